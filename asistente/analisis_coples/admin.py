@@ -42,6 +42,15 @@ class ConfiguracionSistemaAdmin(admin.ModelAdmin):
         ('Configuración de Robustez', {
             'fields': ('configuracion_robustez',)
         }),
+        ('ONNX Runtime', {
+            'fields': (
+                'onnx_intra_op_threads', 'onnx_inter_op_threads',
+                'onnx_nivel_optimizacion', 'onnx_modo_ejecucion',
+                'onnx_arena_memoria', 'onnx_patron_memoria',
+                'onnx_directorio_optimizados'
+            ),
+            'classes': ('collapse',)
+        }),
         ('Metadatos', {
             'fields': ('fecha_creacion', 'fecha_modificacion'),
             'classes': ('collapse',)
@@ -0,0 +1,154 @@
+# analisis_coples/api/archivos.py
+
+"""
+Entrega de archivos del storage (imágenes procesadas) como binario con
+caché HTTP.
+
+- ETag fuerte por archivo (nombre, tamaño y fecha de modificación) y 304 si
+  coincide con If-None-Match.
+- Cache-Control immutable cuando el resultado ya no puede cambiar (análisis
+  completado).
+- Range de un solo tramo (206 / 416), respetando If-Range.
+- Con ANALISIS_IMAGENES_X_ACCEL (prefijo de una location `internal` de
+  nginx) el envío se delega a nginx con X-Accel-Redirect; solo funciona si
+  la petición llega a Django a través de ese nginx.
+"""
+
+import hashlib
+import re
+from typing import Optional, Tuple
+from urllib.parse import quote
+
+from django.conf import settings
+from django.http import FileResponse, HttpResponse, HttpResponseNotModified, StreamingHttpResponse
+from django.utils.http import parse_etags
+
+CACHE_INMUTABLE = 'private, max-age=31536000, immutable'
+CACHE_REVALIDAR = 'private, no-cache'
+TAMANO_BLOQUE = 64 * 1024
+
+_RANGO = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+
+def etag_archivo(archivo) -> str:
+    """ETag fuerte del archivo sin leer su contenido"""
+    try:
+        tamano = archivo.size
+    except (OSError, ValueError):
+        tamano = ''
+    try:
+        modificado = archivo.storage.get_modified_time(archivo.name).timestamp()
+    except (NotImplementedError, OSError, ValueError, AttributeError):
+        modificado = ''
+    resumen = hashlib.sha1(f'{archivo.name}:{tamano}:{modificado}'.encode('utf-8')).hexdigest()
+    return f'"{resumen[:32]}"'
+
+
+def _coincide(etag: str, cabecera: str) -> bool:
+    """Comparación débil de If-None-Match (RFC 9110 §13.1.2)"""
+    etags = parse_etags(cabecera)
+    if '*' in etags:
+        return True
+    return any(e.removeprefix('W/') == etag for e in etags)
+
+
+def _rango(cabecera: str, tamano: int) -> Optional[Tuple[int, int]]:
+    """
+    (inicio, fin) inclusivos de un Range 'bytes=a-b' / 'bytes=a-' / 'bytes=-n'.
+
+    Returns:
+        None si la cabecera no es un rango simple (se sirve el archivo completo)
+
+    Raises:
+        ValueError: Si el rango no es satisfacible
+    """
+    coincidencia = _RANGO.match(cabecera.strip())
+    if not coincidencia:
+        return None
+    inicio, fin = coincidencia.groups()
+    if not inicio and not fin:
+        return None
+    if not inicio:
+        sufijo = int(fin)
+        if sufijo == 0:
+            raise ValueError('Rango vacío')
+        return max(0, tamano - sufijo), tamano - 1
+    inicio = int(inicio)
+    fin = min(int(fin), tamano - 1) if fin else tamano - 1
+    if inicio >= tamano or fin < inicio:
+        raise ValueError('Rango fuera del archivo')
+    return inicio, fin
+
+
+def _leer_tramo(archivo, inicio: int, longitud: int):
+    with archivo.open('rb') as f:
+        f.seek(inicio)
+        while longitud > 0:
+            bloque = f.read(min(TAMANO_BLOQUE, longitud))
+            if not bloque:
+                break
+            longitud -= len(bloque)
+            yield bloque
+
+
+def respuesta_archivo(
+    request,
+    archivo,
+    inmutable: bool,
+    content_type: str = 'image/jpeg',
+    nombre_descarga: Optional[str] = None
+) -> HttpResponse:
+    """
+    Respuesta binaria para un FieldFile con ETag, Cache-Control y Range.
+
+    Args:
+        request: Petición (HttpRequest o Request de DRF)
+        archivo: FieldFile del modelo (p.ej. analisis.archivo_imagen)
+        inmutable: El archivo ya no cambiará (Cache-Control immutable)
+        content_type: Tipo MIME
+        nombre_descarga: Si se indica, Content-Disposition: attachment
+    """
+    etag = etag_archivo(archivo)
+    cache_control = CACHE_INMUTABLE if inmutable else CACHE_REVALIDAR
+
+    def cabeceras(respuesta):
+        respuesta['ETag'] = etag
+        respuesta['Cache-Control'] = cache_control
+        respuesta['Accept-Ranges'] = 'bytes'
+        if nombre_descarga:
+            respuesta['Content-Disposition'] = f'attachment; filename="{nombre_descarga}"'
+        return respuesta
+
+    if_none_match = request.headers.get('If-None-Match')
+    if if_none_match and _coincide(etag, if_none_match):
+        return cabeceras(HttpResponseNotModified())
+
+    # nginx sirve el archivo (y resuelve Range) desde una location internal
+    prefijo = getattr(settings, 'ANALISIS_IMAGENES_X_ACCEL', '')
+    if prefijo:
+        respuesta = HttpResponse(content_type=content_type)
+        respuesta['X-Accel-Redirect'] = prefijo.rstrip('/') + '/' + quote(archivo.name)
+        return cabeceras(respuesta)
+
+    tamano = archivo.size
+    cabecera_rango = request.headers.get('Range')
+    if_range = request.headers.get('If-Range')
+    if cabecera_rango and (not if_range or if_range == etag):
+        try:
+            tramo = _rango(cabecera_rango, tamano)
+        except ValueError:
+            respuesta = HttpResponse(status=416)
+            respuesta['Content-Range'] = f'bytes */{tamano}'
+            return cabeceras(respuesta)
+        if tramo is not None:
+            inicio, fin = tramo
+            longitud = fin - inicio + 1
+            respuesta = StreamingHttpResponse(
+                _leer_tramo(archivo, inicio, longitud), status=206, content_type=content_type
+            )
+            respuesta['Content-Range'] = f'bytes {inicio}-{fin}/{tamano}'
+            respuesta['Content-Length'] = str(longitud)
+            return cabeceras(respuesta)
+
+    respuesta = FileResponse(archivo.open('rb'), content_type=content_type)
+    return cabeceras(respuesta)
@@ -7,7 +7,8 @@ Endpoints:
 - POST /api/camara/preview/iniciar/  - Iniciar preview
 - POST /api/camara/preview/detener/  - Detener preview
 - POST /api/camara/preview/reactivar/- Reactivar desde hibernación
-- GET  /api/camara/preview/frame/    - Obtener frame actual
+- GET  /api/camara/preview/frame/    - Obtener frame actual (ETag / 304)
+- GET  /api/camara/preview/stream/   - Stream MJPEG del preview
 - GET  /api/camara/estado/           - Obtener estado actual
 """
 
@@ -16,7 +17,7 @@ from rest_framework import status, viewsets
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated, AllowAny
-from django.http import HttpResponse
+from django.http import HttpResponse, StreamingHttpResponse
 
 from ..services.camera_service import get_camera_service
 from ..models import EstadoCamara
@@ -177,6 +178,7 @@ class CamaraControlViewSet(viewsets.ViewSet):
         Obtiene el frame actual del preview como imagen JPEG.
         
         Endpoint público (no requiere autenticación) para permitir carga desde <img> tag.
+        Responde 304 si el cliente ya tiene el frame (If-None-Match con el ETag).
         
         Returns:
             HttpResponse con imagen JPEG
@@ -185,26 +187,62 @@ class CamaraControlViewSet(viewsets.ViewSet):
             # NO resetear timer aquí - la solicitud automática de frames
             # no cuenta como interacción del usuario para hibernación
             
-            frame_bytes = self.camera_service.obtener_frame_preview()
-            
-            if frame_bytes:
-                return HttpResponse(
-                    frame_bytes,
-                    content_type='image/jpeg',
-                    headers={
-                        'Cache-Control': 'no-cache, no-store, must-revalidate',
-                        'Pragma': 'no-cache',
-                        'Expires': '0'
-                    }
-                )
-            else:
+            frame = self.camera_service.obtener_frame_preview()
+            
+            if frame is None:
                 return Response({
                     'error': 'No hay frame disponible'
                 }, status=status.HTTP_404_NOT_FOUND)
+            
+            headers = {
+                'Cache-Control': 'no-cache',
+                'ETag': frame.etag,
+            }
+            
+            if frame.etag in request.headers.get('If-None-Match', ''):
+                return HttpResponse(status=status.HTTP_304_NOT_MODIFIED, headers=headers)
+            
+            return HttpResponse(frame.jpeg, content_type='image/jpeg', headers=headers)
                 
         except Exception as e:
             logger.error(f"Error en endpoint preview_frame: {e}")
             return Response({
                 'error': str(e)
             }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
-
+    
+    @action(detail=False, methods=['get'], url_path='preview/stream', permission_classes=[AllowAny])
+    def preview_stream(self, request):
+        """
+        Stream MJPEG (multipart/x-mixed-replace) del preview.
+        
+        Usable directamente en un <img>. Cada frame se envía tal como lo
+        codificó el loop de preview; un cliente lento recibe el más reciente
+        y se salta los intermedios. El stream termina al detener el preview.
+        
+        Returns:
+            StreamingHttpResponse
+        """
+        try:
+            if not self.camera_service.preview_disponible():
+                return Response({
+                    'error': 'Preview no está activo'
+                }, status=status.HTTP_404_NOT_FOUND)
+            
+            if not self.camera_service.es_dueno_camara():
+                # Otro proceso tiene la cámara: relevar sus frames desde memoria compartida
+                self.camera_service.asegurar_relevo_preview()
+            
+            boundary = 'frame'
+            response = StreamingHttpResponse(
+                self.camera_service.difusor_preview.stream_mjpeg(boundary),
+                content_type=f'multipart/x-mixed-replace; boundary={boundary}'
+            )
+            response['Cache-Control'] = 'no-cache, no-store'
+            response['X-Accel-Buffering'] = 'no'  # nginx: no acumular el stream
+            return response
+            
+        except Exception as e:
+            logger.error(f"Error en endpoint preview_stream: {e}")
+            return Response({
+                'error': str(e)
+            }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
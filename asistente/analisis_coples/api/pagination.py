@@ -0,0 +1,26 @@
+# analisis_coples/api/pagination.py
+
+from rest_framework.pagination import CursorPagination
+
+
+class PaginacionCursorAnalisis(CursorPagination):
+    """
+    Paginación por cursor (keyset) sobre timestamp_procesamiento.
+
+    Cada página es un WHERE timestamp_procesamiento < <cursor> LIMIT n sobre
+    el índice, sin OFFSET, así que su coste no crece con la profundidad.
+
+    Es opcional: solo se aplica si el cliente envía ?cursor= o ?page_size=;
+    sin ellos el listado sigue devolviendo una lista como antes.
+    """
+
+    ordering = ('-timestamp_procesamiento', '-id')
+    page_size = 50
+    page_size_query_param = 'page_size'
+    max_page_size = 500
+
+    def paginate_queryset(self, queryset, request, view=None):
+        parametros = request.query_params
+        if self.cursor_query_param not in parametros and self.page_size_query_param not in parametros:
+            return None
+        return super().paginate_queryset(queryset, request, view)
@@ -1,8 +1,10 @@
 # analisis_coples/api/serializers.py
 
+from collections import defaultdict
+
 from rest_framework import serializers
 from django.contrib.auth import get_user_model
-from ..models import ConfiguracionSistema, AnalisisCople, RutinaInspeccion, EstadoCamara
+from ..models import ConfiguracionSistema, AnalisisCople, RutinaInspeccion, EstadoCamara, TrabajoAnalisis
 from ..resultados_models import (
     SegmentacionDefecto,
     SegmentacionPieza,
@@ -22,6 +24,9 @@ class ConfiguracionSistemaSerializer(serializers.ModelSerializer):
         fields = [
             'id', 'nombre', 'ip_camara', 'umbral_confianza', 'umbral_iou',
             'configuracion_robustez', 'distancia_camara_mm', 'factor_conversion_px_mm',
+            'onnx_intra_op_threads', 'onnx_inter_op_threads', 'onnx_nivel_optimizacion',
+            'onnx_modo_ejecucion', 'onnx_arena_memoria', 'onnx_patron_memoria',
+            'onnx_directorio_optimizados',
             'activa', 'creada_por', 'creada_por_nombre',
             'fecha_creacion', 'fecha_modificacion'
         ]
@@ -148,15 +153,123 @@ class SegmentacionPiezaSerializer(serializers.ModelSerializer):
         }
 
 
+# Columnas que necesita la representación de una segmentación
+CAMPOS_SEGMENTACION = (
+    'id', 'clase', 'confianza',
+    'bbox_x1', 'bbox_y1', 'bbox_x2', 'bbox_y2', 'centroide_x', 'centroide_y',
+    'ancho_bbox_px', 'alto_bbox_px', 'ancho_mascara_px', 'alto_mascara_px',
+    'perimetro_mascara_px', 'area_mascara_px',
+    'ancho_bbox_mm', 'alto_bbox_mm', 'ancho_mascara_mm', 'alto_mascara_mm',
+    'perimetro_mascara_mm', 'area_mascara_mm',
+    'excentricidad', 'orientacion_grados', 'coeficientes_mascara',
+)
+
+
+def segmentacion_desde_valores(fila):
+    """
+    Representación de una fila de values(); misma forma que
+    SegmentacionDefectoSerializer / SegmentacionPiezaSerializer.
+    """
+    mediciones_mm = None
+    if fila['ancho_bbox_mm'] is not None:
+        mediciones_mm = {
+            'ancho_bbox': fila['ancho_bbox_mm'],
+            'alto_bbox': fila['alto_bbox_mm'],
+            'ancho_mascara': fila['ancho_mascara_mm'],
+            'alto_mascara': fila['alto_mascara_mm'],
+            'perimetro': fila['perimetro_mascara_mm'],
+            'area': fila['area_mascara_mm']
+        }
+    return {
+        'id': fila['id'],
+        'clase': fila['clase'],
+        'confianza': fila['confianza'],
+        'bbox': {
+            'x1': fila['bbox_x1'],
+            'y1': fila['bbox_y1'],
+            'x2': fila['bbox_x2'],
+            'y2': fila['bbox_y2']
+        },
+        'centroide': {
+            'x': fila['centroide_x'],
+            'y': fila['centroide_y']
+        },
+        'mediciones_px': {
+            'ancho_bbox': fila['ancho_bbox_px'],
+            'alto_bbox': fila['alto_bbox_px'],
+            'ancho_mascara': fila['ancho_mascara_px'],
+            'alto_mascara': fila['alto_mascara_px'],
+            'perimetro': fila['perimetro_mascara_px'],
+            'area': fila['area_mascara_px']
+        },
+        'mediciones_mm': mediciones_mm,
+        'geometria': {
+            'excentricidad': fila['excentricidad'],
+            'orientacion_grados': fila['orientacion_grados']
+        },
+        'coeficientes_mascara': fila['coeficientes_mascara']
+    }
+
+
+class SegmentacionesField(serializers.Field):
+    """
+    Segmentaciones de un análisis leídas con values() y construidas en una
+    pasada, sin instanciar modelos ni un serializer anidado por fila.
+    
+    Usa las filas precargadas por AnalisisCopleListaSerializer si las hay;
+    si no, hace una consulta por relación.
+    """
+    
+    def __init__(self, modelo, **kwargs):
+        self.modelo = modelo
+        kwargs['read_only'] = True
+        super().__init__(**kwargs)
+    
+    def get_attribute(self, instance):
+        precargadas = getattr(instance, '_segmentaciones_precargadas', {})
+        if self.field_name in precargadas:
+            return precargadas[self.field_name]
+        return self.modelo.objects.filter(analisis=instance).values(*CAMPOS_SEGMENTACION)
+    
+    def to_representation(self, filas):
+        return [segmentacion_desde_valores(fila) for fila in filas]
+
+
+class AnalisisCopleListaSerializer(serializers.ListSerializer):
+    """Precarga las segmentaciones de todos los análisis con una consulta por relación"""
+    
+    def to_representation(self, data):
+        analisis = list(data.all() if hasattr(data, 'all') else data)
+        for nombre, campo in self.child.fields.items():
+            if not isinstance(campo, SegmentacionesField):
+                continue
+            agrupadas = defaultdict(list)
+            filas = campo.modelo.objects.filter(
+                analisis_id__in=[a.pk for a in analisis]
+            ).values('analisis_id', *CAMPOS_SEGMENTACION)
+            for fila in filas:
+                agrupadas[fila['analisis_id']].append(fila)
+            for a in analisis:
+                if not hasattr(a, '_segmentaciones_precargadas'):
+                    a._segmentaciones_precargadas = {}
+                a._segmentaciones_precargadas[nombre] = agrupadas.get(a.pk, [])
+        return super().to_representation(analisis)
+
+
 class AnalisisCopleSerializer(serializers.ModelSerializer):
-    """Serializer para AnalisisCople con resultados relacionados"""
+    """
+    Serializer para AnalisisCople con resultados relacionados.
+    
+    Admite ?campos=a,b,... para devolver solo esos campos; omitir
+    segmentaciones_defectos / segmentaciones_piezas evita sus consultas.
+    """
     
     usuario_nombre = serializers.CharField(source='usuario.name', read_only=True)
     configuracion_nombre = serializers.CharField(source='configuracion.nombre', read_only=True)
     
-    # Resultados relacionados (solo segmentación)
-    segmentaciones_defectos = SegmentacionDefectoSerializer(many=True, read_only=True)
-    segmentaciones_piezas = SegmentacionPiezaSerializer(many=True, read_only=True)
+    # Resultados relacionados (solo segmentación, ver SegmentacionesField)
+    segmentaciones_defectos = SegmentacionesField(SegmentacionDefecto)
+    segmentaciones_piezas = SegmentacionesField(SegmentacionPieza)
     
     # Tiempos de procesamiento (objeto y campos directos para compatibilidad)
     tiempos = serializers.SerializerMethodField()
@@ -181,6 +294,16 @@ class AnalisisCopleSerializer(serializers.ModelSerializer):
             'resolucion_ancho', 'resolucion_alto', 'resolucion_canales',
             'tiempos', 'tiempo_total_ms', 'imagen_procesada_url', 'metadatos_json', 'mensaje_error'
         ]
+        list_serializer_class = AnalisisCopleListaSerializer
+    
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        request = self.context.get('request')
+        campos = request.query_params.get('campos') if request is not None and hasattr(request, 'query_params') else None
+        if campos:
+            solicitados = {campo.strip() for campo in campos.split(',') if campo.strip()}
+            for nombre in set(self.fields) - solicitados:
+                self.fields.pop(nombre)
     
     def get_tiempos(self, obj):
         return {
@@ -221,11 +344,15 @@ class AnalisisCopleListSerializer(serializers.ModelSerializer):
             'num_defectos', 'num_piezas', 'tiempo_total_ms', 'mensaje_error'
         ]
     
+    # AnalisisCopleViewSet anota num_defectos/num_piezas en el queryset;
+    # count() solo como respaldo para objetos sin anotar
     def get_num_defectos(self, obj):
-        return obj.segmentaciones_defectos.count()
+        num = getattr(obj, 'num_defectos', None)
+        return obj.segmentaciones_defectos.count() if num is None else num
     
     def get_num_piezas(self, obj):
-        return obj.segmentaciones_piezas.count()
+        num = getattr(obj, 'num_piezas', None)
+        return obj.segmentaciones_piezas.count() if num is None else num
 
 
 class EstadisticasSistemaSerializer(serializers.ModelSerializer):
@@ -414,3 +541,19 @@ class IniciarRutinaSerializer(serializers.Serializer):
         if value and not ConfiguracionSistema.objects.filter(id=value).exists():
             raise serializers.ValidationError("Configuración no encontrada")
         return value
+
+
+class TrabajoAnalisisSerializer(serializers.ModelSerializer):
+    """Serializer para el estado de un trabajo en cola"""
+    
+    tipo_display = serializers.CharField(source='get_tipo_display', read_only=True)
+    estado_display = serializers.CharField(source='get_estado_display', read_only=True)
+    
+    class Meta:
+        model = TrabajoAnalisis
+        fields = [
+            'id', 'tipo', 'tipo_display', 'estado', 'estado_display',
+            'parametros', 'resultado', 'progreso', 'mensaje', 'mensaje_error',
+            'timestamp_creacion', 'timestamp_inicio', 'timestamp_fin'
+        ]
+        read_only_fields = fields
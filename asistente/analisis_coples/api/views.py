@@ -5,28 +5,56 @@ from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated, AllowAny
 from django.shortcuts import get_object_or_404
-from django.http import HttpResponse, FileResponse
-from django.db.models import Q
+from django.http import HttpResponse
+from django.db import transaction
+from django.db.models import Count, Q, Sum
 from django.utils import timezone
 from datetime import datetime, timedelta
 import logging
 import os
 
-from ..models import ConfiguracionSistema, AnalisisCople, RutinaInspeccion
+from ..models import ConfiguracionSistema, AnalisisCople, RutinaInspeccion, TrabajoAnalisis
 from ..resultados_models import EstadisticasSistema
 from ..services_real import servicio_analisis_real as servicio_analisis
+from ..services.trabajos_service import get_cola_trabajos, trabajo_activo
+from ..services.estadisticas_service import obtener_estadisticas
+from .archivos import respuesta_archivo
+from .pagination import PaginacionCursorAnalisis
 from .serializers import (
     ConfiguracionSistemaSerializer,
     AnalisisCopleSerializer,
     AnalisisCopleListSerializer,
     EstadisticasSistemaSerializer,
     AnalisisRequestSerializer,
-    ConfiguracionRequestSerializer
+    ConfiguracionRequestSerializer,
+    TrabajoAnalisisSerializer
 )
 
 logger = logging.getLogger(__name__)
 
 
+def _fecha_parametro(request, nombre):
+    """Fecha YYYY-MM-DD de un query param, o None si falta o es inválida"""
+    valor = request.query_params.get(nombre)
+    if not valor:
+        return None
+    try:
+        return datetime.strptime(valor, '%Y-%m-%d').date()
+    except ValueError:
+        return None
+
+
+def traza_solicitada(request) -> bool:
+    """
+    Traza de diagnóstico pedida con ?traza=1 o la cabecera X-Analisis-Traza: 1.
+    Solo para usuarios staff.
+    """
+    if not getattr(request.user, 'is_staff', False):
+        return False
+    valor = request.query_params.get('traza') or request.headers.get('X-Analisis-Traza', '')
+    return valor.lower() in ('1', 'true', 'si', 'sí')
+
+
 class ConfiguracionSistemaViewSet(viewsets.ModelViewSet):
     """ViewSet para gestionar configuraciones del sistema"""
     
@@ -91,6 +119,7 @@ class AnalisisCopleViewSet(viewsets.ModelViewSet):
     
     queryset = AnalisisCople.objects.all()
     permission_classes = [IsAuthenticated]
+    pagination_class = PaginacionCursorAnalisis
     
     def get_serializer_class(self):
         """Usar serializer detallado para retrieve, simplificado para list"""
@@ -136,96 +165,93 @@ class AnalisisCopleViewSet(viewsets.ModelViewSet):
             except ValueError:
                 pass
         
+        # Nombres de usuario/configuración en la misma consulta; en los
+        # listados también los conteos (sin N+1)
+        if self.action in ('list', 'recientes', 'retrieve'):
+            queryset = queryset.select_related('usuario', 'configuracion')
+        if self.action in ('list', 'recientes'):
+            queryset = queryset.annotate(
+                num_defectos=Count('segmentaciones_defectos', distinct=True),
+                num_piezas=Count('segmentaciones_piezas', distinct=True),
+            )
+        
         return queryset.order_by('-timestamp_procesamiento')
     
     def create(self, request):
         """
-        Crea un nuevo análisis ejecutando segmentación y mediciones.
+        Encola un análisis de segmentación (captura + segmentación + mediciones).
         
         Body params:
             tipo_analisis: 'medicion_piezas' o 'medicion_defectos'
             configuracion_id (opcional): ID de configuración a usar
+        
+        Returns:
+            202 con el trabajo encolado; al completarse, resultado.analisis_id
+            es el AnalisisCople creado (GET /api/analisis/trabajos/{id}/)
         """
         serializer = self.get_serializer(data=request.data)
         if not serializer.is_valid():
             return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
         
-        tipo_analisis = serializer.validated_data['tipo_analisis']
-        configuracion_id = serializer.validated_data.get('configuracion_id')
-        
         try:
-            # Usar el nuevo servicio de segmentación simplificado
-            from ..services.segmentation_analysis_service import get_segmentation_analysis_service
-            
-            seg_service = get_segmentation_analysis_service()
-            
-            # Ejecutar análisis con captura desde cámara activa
-            resultado = seg_service.analizar_imagen(
-                tipo_analisis=tipo_analisis,
-                usuario=request.user,
-                configuracion_id=configuracion_id
+            # La inferencia no ocurre dentro de la petición (ni de su transacción)
+            trabajo = get_cola_trabajos().encolar(
+                'analizar_imagen',
+                parametros={
+                    'tipo_analisis': serializer.validated_data['tipo_analisis'],
+                    'configuracion_id': serializer.validated_data.get('configuracion_id'),
+                    'traza': traza_solicitada(request),
+                },
+                usuario=request.user
             )
             
-            if 'error' in resultado:
-                return Response({
-                    'error': resultado['error']
-                }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
-            
-            # Obtener el análisis creado
-            analisis = AnalisisCople.objects.get(id=resultado['analisis_id'])
-            serializer_response = AnalisisCopleSerializer(analisis)
-            
-            return Response(serializer_response.data, status=status.HTTP_201_CREATED)
+            return Response({
+                'message': 'Análisis encolado',
+                'trabajo_id': str(trabajo.id),
+                'trabajo': TrabajoAnalisisSerializer(trabajo).data
+            }, status=status.HTTP_202_ACCEPTED)
             
         except Exception as e:
-            logger.error(f"Error creando análisis: {e}", exc_info=True)
+            logger.error(f"Error encolando análisis: {e}", exc_info=True)
             return Response({
-                'error': f'Error ejecutando análisis: {str(e)}'
+                'error': f'Error encolando análisis: {str(e)}'
             }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
     
     @action(detail=False, methods=['post'])
     def realizar_analisis(self, request):
-        """Realizar un nuevo análisis"""
+        """
+        Encola un nuevo análisis.
+        
+        POST /api/analisis/resultados/realizar_analisis/
+        
+        Returns:
+            202 con el trabajo encolado; consultar GET /api/analisis/trabajos/{id}/
+        """
         serializer = AnalisisRequestSerializer(data=request.data)
         if not serializer.is_valid():
             return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
         
-        tipo_analisis = serializer.validated_data['tipo_analisis']
-        configuracion_id = serializer.validated_data.get('configuracion_id')
-        
         try:
-            # Inicializar sistema si es necesario
-            if not servicio_analisis.inicializado:
-                if not servicio_analisis.inicializar_sistema(configuracion_id):
-                    return Response({
-                        'error': 'Error inicializando el sistema de análisis'
-                    }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
-            
-            # Realizar análisis según el tipo
-            if tipo_analisis == 'completo':
-                resultado = servicio_analisis.realizar_analisis_completo(request.user)
-            elif tipo_analisis == 'clasificacion':
-                resultado = servicio_analisis.realizar_analisis_clasificacion(request.user)
-            else:
-                # Para otros tipos de análisis, usar análisis completo por ahora
-                resultado = servicio_analisis.realizar_analisis_completo(request.user)
-            
-            if 'error' in resultado:
-                return Response(resultado, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
-            
-            # Obtener el análisis creado
-            analisis = AnalisisCople.objects.get(id_analisis=resultado['id_analisis'])
-            serializer_response = AnalisisCopleSerializer(analisis)
+            # Encolar el análisis; un trabajador lo ejecuta fuera de la petición
+            trabajo = get_cola_trabajos().encolar(
+                'realizar_analisis',
+                parametros={
+                    'tipo_analisis': serializer.validated_data['tipo_analisis'],
+                    'configuracion_id': serializer.validated_data.get('configuracion_id'),
+                    'traza': traza_solicitada(request),
+                },
+                usuario=request.user
+            )
             
             return Response({
-                'message': 'Análisis completado exitosamente',
-                'analisis': serializer_response.data
-            }, status=status.HTTP_201_CREATED)
+                'message': 'Análisis encolado',
+                'trabajo': TrabajoAnalisisSerializer(trabajo).data
+            }, status=status.HTTP_202_ACCEPTED)
             
         except Exception as e:
-            logger.error(f"Error realizando análisis: {e}")
+            logger.error(f"Error encolando análisis: {e}")
             return Response({
-                'error': f'Error realizando análisis: {str(e)}'
+                'error': f'Error encolando análisis: {str(e)}'
             }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
     
     @action(detail=True, methods=['get'], url_path='descargar-imagen')
@@ -239,32 +265,18 @@ class AnalisisCopleViewSet(viewsets.ModelViewSet):
                     'error': 'No hay imagen procesada disponible'
                 }, status=status.HTTP_404_NOT_FOUND)
             
-            # Abrir y servir el archivo con headers de descarga
-            try:
-                imagen_path = analisis.archivo_imagen.path
-                
-                if not os.path.exists(imagen_path):
-                    return Response({
-                        'error': 'El archivo de imagen no existe en el sistema'
-                    }, status=status.HTTP_404_NOT_FOUND)
-                
-                # Crear response con FileResponse para forzar descarga
-                response = FileResponse(
-                    open(imagen_path, 'rb'),
-                    content_type='image/jpeg'
-                )
-                
-                # Header para forzar descarga en lugar de mostrar
-                filename = f"analisis_{analisis.id_analisis}_procesado.jpg"
-                response['Content-Disposition'] = f'attachment; filename="{filename}"'
-                
-                return response
-                
-            except Exception as e:
-                logger.error(f"Error abriendo imagen: {e}")
+            if not analisis.archivo_imagen.storage.exists(analisis.archivo_imagen.name):
                 return Response({
-                    'error': f'Error accediendo al archivo: {str(e)}'
-                }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+                    'error': 'El archivo de imagen no existe en el sistema'
+                }, status=status.HTTP_404_NOT_FOUND)
+            
+            # Header para forzar descarga en lugar de mostrar
+            return respuesta_archivo(
+                request,
+                analisis.archivo_imagen,
+                inmutable=analisis.estado == 'completado',
+                nombre_descarga=f"analisis_{analisis.id_analisis}_procesado.jpg"
+            )
             
         except Exception as e:
             logger.error(f"Error descargando imagen: {e}")
@@ -274,11 +286,14 @@ class AnalisisCopleViewSet(viewsets.ModelViewSet):
     
     @action(detail=True, methods=['get'], permission_classes=[AllowAny])
     def imagen_procesada(self, request, pk=None):
-        """Obtener imagen procesada de un análisis"""
+        """
+        Obtener imagen procesada de un análisis.
+        
+        Por defecto responde el JPEG binario con ETag, Cache-Control y Range.
+        ?formato=base64 devuelve el JSON anterior ({image_data, ...}) por
+        compatibilidad.
+        """
         try:
-            import base64
-            from django.http import FileResponse
-            
             analisis = self.get_object()
             
             if not analisis.archivo_imagen:
@@ -286,8 +301,21 @@ class AnalisisCopleViewSet(viewsets.ModelViewSet):
                     'error': 'No hay imagen procesada disponible'
                 }, status=status.HTTP_404_NOT_FOUND)
             
+            if request.query_params.get('formato') != 'base64':
+                if not analisis.archivo_imagen.storage.exists(analisis.archivo_imagen.name):
+                    return Response({
+                        'error': 'El archivo de imagen no existe en el sistema'
+                    }, status=status.HTTP_404_NOT_FOUND)
+                return respuesta_archivo(
+                    request,
+                    analisis.archivo_imagen,
+                    inmutable=analisis.estado == 'completado'
+                )
+            
             # Leer el archivo de imagen
             try:
+                import base64
+                
                 with analisis.archivo_imagen.open('rb') as f:
                     imagen_bytes = f.read()
                 
@@ -372,68 +400,24 @@ class AnalisisCopleViewSet(viewsets.ModelViewSet):
             # Estadísticas del sistema
             stats_sistema = servicio_analisis.obtener_estadisticas_sistema()
             
-            # Estadísticas de la base de datos
-            total_analisis = self.get_queryset().count()
-            analisis_exitosos = self.get_queryset().filter(estado='completado').count()
-            analisis_con_error = self.get_queryset().filter(estado='error').count()
-            
-            # Estadísticas por tipo
-            stats_por_tipo = {}
-            for tipo, _ in AnalisisCople.TIPO_ANALISIS_CHOICES:
-                count = self.get_queryset().filter(tipo_analisis=tipo).count()
-                stats_por_tipo[tipo] = count
-            
-            # Estadísticas de segmentación
-            total_defectos = 0
-            total_piezas = 0
-            confianza_promedio = 0.0
-            
-            analisis_completados = self.get_queryset().filter(estado='completado')
-            
-            if analisis_completados.exists():
-                # Contar defectos y piezas
-                from ..resultados_models import SegmentacionDefecto, SegmentacionPieza
-                
-                total_defectos = SegmentacionDefecto.objects.filter(
-                    analisis__in=analisis_completados
-                ).count()
-                
-                total_piezas = SegmentacionPieza.objects.filter(
-                    analisis__in=analisis_completados
-                ).count()
-                
-                # Calcular confianza promedio de segmentaciones
-                confianzas_defectos = SegmentacionDefecto.objects.filter(
-                    analisis__in=analisis_completados
-                ).values_list('confianza', flat=True)
-                
-                confianzas_piezas = SegmentacionPieza.objects.filter(
-                    analisis__in=analisis_completados
-                ).values_list('confianza', flat=True)
-                
-                todas_confianzas = list(confianzas_defectos) + list(confianzas_piezas)
-                if todas_confianzas:
-                    confianza_promedio = sum(todas_confianzas) / len(todas_confianzas)
+            # Estadísticas de la base de datos (agregadas en BD y cacheadas)
+            alcance = 'todos' if request.user.is_superuser else f'usuario={request.user.pk}'
+            filtros = sorted(
+                (clave, valor) for clave, valor in request.query_params.items()
+                if clave in ('tipo_analisis', 'estado', 'fecha_desde', 'fecha_hasta')
+            )
+            # Sin filtros de usuario/tipo/estado sirven los resúmenes diarios
+            usar_resumenes = request.user.is_superuser and not any(
+                clave in ('tipo_analisis', 'estado') for clave, _ in filtros
+            )
+            desde, hasta = (
+                _fecha_parametro(request, 'fecha_desde'), _fecha_parametro(request, 'fecha_hasta')
+            )
+            estadisticas = obtener_estadisticas(
+                self.get_queryset(), f'{alcance}:{filtros}', usar_resumenes, desde, hasta
+            )
             
-            return Response({
-                'sistema': stats_sistema,
-                'base_datos': {
-                    'total_analisis': total_analisis,
-                    'analisis_exitosos': analisis_exitosos,
-                    'analisis_con_error': analisis_con_error,
-                    'tasa_exito': (analisis_exitosos / total_analisis * 100) if total_analisis > 0 else 0
-                },
-                'por_tipo': stats_por_tipo,
-                'segmentacion': {
-                    'total_defectos': total_defectos,
-                    'total_piezas': total_piezas,
-                    'confianza_promedio': confianza_promedio,
-                    'promedio_por_analisis': {
-                        'defectos': (total_defectos / analisis_exitosos) if analisis_exitosos > 0 else 0,
-                        'piezas': (total_piezas / analisis_exitosos) if analisis_exitosos > 0 else 0
-                    }
-                }
-            })
+            return Response({'sistema': stats_sistema, **estadisticas})
             
         except Exception as e:
             logger.error(f"Error obteniendo estadísticas: {e}")
@@ -485,26 +469,28 @@ class EstadisticasSistemaViewSet(viewsets.ReadOnlyModelViewSet):
     def resumen(self, request):
         """Obtener resumen de estadísticas"""
         try:
-            # Estadísticas del último mes
+            # Estadísticas del último mes (suma de los resúmenes diarios)
             fecha_limite = timezone.now().date() - timedelta(days=30)
-            stats_recientes = self.get_queryset().filter(fecha__gte=fecha_limite)
-            
-            if stats_recientes.exists():
-                # Calcular promedios
-                total_analisis = sum(s.total_analisis for s in stats_recientes)
-                analisis_exitosos = sum(s.analisis_exitosos for s in stats_recientes)
-                total_aceptados = sum(s.total_aceptados for s in stats_recientes)
-                total_rechazados = sum(s.total_rechazados for s in stats_recientes)
+            totales = self.get_queryset().filter(fecha__gte=fecha_limite).order_by().aggregate(
+                dias=Count('pk'),
+                total_analisis=Sum('total_analisis'),
+                analisis_exitosos=Sum('analisis_exitosos'),
+            )
+            
+            if totales['dias']:
+                total_analisis = totales['total_analisis'] or 0
+                analisis_exitosos = totales['analisis_exitosos'] or 0
                 
+                # La clasificación aceptado/rechazado ya no se registra; los
+                # campos se mantienen para el frontend
                 return Response({
                     'periodo': 'Últimos 30 días',
                     'total_analisis': total_analisis,
                     'analisis_exitosos': analisis_exitosos,
                     'tasa_exito': (analisis_exitosos / total_analisis * 100) if total_analisis > 0 else 0,
-                    'total_aceptados': total_aceptados,
-                    'total_rechazados': total_rechazados,
-                    'tasa_aceptacion': (total_aceptados / (total_aceptados + total_rechazados) * 100) 
-                                      if (total_aceptados + total_rechazados) > 0 else 0
+                    'total_aceptados': 0,
+                    'total_rechazados': 0,
+                    'tasa_aceptacion': 0
                 })
             else:
                 return Response({
@@ -592,6 +578,20 @@ class SistemaControlViewSet(viewsets.ViewSet):
                 'error': f'Error liberando sistema: {str(e)}'
             }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
     
+    @action(detail=False, methods=['get'])
+    def modelos(self, request):
+        """Estadísticas del registro de modelos ONNX (cargas, tiempos, memoria)"""
+        try:
+            from ..services.model_registry import get_model_registry
+            
+            return Response(get_model_registry().obtener_estadisticas())
+            
+        except Exception as e:
+            logger.error(f"Error obteniendo estadísticas de modelos: {e}")
+            return Response({
+                'error': f'Error obteniendo estadísticas de modelos: {str(e)}'
+            }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+    
     @action(detail=False, methods=['post'])
     def capturar(self, request):
         """
@@ -740,63 +740,52 @@ class RutinaInspeccionViewSet(viewsets.ModelViewSet):
     @action(detail=True, methods=['post'])
     def ejecutar_barrido(self, request, pk=None):
         """
-        Ejecuta el barrido automático de 6 ángulos.
+        Encola el barrido automático de la rutina.
         
         POST /api/rutinas/{id}/ejecutar_barrido/
         
-        NOTA: Esta operación toma ~18 segundos (6 fotos x 3s)
+        El barrido lo ejecuta un trabajador fuera de la petición; al terminar
+        la rutina queda finalizada. El progreso se consulta en
+        GET /api/analisis/trabajos/{id}/
         
         Returns:
-            Resultado del barrido y lista de análisis creados
+            202 con el trabajo encolado; 409 si la rutina ya tiene un barrido
+            pendiente o en proceso
         """
         try:
-            from ..services.rutina_inspeccion_service import get_rutina_inspeccion_service
-            
-            rutina = self.get_object()
-            
-            # Verificar que la rutina está en progreso
-            if rutina.estado != 'en_progreso':
-                return Response({
-                    'error': f'La rutina está en estado {rutina.estado}, no se puede ejecutar barrido'
-                }, status=status.HTTP_400_BAD_REQUEST)
-            
-            # Ejecutar barrido
-            rutina_service = get_rutina_inspeccion_service()
-            resultado = rutina_service.ejecutar_barrido_automatico(
-                rutina_id=rutina.id,
-                usuario=request.user
-            )
-            
-            if not resultado.get('success'):
-                return Response({
-                    'error': resultado.get('error', 'Error ejecutando barrido')
-                }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
-            
-            # Finalizar rutina automáticamente
-            resultado_finalizacion = rutina_service.finalizar_rutina(rutina.id)
-            
-            if not resultado_finalizacion.get('success'):
-                return Response({
-                    'error': resultado_finalizacion.get('error', 'Error finalizando rutina')
-                }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
-            
-            # Recargar rutina para obtener datos actualizados
-            rutina.refresh_from_db()
-            
-            from .serializers import RutinaInspeccionSerializer
-            rutina_serializer = RutinaInspeccionSerializer(rutina, context={'request': request})
+            # Bloquear la fila de la rutina: dos peticiones simultáneas no
+            # pueden encolar dos barridos de la misma rutina
+            with transaction.atomic():
+                rutina = RutinaInspeccion.objects.select_for_update().get(pk=self.get_object().pk)
+                
+                # Verificar que la rutina está en progreso
+                if rutina.estado != 'en_progreso':
+                    return Response({
+                        'error': f'La rutina está en estado {rutina.estado}, no se puede ejecutar barrido'
+                    }, status=status.HTTP_400_BAD_REQUEST)
+                
+                en_curso = trabajo_activo('ejecutar_barrido', rutina_id=rutina.id)
+                if en_curso is not None:
+                    return Response({
+                        'error': 'La rutina ya tiene un barrido pendiente o en proceso',
+                        'trabajo': TrabajoAnalisisSerializer(en_curso).data
+                    }, status=status.HTTP_409_CONFLICT)
+                
+                trabajo = get_cola_trabajos().encolar(
+                    'ejecutar_barrido',
+                    parametros={'rutina_id': rutina.id, 'traza': traza_solicitada(request)},
+                    usuario=request.user
+                )
             
             return Response({
-                'message': 'Barrido completado y rutina finalizada',
-                'rutina': rutina_serializer.data,
-                'num_capturas': resultado['num_capturas'],
-                'analisis_ids': resultado['analisis_ids']
-            })
+                'message': 'Barrido encolado',
+                'trabajo': TrabajoAnalisisSerializer(trabajo).data
+            }, status=status.HTTP_202_ACCEPTED)
             
         except Exception as e:
-            logger.error(f"Error ejecutando barrido: {e}", exc_info=True)
+            logger.error(f"Error encolando barrido: {e}", exc_info=True)
             return Response({
-                'error': f'Error ejecutando barrido: {str(e)}'
+                'error': f'Error encolando barrido: {str(e)}'
             }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
     
     @action(detail=True, methods=['get'])
@@ -853,3 +842,30 @@ class RutinaInspeccionViewSet(viewsets.ModelViewSet):
             return Response({
                 'error': f'Error obteniendo reporte: {str(e)}'
             }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
+class TrabajoAnalisisViewSet(viewsets.ReadOnlyModelViewSet):
+    """
+    Consulta de trabajos encolados (análisis y barridos).
+    
+    GET /api/analisis/trabajos/{id}/ devuelve estado, progreso y resultado.
+    """
+    
+    queryset = TrabajoAnalisis.objects.all()
+    serializer_class = TrabajoAnalisisSerializer
+    permission_classes = [IsAuthenticated]
+    
+    def get_queryset(self):
+        """Filtrar trabajos por usuario"""
+        queryset = super().get_queryset()
+        
+        # Filtrar por usuario si no es superusuario
+        if not self.request.user.is_superuser:
+            queryset = queryset.filter(usuario=self.request.user)
+        
+        # Filtrar por estado
+        estado = self.request.query_params.get('estado')
+        if estado:
+            queryset = queryset.filter(estado=estado)
+        
+        return queryset.order_by('-timestamp_creacion')
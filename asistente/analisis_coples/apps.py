@@ -1,6 +1,68 @@
+import logging
+import os
+import sys
+import threading
+
 from django.apps import AppConfig
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
 
 
 class AnalisisCoplesConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'analisis_coples'
+
+    def ready(self):
+        """
+        Al arrancar el servidor: precarga los modelos ONNX en segundo plano e
+        inicia los hilos trabajadores de la cola de análisis.
+        """
+        from .modules.logging_config import configurar_traza
+        configurar_traza(getattr(settings, 'ANALISIS_TRAZA_MUESTREO', 0.0))
+
+        # Resumen diario al terminar cada análisis; cada escritura invalida
+        # las estadísticas cacheadas
+        from django.db.models.signals import post_delete, post_save, pre_save
+        from .models import AnalisisCople
+        from .services.estadisticas_service import (
+            invalidar_estadisticas,
+            recordar_estado_previo,
+            registrar_transicion_estado,
+        )
+        pre_save.connect(recordar_estado_previo, sender=AnalisisCople, dispatch_uid='resumen_pre_save')
+        post_save.connect(registrar_transicion_estado, sender=AnalisisCople, dispatch_uid='resumen_post_save')
+        post_save.connect(invalidar_estadisticas, sender=AnalisisCople, dispatch_uid='estadisticas_post_save')
+        post_delete.connect(invalidar_estadisticas, sender=AnalisisCople, dispatch_uid='estadisticas_post_delete')
+
+        if not self._es_proceso_servidor():
+            return
+
+        num_trabajadores = getattr(settings, 'ANALISIS_TRABAJADORES_SERVIDOR', 0)
+        if num_trabajadores > 0 and getattr(settings, 'ANALISIS_COLA_TRABAJOS', 'base_datos') == 'base_datos':
+            from .services.trabajos_service import iniciar_trabajadores_servidor
+            iniciar_trabajadores_servidor(num_trabajadores)
+
+        if not getattr(settings, 'ANALISIS_PRECARGAR_MODELOS', False):
+            return
+
+        from .services.model_registry import precargar_modelos
+
+        threading.Thread(
+            target=precargar_modelos,
+            name='PrecargaModelos',
+            daemon=True,
+        ).start()
+        logger.info("🔥 Precarga de modelos ONNX iniciada en segundo plano")
+
+    @staticmethod
+    def _es_proceso_servidor() -> bool:
+        """
+        Evita precargar en comandos de gestión (migrate, shell, ...) y en el
+        proceso vigilante del autoreloader de runserver.
+        """
+        if os.path.basename(sys.argv[0]) != 'manage.py':
+            return True  # gunicorn, uvicorn, etc.
+        if len(sys.argv) < 2 or sys.argv[1] not in ('runserver', 'runserver_plus'):
+            return False
+        return os.environ.get('RUN_MAIN') == 'true' or '--noreload' in sys.argv
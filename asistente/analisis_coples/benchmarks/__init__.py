@@ -0,0 +1,6 @@
+"""
+Benchmarks del pipeline de análisis.
+
+Se ejecutan con `python manage.py benchmark_pipeline` (ver
+management/commands/benchmark_pipeline.py).
+"""
@@ -0,0 +1,116 @@
+"""
+Modelo ONNX mínimo con las entradas y salidas de YOLO11-SEG.
+
+Sustituye a los modelos de producción (que no se versionan) cuando no están
+en ModelsConfig.MODELS_DIR: entrada images (N, 3, 640, 640) y salidas
+(N, 37, 8400) y (N, 32, 160, 160), con un par de convoluciones y pesos
+aleatorios con semilla. Los sesgos colocan las cajas alrededor del centro de
+la imagen y la confianza cerca del umbral, así que decodificación, NMS,
+máscaras y mediciones trabajan con un número de instancias realista.
+
+Requiere el paquete `onnx` (solo para generar el archivo).
+"""
+
+import os
+
+import numpy as np
+
+from analisis_coples.expo_config import ModelsConfig
+
+# Escalas de la cabeza YOLO (stride, lado de la rejilla para 640)
+ESCALAS = ((8, 80), (16, 40), (32, 20))
+NUM_SALIDAS = 37   # cx, cy, w, h, conf, 32 coeficientes
+NUM_PROTOS = 32
+
+
+def _pesos_cabeza(rng: np.random.Generator, stride: int):
+    fan_in = 3 * stride * stride
+    # Desviación de la salida por canal: cajas de ±100 px, confianza y coeficientes ~N(0, 1)
+    escala = np.array([100, 100, 40, 40, 1.5] + [1.0] * NUM_PROTOS, dtype=np.float32)
+    pesos = rng.standard_normal((NUM_SALIDAS, 3, stride, stride)).astype(np.float32)
+    pesos *= (escala / np.sqrt(fan_in) * 2)[:, None, None, None]
+    sesgo = np.zeros(NUM_SALIDAS, dtype=np.float32)
+    sesgo[:5] = (320, 320, 160, 160, -1.0)  # ~2% de anclas sobre el umbral de confianza
+    # Compensar la media de la entrada (~0.5) para centrar las cajas
+    sesgo -= pesos.sum(axis=(1, 2, 3)) * 0.5
+    return pesos, sesgo
+
+
+def crear_modelo_minimo(ruta: str, semilla: int = 0) -> str:
+    """
+    Genera el modelo mínimo en `ruta`.
+
+    Args:
+        ruta: Archivo .onnx a escribir
+        semilla: Semilla de los pesos
+
+    Returns:
+        La ruta del modelo
+    """
+    import onnx
+    from onnx import TensorProto, helper, numpy_helper
+
+    rng = np.random.default_rng(semilla)
+    tamano = ModelsConfig.INPUT_SIZE
+    nodos, inicializadores, salidas_escala = [], [], []
+
+    inicializadores.append(numpy_helper.from_array(
+        np.array([0, NUM_SALIDAS, -1], dtype=np.int64), 'forma_cabeza'
+    ))
+    for stride, _ in ESCALAS:
+        pesos, sesgo = _pesos_cabeza(rng, stride)
+        inicializadores += [
+            numpy_helper.from_array(pesos, f'w{stride}'),
+            numpy_helper.from_array(sesgo, f'b{stride}'),
+        ]
+        nodos += [
+            helper.make_node(
+                'Conv', ['images', f'w{stride}', f'b{stride}'], [f'p{stride}'],
+                kernel_shape=[stride, stride], strides=[stride, stride]
+            ),
+            helper.make_node('Reshape', [f'p{stride}', 'forma_cabeza'], [f'r{stride}']),
+        ]
+        salidas_escala.append(f'r{stride}')
+    nodos.append(helper.make_node('Concat', salidas_escala, ['output0'], axis=2))
+
+    pesos_protos = (rng.standard_normal((NUM_PROTOS, 3, 4, 4)) / np.sqrt(48)).astype(np.float32)
+    inicializadores.append(numpy_helper.from_array(pesos_protos, 'wp'))
+    nodos.append(helper.make_node('Conv', ['images', 'wp'], ['output1'], kernel_shape=[4, 4], strides=[4, 4]))
+
+    num_anclas = sum(lado * lado for _, lado in ESCALAS)
+    grafo = helper.make_graph(
+        nodos,
+        'yolo11_seg_minimo',
+        [helper.make_tensor_value_info('images', TensorProto.FLOAT, ['batch', 3, tamano, tamano])],
+        [
+            helper.make_tensor_value_info('output0', TensorProto.FLOAT, ['batch', NUM_SALIDAS, num_anclas]),
+            helper.make_tensor_value_info('output1', TensorProto.FLOAT, ['batch', NUM_PROTOS, tamano // 4, tamano // 4]),
+        ],
+        inicializadores
+    )
+    modelo = helper.make_model(grafo, opset_imports=[helper.make_opsetid('', 13)])
+    modelo.ir_version = 8
+    onnx.checker.check_model(modelo)
+
+    os.makedirs(os.path.dirname(ruta) or '.', exist_ok=True)
+    onnx.save(modelo, ruta)
+    return ruta
+
+
+def ruta_modelo(nombre: str, directorio_minimo: str, forzar_minimo: bool = False) -> str:
+    """
+    Modelo de producción si existe; si no, el modelo mínimo (generándolo).
+
+    Args:
+        nombre: Archivo del modelo en ModelsConfig.MODELS_DIR
+        directorio_minimo: Directorio donde generar el modelo mínimo
+        forzar_minimo: Usar el modelo mínimo aunque exista el de producción
+    """
+    ruta_produccion = os.path.join(ModelsConfig.MODELS_DIR, nombre)
+    if os.path.exists(ruta_produccion) and not forzar_minimo:
+        return ruta_produccion
+
+    ruta = os.path.join(directorio_minimo, 'yolo11_seg_minimo.onnx')
+    if not os.path.exists(ruta):
+        crear_modelo_minimo(ruta)
+    return ruta
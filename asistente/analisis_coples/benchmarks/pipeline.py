@@ -0,0 +1,286 @@
+"""
+Benchmark por etapas del pipeline de análisis.
+
+Cada frame del corpus recorre las mismas funciones que un análisis real, pero
+cronometradas por separado: preprocesamiento, session.run, decodificación,
+NMS, máscaras, mediciones, visualización, codificación JPEG, persistencia y
+serialización del análisis para la API (detalle con segmentaciones).
+Los resultados se resumen en p50/p95/p99 por etapa.
+"""
+
+import os
+import resource
+import sys
+import time
+import uuid
+from collections import defaultdict
+from contextlib import contextmanager
+from typing import Any, Dict, List, Optional, Sequence
+
+import cv2
+import numpy as np
+from django.utils import timezone
+
+from ..api.serializers import AnalisisCopleSerializer
+from ..models import AnalisisCople
+from ..modules.capture.gev_simulado import EXTENSIONES_IMAGEN
+from ..modules.segmentation.batch_inference import aplicar_nms, filtrar_detecciones_lote
+from ..services.persistencia_service import (
+    construir_segmentaciones_defectos,
+    construir_segmentaciones_piezas,
+    persistir_analisis,
+)
+from ..services.segmentation_analysis_service import generar_imagen_procesada
+
+ETAPAS = (
+    'preprocesamiento',
+    'inferencia',
+    'decodificacion',
+    'nms',
+    'mascaras',
+    'mediciones',
+    'visualizacion',
+    'codificacion_jpeg',
+    'persistencia',
+    'serializacion',
+)
+
+PREFIJO_ANALISIS = 'benchmark_'
+
+
+def resumir(muestras: Sequence[float]) -> Dict[str, float]:
+    """Percentiles y extremos de una serie de tiempos en ms"""
+    if not muestras:
+        return {'n': 0}
+    datos = np.asarray(muestras, dtype=np.float64)
+    p50, p95, p99 = np.percentile(datos, [50, 95, 99])
+    return {
+        'n': int(datos.size),
+        'p50_ms': round(float(p50), 3),
+        'p95_ms': round(float(p95), 3),
+        'p99_ms': round(float(p99), 3),
+        'media_ms': round(float(datos.mean()), 3),
+        'min_ms': round(float(datos.min()), 3),
+        'max_ms': round(float(datos.max()), 3),
+    }
+
+
+def rss_pico_mb() -> float:
+    """Pico de memoria residente del proceso (MB)"""
+    pico = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reporta KB; macOS, bytes
+    return round(pico / (1024 * 1024 if sys.platform == 'darwin' else 1024), 1)
+
+
+class Cronometro:
+    """Acumula los tiempos (ms) de cada etapa"""
+
+    def __init__(self):
+        self.tiempos: Dict[str, List[float]] = defaultdict(list)
+
+    @contextmanager
+    def medir(self, etapa: str):
+        inicio = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.tiempos[etapa].append((time.perf_counter() - inicio) * 1000)
+
+    def resumen(self) -> Dict[str, Dict[str, float]]:
+        return {etapa: resumir(muestras) for etapa, muestras in self.tiempos.items()}
+
+
+# ----------------------------------------------------------------------
+# Corpus
+# ----------------------------------------------------------------------
+
+def cargar_corpus(fuente: str, max_frames: int) -> List[np.ndarray]:
+    """
+    Frames BGR grabados: directorio de imágenes (.png, .jpg, .npy, ...) o video.
+    """
+    frames = []
+    if os.path.isdir(fuente):
+        rutas = sorted(
+            os.path.join(fuente, nombre) for nombre in os.listdir(fuente)
+            if nombre.lower().endswith(EXTENSIONES_IMAGEN)
+        )
+        for ruta in rutas[:max_frames]:
+            frame = np.load(ruta) if ruta.endswith('.npy') else cv2.imread(ruta, cv2.IMREAD_COLOR)
+            if frame is not None:
+                if frame.ndim == 2:
+                    frame = cv2.cvtColor(frame, cv2.COLOR_GRAY2BGR)
+                frames.append(frame)
+    else:
+        video = cv2.VideoCapture(fuente)
+        try:
+            while len(frames) < max_frames:
+                ok, frame = video.read()
+                if not ok:
+                    break
+                frames.append(frame)
+        finally:
+            video.release()
+
+    if not frames:
+        raise ValueError(f"No hay frames en el corpus {fuente}")
+    return frames
+
+
+def grabar_corpus_simulado(num_frames: int, fuente: Optional[str] = None) -> List[np.ndarray]:
+    """
+    Graba frames con la cámara simulada (mismo camino de buffers y demosaico
+    que la cámara GigE real).
+
+    Args:
+        num_frames: Frames a grabar
+        fuente: Fuente a reproducir por la cámara simulada (None = escena sintética)
+    """
+    from ..modules.capture.camara_simulada import CamaraSimulada
+
+    camara = CamaraSimulada(fuente=fuente, fps=100)
+    if not camara.inicializar() or not camara.iniciar_captura_continua():
+        camara.liberar()
+        raise RuntimeError("No se pudo iniciar la cámara simulada")
+
+    frames = []
+    seq = 0
+    try:
+        while len(frames) < num_frames:
+            leido = camara.esperar_frame(seq, timeout=2.0)
+            if leido is None:
+                raise RuntimeError("La cámara simulada dejó de entregar frames")
+            seq = leido[0]
+            frames.append(leido[2].copy())
+    finally:
+        camara.liberar()
+    return frames
+
+
+# ----------------------------------------------------------------------
+# Pipeline
+# ----------------------------------------------------------------------
+
+class BenchmarkMotor:
+    """Ejecuta el pipeline de un segmentador etapa por etapa"""
+
+    def __init__(self, tipo: str, motor, measurement_service, persistir: bool = True):
+        """
+        Args:
+            tipo: 'piezas' o 'defectos'
+            motor: SegmentadorPiezasCoples o SegmentadorDefectosCoples ya inicializado
+            measurement_service: MeasurementService
+            persistir: Si False, se omite la etapa de persistencia
+        """
+        self.tipo = tipo
+        self.motor = motor
+        self.measurement_service = measurement_service
+        self.persistir = persistir
+        self.tipo_analisis = f'medicion_{tipo}'
+        self.construir_filas = (
+            construir_segmentaciones_piezas if tipo == 'piezas' else construir_segmentaciones_defectos
+        )
+        self.preprocesar = motor.preprocesador.preparar
+
+        self.ids_creados: List[str] = []
+        self.segmentaciones_por_frame: List[int] = []
+
+    def procesar(self, imagen: np.ndarray, cronometro: Cronometro) -> None:
+        motor = self.motor
+        inicio = time.perf_counter()
+
+        with cronometro.medir('preprocesamiento'):
+            tensor, _ = self.preprocesar(imagen)
+
+        with cronometro.medir('inferencia'):
+            salidas = motor.session.run(motor.output_names, {motor.input_name: tensor})
+
+        with cronometro.medir('decodificacion'):
+            detecciones = np.array(salidas[0], copy=True)
+            protos = np.array(salidas[1], copy=True)
+            candidatas = filtrar_detecciones_lote(detecciones[:1], motor.confianza_min)[0]
+
+        with cronometro.medir('nms'):
+            boxes, confianzas, coeficientes = aplicar_nms(candidatas, motor.confianza_min)
+
+        with cronometro.medir('mascaras'):
+            segmentaciones = motor._construir_segmentaciones(boxes, confianzas, coeficientes, protos[:1])
+
+        with cronometro.medir('mediciones'):
+            mediciones = self.measurement_service.calcular_mediciones_lote(
+                [seg.get('mascara') for seg in segmentaciones]
+            )
+
+        with cronometro.medir('visualizacion'):
+            imagen_procesada = generar_imagen_procesada(imagen, segmentaciones, self.tipo_analisis)
+
+        with cronometro.medir('codificacion_jpeg'):
+            cv2.imencode('.jpg', imagen_procesada if imagen_procesada is not None else imagen)
+
+        if self.persistir:
+            with cronometro.medir('persistencia'):
+                analisis_db = self._persistir(imagen, segmentaciones, mediciones)
+            with cronometro.medir('serializacion'):
+                AnalisisCopleSerializer().to_representation(analisis_db)
+
+        cronometro.tiempos['total'].append((time.perf_counter() - inicio) * 1000)
+        self.segmentaciones_por_frame.append(len(segmentaciones))
+
+    def _persistir(self, imagen: np.ndarray, segmentaciones: List[Dict], mediciones: List[Dict]) -> AnalisisCople:
+        id_analisis = f"{PREFIJO_ANALISIS}{uuid.uuid4().hex[:12]}"
+        analisis_db = AnalisisCople.objects.create(
+            id_analisis=id_analisis,
+            timestamp_captura=timezone.now(),
+            tipo_analisis=self.tipo_analisis,
+            estado='procesando',
+            archivo_json='',
+            resolucion_ancho=imagen.shape[1],
+            resolucion_alto=imagen.shape[0],
+            resolucion_canales=imagen.shape[2] if imagen.ndim > 2 else 1,
+            tiempo_captura_ms=0.0,
+            tiempo_total_ms=0.0,
+            metadatos_json={}
+        )
+        self.ids_creados.append(id_analisis)
+        analisis_db.estado = 'completado'
+        persistir_analisis(analisis_db, self.construir_filas(analisis_db, segmentaciones, mediciones), tiempos={})
+        return analisis_db
+
+    def limpiar(self) -> int:
+        """Elimina los análisis creados por el benchmark"""
+        if not self.ids_creados:
+            return 0
+        borrados = AnalisisCople.objects.filter(id_analisis__in=self.ids_creados).delete()[0]
+        self.ids_creados = []
+        return borrados
+
+
+def ejecutar_benchmark(
+    benchmark: BenchmarkMotor,
+    frames: Sequence[np.ndarray],
+    calentamiento: int = 3
+) -> Dict[str, Any]:
+    """
+    Calienta el motor y cronometra cada frame del corpus.
+
+    Returns:
+        Dict con el resumen por etapa, el total por frame y el pico de RSS
+    """
+    descarte = Cronometro()
+    for i in range(calentamiento):
+        benchmark.procesar(frames[i % len(frames)], descarte)
+    benchmark.segmentaciones_por_frame = []
+
+    cronometro = Cronometro()
+    try:
+        for frame in frames:
+            benchmark.procesar(frame, cronometro)
+    finally:
+        benchmark.limpiar()
+
+    resumen = cronometro.resumen()
+    return {
+        'etapas': {etapa: resumen[etapa] for etapa in ETAPAS if etapa in resumen},
+        'total': resumen.get('total', {'n': 0}),
+        'segmentaciones_promedio': round(float(np.mean(benchmark.segmentaciones_por_frame or [0])), 2),
+        'rss_pico_mb': rss_pico_mb(),
+    }
@@ -22,6 +22,9 @@ class CameraConfig:
     FRAMERATE = 10.0          # 10 FPS - reducido para menor carga CPU
     PACKET_SIZE = 9000        # Tamaño de paquete jumbo
     NUM_BUFFERS = 2           # Solo 2 buffers para minimizar memoria
+    RING_SLOTS = 4            # Frames BGR procesados retenidos para lectores
+    TRIGGER_MODE = os.environ.get('CAMARA_MODO_DISPARO', 'continuo')  # 'continuo' o 'software'
+    BACKEND = os.environ.get('CAMARA_BACKEND', 'gige')  # 'gige' o 'simulado' (sin hardware)
     GAIN = 2.0               # Ganancia mínima para mejor calidad
     
     # Configuración del ROI
@@ -34,6 +37,23 @@ class CameraConfig:
     FRAME_TIMEOUT = 0.1       # 100ms timeout para frames
     STARTUP_TIMEOUT = 5.0     # 5s timeout para primer frame
     SHUTDOWN_TIMEOUT = 2.0    # 2s timeout para cerrar thread
+    CAPTURE_TIMEOUT = 2.0     # 2s máximo esperando un frame posterior a un evento
+
+    # Cámara simulada (CAMARA_BACKEND=simulado)
+    SIMULADA_FUENTE = os.environ.get('CAMARA_SIMULADA_FUENTE', '')  # Directorio o video; vacío = escena sintética
+    SIMULADA_JITTER = float(os.environ.get('CAMARA_SIMULADA_JITTER', '0'))    # ± segundos por frame
+    SIMULADA_PERDIDA = float(os.environ.get('CAMARA_SIMULADA_PERDIDA', '0'))  # Fracción de frames incompletos
+    
+    # Frames del preview compartidos entre procesos (multiprocessing.shared_memory)
+    PREVIEW_SHM_NAME = "asistente_camara_preview"
+    PREVIEW_SHM_SLOTS = 4     # Últimos N frames disponibles para lectores
+    PREVIEW_MAX_AGE = 2.0     # Segundos tras los que un frame compartido se considera viejo
+    
+    # Daemon de cámara (manage.py camara_daemon): capturas por memoria compartida
+    CAPTURA_SHM_NAME = "asistente_camara_captura"
+    CAPTURA_SHM_SLOTS = 4
+    DAEMON_TIMEOUT = 10.0              # Timeout de comandos al daemon
+    DAEMON_TIMEOUT_INICIALIZAR = 30.0  # La búsqueda de la cámara GigE tarda más
 
 # ==================== CONFIGURACIÓN DE WEBCAM FALLBACK ====================
 class WebcamConfig:
@@ -93,6 +113,16 @@ class ModelsConfig:
     INTRA_OP_THREADS = 2
     INTER_OP_THREADS = 2
     PROVIDERS = ['CPUExecutionProvider']
+    GRAPH_OPTIMIZATION = 'todo'         # 'deshabilitado', 'basico', 'extendido', 'todo'
+    EXECUTION_MODE = 'secuencial'       # 'secuencial' o 'paralelo'
+    ENABLE_CPU_MEM_ARENA = True
+    ENABLE_MEM_PATTERN = True
+    OPTIMIZED_MODELS_DIR = None         # Caché de modelos optimizados (None = desactivada)
+
+    # Registro de modelos (sesiones ONNX compartidas por proceso)
+    REGISTRY_MEMORY_BUDGET_MB = 1024    # Presupuesto de memoria para modelos cargados
+    REGISTRY_MEMORY_FACTOR = 1.5        # Memoria estimada = tamaño del .onnx × factor
+    PRELOAD_MODELS = ['piezas', 'defectos']  # Modelos a precargar al arrancar Django
 
 # ==================== CONFIGURACIÓN DE ROBUSTEZ ====================
 class RobustezConfig:
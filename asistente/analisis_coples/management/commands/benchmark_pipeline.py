@@ -0,0 +1,166 @@
+# analisis_coples/management/commands/benchmark_pipeline.py
+
+import contextlib
+import json
+import logging
+import os
+import platform
+import subprocess
+import tempfile
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+MOTORES = ('piezas', 'defectos')
+
+
+def _commit_actual():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'],
+            capture_output=True, text=True, timeout=5,
+            cwd=os.path.dirname(os.path.abspath(__file__))
+        ).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+class Command(BaseCommand):
+    help = (
+        'Cronometra por etapas el pipeline de segmentación (piezas y defectos) sobre un '
+        'corpus de frames grabados y reporta p50/p95/p99 y el pico de RSS en JSON. '
+        'Sin los modelos de producción usa un modelo ONNX mínimo con las mismas salidas.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--corpus',
+            help='Directorio de imágenes o video con frames grabados '
+                 '(por defecto se graban con la cámara simulada)'
+        )
+        parser.add_argument(
+            '--frames',
+            type=int,
+            default=50,
+            help='Número de frames a cronometrar'
+        )
+        parser.add_argument(
+            '--calentamiento',
+            type=int,
+            default=3,
+            help='Frames procesados antes de medir'
+        )
+        parser.add_argument(
+            '--motores',
+            nargs='+',
+            choices=MOTORES,
+            default=list(MOTORES),
+            help='Segmentadores a medir'
+        )
+        parser.add_argument(
+            '--modelo-minimo',
+            action='store_true',
+            help='Usar el modelo ONNX mínimo aunque existan los de producción'
+        )
+        parser.add_argument(
+            '--sin-bd',
+            action='store_true',
+            help='Omitir las etapas de persistencia y serialización'
+        )
+        parser.add_argument(
+            '--salida',
+            help='Archivo JSON donde guardar los resultados (por defecto se imprime)'
+        )
+
+    def handle(self, *args, **options):
+        import onnxruntime
+
+        from analisis_coples.benchmarks.modelo_minimo import ruta_modelo
+        from analisis_coples.benchmarks.pipeline import (
+            BenchmarkMotor,
+            cargar_corpus,
+            ejecutar_benchmark,
+            grabar_corpus_simulado,
+            rss_pico_mb,
+        )
+        from analisis_coples.expo_config import ModelsConfig
+        from analisis_coples.modules.measurements import get_measurement_service
+        from analisis_coples.modules.segmentation.segmentation_defectos_engine import SegmentadorDefectosCoples
+        from analisis_coples.modules.segmentation.segmentation_piezas_engine import SegmentadorPiezasCoples
+
+        clases = {
+            'piezas': (SegmentadorPiezasCoples, ModelsConfig.SEGMENTATION_PARTS_MODEL),
+            'defectos': (SegmentadorDefectosCoples, ModelsConfig.SEGMENTATION_DEFECTOS_MODEL),
+        }
+
+        if options['frames'] < 1:
+            raise CommandError('--frames debe ser al menos 1')
+
+        with contextlib.ExitStack() as pila:
+            directorio_minimo = pila.enter_context(tempfile.TemporaryDirectory(prefix='benchmark_modelos_'))
+            # Motores y servicios imprimen y registran por frame; solo se muestran con -v 2
+            if options['verbosity'] < 2:
+                pila.enter_context(contextlib.redirect_stdout(pila.enter_context(open(os.devnull, 'w'))))
+                logging.disable(logging.INFO)
+                pila.callback(logging.disable, logging.NOTSET)
+
+            if options['corpus']:
+                frames = cargar_corpus(options['corpus'], options['frames'])
+            else:
+                frames = grabar_corpus_simulado(options['frames'])
+
+            resultados = {}
+            for tipo in options['motores']:
+                clase, nombre_modelo = clases[tipo]
+                try:
+                    ruta = ruta_modelo(nombre_modelo, directorio_minimo, options['modelo_minimo'])
+                except ImportError as e:
+                    raise CommandError(
+                        f'No existe {nombre_modelo} y el modelo mínimo requiere el paquete onnx'
+                    ) from e
+
+                motor = clase(model_path=ruta)
+                if motor.session is None:
+                    raise CommandError(f'No se pudo cargar el modelo {ruta}')
+
+                benchmark = BenchmarkMotor(
+                    tipo, motor, get_measurement_service(), persistir=not options['sin_bd']
+                )
+                resultado = ejecutar_benchmark(benchmark, frames, options['calentamiento'])
+                resultado['modelo'] = os.path.basename(ruta)
+                resultado['modelo_minimo'] = ruta.startswith(directorio_minimo)
+                resultados[tipo] = resultado
+                motor.liberar()
+
+        informe = {
+            'fecha': timezone.now().isoformat(),
+            'commit': _commit_actual(),
+            'plataforma': platform.platform(),
+            'python': platform.python_version(),
+            'onnxruntime': onnxruntime.__version__,
+            'corpus': {
+                'fuente': options['corpus'] or 'camara_simulada',
+                'frames': len(frames),
+                'resolucion': list(frames[0].shape),
+            },
+            'calentamiento': options['calentamiento'],
+            'motores': resultados,
+            'rss_pico_mb': rss_pico_mb(),
+        }
+
+        for tipo, resultado in resultados.items():
+            self.stdout.write(f"\n📊 {tipo} ({resultado['modelo']}, {len(frames)} frames)")
+            for etapa, stats in {**resultado['etapas'], 'total': resultado['total']}.items():
+                self.stdout.write(
+                    f"   {etapa:<18} p50 {stats['p50_ms']:>9.2f}  p95 {stats['p95_ms']:>9.2f}  "
+                    f"p99 {stats['p99_ms']:>9.2f} ms"
+                )
+            self.stdout.write(f"   RSS pico: {resultado['rss_pico_mb']} MB")
+
+        texto = json.dumps(informe, indent=2, ensure_ascii=False)
+        if options['salida']:
+            with open(options['salida'], 'w', encoding='utf-8') as archivo:
+                archivo.write(texto)
+            self.stdout.write(self.style.SUCCESS(f"\nResultados guardados en {options['salida']}"))
+        else:
+            self.stdout.write(texto)
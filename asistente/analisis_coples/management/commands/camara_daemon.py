@@ -0,0 +1,66 @@
+# analisis_coples/management/commands/camara_daemon.py
+
+import signal
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+
+def _interrumpir(*args):
+    raise KeyboardInterrupt
+
+
+class Command(BaseCommand):
+    help = (
+        'Ejecuta el daemon dueño de la cámara (GigE o webcam). Los demás procesos '
+        'capturan y ven el preview a través de él: configurar ANALISIS_CAMARA_SOCKET '
+        'con la misma ruta en el servidor web y en los trabajadores.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--socket',
+            default=getattr(settings, 'ANALISIS_CAMARA_SOCKET', '') or '/tmp/asistente_camara.sock',
+            help='Ruta del socket Unix donde escuchar'
+        )
+        parser.add_argument(
+            '--inicializar',
+            action='store_true',
+            help='Abrir la cámara al arrancar en lugar de esperar la orden del frontend'
+        )
+        parser.add_argument(
+            '--ip',
+            default='172.16.1.24',
+            help='IP de la cámara GigE (con --inicializar)'
+        )
+
+    def handle(self, *args, **options):
+        from analisis_coples.services.camara_ipc import DaemonCamara
+        from analisis_coples.services.camera_service import CameraService
+
+        # Este proceso es el dueño: siempre CameraService local, nunca el cliente
+        daemon = DaemonCamara(CameraService(), options['socket'])
+
+        if options['inicializar']:
+            resultado = daemon.servicio.inicializar_camara(options['ip'])
+            if not resultado['success']:
+                raise CommandError(resultado['error'])
+            self.stdout.write(self.style.SUCCESS(resultado['message']))
+
+        # SIGTERM (docker stop, systemd) detiene el daemon igual que Ctrl+C
+        signal.signal(signal.SIGTERM, _interrumpir)
+
+        self.stdout.write(
+            self.style.SUCCESS(f"📷 Daemon de cámara en {options['socket']}. Ctrl+C para detener.")
+        )
+        try:
+            daemon.servir()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            # Una segunda señal no debe cortar la liberación de la cámara
+            signal.signal(signal.SIGTERM, signal.SIG_IGN)
+            signal.signal(signal.SIGINT, signal.SIG_IGN)
+            daemon.detener()
+
+        self.stdout.write(self.style.SUCCESS('Daemon de cámara detenido'))
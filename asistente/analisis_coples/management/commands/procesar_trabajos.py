@@ -0,0 +1,111 @@
+# analisis_coples/management/commands/procesar_trabajos.py
+
+import multiprocessing
+import signal
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+
+def _ejecutar_trabajador(tipos, intervalo, precargar):
+    """
+    Punto de entrada de cada proceso trabajador (contexto spawn: este módulo
+    se importa antes de django.setup(), así que no importa modelos arriba).
+    """
+    import django
+    django.setup()
+
+    from analisis_coples.services.trabajos_service import ColaBaseDatos, Trabajador
+
+    if precargar:
+        from analisis_coples.services.model_registry import precargar_modelos
+        precargar_modelos()
+
+    trabajador = Trabajador(ColaBaseDatos(), tipos=tipos, intervalo_sondeo=intervalo)
+    signal.signal(signal.SIGTERM, lambda *args: trabajador.detener())
+    signal.signal(signal.SIGINT, lambda *args: trabajador.detener())
+    trabajador.ejecutar()
+
+
+def _interrumpir(*args):
+    raise KeyboardInterrupt
+
+
+class Command(BaseCommand):
+    help = (
+        'Ejecuta un pool local de procesos que consume la cola de trabajos de análisis. '
+        'Cada proceso carga sus propios modelos y captura a través del daemon de cámara '
+        '(ANALISIS_CAMARA_SOCKET); usar ANALISIS_TRABAJADORES_SERVIDOR=0 en el servidor web.'
+    )
+
+    def add_arguments(self, parser):
+        from analisis_coples.models import TrabajoAnalisis
+
+        parser.add_argument(
+            '--procesos',
+            type=int,
+            default=1,
+            help='Número de procesos trabajadores'
+        )
+        parser.add_argument(
+            '--tipos',
+            nargs='+',
+            choices=[tipo for tipo, _ in TrabajoAnalisis.TIPO_CHOICES],
+            help='Tipos de trabajo a atender (por defecto todos)'
+        )
+        parser.add_argument(
+            '--intervalo',
+            type=float,
+            default=1.0,
+            help='Segundos entre consultas a la cola cuando está vacía'
+        )
+        parser.add_argument(
+            '--una-vez',
+            action='store_true',
+            help='Ejecutar los trabajos pendientes en este proceso y salir'
+        )
+
+    def handle(self, *args, **options):
+        tipos = options['tipos']
+        precargar = getattr(settings, 'ANALISIS_PRECARGAR_MODELOS', False)
+
+        if options['una_vez']:
+            from analisis_coples.services.trabajos_service import ColaBaseDatos, Trabajador
+
+            ejecutados = Trabajador(ColaBaseDatos(), tipos=tipos).ejecutar_pendientes()
+            self.stdout.write(self.style.SUCCESS(f'{ejecutados} trabajo(s) ejecutado(s)'))
+            return
+
+        # Las conexiones heredadas no deben compartirse entre procesos
+        connections.close_all()
+
+        contexto = multiprocessing.get_context('spawn')
+        procesos = [
+            contexto.Process(
+                target=_ejecutar_trabajador,
+                args=(tipos, options['intervalo'], precargar),
+                name=f'TrabajadorAnalisis-{i}'
+            )
+            for i in range(options['procesos'])
+        ]
+        for proceso in procesos:
+            proceso.start()
+
+        # SIGTERM (docker stop, systemd) detiene el pool igual que Ctrl+C
+        signal.signal(signal.SIGTERM, _interrumpir)
+
+        self.stdout.write(
+            self.style.SUCCESS(f'👷 {len(procesos)} proceso(s) trabajador(es) iniciados. Ctrl+C para detener.')
+        )
+
+        try:
+            for proceso in procesos:
+                proceso.join()
+        except KeyboardInterrupt:
+            for proceso in procesos:
+                proceso.terminate()
+            for proceso in procesos:
+                proceso.join()
+
+        self.stdout.write(self.style.SUCCESS('Trabajadores detenidos'))
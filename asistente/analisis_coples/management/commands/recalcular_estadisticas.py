@@ -0,0 +1,62 @@
+# analisis_coples/management/commands/recalcular_estadisticas.py
+
+from datetime import datetime, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Max, Min
+from django.utils import timezone
+
+
+def _fecha(valor):
+    try:
+        return datetime.strptime(valor, '%Y-%m-%d').date()
+    except ValueError as e:
+        raise CommandError(f'Fecha inválida: {valor} (formato YYYY-MM-DD)') from e
+
+
+class Command(BaseCommand):
+    help = (
+        'Reconstruye los resúmenes diarios (EstadisticasSistema) a partir de los análisis, '
+        'por tramos de días. Sin fechas recorre todo el historial.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--desde', type=_fecha, help='Primer día (YYYY-MM-DD)')
+        parser.add_argument('--hasta', type=_fecha, help='Último día (YYYY-MM-DD)')
+        parser.add_argument(
+            '--dias-por-tramo',
+            type=int,
+            default=7,
+            help='Días recalculados en cada transacción'
+        )
+
+    def handle(self, *args, **options):
+        from analisis_coples.models import AnalisisCople
+        from analisis_coples.services.estadisticas_service import recalcular_resumenes
+
+        desde, hasta = options['desde'], options['hasta']
+        if desde is None or hasta is None:
+            extremos = AnalisisCople.objects.aggregate(
+                primero=Min('timestamp_procesamiento'), ultimo=Max('timestamp_procesamiento')
+            )
+            if extremos['primero'] is None:
+                self.stdout.write('No hay análisis registrados')
+                return
+            desde = desde or timezone.localdate(extremos['primero'])
+            hasta = hasta or timezone.localdate(extremos['ultimo'])
+        if desde > hasta:
+            raise CommandError('--desde es posterior a --hasta')
+
+        paso = max(1, options['dias_por_tramo'])
+        dias_con_datos = 0
+        inicio = desde
+        while inicio <= hasta:
+            fin = min(inicio + timedelta(days=paso - 1), hasta)
+            dias = recalcular_resumenes(inicio, fin)
+            dias_con_datos += dias
+            self.stdout.write(f'  {inicio} → {fin}: {dias} días con análisis')
+            inicio = fin + timedelta(days=1)
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Resúmenes recalculados del {desde} al {hasta} ({dias_con_datos} días con análisis)'
+        ))
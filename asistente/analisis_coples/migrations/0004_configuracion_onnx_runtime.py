@@ -0,0 +1,49 @@
+# Generated by Django 5.2.2 on 2026-10-16 20:37
+
+import django.core.validators
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('analisis_coples', '0003_alter_analisiscople_archivo_imagen'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='configuracionsistema',
+            name='onnx_arena_memoria',
+            field=models.BooleanField(default=True, help_text='Usar el arena de memoria de ONNX Runtime para la CPU', verbose_name='Arena de memoria CPU'),
+        ),
+        migrations.AddField(
+            model_name='configuracionsistema',
+            name='onnx_directorio_optimizados',
+            field=models.CharField(blank=True, default='', help_text='Directorio donde guardar/cargar los modelos ya optimizados (vacío = sin caché)', max_length=255, verbose_name='Caché de modelos optimizados'),
+        ),
+        migrations.AddField(
+            model_name='configuracionsistema',
+            name='onnx_inter_op_threads',
+            field=models.PositiveSmallIntegerField(default=2, help_text='Hilos entre operadores en ONNX Runtime (solo modo paralelo, 0 = automático)', validators=[django.core.validators.MinValueValidator(0), django.core.validators.MaxValueValidator(64)], verbose_name='Hilos inter-op ONNX'),
+        ),
+        migrations.AddField(
+            model_name='configuracionsistema',
+            name='onnx_intra_op_threads',
+            field=models.PositiveSmallIntegerField(default=2, help_text='Hilos por operador en ONNX Runtime (0 = automático)', validators=[django.core.validators.MinValueValidator(0), django.core.validators.MaxValueValidator(64)], verbose_name='Hilos intra-op ONNX'),
+        ),
+        migrations.AddField(
+            model_name='configuracionsistema',
+            name='onnx_modo_ejecucion',
+            field=models.CharField(choices=[('secuencial', 'Secuencial'), ('paralelo', 'Paralelo')], default='secuencial', help_text='Modo de ejecución de los operadores del grafo', max_length=20, verbose_name='Modo de ejecución ONNX'),
+        ),
+        migrations.AddField(
+            model_name='configuracionsistema',
+            name='onnx_nivel_optimizacion',
+            field=models.CharField(choices=[('deshabilitado', 'Deshabilitada'), ('basico', 'Básica'), ('extendido', 'Extendida'), ('todo', 'Completa (ORT_ENABLE_ALL)')], default='todo', help_text='Nivel de optimización del grafo aplicado al cargar los modelos', max_length=20, verbose_name='Optimización del grafo ONNX'),
+        ),
+        migrations.AddField(
+            model_name='configuracionsistema',
+            name='onnx_patron_memoria',
+            field=models.BooleanField(default=True, help_text='Preasignar memoria según el patrón de la primera inferencia', verbose_name='Patrón de memoria'),
+        ),
+    ]
@@ -0,0 +1,42 @@
+# Generated by Django 5.2.2 on 2026-10-16 20:51
+
+import django.core.validators
+import django.db.models.deletion
+import uuid
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('analisis_coples', '0004_configuracion_onnx_runtime'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TrabajoAnalisis',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('tipo', models.CharField(choices=[('realizar_analisis', 'Análisis individual'), ('ejecutar_barrido', 'Barrido de rutina')], max_length=30, verbose_name='Tipo de trabajo')),
+                ('estado', models.CharField(choices=[('pendiente', 'Pendiente'), ('en_proceso', 'En Proceso'), ('completado', 'Completado'), ('error', 'Error')], default='pendiente', max_length=20, verbose_name='Estado')),
+                ('parametros', models.JSONField(default=dict, help_text='Argumentos de la tarea', verbose_name='Parámetros')),
+                ('resultado', models.JSONField(blank=True, default=dict, help_text='Resultado devuelto por la tarea', verbose_name='Resultado')),
+                ('progreso', models.IntegerField(default=0, validators=[django.core.validators.MinValueValidator(0), django.core.validators.MaxValueValidator(100)], verbose_name='Progreso (%)')),
+                ('mensaje', models.CharField(blank=True, help_text='Último paso reportado por la tarea', max_length=255, verbose_name='Mensaje')),
+                ('mensaje_error', models.TextField(blank=True, help_text='Mensaje de error si el trabajo falló', verbose_name='Mensaje de error')),
+                ('trabajador', models.CharField(blank=True, help_text='Identificador del trabajador que tomó el trabajo', max_length=100, verbose_name='Trabajador')),
+                ('timestamp_creacion', models.DateTimeField(auto_now_add=True, verbose_name='Timestamp de creación')),
+                ('timestamp_inicio', models.DateTimeField(blank=True, null=True, verbose_name='Timestamp de inicio')),
+                ('timestamp_fin', models.DateTimeField(blank=True, null=True, verbose_name='Timestamp de finalización')),
+                ('usuario', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='trabajos_analisis', to=settings.AUTH_USER_MODEL, verbose_name='Usuario')),
+            ],
+            options={
+                'verbose_name': 'Trabajo de Análisis',
+                'verbose_name_plural': 'Trabajos de Análisis',
+                'ordering': ['timestamp_creacion'],
+                'indexes': [models.Index(fields=['estado', 'timestamp_creacion'], name='analisis_co_estado_f3f5ad_idx'), models.Index(fields=['usuario'], name='analisis_co_usuario_80c43d_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.2 on 2026-10-16 22:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('analisis_coples', '0005_trabajo_analisis'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='trabajoanalisis',
+            name='timestamp_latido',
+            field=models.DateTimeField(blank=True, help_text='Renovado por el trabajador mientras ejecuta; si vence, el trabajo se da por caído', null=True, verbose_name='Último latido'),
+        ),
+    ]
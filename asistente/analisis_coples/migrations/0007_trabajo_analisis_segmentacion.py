@@ -0,0 +1,18 @@
+# Generated by Django 5.2.2 on 2026-10-16 23:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('analisis_coples', '0006_trabajo_analisis_latido'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='trabajoanalisis',
+            name='tipo',
+            field=models.CharField(choices=[('realizar_analisis', 'Análisis individual'), ('analizar_imagen', 'Análisis de segmentación'), ('ejecutar_barrido', 'Barrido de rutina')], max_length=30, verbose_name='Tipo de trabajo'),
+        ),
+    ]
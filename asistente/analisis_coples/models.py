@@ -1,5 +1,7 @@
 # analisis_coples/models.py
 
+import uuid
+
 from django.db import models
 from django.utils.translation import gettext_lazy as _
 from django.contrib.auth import get_user_model
@@ -69,6 +71,65 @@ class ConfiguracionSistema(models.Model):
         help_text="Factor de conversión de píxeles a milímetros (mm/px)"
     )
     
+    # Configuración de ONNX Runtime (sesiones de inferencia)
+    onnx_intra_op_threads = models.PositiveSmallIntegerField(
+        _("Hilos intra-op ONNX"),
+        default=2,
+        validators=[MinValueValidator(0), MaxValueValidator(64)],
+        help_text="Hilos por operador en ONNX Runtime (0 = automático)"
+    )
+    
+    onnx_inter_op_threads = models.PositiveSmallIntegerField(
+        _("Hilos inter-op ONNX"),
+        default=2,
+        validators=[MinValueValidator(0), MaxValueValidator(64)],
+        help_text="Hilos entre operadores en ONNX Runtime (solo modo paralelo, 0 = automático)"
+    )
+    
+    onnx_nivel_optimizacion = models.CharField(
+        _("Optimización del grafo ONNX"),
+        max_length=20,
+        choices=[
+            ('deshabilitado', 'Deshabilitada'),
+            ('basico', 'Básica'),
+            ('extendido', 'Extendida'),
+            ('todo', 'Completa (ORT_ENABLE_ALL)'),
+        ],
+        default='todo',
+        help_text="Nivel de optimización del grafo aplicado al cargar los modelos"
+    )
+    
+    onnx_modo_ejecucion = models.CharField(
+        _("Modo de ejecución ONNX"),
+        max_length=20,
+        choices=[
+            ('secuencial', 'Secuencial'),
+            ('paralelo', 'Paralelo'),
+        ],
+        default='secuencial',
+        help_text="Modo de ejecución de los operadores del grafo"
+    )
+    
+    onnx_arena_memoria = models.BooleanField(
+        _("Arena de memoria CPU"),
+        default=True,
+        help_text="Usar el arena de memoria de ONNX Runtime para la CPU"
+    )
+    
+    onnx_patron_memoria = models.BooleanField(
+        _("Patrón de memoria"),
+        default=True,
+        help_text="Preasignar memoria según el patrón de la primera inferencia"
+    )
+    
+    onnx_directorio_optimizados = models.CharField(
+        _("Caché de modelos optimizados"),
+        max_length=255,
+        blank=True,
+        default="",
+        help_text="Directorio donde guardar/cargar los modelos ya optimizados (vacío = sin caché)"
+    )
+    
     # Metadatos
     activa = models.BooleanField(
         _("Configuración activa"),
@@ -96,6 +157,18 @@ class ConfiguracionSistema(models.Model):
     def __str__(self):
         return f"{self.nombre} ({'Activa' if self.activa else 'Inactiva'})"
     
+    def obtener_opciones_onnx(self):
+        """Opciones de sesión ONNX para la fábrica de sesiones"""
+        return {
+            'intra_op_threads': self.onnx_intra_op_threads,
+            'inter_op_threads': self.onnx_inter_op_threads,
+            'nivel_optimizacion': self.onnx_nivel_optimizacion,
+            'modo_ejecucion': self.onnx_modo_ejecucion,
+            'arena_memoria': self.onnx_arena_memoria,
+            'patron_memoria': self.onnx_patron_memoria,
+            'directorio_optimizados': self.onnx_directorio_optimizados or None,
+        }
+    
     def save(self, *args, **kwargs):
         # Asegurar que solo una configuración esté activa
         if self.activa:
@@ -353,6 +426,111 @@ class RutinaInspeccion(models.Model):
         return f"Rutina {self.id_rutina} - {self.get_estado_display()} ({self.num_imagenes_capturadas}/6)"
 
 
+class TrabajoAnalisis(models.Model):
+    """Trabajo en cola (análisis o barrido de rutina) ejecutado fuera de la petición HTTP"""
+    
+    TIPO_CHOICES = [
+        ('realizar_analisis', 'Análisis individual'),
+        ('analizar_imagen', 'Análisis de segmentación'),
+        ('ejecutar_barrido', 'Barrido de rutina'),
+    ]
+    
+    ESTADO_CHOICES = [
+        ('pendiente', 'Pendiente'),
+        ('en_proceso', 'En Proceso'),
+        ('completado', 'Completado'),
+        ('error', 'Error'),
+    ]
+    
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    
+    tipo = models.CharField(
+        _("Tipo de trabajo"),
+        max_length=30,
+        choices=TIPO_CHOICES
+    )
+    
+    estado = models.CharField(
+        _("Estado"),
+        max_length=20,
+        choices=ESTADO_CHOICES,
+        default='pendiente'
+    )
+    
+    # Entrada y salida de la tarea
+    parametros = models.JSONField(
+        _("Parámetros"),
+        default=dict,
+        help_text="Argumentos de la tarea"
+    )
+    
+    resultado = models.JSONField(
+        _("Resultado"),
+        default=dict,
+        blank=True,
+        help_text="Resultado devuelto por la tarea"
+    )
+    
+    # Progreso reportado por la tarea
+    progreso = models.IntegerField(
+        _("Progreso (%)"),
+        default=0,
+        validators=[MinValueValidator(0), MaxValueValidator(100)]
+    )
+    
+    mensaje = models.CharField(
+        _("Mensaje"),
+        max_length=255,
+        blank=True,
+        help_text="Último paso reportado por la tarea"
+    )
+    
+    mensaje_error = models.TextField(
+        _("Mensaje de error"),
+        blank=True,
+        help_text="Mensaje de error si el trabajo falló"
+    )
+    
+    usuario = models.ForeignKey(
+        'users.User',
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        verbose_name=_("Usuario"),
+        related_name="trabajos_analisis"
+    )
+    
+    trabajador = models.CharField(
+        _("Trabajador"),
+        max_length=100,
+        blank=True,
+        help_text="Identificador del trabajador que tomó el trabajo"
+    )
+    
+    # Timestamps
+    timestamp_creacion = models.DateTimeField(_("Timestamp de creación"), auto_now_add=True)
+    timestamp_inicio = models.DateTimeField(_("Timestamp de inicio"), null=True, blank=True)
+    timestamp_fin = models.DateTimeField(_("Timestamp de finalización"), null=True, blank=True)
+    timestamp_latido = models.DateTimeField(
+        _("Último latido"),
+        null=True,
+        blank=True,
+        help_text="Renovado por el trabajador mientras ejecuta; si vence, el trabajo se da por caído"
+    )
+    
+    class Meta:
+        verbose_name = _("Trabajo de Análisis")
+        verbose_name_plural = _("Trabajos de Análisis")
+        ordering = ['timestamp_creacion']
+        indexes = [
+            models.Index(fields=['estado', 'timestamp_creacion']),
+            models.Index(fields=['usuario']),
+        ]
+    
+    def __str__(self):
+        return f"Trabajo {self.get_tipo_display()} {self.id} - {self.get_estado_display()} ({self.progreso}%)"
+
+
 class EstadoCamara(models.Model):
     """Estado actual de la cámara GigE (singleton)"""
     
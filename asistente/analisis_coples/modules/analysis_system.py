@@ -26,6 +26,9 @@ from modules.metadata_standard import MetadataStandard
 from modules.preprocessing.illumination_robust import RobustezIluminacion
 from modules.adaptive_thresholds import UmbralesAdaptativos
 from analisis_coples.expo_config import GlobalConfig, RobustezConfig, WebcamConfig
+from analisis_coples.modules.logging_config import obtener_logger
+
+log = obtener_logger(__name__)
 
 
 class SistemaAnalisisIntegrado:
@@ -83,10 +86,10 @@ class SistemaAnalisisIntegrado:
             # Detectar mejor webcam disponible
             webcam_id = detectar_mejor_webcam()
             if webcam_id is None:
-                print("❌ No se encontraron webcams disponibles")
+                log.error('❌ No se encontraron webcams disponibles')
                 return False
             
-            print(f"📷 Usando webcam en dispositivo {webcam_id}")
+            log.debug('📷 Usando webcam en dispositivo %s', webcam_id)
             
             # Crear e inicializar webcam
             self.webcam_fallback = WebcamFallback(
@@ -97,7 +100,7 @@ class SistemaAnalisisIntegrado:
             )
             
             if not self.webcam_fallback.inicializar():
-                print("❌ Error inicializando webcam")
+                log.error('❌ Error inicializando webcam')
                 return False
             
             # Marcar que estamos usando webcam
@@ -106,7 +109,7 @@ class SistemaAnalisisIntegrado:
             return True
             
         except Exception as e:
-            print(f"❌ Error en fallback a webcam: {e}")
+            log.error('❌ Error en fallback a webcam: %s', e)
             return False
     
     def inicializar(self) -> bool:
@@ -117,11 +120,11 @@ class SistemaAnalisisIntegrado:
             True si se inicializó correctamente
         """
         try:
-            print("🚀 Inicializando sistema integrado de análisis...")
+            log.debug('🚀 Inicializando sistema integrado de análisis...')
             
             # 1. NO inicializar cámara - usar imagen provista externamente
             # El CameraService ya maneja la cámara GigE
-            print("📷 Sistema usará imágenes provistas externamente (desde CameraService)")
+            log.debug('📷 Sistema usará imágenes provistas externamente (desde CameraService)')
             
             # 2. Inicializar clasificador (COMENTADO - Solo usamos segmentación)
             # print("🧠 Inicializando clasificador...")
@@ -145,35 +148,35 @@ class SistemaAnalisisIntegrado:
             # self.procesador_deteccion_defectos = ProcesadorDefectos()
             
             # 5. Inicializar segmentador de defectos
-            print("🎯 Inicializando segmentador de defectos...")
+            log.debug('🎯 Inicializando segmentador de defectos...')
             self.segmentador_defectos = SegmentadorDefectosCoples()
             if not self.segmentador_defectos._inicializar_modelo():
-                print("❌ Error inicializando segmentador de defectos")
+                log.error('❌ Error inicializando segmentador de defectos')
                 return False
             self.procesador_segmentacion_defectos = ProcesadorSegmentacionDefectos()
             
             # 6. Inicializar segmentador de piezas
-            print("🎯 Inicializando segmentador de piezas...")
+            log.debug('🎯 Inicializando segmentador de piezas...')
             self.segmentador_piezas = SegmentadorPiezasCoples()
             if not self.segmentador_piezas.stats['inicializado']:
-                print("❌ Error inicializando segmentador de piezas")
+                log.error('❌ Error inicializando segmentador de piezas')
                 return False
             self.procesador_segmentacion_piezas = ProcesadorSegmentacionPiezas()
             
             # 7. Iniciar captura continua (solo para cámara GigE)
             if not self.usando_webcam:
-                print("🎬 Iniciando captura continua...")
+                log.debug('🎬 Iniciando captura continua...')
                 if not self.camara.iniciar_captura_continua():
-                    print("❌ Error iniciando captura continua")
+                    log.error('❌ Error iniciando captura continua')
                     return False
             else:
-                print("🎬 Iniciando captura continua de webcam...")
+                log.debug('🎬 Iniciando captura continua de webcam...')
                 if not self.webcam_fallback.iniciar_captura_continua():
-                    print("❌ Error iniciando captura continua de webcam")
+                    log.error('❌ Error iniciando captura continua de webcam')
                     return False
             
             # 7. Aplicar configuración de robustez por defecto
-            print("🔧 Aplicando configuración de robustez por defecto...")
+            log.debug('🔧 Aplicando configuración de robustez por defecto...')
             config_default = RobustezConfig.CONFIGURACION_DEFAULT
             if config_default == RobustezConfig.UMBRALES_ORIGINAL:
                 self.aplicar_configuracion_robustez("original")
@@ -187,11 +190,11 @@ class SistemaAnalisisIntegrado:
                 self.aplicar_configuracion_robustez("original")  # Fallback a original
             
             self.inicializado = True
-            print("✅ Sistema integrado inicializado correctamente")
+            log.info('✅ Sistema integrado inicializado correctamente')
             return True
             
         except Exception as e:
-            print(f"❌ Error inicializando sistema: {e}")
+            log.error('❌ Error inicializando sistema: %s', e)
             return False
     
     def capturar_imagen_unica(self) -> Dict:
@@ -235,11 +238,11 @@ class SistemaAnalisisIntegrado:
                 "timestamp_original": timestamp
             }
             
-            print(f"📷 Imagen capturada: {timestamp_captura}")
+            log.debug('📷 Imagen capturada: %s', timestamp_captura)
             return resultados
             
         except Exception as e:
-            print(f"❌ Error capturando imagen: {e}")
+            log.error('❌ Error capturando imagen: %s', e)
             return {"error": str(e)}
     
     def analisis_completo(self) -> Dict:
@@ -253,17 +256,17 @@ class SistemaAnalisisIntegrado:
             return {"error": "Sistema no inicializado"}
         
         try:
-            print("🚀 INICIANDO ANÁLISIS COMPLETO SECUENCIAL...")
+            log.debug('🚀 Iniciando análisis completo secuencial...')
             
             # 1. Pausar captura continua temporalmente (solo si es cámara GigE)
             if not self.usando_webcam and self.camara:
-                print("⏸️ Pausando captura continua para análisis...")
+                log.debug('⏸️ Pausando captura continua para análisis...')
                 self.camara.pausar_captura_continua()
             elif self.usando_webcam:
-                print("📷 Usando webcam - no requiere pausa")
+                log.debug('📷 Usando webcam - no requiere pausa')
             
             # 2. Capturar imagen única
-            print("📷 Capturando imagen única...")
+            log.debug('📷 Capturando imagen única...')
             resultado_captura = self.capturar_imagen_unica()
             if "error" in resultado_captura:
                 # Reanudar captura continua en caso de error
@@ -273,23 +276,23 @@ class SistemaAnalisisIntegrado:
             frame = resultado_captura["frame"]
             timestamp_captura = resultado_captura["timestamp_captura"]
             tiempo_captura = resultado_captura["tiempos"]["captura_ms"]  # Usar tiempo de capturar_imagen_unica
-            print(f"✅ Imagen capturada en {tiempo_captura:.2f} ms")
+            log.debug('✅ Imagen capturada en %.2f ms', tiempo_captura)
             
             # Verificar frame capturado (logs simplificados)
-            print(f"📊 Frame capturado: {frame.shape if hasattr(frame, 'shape') else 'No shape'}")
+            log.debug('📊 Frame capturado: %s', frame.shape if hasattr(frame, 'shape') else 'No shape')
             
             # CORREGIDO: Iniciar cronómetro total DESPUÉS de captura, ANTES de procesamiento
             tiempo_inicio_total = time.time()
             
             # 3. CLASIFICACIÓN (SECUENCIAL)
-            print("\n🧠 EJECUTANDO CLASIFICACIÓN...")
+            log.debug('🧠 Ejecutando clasificación...')
             
             tiempo_clasificacion_inicio = time.time()
             resultado_clasificacion = self.clasificador.clasificar(frame)
             tiempo_clasificacion = (time.time() - tiempo_clasificacion_inicio) * 1000
             clase_predicha, confianza, tiempo_inferencia_clas = resultado_clasificacion
-            print(f"✅ Clasificación completada en {tiempo_clasificacion:.2f} ms")
-            print(f"   Resultado: {clase_predicha} ({confianza:.2%})")
+            log.debug('✅ Clasificación completada en %.2f ms', tiempo_clasificacion)
+            log.debug('   Resultado: %s (%.2f%%)', clase_predicha, confianza * 100)
             
             # 4. DETECCIÓN DE PIEZAS (SECUENCIAL)
             # DETECCIÓN DE PIEZAS COMENTADA - Solo clasificación
@@ -452,24 +455,22 @@ class SistemaAnalisisIntegrado:
             }
             
             # 9. Guardar resultados por módulo
-            print("\n💾 GUARDANDO RESULTADOS...")
+            log.debug('💾 Guardando resultados...')
             self._guardar_por_modulos(resultados)
             
             # 10. Reanudar captura continua
-            print("▶️ Reanudando captura continua...")
+            log.debug('▶️ Reanudando captura continua...')
             self.camara.reanudar_captura_continua()
             
             # 11. Pausa mínima para estabilizar sistema
-            print("⏸️ Pausa de 0.5 segundos para estabilizar sistema...")
+            log.debug('⏸️ Pausa de 0.5 segundos para estabilizar sistema...')
             time.sleep(0.5)
             
-            print(f"\n🎉 ANÁLISIS COMPLETO FINALIZADO EN {tiempo_total:.2f} ms")
+            log.info('🎉 Análisis completo finalizado en %.2f ms', tiempo_total)
             return resultados
             
         except Exception as e:
-            print(f"❌ Error en análisis completo: {e}")
-            import traceback
-            traceback.print_exc()
+            log.error('❌ Error en análisis completo: %s', e, exc_info=True)
             # Reanudar captura continua en caso de error
             try:
                 self.camara.reanudar_captura_continua()
@@ -532,7 +533,7 @@ class SistemaAnalisisIntegrado:
             return resultados
             
         except Exception as e:
-            print(f"❌ Error en clasificación: {e}")
+            log.error('❌ Error en clasificación: %s', e)
             return {"error": str(e)}
     
     def solo_deteccion(self) -> Dict:
@@ -583,7 +584,7 @@ class SistemaAnalisisIntegrado:
             return resultados
             
         except Exception as e:
-            print(f"❌ Error en detección de piezas: {e}")
+            log.error('❌ Error en detección de piezas: %s', e)
             return {"error": str(e)}
     
     def solo_deteccion_defectos(self) -> Dict:
@@ -634,7 +635,7 @@ class SistemaAnalisisIntegrado:
             return resultados
             
         except Exception as e:
-            print(f"❌ Error en detección de defectos: {e}")
+            log.error('❌ Error en detección de defectos: %s', e)
             return {"error": str(e)}
     
     def solo_segmentacion_defectos(self) -> Dict:
@@ -685,7 +686,7 @@ class SistemaAnalisisIntegrado:
             return resultados
             
         except Exception as e:
-            print(f"❌ Error en segmentación de defectos: {e}")
+            log.error('❌ Error en segmentación de defectos: %s', e)
             return {"error": str(e)}
     
     def solo_segmentacion_piezas(self) -> Dict:
@@ -736,24 +737,25 @@ class SistemaAnalisisIntegrado:
             )
             
             # 6. Mostrar resultados
-            print(f"\n🎯 SEGMENTACIÓN DE PIEZAS:")
-            print(f"   Segmentaciones detectadas: {len(segmentaciones_piezas)}")
-            for i, seg in enumerate(segmentaciones_piezas):
-                print(f"   Segmentación #{i+1}: {seg['clase']} - {seg['confianza']:.2%}")
-                print(f"     BBox: ({seg['bbox']['x1']}, {seg['bbox']['y1']}) a ({seg['bbox']['x2']}, {seg['bbox']['y2']})")
-                print(f"     Centroide: ({seg['centroide']['x']}, {seg['centroide']['y']})")
-                print(f"     Área: {seg['area']}")
-                print(f"     Dimensiones máscara: {seg['ancho_mascara']}x{seg['alto_mascara']}")
-            
-            print(f"\n⏱️  TIEMPOS:")
-            print(f"   Captura:      {tiempo_captura:.2f} ms")
-            print(f"   Segmentación: {tiempo_segmentacion:.2f} ms")
-            print(f"   Total:        {tiempo_total:.2f} ms")
+            log.debug('🎯 Segmentación de piezas: %s segmentaciones', len(segmentaciones_piezas))
+            if log.depurando():
+                for i, seg in enumerate(segmentaciones_piezas):
+                    log.debug(
+                        '   Segmentación #%s: %s - %.2f%% - BBox: (%s, %s) a (%s, %s) - Centroide: (%s, %s) - Área: %s - Máscara: %sx%s',
+                        i + 1, seg['clase'], seg['confianza'] * 100,
+                        seg['bbox']['x1'], seg['bbox']['y1'], seg['bbox']['x2'], seg['bbox']['y2'],
+                        seg['centroide']['x'], seg['centroide']['y'], seg['area'],
+                        seg['ancho_mascara'], seg['alto_mascara']
+                    )
+            log.debug(
+                '⏱️ Tiempos - captura: %.2f ms, segmentación: %.2f ms, total: %.2f ms',
+                tiempo_captura, tiempo_segmentacion, tiempo_total
+            )
             
             return resultados
             
         except Exception as e:
-            print(f"❌ Error en segmentación de piezas: {e}")
+            log.error('❌ Error en segmentación de piezas: %s', e)
             return {"error": str(e)}
     
     def _guardar_por_modulos(self, resultados: Dict):
@@ -782,10 +784,10 @@ class SistemaAnalisisIntegrado:
             if "segmentaciones_piezas" in resultados:
                 self._guardar_segmentacion_piezas_modulo(resultados, timestamp_captura)
             
-            print(f"✅ Resultados #{self.contador_resultados} guardados por módulos")
+            log.debug('✅ Resultados #%s guardados por módulos', self.contador_resultados)
             
         except Exception as e:
-            print(f"❌ Error guardando por módulos: {e}")
+            log.error('❌ Error guardando por módulos: %s', e)
     
     def _guardar_clasificacion_modulo(self, resultados: Dict, timestamp_captura: str):
         """Guarda resultados de clasificación en su módulo específico"""
@@ -819,10 +821,10 @@ class SistemaAnalisisIntegrado:
             with open(ruta_json, 'w', encoding='utf-8') as f:
                 json.dump(metadatos_clasificacion, f, indent=2, ensure_ascii=False)
             
-            print(f"   📁 Clasificación guardada en: {self.directorios_salida['clasificacion']}")
+            log.debug('   📁 Clasificación guardada en: %s', self.directorios_salida['clasificacion'])
             
         except Exception as e:
-            print(f"❌ Error guardando clasificación: {e}")
+            log.error('❌ Error guardando clasificación: %s', e)
     
     def _guardar_deteccion_piezas_modulo(self, resultados: Dict, timestamp_captura: str):
         """Guarda resultados de detección de piezas en su módulo específico"""
@@ -836,10 +838,10 @@ class SistemaAnalisisIntegrado:
                 timestamp_captura
             )
             
-            print(f"   📁 Detección de piezas guardada en: {self.directorios_salida['deteccion_piezas']}")
+            log.debug('   📁 Detección de piezas guardada en: %s', self.directorios_salida['deteccion_piezas'])
             
         except Exception as e:
-            print(f"❌ Error guardando detección de piezas: {e}")
+            log.error('❌ Error guardando detección de piezas: %s', e)
     
     def _guardar_deteccion_defectos_modulo(self, resultados: Dict, timestamp_captura: str):
         """Guarda resultados de detección de defectos en su módulo específico"""
@@ -853,10 +855,10 @@ class SistemaAnalisisIntegrado:
                 timestamp_captura
             )
             
-            print(f"   📁 Detección de defectos guardada en: {self.directorios_salida['deteccion_defectos']}")
+            log.debug('   📁 Detección de defectos guardada en: %s', self.directorios_salida['deteccion_defectos'])
             
         except Exception as e:
-            print(f"❌ Error guardando detección de defectos: {e}")
+            log.error('❌ Error guardando detección de defectos: %s', e)
     
     def _guardar_segmentacion_defectos_modulo(self, resultados: Dict, timestamp_captura: str):
         """Guarda resultados de segmentación de defectos en su módulo específico"""
@@ -870,10 +872,10 @@ class SistemaAnalisisIntegrado:
                 timestamp_captura
             )
             
-            print(f"   📁 Segmentación de defectos guardada en: {self.directorios_salida['segmentacion_defectos']}")
+            log.debug('   📁 Segmentación de defectos guardada en: %s', self.directorios_salida['segmentacion_defectos'])
             
         except Exception as e:
-            print(f"❌ Error guardando segmentación de defectos: {e}")
+            log.error('❌ Error guardando segmentación de defectos: %s', e)
     
     def _guardar_segmentacion_piezas_modulo(self, resultados: Dict, timestamp_captura: str):
         """Guarda resultados de segmentación de piezas en su módulo específico"""
@@ -885,10 +887,10 @@ class SistemaAnalisisIntegrado:
                 timestamp_captura
             )
             
-            print(f"   📁 Segmentación de piezas guardada en: {self.directorios_salida['segmentacion_piezas']}")
+            log.debug('   📁 Segmentación de piezas guardada en: %s', self.directorios_salida['segmentacion_piezas'])
             
         except Exception as e:
-            print(f"❌ Error guardando segmentación de piezas: {e}")
+            log.error('❌ Error guardando segmentación de piezas: %s', e)
     
     def obtener_estadisticas(self) -> Dict:
         """Retorna estadísticas del sistema"""
@@ -921,7 +923,7 @@ class SistemaAnalisisIntegrado:
     def liberar(self):
         """Libera todos los recursos del sistema"""
         try:
-            print("🧹 Liberando recursos del sistema integrado...")
+            log.debug('🧹 Liberando recursos del sistema integrado...')
             
             if self.camara:
                 self.camara.liberar()
@@ -945,10 +947,10 @@ class SistemaAnalisisIntegrado:
                 self.segmentador_piezas.liberar()
             
             self.inicializado = False
-            print("✅ Recursos del sistema integrado liberados")
+            log.info('✅ Recursos del sistema integrado liberados')
             
         except Exception as e:
-            print(f"❌ Error liberando recursos: {e}")
+            log.error('❌ Error liberando recursos: %s', e)
     
     def preprocesar_imagen_robusta(self, imagen: np.ndarray) -> Tuple[np.ndarray, Dict[str, float]]:
         """
@@ -961,12 +963,12 @@ class SistemaAnalisisIntegrado:
             Tuple[np.ndarray, Dict[str, float]]: Imagen preprocesada y métricas de iluminación
         """
         try:
-            print("🔧 Aplicando preprocesamiento robusto...")
+            log.debug('🔧 Aplicando preprocesamiento robusto...')
             
             # Analizar iluminación
             metrics = self.robustez_iluminacion.analizar_iluminacion(imagen)
-            print(f"   📊 Brillo: {metrics.get('brightness', 0):.1f}")
-            print(f"   📊 Contraste: {metrics.get('contrast', 0):.1f}")
+            log.debug('   📊 Brillo: %.1f', metrics.get('brightness', 0))
+            log.debug('   📊 Contraste: %.1f', metrics.get('contrast', 0))
             
             # Obtener recomendaciones
             recommendations = self.robustez_iluminacion.recomendar_ajustes(imagen)
@@ -979,11 +981,11 @@ class SistemaAnalisisIntegrado:
                 aplicar_contraste=recommendations.get('aplicar_contraste', True)
             )
             
-            print("✅ Preprocesamiento robusto completado")
+            log.debug('✅ Preprocesamiento robusto completado')
             return imagen_robusta, metrics
             
         except Exception as e:
-            print(f"❌ Error en preprocesamiento robusto: {e}")
+            log.error('❌ Error en preprocesamiento robusto: %s', e)
             return imagen, {}
     
     def obtener_umbrales_adaptativos(self, metrics: Dict[str, float], 
@@ -1007,15 +1009,15 @@ class SistemaAnalisisIntegrado:
                 brightness, contrast, detecciones_actuales
             )
             
-            print(f"   🎯 Umbrales adaptativos:")
-            print(f"      Confianza: {umbrales['confianza_min']:.3f}")
-            print(f"      Área mínima: {umbrales['area_minima']:.0f}")
-            print(f"      Cobertura mínima: {umbrales['cobertura_minima']:.3f}")
+            log.debug('   🎯 Umbrales adaptativos:')
+            log.debug('      Confianza: %.3f', umbrales['confianza_min'])
+            log.debug('      Área mínima: %.0f', umbrales['area_minima'])
+            log.debug('      Cobertura mínima: %.3f', umbrales['cobertura_minima'])
             
             return umbrales
             
         except Exception as e:
-            print(f"❌ Error obteniendo umbrales adaptativos: {e}")
+            log.error('❌ Error obteniendo umbrales adaptativos: %s', e)
             return {
                 'confianza_min': 0.5,
                 'area_minima': 500,
@@ -1040,12 +1042,12 @@ class SistemaAnalisisIntegrado:
             elif configuracion == "ultra_permisiva":
                 config = RobustezConfig.UMBRALES_ULTRA_PERMISIVA
             else:
-                print(f"⚠️ Configuración '{configuracion}' no reconocida, usando moderada")
+                log.warning("⚠️ Configuración '%s' no reconocida, usando moderada", configuracion)
                 config = RobustezConfig.UMBRALES_MODERADA
             
-            print(f"🔧 Aplicando configuración de robustez: {config['descripcion']}")
-            print(f"   Confianza mínima: {config['confianza_min']}")
-            print(f"   IoU threshold: {config['iou_threshold']}")
+            log.info('🔧 Aplicando configuración de robustez: %s', config['descripcion'])
+            log.debug('   Confianza mínima: %s', config['confianza_min'])
+            log.debug('   IoU threshold: %s', config['iou_threshold'])
             
             # Aplicar a detectores
             if self.detector_piezas:
@@ -1060,10 +1062,10 @@ class SistemaAnalisisIntegrado:
                     iou_threshold=config['iou_threshold']
                 )
             
-            print("✅ Configuración de robustez aplicada correctamente")
+            log.debug('✅ Configuración de robustez aplicada correctamente')
             
         except Exception as e:
-            print(f"❌ Error aplicando configuración de robustez: {e}")
+            log.error('❌ Error aplicando configuración de robustez: %s', e)
     
     def configurar_robustez_automatica(self, imagen: np.ndarray = None):
         """
@@ -1075,10 +1077,10 @@ class SistemaAnalisisIntegrado:
         try:
             # Capturar imagen si no se proporciona
             if imagen is None:
-                print("📸 Capturando imagen para análisis de robustez...")
+                log.debug('📸 Capturando imagen para análisis de robustez...')
                 imagen = self.camara.capturar_frame()
                 if imagen is None:
-                    print("❌ Error capturando imagen, usando configuración por defecto")
+                    log.error('❌ Error capturando imagen, usando configuración por defecto')
                     self.aplicar_configuracion_robustez("moderada")
                     return
             
@@ -1087,28 +1089,28 @@ class SistemaAnalisisIntegrado:
             brightness = np.mean(gray)
             contrast = np.std(gray)
             
-            print(f"📊 Análisis de iluminación:")
-            print(f"   Brillo: {brightness:.1f}")
-            print(f"   Contraste: {contrast:.1f}")
+            log.debug('📊 Análisis de iluminación:')
+            log.debug('   Brillo: %.1f', brightness)
+            log.debug('   Contraste: %.1f', contrast)
             
             # Determinar configuración basándose en condiciones
             if brightness < 60 or contrast < 20:
                 configuracion = "ultra_permisiva"
-                print("   Condiciones: Muy difíciles")
+                log.debug('   Condiciones: Muy difíciles')
             elif brightness < 100 or contrast < 30:
                 configuracion = "permisiva"
-                print("   Condiciones: Difíciles")
+                log.debug('   Condiciones: Difíciles')
             elif brightness < 150:
                 configuracion = "moderada"
-                print("   Condiciones: Normales")
+                log.debug('   Condiciones: Normales')
             else:
                 configuracion = "original"
-                print("   Condiciones: Buenas")
+                log.debug('   Condiciones: Buenas')
             
             # Aplicar configuración
             self.aplicar_configuracion_robustez(configuracion)
             
         except Exception as e:
-            print(f"❌ Error en configuración automática de robustez: {e}")
+            log.error('❌ Error en configuración automática de robustez: %s', e)
             # Fallback a configuración moderada
             self.aplicar_configuracion_robustez("moderada")
@@ -0,0 +1,257 @@
+"""
+Anillo de frames en memoria compartida (multiprocessing.shared_memory).
+
+El proceso dueño de la cámara escribe cada frame en el siguiente slot de un
+anillo de N slots; cualquier otro proceso (workers de Gunicorn, trabajadores
+de la cola) abre el mismo segmento por nombre y lee los frames sin copiarlos
+ni serializarlos.
+
+Disposición del segmento:
+    cabecera   int64[8]: magic, estado, num_slots, alto, ancho, canales, seq, reservado
+    seq slots  int64[N]: secuencia del frame en cada slot (0 = escribiéndose)
+    timestamps float64[N]: time.time() de cada frame
+    datos      uint8[N, alto, ancho, canales]
+
+Cada slot funciona como un seqlock: el escritor pone su secuencia a 0, copia
+el frame y publica la secuencia nueva; el lector comprueba que la secuencia
+no cambió después de leer.
+"""
+
+import logging
+import sys
+import threading
+import time
+from multiprocessing import shared_memory
+from typing import Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+MAGIC = 0x434F504C45  # 'COPLE'
+ESTADO_ACTIVO = 1
+ESTADO_CERRADO = 2
+
+_CABECERA = 8
+_MAGIC, _ESTADO, _NUM_SLOTS, _ALTO, _ANCHO, _CANALES, _SEQ = range(7)
+
+_registro_lock = threading.Lock()
+
+
+def _abrir_memoria(nombre: str) -> shared_memory.SharedMemory:
+    """
+    Abre un segmento existente sin registrarlo en el resource_tracker.
+
+    Antes de Python 3.13 adjuntarse a un segmento también lo registra, y el
+    tracker lo borraría al terminar el proceso lector.
+    """
+    if sys.version_info >= (3, 13):
+        return shared_memory.SharedMemory(name=nombre, track=False)
+
+    from multiprocessing import resource_tracker
+
+    with _registro_lock:
+        registrar = resource_tracker.register
+        resource_tracker.register = (
+            lambda name, rtype: None if rtype == 'shared_memory' else registrar(name, rtype)
+        )
+        try:
+            return shared_memory.SharedMemory(name=nombre)
+        finally:
+            resource_tracker.register = registrar
+
+
+class AnilloFramesCompartido:
+    """Últimos N frames con número de secuencia y timestamp, en memoria compartida"""
+
+    def __init__(self, shm: shared_memory.SharedMemory, propietario: bool):
+        self._shm = shm
+        self.propietario = propietario
+        self.nombre = shm.name
+
+        self._cabecera = np.ndarray((_CABECERA,), dtype=np.int64, buffer=shm.buf, offset=0)
+        num_slots, alto, ancho, canales = (int(v) for v in self._cabecera[_NUM_SLOTS:_CANALES + 1])
+        self.num_slots = num_slots
+        self.shape: Tuple[int, int, int] = (alto, ancho, canales)
+
+        offset = _CABECERA * 8
+        self._seq_slots = np.ndarray((num_slots,), dtype=np.int64, buffer=shm.buf, offset=offset)
+        offset += num_slots * 8
+        self._timestamps = np.ndarray((num_slots,), dtype=np.float64, buffer=shm.buf, offset=offset)
+        offset += num_slots * 8
+        offset = (offset + 63) // 64 * 64
+        self._datos = np.ndarray((num_slots, alto, ancho, canales), dtype=np.uint8, buffer=shm.buf, offset=offset)
+
+    # ------------------------------------------------------------------
+    # Creación / apertura
+    # ------------------------------------------------------------------
+
+    @staticmethod
+    def tamano_requerido(shape: Tuple[int, int, int], num_slots: int) -> int:
+        cabecera = (_CABECERA + 2 * num_slots) * 8
+        cabecera = (cabecera + 63) // 64 * 64
+        return cabecera + num_slots * int(np.prod(shape))
+
+    @classmethod
+    def crear(cls, nombre: str, shape: Tuple[int, int, int], num_slots: int = 4) -> 'AnilloFramesCompartido':
+        """
+        Crea el segmento (proceso dueño de la cámara).
+
+        Si quedó un segmento con el mismo nombre de una ejecución anterior,
+        se reemplaza.
+        """
+        if len(shape) == 2:
+            shape = (shape[0], shape[1], 1)
+        tamano = cls.tamano_requerido(shape, num_slots)
+
+        try:
+            shm = shared_memory.SharedMemory(name=nombre, create=True, size=tamano)
+        except FileExistsError:
+            anterior = _abrir_memoria(nombre)
+            anterior.close()
+            anterior.unlink()
+            shm = shared_memory.SharedMemory(name=nombre, create=True, size=tamano)
+
+        cabecera = np.ndarray((_CABECERA,), dtype=np.int64, buffer=shm.buf, offset=0)
+        cabecera[:] = 0
+        cabecera[_NUM_SLOTS] = num_slots
+        cabecera[_ALTO], cabecera[_ANCHO], cabecera[_CANALES] = shape
+        cabecera[_ESTADO] = ESTADO_ACTIVO
+        cabecera[_MAGIC] = MAGIC
+        del cabecera
+
+        anillo = cls(shm, propietario=True)
+        anillo._seq_slots[:] = -1
+        logger.info(f"🧠 Anillo compartido '{nombre}' creado: {num_slots} slots de {shape}")
+        return anillo
+
+    @classmethod
+    def abrir(cls, nombre: str) -> Optional['AnilloFramesCompartido']:
+        """Abre el segmento desde otro proceso; None si no existe o está cerrado"""
+        try:
+            shm = _abrir_memoria(nombre)
+        except FileNotFoundError:
+            return None
+
+        cabecera = np.ndarray((_CABECERA,), dtype=np.int64, buffer=shm.buf, offset=0)
+        valido = cabecera[_MAGIC] == MAGIC and cabecera[_ESTADO] == ESTADO_ACTIVO
+        del cabecera
+        if not valido:
+            shm.close()
+            return None
+        return cls(shm, propietario=False)
+
+    def cerrar(self) -> None:
+        """Libera el mapeo; el dueño además marca el anillo como cerrado y lo elimina"""
+        if self._shm is None:
+            return
+        if self.propietario:
+            self._cabecera[_ESTADO] = ESTADO_CERRADO
+        # Soltar las vistas antes de cerrar el mapeo
+        self._cabecera = self._seq_slots = self._timestamps = self._datos = None
+        try:
+            self._shm.close()
+        except BufferError:
+            # Aún hay vistas sin copia en uso; el mapeo se libera con ellas
+            logger.warning(f"⚠️ Anillo '{self.nombre}' cerrado con vistas de frames aún en uso")
+        if self.propietario:
+            try:
+                self._shm.unlink()
+            except FileNotFoundError:
+                pass
+        self._shm = None
+
+    @property
+    def activo(self) -> bool:
+        return self._shm is not None and self._cabecera[_ESTADO] == ESTADO_ACTIVO
+
+    @property
+    def seq(self) -> int:
+        """Secuencia del último frame publicado (0 si aún no hay frames)"""
+        return int(self._cabecera[_SEQ])
+
+    # ------------------------------------------------------------------
+    # Escritura (solo el dueño)
+    # ------------------------------------------------------------------
+
+    def escribir(self, frame: np.ndarray, timestamp: Optional[float] = None) -> int:
+        """
+        Copia un frame en el siguiente slot y lo publica.
+
+        Returns:
+            Secuencia asignada al frame
+        """
+        seq = int(self._cabecera[_SEQ]) + 1
+        slot = seq % self.num_slots
+
+        self._seq_slots[slot] = 0  # slot en escritura
+        np.copyto(self._datos[slot], frame.reshape(self.shape), casting='no')
+        self._timestamps[slot] = time.time() if timestamp is None else timestamp
+        self._seq_slots[slot] = seq
+        self._cabecera[_SEQ] = seq
+        return seq
+
+    # ------------------------------------------------------------------
+    # Lectura (cualquier proceso)
+    # ------------------------------------------------------------------
+
+    def leer(self, seq: Optional[int] = None, copiar: bool = True) -> Optional[Tuple[int, float, np.ndarray]]:
+        """
+        Lee un frame del anillo.
+
+        Args:
+            seq: Secuencia a leer (None = la última)
+            copiar: True devuelve una copia consistente; False una vista de
+                solo lectura sin copia, válida hasta que el escritor da la
+                vuelta al anillo (N-1 frames más)
+
+        Returns:
+            (seq, timestamp, frame) o None si el frame ya no está en el anillo
+        """
+        if seq is None:
+            seq = self.seq
+        if seq <= 0:
+            return None
+
+        slot = seq % self.num_slots
+        if self._seq_slots[slot] != seq:
+            return None
+
+        timestamp = float(self._timestamps[slot])
+        if copiar:
+            frame = self._datos[slot].copy()
+        else:
+            frame = self._datos[slot].view()
+            frame.flags.writeable = False
+
+        # Si el escritor tocó el slot mientras leíamos, el frame no es válido
+        if self._seq_slots[slot] != seq:
+            return None
+        return seq, timestamp, frame
+
+    def esperar_frame(
+        self,
+        despues_de_seq: int = 0,
+        timeout: float = 1.0,
+        copiar: bool = True,
+        intervalo_sondeo: float = 0.005
+    ) -> Optional[Tuple[int, float, np.ndarray]]:
+        """
+        Espera un frame con secuencia mayor que `despues_de_seq` y devuelve
+        el más reciente.
+
+        Entre procesos no hay notificación, así que se sondea la secuencia de
+        la cabecera (lectura de un entero en memoria compartida).
+        """
+        limite = time.monotonic() + timeout
+        while True:
+            if not self.activo:
+                return None
+            seq = self.seq
+            if seq > despues_de_seq:
+                resultado = self.leer(seq, copiar=copiar)
+                if resultado is not None:
+                    return resultado
+            if time.monotonic() >= limite:
+                return None
+            time.sleep(intervalo_sondeo)
@@ -0,0 +1,140 @@
+"""
+Anillo de frames preasignado para el thread de captura.
+
+El escritor (thread de captura) pide el siguiente slot, escribe el frame
+directamente en él (p.ej. cv2.cvtColor(..., dst=slot)) y lo publica con un
+número de secuencia. Los lectores obtienen vistas de solo lectura sin copiar;
+la secuencia del slot se verifica antes y después de leer, así que una vista
+es válida mientras el escritor no dé la vuelta al anillo (N-1 frames más).
+
+No hay lock en el camino de escritura ni de lectura: la Condition solo se usa
+para despertar a quien espera un frame nuevo.
+"""
+
+import threading
+import time
+from typing import Optional, Tuple
+
+import numpy as np
+
+
+class AnilloFrames:
+    """Últimos N frames preasignados con secuencia y timestamp"""
+
+    def __init__(self, shape: Tuple[int, ...], num_slots: int = 4, dtype=np.uint8):
+        """
+        Args:
+            shape: Forma de cada frame (alto, ancho, canales)
+            num_slots: Número de slots del anillo (mínimo 2)
+            dtype: Tipo de los píxeles
+        """
+        self.num_slots = max(2, num_slots)
+        self.shape = tuple(shape)
+        self._datos = np.empty((self.num_slots, *self.shape), dtype=dtype)
+        self._seq_slots = [-1] * self.num_slots
+        self._timestamps = [0.0] * self.num_slots
+        self._seq = 0
+        self._condicion = threading.Condition()
+
+    @property
+    def seq(self) -> int:
+        """Secuencia del último frame publicado (0 si aún no hay frames)"""
+        return self._seq
+
+    # ------------------------------------------------------------------
+    # Escritura (un único thread escritor)
+    # ------------------------------------------------------------------
+
+    def slot_escritura(self) -> np.ndarray:
+        """
+        Devuelve el slot donde escribir el siguiente frame y lo invalida
+        para los lectores hasta que se llame a publicar().
+        """
+        slot = (self._seq + 1) % self.num_slots
+        self._seq_slots[slot] = 0
+        return self._datos[slot]
+
+    def publicar(self, timestamp: Optional[float] = None) -> int:
+        """
+        Publica el frame escrito en el slot de escritura.
+
+        Returns:
+            Secuencia asignada al frame
+        """
+        seq = self._seq + 1
+        slot = seq % self.num_slots
+        self._timestamps[slot] = time.time() if timestamp is None else timestamp
+        self._seq_slots[slot] = seq
+        self._seq = seq
+        with self._condicion:
+            self._condicion.notify_all()
+        return seq
+
+    def descartar(self) -> None:
+        """Abandona el slot de escritura sin publicarlo (frame con error)"""
+        slot = (self._seq + 1) % self.num_slots
+        self._seq_slots[slot] = -1
+
+    def vaciar(self) -> None:
+        """Invalida todos los slots (la secuencia sigue creciendo)"""
+        self._seq_slots = [-1] * self.num_slots
+
+    # ------------------------------------------------------------------
+    # Lectura (cualquier thread)
+    # ------------------------------------------------------------------
+
+    def leer(self, seq: Optional[int] = None) -> Optional[Tuple[int, float, np.ndarray]]:
+        """
+        Lee un frame como vista de solo lectura, sin copiar.
+
+        Args:
+            seq: Secuencia a leer (None = la última)
+
+        Returns:
+            (seq, timestamp, frame) o None si el frame ya no está en el anillo
+        """
+        if seq is None:
+            seq = self._seq
+        if seq <= 0:
+            return None
+
+        slot = seq % self.num_slots
+        if self._seq_slots[slot] != seq:
+            return None
+
+        timestamp = self._timestamps[slot]
+        frame = self._datos[slot].view()
+        frame.flags.writeable = False
+
+        # Si el escritor reutilizó el slot mientras leíamos, descartar
+        if self._seq_slots[slot] != seq:
+            return None
+        return seq, timestamp, frame
+
+    def esperar_frame(
+        self,
+        despues_de_seq: int = 0,
+        timeout: float = 1.0
+    ) -> Optional[Tuple[int, float, np.ndarray]]:
+        """
+        Bloquea hasta que haya un frame con secuencia mayor que
+        `despues_de_seq` y devuelve el más reciente.
+
+        Returns:
+            (seq, timestamp, frame) o None si vence el timeout
+        """
+        limite = time.monotonic() + timeout
+        with self._condicion:
+            while True:
+                if self._seq > despues_de_seq:
+                    resultado = self.leer()
+                    if resultado is not None:
+                        return resultado
+                restante = limite - time.monotonic()
+                if restante <= 0:
+                    return None
+                self._condicion.wait(restante)
+
+    def frames_validos(self) -> int:
+        """Número de slots con un frame publicado"""
+        return sum(1 for seq in self._seq_slots if seq > 0)
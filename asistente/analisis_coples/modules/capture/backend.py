@@ -0,0 +1,48 @@
+"""
+Interfaz común de los backends de captura.
+
+CameraService trabaja con cualquier backend que implemente esta interfaz:
+- CamaraTiempoOptimizada: cámara GigE real (pygigev)
+- CamaraSimulada: el mismo controlador GigE sobre una cámara simulada que
+  reproduce frames Bayer (benchmarks y pruebas sin hardware)
+- WebcamFallback: webcam USB
+"""
+
+from typing import Any, Dict, Optional, Tuple
+
+import numpy as np
+
+
+class BackendCaptura:
+    """Interfaz de un backend de captura"""
+
+    def inicializar(self) -> bool:
+        """Abre y configura el dispositivo"""
+        raise NotImplementedError
+
+    def iniciar_captura_continua(self) -> bool:
+        """Arranca el thread que publica frames en el anillo del backend"""
+        raise NotImplementedError
+
+    def detener_captura(self) -> None:
+        raise NotImplementedError
+
+    def capturar_frame(self) -> Optional[np.ndarray]:
+        """Frame actual como copia propia (o None)"""
+        raise NotImplementedError
+
+    def capturar_frame_posterior(
+        self,
+        no_antes_de: Optional[float] = None,
+        despues_de_seq: int = 0,
+        timeout: float = 2.0
+    ) -> Optional[Tuple[int, float, np.ndarray]]:
+        """Primer frame expuesto después de un evento: (seq, timestamp, frame)"""
+        raise NotImplementedError
+
+    def obtener_estadisticas(self) -> Dict[str, Any]:
+        raise NotImplementedError
+
+    def liberar(self) -> None:
+        """Detiene la captura y libera el dispositivo"""
+        raise NotImplementedError
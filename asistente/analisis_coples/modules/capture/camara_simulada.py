@@ -0,0 +1,57 @@
+"""
+Cámara GigE simulada para pruebas y benchmarks de captura.
+
+CamaraSimulada es el controlador GigE real (CamaraTiempoOptimizada) sobre
+GevSimulado en lugar de pygigev: los frames recorren el mismo camino de
+buffers de transferencia, demosaico y anillo que con la cámara física, así
+que las regresiones de rendimiento de la captura se pueden medir sin hardware.
+"""
+
+from typing import Any, Dict, Optional
+
+from analisis_coples.expo_config import CameraConfig
+from .camera_controller import CamaraTiempoOptimizada
+from .gev_simulado import GevSimulado
+
+
+class CamaraSimulada(CamaraTiempoOptimizada):
+    """CamaraTiempoOptimizada que reproduce frames Bayer a un ritmo configurable"""
+
+    def __init__(
+        self,
+        fuente: Optional[str] = None,
+        fps: float = CameraConfig.FRAMERATE,
+        jitter: float = 0.0,
+        tasa_perdida: float = 0.0,
+        semilla: int = 0,
+        ip: Optional[str] = None
+    ):
+        """
+        Args:
+            fuente: Directorio de imágenes o video (None = escena sintética)
+            fps: Frames por segundo en modo continuo
+            jitter: Variación máxima (± segundos) del periodo entre frames
+            tasa_perdida: Fracción de frames que llegan incompletos
+            semilla: Semilla para que jitter y pérdidas sean reproducibles
+            ip: IP anunciada (por defecto la de la configuración)
+        """
+        ip = ip or CameraConfig.DEFAULT_IP
+        gev = GevSimulado(
+            ip=ip,
+            fuente=fuente,
+            jitter=jitter,
+            tasa_perdida=tasa_perdida,
+            semilla=semilla
+        )
+        super().__init__(ip=ip, gev=gev)
+        self.framerate = fps
+
+    def obtener_estadisticas(self) -> Dict[str, Any]:
+        stats = super().obtener_estadisticas()
+        stats.update({
+            'simulada': True,
+            'frames_generados': self.gev.frames_generados,
+            'frames_perdidos': self.gev.frames_perdidos,
+            'frames_descartados': self.gev.frames_descartados,
+        })
+        return stats
@@ -8,13 +8,15 @@ import time
 import numpy as np
 import ctypes
 import threading
-from threading import Event, Lock
+from threading import Event
 from queue import Queue
 import sys
 import os
 
 # Importar configuración
 from analisis_coples.expo_config import CameraConfig, StatsConfig, GlobalConfig
+from .anillo_frames import AnilloFrames
+from .backend import BackendCaptura
 
 # Obtener el código de soporte común para el GigE-V Framework
 # Agregar la ruta de gigev_common al path
@@ -38,26 +40,29 @@ except ImportError as e:
     print(f"⚠️ pygigev no disponible - Cámara GigE no funcionará (usar webcam como fallback): {e}")
 
 
-class CamaraTiempoOptimizada:
+class CamaraTiempoOptimizada(BackendCaptura):
     """
     Controlador optimizado de cámara GigE para captura de imágenes de coples.
     
     Características:
-    - Captura asíncrona continua con doble buffer
+    - Captura asíncrona continua en un anillo de N frames preasignados
     - Optimizado para resolución 640x640
     - Procesamiento en tiempo real con mínima latencia
     - Gestión automática de memoria
     - Estadísticas de rendimiento en tiempo real
     """
     
-    def __init__(self, ip=None):
+    def __init__(self, ip=None, gev=None):
         """
         Inicializa el controlador de cámara.
         
         Args:
             ip (str, optional): Dirección IP de la cámara. Si no se proporciona, usa la configuración por defecto.
+            gev (optional): Implementación de la API GigE-V; por defecto pygigev.
+                GevSimulado permite usar el controlador sin hardware.
         """
         self.ip = ip or CameraConfig.DEFAULT_IP
+        self.gev = gev if gev is not None else pygigev
         self.handle = None
         self.buffer_addresses = None
         self.frame_count = 0
@@ -70,27 +75,29 @@ class CamaraTiempoOptimizada:
         self.num_buffers = CameraConfig.NUM_BUFFERS
         self.gain = CameraConfig.GAIN
         
+        # Modo de adquisición: 'continuo' (free-running) o 'software' (un frame por disparo)
+        self.modo_disparo = CameraConfig.TRIGGER_MODE
+        self.disparo_lock = threading.Lock()  # Un disparo en curso a la vez
+        
         # Configuración del ROI
         self.roi_width = CameraConfig.ROI_WIDTH
         self.roi_height = CameraConfig.ROI_HEIGHT
         self.roi_offset_x = CameraConfig.ROI_OFFSET_X
         self.roi_offset_y = CameraConfig.ROI_OFFSET_Y
         
-        # Sistema de doble buffer asíncrono optimizado
-        self.write_buffer_idx = 0    # Buffer donde se está escribiendo actualmente
-        self.read_buffer_idx = 1     # Buffer listo para lectura
-        
-        # Almacenamiento de frames procesados
-        self.processed_frames = [None] * 2  # Solo necesitamos 2 slots
-        self.frame_ready = [False] * 2      # Estado de cada frame
-        self.frame_timestamps = [0] * 2     # Timestamps de captura
+        # Anillo de frames BGR preasignados: el demosaico escribe directo en
+        # el slot y los lectores reciben vistas de solo lectura con secuencia
+        self.anillo = AnilloFrames(
+            (self.roi_height, self.roi_width, 3),
+            num_slots=CameraConfig.RING_SLOTS
+        )
         
-        # Control de sincronización optimizado
-        self.buffer_lock = Lock()           # Lock mínimo para cambios de índices
-        self.frame_ready_event = Event()    # Señal de frame listo
+        # Control del thread de captura
         self.capture_thread = None          # Thread de captura continua
         self.capture_active = False         # Control del thread
         self.capture_paused = False         # Control de pausa temporal
+        self.captura_reanudada = Event()    # Set mientras la captura no está pausada
+        self.captura_reanudada.set()
         
         # Estadísticas de rendimiento
         self.capture_times = Queue(maxsize=StatsConfig.CAPTURE_TIMES_QUEUE_SIZE)
@@ -110,18 +117,18 @@ class CamaraTiempoOptimizada:
             bool: True si la configuración fue exitosa
         """
         # Verificar que pygigev esté disponible
-        if not PYGIGEV_AVAILABLE:
+        if self.gev is None:
             print("❌ pygigev no disponible - no se puede usar cámara GigE")
             return False
         
         try:
             # Inicializar API GigE
-            pygigev.GevApiInitialize()
+            self.gev.GevApiInitialize()
             
             # Buscar cámaras disponibles
             numFound = (ctypes.c_uint32)(0)
-            camera_info = (pygigev.GEV_CAMERA_INFO * CameraConfig.MAX_CAMERAS)()
-            status = pygigev.GevGetCameraList(camera_info, CameraConfig.MAX_CAMERAS, ctypes.byref(numFound))
+            camera_info = (self.gev.GEV_CAMERA_INFO * CameraConfig.MAX_CAMERAS)()
+            status = self.gev.GevGetCameraList(camera_info, CameraConfig.MAX_CAMERAS, ctypes.byref(numFound))
             
             print(f"🔍 Buscando cámaras GigE... Status: {status}, Encontradas: {numFound.value}")
             
@@ -158,9 +165,9 @@ class CamaraTiempoOptimizada:
             # Abrir cámara
             print(f"🔓 Intentando abrir cámara en modo exclusivo...")
             self.handle = (ctypes.c_void_p)()
-            status = pygigev.GevOpenCamera(
+            status = self.gev.GevOpenCamera(
                 camera_info[self.camIndex], 
-                pygigev.GevExclusiveMode, 
+                self.gev.GevExclusiveMode, 
                 ctypes.byref(self.handle)
             )
             if status != 0:
@@ -172,9 +179,9 @@ class CamaraTiempoOptimizada:
                 
                 # Intentar en modo monitor como fallback
                 print(f"🔄 Intentando abrir en modo monitor...")
-                status = pygigev.GevOpenCamera(
+                status = self.gev.GevOpenCamera(
                     camera_info[self.camIndex], 
-                    pygigev.GevMonitorMode, 
+                    self.gev.GevMonitorMode, 
                     ctypes.byref(self.handle)
                 )
                 if status != 0:
@@ -193,6 +200,10 @@ class CamaraTiempoOptimizada:
             if not self._configurar_roi():
                 return False
             
+            # Configurar modo de disparo
+            if not self.configurar_modo_disparo(self.modo_disparo):
+                return False
+            
             # Configurar buffers
             if not self._configurar_buffers():
                 return False
@@ -208,6 +219,10 @@ class CamaraTiempoOptimizada:
             print(f"❌ Error en configuración: {e}")
             return False
 
+    def inicializar(self):
+        """Interfaz BackendCaptura: equivale a configurar_camara()"""
+        return self.configurar_camara()
+
     def _ip_to_int(self, ip_str):
         """Convierte IP string a entero para comparación"""
         try:
@@ -236,7 +251,7 @@ class CamaraTiempoOptimizada:
             ]
 
             for nombre, valor in configuraciones:
-                status = pygigev.GevSetFeatureValue(
+                status = self.gev.GevSetFeatureValue(
                     self.handle,
                     nombre.encode(),
                     ctypes.sizeof(valor),
@@ -266,7 +281,7 @@ class CamaraTiempoOptimizada:
 
             for nombre, valor in roi_configs:
                 valor_int64 = (ctypes.c_int64)(valor)
-                status = pygigev.GevSetFeatureValue(
+                status = self.gev.GevSetFeatureValue(
                     self.handle,
                     nombre.encode(),
                     ctypes.sizeof(valor_int64),
@@ -284,13 +299,52 @@ class CamaraTiempoOptimizada:
             print(f"❌ Error configurando ROI: {e}")
             return False
 
+    def configurar_modo_disparo(self, modo):
+        """
+        Selecciona el modo de adquisición de la cámara.
+        
+        En modo 'software' la cámara solo expone un frame por cada
+        TriggerSoftware: el thread de captura queda esperando sin recibir ni
+        demosaicar frames que nadie usa.
+        
+        Args:
+            modo (str): 'continuo' o 'software'
+            
+        Returns:
+            bool: True si la cámara aceptó la configuración
+        """
+        if modo not in ('continuo', 'software'):
+            print(f"❌ Modo de disparo desconocido: {modo}")
+            return False
+        
+        try:
+            configuraciones = [("TriggerSelector", "FrameStart")]
+            if modo == 'software':
+                configuraciones += [("TriggerSource", "Software"), ("TriggerMode", "On")]
+            else:
+                configuraciones += [("TriggerMode", "Off")]
+            
+            for nombre, valor in configuraciones:
+                status = self.gev.GevSetFeatureValueAsString(self.handle, nombre.encode(), valor.encode())
+                if status != 0:
+                    print(f"❌ Error configurando {nombre}={valor}")
+                    return False
+            
+            self.modo_disparo = modo
+            print(f"✅ Modo de disparo: {modo}")
+            return True
+            
+        except Exception as e:
+            print(f"❌ Error configurando modo de disparo: {e}")
+            return False
+
     def _configurar_buffers(self):
         """Configura los buffers de captura."""
         try:
             # Obtener parámetros de payload
             self.payload_size = (ctypes.c_uint64)()
             self.pixel_format = (ctypes.c_uint32)()
-            status = pygigev.GevGetPayloadParameters(
+            status = self.gev.GevGetPayloadParameters(
                 self.handle,
                 ctypes.byref(self.payload_size),
                 ctypes.byref(self.pixel_format)
@@ -302,13 +356,13 @@ class CamaraTiempoOptimizada:
             # Mostrar formato de píxel detectado
             pixel_fmt_value = self.pixel_format.value
             pixel_fmt_name = "Desconocido"
-            if pixel_fmt_value == GPF.fmtBayerRG8.value:
+            if pixel_fmt_value == self.gev.GevPixelFormats.fmtBayerRG8.value:
                 pixel_fmt_name = "BayerRG8"
-            elif pixel_fmt_value == GPF.fmtBayerGR8.value:
+            elif pixel_fmt_value == self.gev.GevPixelFormats.fmtBayerGR8.value:
                 pixel_fmt_name = "BayerGR8"
-            elif pixel_fmt_value == GPF.fmtBayerGB8.value:
+            elif pixel_fmt_value == self.gev.GevPixelFormats.fmtBayerGB8.value:
                 pixel_fmt_name = "BayerGB8"
-            elif pixel_fmt_value == GPF.fmtBayerBG8.value:
+            elif pixel_fmt_value == self.gev.GevPixelFormats.fmtBayerBG8.value:
                 pixel_fmt_name = "BayerBG8"
             print(f"📷 Formato de píxel: {pixel_fmt_name} (0x{pixel_fmt_value:08X})")
 
@@ -330,9 +384,9 @@ class CamaraTiempoOptimizada:
     def _inicializar_transferencia(self):
         """Inicializa la transferencia asíncrona."""
         try:
-            status = pygigev.GevInitializeTransfer(
+            status = self.gev.GevInitializeTransfer(
                 self.handle,
-                pygigev.Asynchronous,  # Modo asíncrono
+                self.gev.Asynchronous,  # Modo asíncrono
                 self.payload_size,
                 self.num_buffers,
                 self.buffer_addresses
@@ -358,27 +412,42 @@ class CamaraTiempoOptimizada:
             print("⚠️ La captura ya está activa")
             return True
             
-        self.capture_active = True
-        self.capture_thread = threading.Thread(
-            target=self._thread_captura_continua,
-            daemon=True
-        )
-        self.capture_thread.start()
+        seq_inicial = self.anillo.seq
+        self._arrancar_thread_captura()
+        
+        # En modo 'software' no llegan frames sin disparo: comprobar con uno
+        if self.modo_disparo == 'software':
+            if self.capturar_disparo(timeout=CameraConfig.STARTUP_TIMEOUT) is not None:
+                print("✅ Captura por disparo lista")
+                return True
+            print("❌ Timeout esperando frame del disparo inicial")
+            return False
         
         # Esperar a que el primer frame esté listo
-        if self.frame_ready_event.wait(timeout=CameraConfig.STARTUP_TIMEOUT):
+        if self.anillo.esperar_frame(seq_inicial, timeout=CameraConfig.STARTUP_TIMEOUT) is not None:
             print("✅ Captura continua iniciada correctamente")
             return True
         else:
             print("❌ Timeout esperando primer frame")
             return False
 
+    def _arrancar_thread_captura(self):
+        """Arranca el thread que recibe y demosaica frames (si no está corriendo)"""
+        if self.capture_thread and self.capture_thread.is_alive():
+            return
+        self.capture_active = True
+        self.capture_thread = threading.Thread(
+            target=self._thread_captura_continua,
+            daemon=True
+        )
+        self.capture_thread.start()
+
     def _thread_captura_continua(self):
         """Thread dedicado a captura continua de frames."""
         print("🚀 Iniciando captura continua...")
         
         # Iniciar transferencia continua
-        status = pygigev.GevStartTransfer(self.handle, -1)
+        status = self.gev.GevStartTransfer(self.handle, -1)
         if status != 0:
             print("❌ Error iniciando transferencia continua")
             return
@@ -388,17 +457,15 @@ class CamaraTiempoOptimizada:
         
         try:
             while self.capture_active:
-                # Verificar si la captura está pausada
-                with self.buffer_lock:
-                    if self.capture_paused:
-                        time.sleep(0.001)  # 1ms
-                        continue
+                # Si la captura está pausada, esperar sin consumir CPU
+                if not self.captura_reanudada.wait(timeout=CameraConfig.FRAME_TIMEOUT):
+                    continue
                 
                 capture_start = time.time()
-                gevbufPtr = ctypes.POINTER(pygigev.GEV_BUFFER_OBJECT)()
+                gevbufPtr = ctypes.POINTER(self.gev.GEV_BUFFER_OBJECT)()
                 
                 # Esperar frame con timeout
-                status = pygigev.GevWaitForNextFrame(
+                status = self.gev.GevWaitForNextFrame(
                     self.handle,
                     ctypes.byref(gevbufPtr),
                     int(CameraConfig.FRAME_TIMEOUT * 1000)  # Convertir a ms
@@ -425,25 +492,22 @@ class CamaraTiempoOptimizada:
                     processing_time = (time.time() - processing_start) * 1000
                     if not self.processing_times.full():
                         self.processing_times.put(processing_time)
-                    
-                    # Señalar que hay un frame listo
-                    self.frame_ready_event.set()
                 
                 # Liberar el buffer inmediatamente
                 if gevbufPtr:
-                    pygigev.GevReleaseFrame(self.handle, gevbufPtr)
+                    self.gev.GevReleaseFrame(self.handle, gevbufPtr)
                     
         except Exception as e:
             print(f"❌ Error en thread de captura: {e}")
         finally:
             # Detener transferencia
             if self.handle:
-                pygigev.GevStopTransfer(self.handle)
+                self.gev.GevStopTransfer(self.handle)
             print(f"📊 Thread de captura terminado. Frames capturados: {frame_local_count}")
 
     def _procesar_frame_async(self, gevbufPtr):
         """
-        Procesa frame de manera asíncrona en el buffer de escritura actual.
+        Demosaica el frame directamente en el siguiente slot del anillo y lo publica.
         
         Args:
             gevbufPtr: Puntero al buffer de GigE
@@ -465,61 +529,181 @@ class CamaraTiempoOptimizada:
             raw_data = raw_data.reshape((self.roi_height, self.roi_width))
             
             # Procesar imagen invirtiendo canales R y B desde Bayer
-            # Usando BayerBG en lugar de BayerRG para corregir inversión de colores
-            frame_bgr = cv2.cvtColor(raw_data, cv2.COLOR_BayerBG2BGR)
-            
-            # Actualizar buffer de escritura atómicamente
-            with self.buffer_lock:
-                # Guardar frame procesado en buffer de escritura
-                self.processed_frames[self.write_buffer_idx] = frame_bgr.copy()
-                self.frame_ready[self.write_buffer_idx] = True
-                self.frame_timestamps[self.write_buffer_idx] = time.time()
-                
-                # Rotar índices de buffers
-                self._rotar_buffers()
+            # Usando BayerBG en lugar de BayerRG para corregir inversión de colores.
+            # El resultado se escribe en el slot: sin imagen intermedia ni copia.
+            slot = self.anillo.slot_escritura()
+            try:
+                cv2.cvtColor(raw_data, cv2.COLOR_BayerBG2BGR, dst=slot)
+            except Exception:
+                self.anillo.descartar()
+                raise
             
+            self.anillo.publicar(time.time())
             return True
             
         except Exception as e:
             print(f"❌ Error procesando frame async: {e}")
             return False
 
-    def _rotar_buffers(self):
-        """Rota los índices de buffers de manera circular."""
-        # Intercambiar buffers de manera simple
-        self.write_buffer_idx, self.read_buffer_idx = self.read_buffer_idx, self.write_buffer_idx
-
-    def obtener_frame_instantaneo(self):
+    def obtener_frame_instantaneo(self, copiar=False):
         """
-        Obtiene el frame más reciente de manera instantánea (~1ms).
+        Obtiene el frame más reciente de manera instantánea (sin lock).
+        
+        Args:
+            copiar (bool): False devuelve una vista de solo lectura del anillo,
+                válida mientras no se capturen RING_SLOTS-1 frames más;
+                True devuelve una copia propia
         
         Returns:
             tuple: (frame, tiempo_acceso_ms, timestamp) o (None, tiempo_acceso_ms, 0)
         """
         start_time = time.time()
         
-        with self.buffer_lock:
-            if self.frame_ready[self.read_buffer_idx]:
-                # Copiar frame del buffer de lectura
-                frame = self.processed_frames[self.read_buffer_idx].copy()
-                timestamp = self.frame_timestamps[self.read_buffer_idx]
-                
-                # Marcar como procesado
-                self.frame_ready[self.read_buffer_idx] = False
-                
-                elapsed = (time.time() - start_time) * 1000
-                return frame, elapsed, timestamp
-            else:
-                # No hay frame nuevo, devolver el último disponible
-                for i in range(2):
-                    if self.frame_ready[i]:
-                        frame = self.processed_frames[i].copy()
-                        timestamp = self.frame_timestamps[i]
-                        elapsed = (time.time() - start_time) * 1000
-                        return frame, elapsed, timestamp
+        leido = self.anillo.leer()
+        if leido is None:
+            elapsed = (time.time() - start_time) * 1000
+            return None, elapsed, 0
+        
+        _, timestamp, frame = leido
+        if copiar:
+            frame = frame.copy()
         
         elapsed = (time.time() - start_time) * 1000
-        return None, elapsed, 0
+        return frame, elapsed, timestamp
+
+    def esperar_frame(self, despues_de_seq=0, timeout=CameraConfig.FRAME_TIMEOUT):
+        """
+        Bloquea hasta que el thread de captura publique un frame posterior a
+        `despues_de_seq` (sin sondeo).
+        
+        Args:
+            despues_de_seq (int): Última secuencia ya vista (0 = cualquiera)
+            timeout (float): Segundos máximos de espera
+            
+        Returns:
+            tuple: (seq, timestamp, frame de solo lectura) o None si vence el timeout
+        """
+        return self.anillo.esperar_frame(despues_de_seq, timeout)
+
+    def capturar_frame_posterior(self, no_antes_de=None, despues_de_seq=0, timeout=CameraConfig.CAPTURE_TIMEOUT):
+        """
+        Captura el primer frame cuya exposición empezó después de un evento
+        (p.ej. el brazo terminó de posicionar la pieza), en lugar de lo que
+        haya en el anillo en ese momento.
+        
+        El timestamp del anillo es el de recepción en el host; el inicio de la
+        exposición se estima restando el tiempo de exposición configurado.
+        La espera es por evento (Condition del anillo), sin sondeo.
+        
+        Args:
+            no_antes_de (float, optional): time.time() del evento; el frame
+                debe haberse expuesto después
+            despues_de_seq (int): Secuencia mínima exclusiva (0 = cualquiera)
+            timeout (float): Segundos máximos de espera
+            
+        Returns:
+            tuple: (seq, timestamp, frame copiado) o None si vence el timeout
+        """
+        if self.modo_disparo == 'software':
+            # El frame se expone después del disparo: basta con disparar tras el evento
+            if no_antes_de is not None and no_antes_de > time.time():
+                time.sleep(no_antes_de - time.time())
+            return self.capturar_disparo(timeout)
+        
+        if not (self.capture_thread and self.capture_thread.is_alive()):
+            if not self.iniciar_captura_continua():
+                return None
+        
+        duracion_exposicion = self.exposure_time / 1e6  # µs -> s
+        limite = time.monotonic() + timeout
+        seq = despues_de_seq
+        while True:
+            restante = limite - time.monotonic()
+            if restante <= 0:
+                return None
+            leido = self.anillo.esperar_frame(seq, restante)
+            if leido is None:
+                return None
+            
+            seq, timestamp, frame = leido
+            if no_antes_de is not None and timestamp - duracion_exposicion < no_antes_de:
+                continue  # Expuesto antes del evento: esperar el siguiente
+            
+            frame = frame.copy()
+            # Validar que el slot no se reutilizó durante la copia
+            if self.anillo.leer(seq) is not None:
+                return seq, timestamp, frame
+
+    def disparar(self):
+        """
+        Envía un TriggerSoftware a la cámara.
+        
+        Returns:
+            bool: True si la cámara aceptó el disparo
+        """
+        valor = ctypes.c_int32(1)
+        status = self.gev.GevSetFeatureValue(
+            self.handle,
+            b"TriggerSoftware",
+            ctypes.sizeof(valor),
+            ctypes.byref(valor)
+        )
+        if status != 0:
+            print(f"❌ Error enviando TriggerSoftware. Status: {status}")
+            return False
+        return True
+
+    def capturar_disparo(self, timeout=CameraConfig.CAPTURE_TIMEOUT):
+        """
+        Dispara la cámara y espera el frame resultante (modo 'software').
+        
+        Returns:
+            tuple: (seq, timestamp, frame copiado) o None si falla o vence el timeout
+        """
+        self._arrancar_thread_captura()
+        
+        with self.disparo_lock:
+            seq_anterior = self.anillo.seq
+            if not self.disparar():
+                return None
+            leido = self.anillo.esperar_frame(seq_anterior, timeout)
+            if leido is None:
+                print(f"⚠️ Sin frame tras el disparo ({timeout}s)")
+                return None
+            seq, timestamp, frame = leido
+            return seq, timestamp, frame.copy()
+
+    def capturar_rafaga(self, num_frames, timeout=CameraConfig.CAPTURE_TIMEOUT):
+        """
+        Captura `num_frames` frames seguidos.
+        
+        En modo 'software' se dispara de nuevo en cuanto llega cada frame; en
+        modo continuo se toman los siguientes frames consecutivos del stream.
+        
+        Args:
+            num_frames (int): Frames de la ráfaga
+            timeout (float): Segundos máximos por frame
+            
+        Returns:
+            list: [(seq, timestamp, frame copiado), ...]; más corta si algún frame no llegó
+        """
+        rafaga = []
+        if self.modo_disparo == 'software':
+            for _ in range(num_frames):
+                capturado = self.capturar_disparo(timeout)
+                if capturado is None:
+                    break
+                rafaga.append(capturado)
+            return rafaga
+        
+        seq = self.anillo.seq
+        for _ in range(num_frames):
+            capturado = self.capturar_frame_posterior(despues_de_seq=seq, timeout=timeout)
+            if capturado is None:
+                break
+            rafaga.append(capturado)
+            seq = capturado[0]
+        return rafaga
 
     def capturar_frame(self):
         """
@@ -528,7 +712,12 @@ class CamaraTiempoOptimizada:
         Returns:
             np.ndarray or None: Frame capturado o None si hay error
         """
-        frame, tiempo, timestamp = self.obtener_frame_instantaneo()
+        if self.modo_disparo == 'software':
+            capturado = self.capturar_disparo()
+            return capturado[2] if capturado is not None else None
+        
+        # Copia propia: el análisis retiene la imagen más de lo que dura un slot
+        frame, tiempo, timestamp = self.obtener_frame_instantaneo(copiar=True)
         return frame
 
     def obtener_estadisticas(self):
@@ -552,10 +741,12 @@ class CamaraTiempoOptimizada:
             'fps_real': fps_real,
             'frames_totales': self.total_frames_captured,
             'tiempo_total': tiempo_total,
-            'buffers_listos': sum(self.frame_ready),
+            'buffers_listos': self.anillo.frames_validos(),
+            'ultimo_seq': self.anillo.seq,
             'ip_camara': self.ip,
             'roi_size': f"{self.roi_width}x{self.roi_height}",
             'exposure_time': self.exposure_time,
+            'modo_disparo': self.modo_disparo,
             'framerate': self.framerate
         }
         
@@ -574,31 +765,19 @@ class CamaraTiempoOptimizada:
             # Detener captura
             self.detener_captura()
             
-            # Limpiar buffers de manera segura
-            with self.buffer_lock:
-                try:
-                    if hasattr(self, 'processed_frames') and self.processed_frames is not None:
-                        for i in range(len(self.processed_frames)):
-                            if i < len(self.processed_frames) and self.processed_frames[i] is not None:
-                                del self.processed_frames[i]
-                        self.processed_frames = [None] * 2
-                    if hasattr(self, 'frame_ready') and self.frame_ready is not None:
-                        self.frame_ready = [False] * 2
-                except Exception as e:
-                    print(f"   - Error limpiando buffers: {e}")
-                    self.processed_frames = [None] * 2
-                    self.frame_ready = [False] * 2
+            # Invalidar los frames del anillo (la memoria preasignada se reutiliza)
+            self.anillo.vaciar()
             
             # Cerrar cámara
             if self.handle:
                 try:
-                    pygigev.GevCloseCamera(self.handle)
+                    self.gev.GevCloseCamera(self.handle)
                 except:
                     pass
                 self.handle = None
             
             try:
-                pygigev.GevApiUninitialize()
+                self.gev.GevApiUninitialize()
             except:
                 pass
             
@@ -611,17 +790,17 @@ class CamaraTiempoOptimizada:
         """
         Pausa temporalmente la captura continua para permitir captura única
         """
-        with self.buffer_lock:
-            self.capture_paused = True
-            print("⏸️ Captura continua pausada temporalmente")
+        self.capture_paused = True
+        self.captura_reanudada.clear()
+        print("⏸️ Captura continua pausada temporalmente")
     
     def reanudar_captura_continua(self):
         """
         Reanuda la captura continua después de una pausa temporal
         """
-        with self.buffer_lock:
-            self.capture_paused = False
-            print("▶️ Captura continua reanudada")
+        self.capture_paused = False
+        self.captura_reanudada.set()
+        print("▶️ Captura continua reanudada")
 
     def mostrar_configuracion(self):
         """Muestra la configuración actual de la cámara."""
@@ -0,0 +1,384 @@
+"""
+Cámara GigE simulada con la misma API que pygigev.
+
+Implementa la parte de pygigev que usa CamaraTiempoOptimizada (búsqueda y
+apertura de la cámara, features, transferencia asíncrona con buffers y
+GevWaitForNextFrame), así que el controlador real se ejercita sin hardware:
+
+    camara = CamaraTiempoOptimizada(gev=GevSimulado())
+
+Genera frames Bayer (patrón BG, como la cámara de la línea) a partir de una
+escena sintética o reproduce un directorio de imágenes / un video. Soporta
+modo libre (AcquisitionFrameRate, con jitter y pérdida de frames
+reproducibles por semilla) y disparo por software (TriggerMode=On,
+TriggerSource=Software, TriggerSoftware).
+"""
+
+import ctypes
+import enum
+import os
+import queue
+import random
+import socket
+import threading
+import time
+from typing import Dict, List, Optional
+
+import cv2
+import numpy as np
+
+from analisis_coples.expo_config import CameraConfig
+
+# Códigos de retorno (GEVLIB_OK y errores usados por el controlador)
+GEVLIB_OK = 0
+GEVLIB_ERROR_TIME_OUT = -2004
+GEVLIB_ERROR_INVALID_HANDLE = -2001
+GEV_FRAME_STATUS_INCOMPLETE = 1  # status de un buffer con paquetes perdidos
+
+EXTENSIONES_IMAGEN = ('.png', '.bmp', '.tif', '.tiff', '.jpg', '.jpeg', '.npy')
+
+
+class GevPixelFormats(enum.Enum):
+    fmtBayerGR8 = 0x01080008
+    fmtBayerRG8 = 0x01080009
+    fmtBayerGB8 = 0x0108000A
+    fmtBayerBG8 = 0x0108000B
+
+
+class GEV_CAMERA_INFO(ctypes.Structure):
+    _fields_ = [
+        ('fIPv6', ctypes.c_uint32),
+        ('ipAddr', ctypes.c_uint32),
+        ('manufacturer', ctypes.c_char * 65),
+        ('model', ctypes.c_char * 65),
+        ('serial', ctypes.c_char * 65),
+    ]
+
+
+class GEV_BUFFER_OBJECT(ctypes.Structure):
+    _fields_ = [
+        ('payload_type', ctypes.c_uint32),
+        ('state', ctypes.c_uint32),
+        ('status', ctypes.c_int32),
+        ('timestamp_hi', ctypes.c_uint32),
+        ('timestamp_lo', ctypes.c_uint32),
+        ('timestamp', ctypes.c_uint64),
+        ('recv_size', ctypes.c_uint64),
+        ('id', ctypes.c_uint64),
+        ('h', ctypes.c_uint32),
+        ('w', ctypes.c_int32),
+        ('format', ctypes.c_int32),
+        ('address', ctypes.c_void_p),
+    ]
+
+
+def mosaico_bayer_bg(imagen_bgr: np.ndarray) -> np.ndarray:
+    """
+    Convierte una imagen BGR al mosaico Bayer que cv2.COLOR_BayerBG2BGR
+    reconstruye (R en píxeles par-par, B en impar-impar en la convención de OpenCV).
+    """
+    alto, ancho = imagen_bgr.shape[:2]
+    bayer = np.empty((alto, ancho), dtype=np.uint8)
+    bayer[0::2, 0::2] = imagen_bgr[0::2, 0::2, 2]  # R
+    bayer[0::2, 1::2] = imagen_bgr[0::2, 1::2, 1]  # G
+    bayer[1::2, 0::2] = imagen_bgr[1::2, 0::2, 1]  # G
+    bayer[1::2, 1::2] = imagen_bgr[1::2, 1::2, 0]  # B
+    return bayer
+
+
+def escena_sintetica(alto: int, ancho: int) -> np.ndarray:
+    """Escena BGR de prueba: fondo en degradado con un anillo tipo cople"""
+    x = np.linspace(40, 200, ancho, dtype=np.float32)
+    y = np.linspace(40, 200, alto, dtype=np.float32)[:, None]
+    fondo = ((x + y) / 2).astype(np.uint8)
+    escena = cv2.merge([fondo, fondo, fondo])
+    centro = (ancho // 2, alto // 2)
+    radio = min(alto, ancho) // 3
+    cv2.circle(escena, centro, radio, (60, 120, 200), thickness=max(4, radio // 4))
+    return escena
+
+
+def _a_bayer(imagen: np.ndarray, alto: int, ancho: int) -> np.ndarray:
+    """Ajusta una imagen (Bayer cruda o color) a un frame BayerBG de alto x ancho"""
+    if imagen.dtype != np.uint8:
+        imagen = cv2.normalize(imagen, None, 0, 255, cv2.NORM_MINMAX).astype(np.uint8)
+
+    if imagen.ndim == 2:
+        if imagen.shape == (alto, ancho):
+            return np.ascontiguousarray(imagen)
+        # Bayer de otro tamaño: recortar/escalar en color y volver a mosaico
+        imagen = cv2.cvtColor(imagen, cv2.COLOR_BayerBG2BGR)
+    elif imagen.shape[2] == 4:
+        imagen = imagen[:, :, :3]
+
+    alto_img, ancho_img = imagen.shape[:2]
+    if alto_img >= alto and ancho_img >= ancho:
+        y, x = (alto_img - alto) // 2, (ancho_img - ancho) // 2
+        imagen = imagen[y:y + alto, x:x + ancho]
+    else:
+        imagen = cv2.resize(imagen, (ancho, alto))
+    return mosaico_bayer_bg(imagen)
+
+
+def cargar_frames_bayer(fuente: str, alto: int, ancho: int, max_frames: int = 500) -> List[np.ndarray]:
+    """
+    Carga los frames a reproducir.
+
+    Args:
+        fuente: Directorio de imágenes (.png, .tif, .npy, ...; 2D = Bayer
+            cruda, 3 canales = BGR) o archivo de video
+        alto, ancho: Tamaño del ROI de la cámara
+        max_frames: Límite de frames en memoria
+
+    Returns:
+        Lista de frames BayerBG uint8
+    """
+    imagenes = []
+    if os.path.isdir(fuente):
+        rutas = sorted(
+            os.path.join(fuente, nombre) for nombre in os.listdir(fuente)
+            if nombre.lower().endswith(EXTENSIONES_IMAGEN)
+        )
+        for ruta in rutas[:max_frames]:
+            if ruta.endswith('.npy'):
+                imagen = np.load(ruta)
+            else:
+                imagen = cv2.imread(ruta, cv2.IMREAD_UNCHANGED)
+            if imagen is not None:
+                imagenes.append(imagen)
+    else:
+        video = cv2.VideoCapture(fuente)
+        try:
+            while len(imagenes) < max_frames:
+                ok, imagen = video.read()
+                if not ok:
+                    break
+                imagenes.append(imagen)
+        finally:
+            video.release()
+
+    if not imagenes:
+        raise ValueError(f"No hay frames que reproducir en {fuente}")
+    return [_a_bayer(imagen, alto, ancho) for imagen in imagenes]
+
+
+def _valor_ref(argumento):
+    """Objeto ctypes detrás de un ctypes.byref(...)"""
+    return getattr(argumento, '_obj', argumento)
+
+
+class GevSimulado:
+    """Sustituto de pygigev en proceso con una única cámara simulada"""
+
+    GevPixelFormats = GevPixelFormats
+    GEV_CAMERA_INFO = GEV_CAMERA_INFO
+    GEV_BUFFER_OBJECT = GEV_BUFFER_OBJECT
+    (GevMonitorMode, GevControlMode, GevExclusiveMode) = (0, 2, 4)
+    (Asynchronous, SynchronousNextEmpty) = (0, 1)
+
+    def __init__(
+        self,
+        ip: str = CameraConfig.DEFAULT_IP,
+        latencia_disparo: float = 0.0,
+        fuente: Optional[str] = None,
+        jitter: float = 0.0,
+        tasa_perdida: float = 0.0,
+        semilla: int = 0
+    ):
+        """
+        Args:
+            ip: IP que anuncia la cámara simulada
+            latencia_disparo: Segundos entre TriggerSoftware y el frame
+                (además del tiempo de exposición configurado)
+            fuente: Directorio de imágenes o video a reproducir en bucle
+                (None = escena sintética)
+            jitter: Variación máxima (± segundos) del periodo en modo libre
+            tasa_perdida: Fracción de frames entregados como incompletos
+            semilla: Semilla del jitter y las pérdidas (reproducible)
+        """
+        self.ip = ip
+        self.latencia_disparo = latencia_disparo
+        self.fuente = fuente
+        self.jitter = jitter
+        self.tasa_perdida = tasa_perdida
+        self._aleatorio = random.Random(semilla)
+
+        self.features: Dict[str, object] = {
+            'ExposureTime': float(CameraConfig.EXPOSURE_TIME),
+            'AcquisitionFrameRate': float(CameraConfig.FRAMERATE),
+            'Gain': float(CameraConfig.GAIN),
+            'Width': CameraConfig.ROI_WIDTH,
+            'Height': CameraConfig.ROI_HEIGHT,
+            'OffsetX': 0,
+            'OffsetY': 0,
+            'TriggerSelector': 'FrameStart',
+            'TriggerMode': 'Off',
+            'TriggerSource': 'Software',
+        }
+
+        self._abierta = False
+        self._buffers: List[int] = []
+        self._libres: 'queue.Queue[int]' = queue.Queue()
+        self._listos: 'queue.Queue[GEV_BUFFER_OBJECT]' = queue.Queue()
+        self._disparos = threading.Semaphore(0)
+        self._detener = threading.Event()
+        self._hilo: Optional[threading.Thread] = None
+        self._frames: List[np.ndarray] = []
+
+        self.frames_generados = 0
+        self.frames_perdidos = 0     # Entregados como incompletos (tasa_perdida)
+        self.frames_descartados = 0  # Sin buffer libre (el host no liberó a tiempo)
+
+    # ------------------------------------------------------------------
+    # API de pygigev
+    # ------------------------------------------------------------------
+
+    def GevApiInitialize(self):
+        return GEVLIB_OK
+
+    def GevApiUninitialize(self):
+        return GEVLIB_OK
+
+    def GevGetCameraList(self, camera_info, max_cameras, num_found):
+        camera_info[0].ipAddr = int.from_bytes(socket.inet_aton(self.ip), byteorder='big')
+        camera_info[0].model = b'Simulada'
+        _valor_ref(num_found).value = 1
+        return GEVLIB_OK
+
+    def GevOpenCamera(self, camera_info, mode, handle):
+        _valor_ref(handle).value = 1
+        self._abierta = True
+        return GEVLIB_OK
+
+    def GevCloseCamera(self, handle):
+        self.GevStopTransfer(handle)
+        self._abierta = False
+        return GEVLIB_OK
+
+    def GevSetFeatureValue(self, handle, nombre, size, valor):
+        nombre = nombre.decode()
+        if nombre == 'TriggerSoftware':
+            self._disparos.release()
+            return GEVLIB_OK
+        self.features[nombre] = _valor_ref(valor).value
+        return GEVLIB_OK
+
+    def GevSetFeatureValueAsString(self, handle, nombre, valor):
+        self.features[nombre.decode()] = valor.decode()
+        return GEVLIB_OK
+
+    def GevGetPayloadParameters(self, handle, payload_size, pixel_format):
+        _valor_ref(payload_size).value = self._ancho * self._alto
+        _valor_ref(pixel_format).value = GevPixelFormats.fmtBayerBG8.value
+        return GEVLIB_OK
+
+    def GevInitializeTransfer(self, handle, mode, payload_size, num_buffers, buffer_addresses):
+        self._buffers = [buffer_addresses[i] for i in range(num_buffers)]
+        self._libres = queue.Queue()
+        for direccion in self._buffers:
+            self._libres.put(direccion)
+        self._listos = queue.Queue()
+        if self.fuente:
+            self._frames = cargar_frames_bayer(self.fuente, self._alto, self._ancho)
+        else:
+            self._frames = [mosaico_bayer_bg(escena_sintetica(self._alto, self._ancho))]
+        return GEVLIB_OK
+
+    def GevStartTransfer(self, handle, num_frames):
+        if not self._abierta:
+            return GEVLIB_ERROR_INVALID_HANDLE
+        self._detener.clear()
+        self._hilo = threading.Thread(target=self._generar, name='GevSimulado', daemon=True)
+        self._hilo.start()
+        return GEVLIB_OK
+
+    def GevStopTransfer(self, handle):
+        self._detener.set()
+        self._disparos.release()  # Despertar al generador si espera un disparo
+        if self._hilo is not None and self._hilo is not threading.current_thread():
+            self._hilo.join(timeout=1.0)
+        self._hilo = None
+        return GEVLIB_OK
+
+    def GevWaitForNextFrame(self, handle, buffer_ptr, timeout_ms):
+        try:
+            buffer = self._listos.get(timeout=timeout_ms / 1000)
+        except queue.Empty:
+            return GEVLIB_ERROR_TIME_OUT
+        _valor_ref(buffer_ptr).contents = buffer
+        return GEVLIB_OK
+
+    def GevReleaseFrame(self, handle, buffer_ptr):
+        self._libres.put(buffer_ptr.contents.address)
+        return GEVLIB_OK
+
+    # ------------------------------------------------------------------
+    # Generación de frames
+    # ------------------------------------------------------------------
+
+    @property
+    def _ancho(self) -> int:
+        return int(self.features['Width'])
+
+    @property
+    def _alto(self) -> int:
+        return int(self.features['Height'])
+
+    @property
+    def modo_disparo(self) -> bool:
+        return self.features.get('TriggerMode') == 'On'
+
+    def _esperar_siguiente_frame(self, siguiente: float) -> float:
+        """Espera al próximo disparo o al siguiente periodo; devuelve el nuevo instante objetivo"""
+        if self.modo_disparo:
+            while not self._disparos.acquire(timeout=0.1):
+                if self._detener.is_set() or not self.modo_disparo:
+                    return time.monotonic()
+            if self._detener.is_set():
+                return siguiente
+            # El sensor expone después del disparo
+            time.sleep(self.latencia_disparo + float(self.features['ExposureTime']) / 1e6)
+            return time.monotonic()
+
+        periodo = 1.0 / max(float(self.features['AcquisitionFrameRate']), 0.1)
+        if self.jitter > 0:
+            periodo = max(0.0, periodo + self._aleatorio.uniform(-self.jitter, self.jitter))
+        siguiente += periodo
+        self._detener.wait(max(0.0, siguiente - time.monotonic()))
+        return max(siguiente, time.monotonic() - periodo)
+
+    def _generar(self) -> None:
+        siguiente = time.monotonic()
+        indice = 0
+        while not self._detener.is_set():
+            siguiente = self._esperar_siguiente_frame(siguiente)
+            if self._detener.is_set():
+                break
+            perdido = self.tasa_perdida > 0 and self._aleatorio.random() < self.tasa_perdida
+            self._entregar(self._frames[indice % len(self._frames)], perdido)
+            indice += 1
+
+    def _entregar(self, bayer: np.ndarray, perdido: bool = False) -> None:
+        """Copia un frame a un buffer libre y lo pone en la cola de listos"""
+        try:
+            direccion = self._libres.get_nowait()
+        except queue.Empty:
+            self.frames_descartados += 1
+            return
+
+        ctypes.memmove(direccion, bayer.ctypes.data, bayer.nbytes)
+        self.frames_generados += 1
+        if perdido:
+            self.frames_perdidos += 1
+
+        ahora_ns = time.time_ns()
+        buffer = GEV_BUFFER_OBJECT()
+        buffer.status = GEV_FRAME_STATUS_INCOMPLETE if perdido else 0
+        buffer.recv_size = bayer.nbytes
+        buffer.id = self.frames_generados
+        buffer.h, buffer.w = bayer.shape
+        buffer.format = GevPixelFormats.fmtBayerBG8.value
+        buffer.timestamp = ahora_ns
+        buffer.timestamp_hi, buffer.timestamp_lo = ahora_ns >> 32, ahora_ns & 0xFFFFFFFF
+        buffer.address = direccion
+        self._listos.put(buffer)
@@ -8,10 +8,12 @@ import numpy as np
 import time
 from typing import Optional, Tuple
 import threading
-from queue import Queue, Empty
 import logging
 
-class WebcamFallback:
+from .anillo_frames import AnilloFrames
+from .backend import BackendCaptura
+
+class WebcamFallback(BackendCaptura):
     """
     Controlador de webcam como fallback para la cámara GigE
     """
@@ -46,11 +48,11 @@ class WebcamFallback:
         self.inicializado = False
         self.capturando = False
         
-        # Thread de captura
+        # Thread de captura: los frames procesados se publican en un anillo
+        # con secuencia y timestamp (ver capturar_frame_posterior)
         self.capture_thread = None
-        self.frame_queue = Queue(maxsize=2)
-        self.latest_frame = None
-        self.frame_lock = threading.Lock()
+        self.anillo = AnilloFrames((height, width, 3))
+        self.periodo_frame = 1.0 / 30  # Se ajusta a los FPS reales al inicializar
         
         # Estadísticas
         self.total_frames_captured = 0
@@ -178,6 +180,9 @@ class WebcamFallback:
             # Configurar FPS
             self.cap.set(cv2.CAP_PROP_FPS, 30)
             
+            # Sin cola en el driver: el frame leído es el más reciente posible
+            self.cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)
+            
             # Configurar a la resolución máxima posible primero
             self.cap.set(cv2.CAP_PROP_FRAME_WIDTH, 1920)
             self.cap.set(cv2.CAP_PROP_FRAME_HEIGHT, 1080)
@@ -194,6 +199,8 @@ class WebcamFallback:
                 self.native_height = 480
                 
             actual_fps = self.cap.get(cv2.CAP_PROP_FPS)
+            if actual_fps > 0:
+                self.periodo_frame = 1.0 / actual_fps
             
             print(f"✅ Webcam configurada:")
             print(f"   📐 Resolución nativa: {self.native_width}x{self.native_height}")
@@ -251,26 +258,19 @@ class WebcamFallback:
         while self.capturando and self.cap is not None:
             try:
                 ret, frame = self.cap.read()
+                timestamp = time.time()
                 if ret and frame is not None:
                     # Procesar frame (recorte o redimensionado)
                     frame = self._procesar_frame(frame)
                     
-                    # Actualizar frame más reciente
-                    with self.frame_lock:
-                        self.latest_frame = frame.copy()
-                    
-                    # Agregar a cola (sin bloquear)
-                    try:
-                        self.frame_queue.put_nowait(frame.copy())
-                    except:
-                        # Cola llena, remover frame más antiguo
-                        try:
-                            self.frame_queue.get_nowait()
-                            self.frame_queue.put_nowait(frame.copy())
-                        except:
-                            pass
-                    
-                    self.total_frames_captured += 1
+                    # Publicar en el anillo (única copia del frame)
+                    slot = self.anillo.slot_escritura()
+                    if frame.shape == slot.shape:
+                        np.copyto(slot, frame)
+                        self.anillo.publicar(timestamp)
+                        self.total_frames_captured += 1
+                    else:
+                        self.anillo.descartar()
                 else:
                     time.sleep(0.01)  # Pequeña pausa si no hay frame
                     
@@ -290,15 +290,57 @@ class WebcamFallback:
             
         start_time = time.time()
         
-        with self.frame_lock:
-            if self.latest_frame is not None:
-                frame = self.latest_frame.copy()
-                tiempo_acceso = (time.time() - start_time) * 1000
-                timestamp = time.time()
-                return frame, tiempo_acceso, timestamp
+        leido = self.anillo.leer()
+        if leido is not None:
+            _, timestamp, frame = leido
+            frame = frame.copy()
+            tiempo_acceso = (time.time() - start_time) * 1000
+            return frame, tiempo_acceso, timestamp
         
         return None, 0, 0
     
+    def capturar_frame_posterior(
+        self,
+        no_antes_de: Optional[float] = None,
+        despues_de_seq: int = 0,
+        timeout: float = 2.0
+    ) -> Optional[Tuple[int, float, np.ndarray]]:
+        """
+        Captura el primer frame expuesto después de un evento.
+        
+        Arranca la captura continua si hace falta y espera por evento (sin
+        sondeo). El inicio de la exposición se estima como el momento de
+        lectura menos un periodo de frame.
+        
+        Args:
+            no_antes_de: time.time() del evento (None = sin restricción)
+            despues_de_seq: Secuencia mínima exclusiva (0 = cualquiera)
+            timeout: Segundos máximos de espera
+            
+        Returns:
+            tuple: (seq, timestamp, frame copiado) o None si vence el timeout
+        """
+        if not self.capturando and not self.iniciar_captura_continua():
+            return None
+        
+        limite = time.monotonic() + timeout
+        seq = despues_de_seq
+        while True:
+            restante = limite - time.monotonic()
+            if restante <= 0:
+                return None
+            leido = self.anillo.esperar_frame(seq, restante)
+            if leido is None:
+                return None
+            
+            seq, timestamp, frame = leido
+            if no_antes_de is not None and timestamp - self.periodo_frame < no_antes_de:
+                continue  # Expuesto antes del evento: esperar el siguiente
+            
+            frame = frame.copy()
+            if self.anillo.leer(seq) is not None:
+                return seq, timestamp, frame
+    
     def obtener_frame_sincrono(self) -> Tuple[Optional[np.ndarray], float, float]:
         """
         Obtiene un frame directamente (síncrono)
@@ -332,7 +374,11 @@ class WebcamFallback:
         Returns:
             np.ndarray: Frame capturado o None si hay error
         """
-        frame, _, _ = self.obtener_frame_sincrono()
+        # Con la captura continua activa el thread es el único que lee del dispositivo
+        if self.capturando:
+            frame, _, _ = self.obtener_frame_instantaneo()
+        else:
+            frame, _, _ = self.obtener_frame_sincrono()
         return frame
     
     def detener_captura_continua(self):
@@ -343,6 +389,14 @@ class WebcamFallback:
                 self.capture_thread.join(timeout=2.0)
             print("🛑 Captura continua detenida")
     
+    def detener_captura(self):
+        """Interfaz BackendCaptura"""
+        self.detener_captura_continua()
+    
+    def liberar(self):
+        """Interfaz BackendCaptura (CameraService libera la webcam con este nombre)"""
+        self.liberar_recursos()
+    
     def liberar_recursos(self):
         """Libera todos los recursos de la webcam"""
         self.detener_captura_continua()
@@ -351,12 +405,8 @@ class WebcamFallback:
             self.cap.release()
             self.cap = None
             
-        # Limpiar cola
-        while not self.frame_queue.empty():
-            try:
-                self.frame_queue.get_nowait()
-            except:
-                break
+        # Invalidar frames publicados
+        self.anillo.vaciar()
                 
         self.inicializado = False
         print("✅ Recursos de webcam liberados")
@@ -11,6 +11,7 @@ from typing import Tuple, Dict, Any, Optional
 
 # Importar configuración
 from analisis_coples.expo_config import ModelsConfig, GlobalConfig
+from analisis_coples.modules.onnx_session import crear_sesion_onnx
 
 
 class ClasificadorCoplesONNX:
@@ -107,18 +108,8 @@ class ClasificadorCoplesONNX:
                 print("❌ ONNX Runtime no disponible. Instala con: pip install onnxruntime")
                 return False
             
-            # Configurar sesión ONNX
-            providers = ModelsConfig.PROVIDERS
-            session_options = ort.SessionOptions()
-            session_options.intra_op_num_threads = ModelsConfig.INTRA_OP_THREADS
-            session_options.inter_op_num_threads = ModelsConfig.INTER_OP_THREADS
-            
-            # Crear sesión
-            self.session = ort.InferenceSession(
-                self.model_path, 
-                sess_options=session_options,
-                providers=providers
-            )
+            # Crear sesión (opciones de sesión del proceso)
+            self.session = crear_sesion_onnx(self.model_path, providers=ModelsConfig.PROVIDERS)
             
             # Obtener información del modelo
             self.input_name = self.session.get_inputs()[0].name
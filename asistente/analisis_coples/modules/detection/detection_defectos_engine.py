@@ -11,6 +11,7 @@ from typing import List, Dict, Tuple, Optional
 
 # Importar configuración
 from analisis_coples.expo_config import ModelsConfig, GlobalConfig
+from analisis_coples.modules.onnx_session import crear_sesion_onnx
 
 # Importar decodificador YOLOv11
 from .yolov11_decoder import YOLOv11Decoder
@@ -118,11 +119,8 @@ class DetectorDefectosCoples:
             if ort.get_device() == 'GPU':
                 providers = ['CUDAExecutionProvider'] + providers
             
-            # Crear sesión
-            self.session = ort.InferenceSession(
-                self.model_path, 
-                providers=providers
-            )
+            # Crear sesión (opciones de sesión del proceso)
+            self.session = crear_sesion_onnx(self.model_path, providers=providers)
             
             # Obtener información del modelo
             self.input_name = self.session.get_inputs()[0].name
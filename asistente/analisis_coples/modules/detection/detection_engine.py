@@ -4,7 +4,6 @@ Implementa detección de objetos usando modelos ONNX
 """
 
 import numpy as np
-import onnxruntime as ort
 import cv2
 from typing import List, Dict, Tuple, Optional
 import time
@@ -15,6 +14,7 @@ import sys
 sys.path.append(os.path.join(os.path.dirname(__file__), "..", ".."))
 
 from analisis_coples.expo_config import ModelsConfig, GlobalConfig
+from analisis_coples.modules.onnx_session import crear_sesion_onnx
 from .yolov11_decoder import YOLOv11Decoder
 
 
@@ -82,11 +82,8 @@ class DetectorCoplesONNX:
             # Configurar proveedores ONNX
             providers = ModelsConfig.PROVIDERS
             
-            # Crear sesión ONNX
-            self.session = ort.InferenceSession(
-                self.modelo_path,
-                providers=providers
-            )
+            # Crear sesión ONNX (opciones de sesión del proceso)
+            self.session = crear_sesion_onnx(self.modelo_path, providers=providers)
             
             # Obtener información del modelo
             self.input_name = self.session.get_inputs()[0].name
@@ -7,6 +7,10 @@ import numpy as np
 import cv2
 from typing import List, Tuple, Dict, Any
 
+from analisis_coples.modules.logging_config import obtener_logger
+
+log = obtener_logger(__name__)
+
 class YOLOv11Decoder:
     """
     Decodificador optimizado para modelos YOLOv11 ONNX
@@ -27,7 +31,10 @@ class YOLOv11Decoder:
         self.iou_threshold = iou_threshold
         self.max_det = max_det
         self.class_names = class_names or ["Cople"]  # Por defecto usa "Cople" si no se proporcionan clases
-        print(f"🎯 YOLOv11Decoder inicializado - Conf: {confianza_min}, IoU: {iou_threshold}, MaxDet: {max_det}, Clases: {self.class_names}")
+        log.debug(
+            '🎯 YOLOv11Decoder inicializado - Conf: %s, IoU: %s, MaxDet: %s, Clases: %s',
+            confianza_min, iou_threshold, max_det, self.class_names
+        )
     
     def decode_output(self, outputs: np.ndarray, imagen_shape: Tuple[int, int] = (640, 640)) -> List[Dict]:
         """
@@ -43,8 +50,7 @@ class YOLOv11Decoder:
             Lista de detecciones con formato estándar
         """
         try:
-            print(f"🔍 YOLOv11Decoder - Input shape: {outputs.shape}")
-            print(f"🔍 YOLOv11Decoder - Imagen shape: {imagen_shape}")
+            log.debug('🔍 YOLOv11Decoder - Input shape: %s, imagen shape: %s', outputs.shape, imagen_shape)
             
             # Verificar formato de salida
             if len(outputs.shape) != 3 or outputs.shape[1] != 5:
@@ -52,27 +58,29 @@ class YOLOv11Decoder:
             
             # Transponer para facilitar procesamiento: (1, 5, 8400) -> (8400, 5)
             predictions = outputs[0].transpose()  # Shape: (8400, 5)
-            print(f"🔍 YOLOv11Decoder - Predictions shape: {predictions.shape}")
             
             # Separar coordenadas y confianzas
             boxes = predictions[:, :4]  # [x_center, y_center, width, height]
             confidences = predictions[:, 4]  # Puntuaciones de confianza (logits)
             
-            print(f"🔍 YOLOv11Decoder - Boxes shape: {boxes.shape}")
-            print(f"🔍 YOLOv11Decoder - Confidences shape: {confidences.shape}")
-            print(f"🔍 YOLOv11Decoder - Rango confidences: [{np.min(confidences):.4f}, {np.max(confidences):.4f}]")
+            if log.depurando():
+                log.debug('🔍 YOLOv11Decoder - Rango confidences: [%.4f, %.4f]', np.min(confidences), np.max(confidences))
             
             # CRÍTICO: Aplicar sigmoid a las confianzas
             confidences_sigmoid = self._sigmoid(confidences)
-            print(f"🔍 YOLOv11Decoder - Rango confidences (sigmoid): [{np.min(confidences_sigmoid):.4f}, {np.max(confidences_sigmoid):.4f}]")
+            if log.depurando():
+                log.debug(
+                    '🔍 YOLOv11Decoder - Rango confidences (sigmoid): [%.4f, %.4f]',
+                    np.min(confidences_sigmoid), np.max(confidences_sigmoid)
+                )
             
             # Filtrar por confianza mínima (más estricto)
             valid_indices = confidences_sigmoid > self.confianza_min
             valid_count = np.sum(valid_indices)
-            print(f"🔍 YOLOv11Decoder - Detecciones válidas (conf > {self.confianza_min}): {valid_count}")
+            log.debug('🔍 YOLOv11Decoder - Detecciones válidas (conf > %s): %s', self.confianza_min, valid_count)
             
             if valid_count == 0:
-                print("⚠️ YOLOv11Decoder - No se encontraron detecciones con confianza suficiente")
+                log.debug('⚠️ YOLOv11Decoder - No se encontraron detecciones con confianza suficiente')
                 return []
             
             # Filtrar predicciones válidas
@@ -81,7 +89,6 @@ class YOLOv11Decoder:
             
             # Convertir de formato center_x, center_y, width, height a x1, y1, x2, y2
             boxes_xyxy = self._convert_to_xyxy(boxes_valid)
-            print(f"🔍 YOLOv11Decoder - Boxes XYXY shape: {boxes_xyxy.shape}")
             
             # Aplicar Non-Maximum Suppression con parámetros más agresivos
             indices = cv2.dnn.NMSBoxes(
@@ -91,7 +98,7 @@ class YOLOv11Decoder:
                 self.iou_threshold
             )
             
-            print(f"🔍 YOLOv11Decoder - NMS aplicado, índices válidos: {len(indices) if len(indices) > 0 else 0}")
+            log.debug('🔍 YOLOv11Decoder - NMS aplicado, índices válidos: %s', len(indices) if len(indices) > 0 else 0)
             
             detecciones = []
             
@@ -134,17 +141,23 @@ class YOLOv11Decoder:
                             }
                             
                             detecciones.append(detection)
-                            print(f"✅ YOLOv11Decoder - Detección {i+1}: {clase_nombre} - {confidence:.3f} - BBox: ({int(x1)},{int(y1)}) a ({int(x2)},{int(y2)}) - Área: {area}")
+                            log.debug(
+                                '✅ YOLOv11Decoder - Detección %s: %s - %.3f - BBox: (%.0f,%.0f) a (%.0f,%.0f) - Área: %s',
+                                i + 1, clase_nombre, confidence, x1, y1, x2, y2, area
+                            )
                         else:
-                            print(f"⚠️ YOLOv11Decoder - Detección {i+1} descartada por área insuficiente: {area}")
+                            log.debug('⚠️ YOLOv11Decoder - Detección %s descartada por área insuficiente: %s', i + 1, area)
                     else:
-                        print(f"⚠️ YOLOv11Decoder - Detección {i+1} descartada por coordenadas inválidas: ({x1:.1f},{y1:.1f}) a ({x2:.1f},{y2:.1f})")
+                        log.debug(
+                            '⚠️ YOLOv11Decoder - Detección %s descartada por coordenadas inválidas: (%.1f,%.1f) a (%.1f,%.1f)',
+                            i + 1, x1, y1, x2, y2
+                        )
             
-            print(f"🎯 YOLOv11Decoder - Total detecciones finales: {len(detecciones)}")
+            log.debug('🎯 YOLOv11Decoder - Total detecciones finales: %s', len(detecciones))
             return detecciones
             
         except Exception as e:
-            print(f"❌ YOLOv11Decoder - Error en decodificación: {e}")
+            log.error('❌ YOLOv11Decoder - Error en decodificación: %s', e, exc_info=True)
             return []
     
     def _sigmoid(self, x: np.ndarray) -> np.ndarray:
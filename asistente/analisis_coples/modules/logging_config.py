@@ -4,9 +4,16 @@ Configuración de logging para el sistema de análisis de coples
 """
 
 import logging
+import random
 import sys
+from contextlib import contextmanager
+from contextvars import ContextVar
 from typing import Optional
 
+# Traza: diagnóstico detallado (nivel DEBUG) de un análisis concreto, aunque el
+# nivel configurado sea INFO. Se activa por petición o por muestreo.
+_traza_activa: ContextVar[bool] = ContextVar('traza_activa', default=False)
+
 class SistemaLogging:
     """
     Sistema de logging centralizado para el proyecto
@@ -14,6 +21,7 @@ class SistemaLogging:
     
     _instancia = None
     _logger = None
+    tasa_muestreo_traza = 0.0
     
     def __new__(cls):
         if cls._instancia is None:
@@ -86,9 +94,83 @@ class SistemaLogging:
             for handler in self._logger.handlers:
                 handler.setLevel(niveles[nivel.upper()])
 
+    def configurar_traza(self, tasa_muestreo: float):
+        """Fracción (0-1) de análisis que se trazan sin haberlo pedido"""
+        SistemaLogging.tasa_muestreo_traza = max(0.0, min(1.0, float(tasa_muestreo)))
+    
+    def obtener(self, nombre: str) -> 'LoggerAnalisis':
+        """Logger con niveles y traza para un módulo (usar __name__)"""
+        return LoggerAnalisis(logging.getLogger(nombre))
+
+
+class LoggerAnalisis:
+    """
+    Fachada sobre logging.Logger para el camino caliente.
+    
+    Los mensajes usan formato perezoso con % (`log.debug("shape %s", x.shape)`):
+    si el nivel no está habilitado no se formatea nada. Los cálculos que solo
+    sirven para diagnóstico deben protegerse con `if log.depurando():`.
+    debug() también se emite, sin importar el nivel, dentro de una traza.
+    """
+    
+    __slots__ = ('_logger',)
+    
+    def __init__(self, logger: logging.Logger):
+        self._logger = logger
+    
+    def depurando(self) -> bool:
+        """True si los mensajes debug() se van a emitir"""
+        return _traza_activa.get() or self._logger.isEnabledFor(logging.DEBUG)
+    
+    def debug(self, mensaje: str, *args, **kwargs):
+        if self._logger.isEnabledFor(logging.DEBUG) or _traza_activa.get():
+            # _log no vuelve a comprobar el nivel del logger
+            self._logger._log(logging.DEBUG, mensaje, args, stacklevel=2, **kwargs)
+    
+    def info(self, mensaje: str, *args, **kwargs):
+        self._logger.info(mensaje, *args, stacklevel=2, **kwargs)
+    
+    def warning(self, mensaje: str, *args, **kwargs):
+        self._logger.warning(mensaje, *args, stacklevel=2, **kwargs)
+    
+    def error(self, mensaje: str, *args, **kwargs):
+        self._logger.error(mensaje, *args, stacklevel=2, **kwargs)
+    
+    def exception(self, mensaje: str, *args, **kwargs):
+        """Error con traceback (dentro de un except)"""
+        self._logger.error(mensaje, *args, exc_info=True, stacklevel=2, **kwargs)
+
+
+def traza_activa() -> bool:
+    return _traza_activa.get()
+
+
+@contextmanager
+def traza(solicitada: bool = False):
+    """
+    Activa la traza en el contexto actual si se pidió explícitamente o si el
+    análisis cae en la muestra (SistemaLogging.tasa_muestreo_traza).
+    
+    Yields:
+        True si la traza quedó activa
+    """
+    tasa = SistemaLogging.tasa_muestreo_traza
+    activa = bool(solicitada) or (tasa > 0 and random.random() < tasa)
+    token = _traza_activa.set(activa or _traza_activa.get())
+    try:
+        yield _traza_activa.get()
+    finally:
+        _traza_activa.reset(token)
+
+
 # Instancia global del logger
 logger = SistemaLogging()
 
+
+def obtener_logger(nombre: str) -> LoggerAnalisis:
+    """Logger del módulo `nombre` (usar __name__)"""
+    return logger.obtener(nombre)
+
 # Funciones de conveniencia
 def log_info(mensaje: str):
     """Log de información"""
@@ -117,3 +199,7 @@ def log_resultado(mensaje: str):
 def configurar_logging(nivel: str = 'INFO'):
     """Configura el nivel de logging global"""
     logger.configurar_nivel(nivel)
+
+def configurar_traza(tasa_muestreo: float):
+    """Configura la fracción de análisis trazados por muestreo"""
+    logger.configurar_traza(tasa_muestreo)
@@ -0,0 +1,282 @@
+"""
+Representación compacta de máscaras de segmentación.
+
+En lugar de un mapa float32 de 640x640 por instancia (1.6 MB), cada máscara
+guarda el desplazamiento de su bbox y el recorte binario (uint8 o empaquetado
+a bits con np.packbits). Área, bbox y contornos se calculan sobre el recorte
+una sola vez y se cachean; la máscara completa solo se reconstruye cuando un
+consumidor la pide explícitamente con to_dense().
+
+También admite codificación RLE estilo COCO (no comprimida, orden por
+columnas) para serializar o intercambiar máscaras.
+"""
+
+import cv2
+import numpy as np
+from typing import Dict, List, Optional, Sequence, Tuple, Union
+
+
+class MascaraCompacta:
+    """
+    Máscara binaria recortada a su bbox.
+
+    Atributos:
+        x1, y1: Desplazamiento del recorte dentro de la imagen
+        shape: (alto, ancho) de la imagen completa
+    """
+
+    __slots__ = ('x1', 'y1', 'shape', '_alto', '_ancho', '_datos',
+                 '_empaquetada', '_area', '_bbox', '_contornos')
+
+    def __init__(
+        self,
+        recorte: np.ndarray,
+        x1: int = 0,
+        y1: int = 0,
+        shape: Tuple[int, int] = (640, 640),
+        empaquetar: bool = False
+    ):
+        """
+        Args:
+            recorte: Máscara binaria (alto, ancho) de la región del bbox
+            x1, y1: Posición del recorte en la imagen completa
+            shape: (alto, ancho) de la imagen completa
+            empaquetar: Guardar el recorte empaquetado a 1 bit por píxel
+        """
+        recorte = np.asarray(recorte)
+        if recorte.dtype != np.uint8 or (recorte.size and recorte.max() > 1):
+            recorte = (recorte > 0.5).astype(np.uint8)
+
+        self.x1 = int(x1)
+        self.y1 = int(y1)
+        self.shape = (int(shape[0]), int(shape[1]))
+        self._alto, self._ancho = recorte.shape[:2]
+        self._empaquetada = empaquetar
+        self._datos = np.packbits(recorte, axis=None) if empaquetar else np.ascontiguousarray(recorte)
+        self._area: Optional[int] = None
+        self._bbox: Optional[Tuple[int, int, int, int]] = None
+        self._contornos: Optional[List[np.ndarray]] = None
+
+    # ------------------------------------------------------------------
+    # Construcción
+    # ------------------------------------------------------------------
+
+    @classmethod
+    def desde_densa(
+        cls,
+        mascara: np.ndarray,
+        umbral: float = 0.5,
+        empaquetar: bool = False,
+        origen: Tuple[int, int] = (0, 0),
+        shape: Optional[Tuple[int, int]] = None
+    ) -> 'MascaraCompacta':
+        """
+        Crea una máscara compacta ajustada a los píxeles activos.
+
+        Args:
+            mascara: Máscara (alto, ancho) float o uint8
+            umbral: Umbral de binarización (se ignora si ya es {0,1} uint8)
+            empaquetar: Guardar el recorte empaquetado a bits
+            origen: (x, y) de la esquina de `mascara` si es solo una región de la imagen
+            shape: (alto, ancho) de la imagen completa (por defecto el de `mascara`)
+        """
+        mascara = np.asarray(mascara)
+        if mascara.dtype == np.uint8 and (mascara.size == 0 or mascara.max() <= 1):
+            binaria = mascara
+        elif mascara.dtype == np.uint8:
+            binaria = (mascara > 127).astype(np.uint8)
+        else:
+            binaria = (mascara > umbral).astype(np.uint8)
+
+        shape = shape or binaria.shape[:2]
+        filas = np.flatnonzero(binaria.any(axis=1))
+        if len(filas) == 0:
+            return cls(np.zeros((0, 0), dtype=np.uint8), origen[0], origen[1], shape, empaquetar)
+
+        columnas = np.flatnonzero(binaria.any(axis=0))
+        y1, y2 = int(filas[0]), int(filas[-1]) + 1
+        x1, x2 = int(columnas[0]), int(columnas[-1]) + 1
+        return cls(binaria[y1:y2, x1:x2], origen[0] + x1, origen[1] + y1, shape, empaquetar)
+
+    @classmethod
+    def desde_rle(cls, rle: Dict, empaquetar: bool = False) -> 'MascaraCompacta':
+        """
+        Decodifica un RLE estilo COCO no comprimido ({'size': [h, w], 'counts': [...]}).
+        """
+        alto, ancho = (int(v) for v in rle['size'])
+        counts = np.asarray(rle['counts'], dtype=np.int64)
+        valores = np.zeros(len(counts), dtype=np.uint8)
+        valores[1::2] = 1  # COCO empieza siempre por una racha de ceros
+        plano = np.repeat(valores, counts)
+        densa = plano.reshape((ancho, alto)).T
+        return cls.desde_densa(densa, empaquetar=empaquetar)
+
+    # ------------------------------------------------------------------
+    # Acceso a los datos
+    # ------------------------------------------------------------------
+
+    @property
+    def recorte(self) -> np.ndarray:
+        """Recorte binario uint8 {0,1} de la región del bbox"""
+        if not self._empaquetada:
+            return self._datos
+        n = self._alto * self._ancho
+        return np.unpackbits(self._datos, count=n).reshape(self._alto, self._ancho)
+
+    @property
+    def region(self) -> Tuple[int, int, int, int]:
+        """Región almacenada (x1, y1, x2, y2) en coordenadas de imagen"""
+        return (self.x1, self.y1, self.x1 + self._ancho, self.y1 + self._alto)
+
+    @property
+    def nbytes(self) -> int:
+        """Memoria ocupada por los datos de la máscara"""
+        return int(self._datos.nbytes)
+
+    @property
+    def area(self) -> int:
+        """Número de píxeles activos"""
+        if self._area is None:
+            self._area = int(np.count_nonzero(self.recorte))
+        return self._area
+
+    @property
+    def bbox(self) -> Optional[Tuple[int, int, int, int]]:
+        """bbox ajustado a los píxeles activos (x1, y1, x2, y2), None si está vacía"""
+        if self._bbox is None:
+            recorte = self.recorte
+            filas = np.flatnonzero(recorte.any(axis=1)) if recorte.size else []
+            if len(filas) == 0:
+                return None
+            columnas = np.flatnonzero(recorte.any(axis=0))
+            self._bbox = (
+                self.x1 + int(columnas[0]), self.y1 + int(filas[0]),
+                self.x1 + int(columnas[-1]) + 1, self.y1 + int(filas[-1]) + 1
+            )
+        return self._bbox
+
+    @property
+    def contours(self) -> List[np.ndarray]:
+        """Contornos externos en coordenadas de imagen completa"""
+        if self._contornos is None:
+            recorte = self.recorte
+            if recorte.size == 0:
+                self._contornos = []
+            else:
+                contornos, _ = cv2.findContours(
+                    recorte, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE,
+                    offset=(self.x1, self.y1)
+                )
+                self._contornos = list(contornos)
+        return self._contornos
+
+    def en_region(self, region: Tuple[int, int, int, int]) -> np.ndarray:
+        """
+        Máscara uint8 {0,1} sobre una región (x1, y1, x2, y2) arbitraria de la imagen.
+
+        Permite comparar o combinar varias máscaras sin reconstruir la imagen completa.
+        """
+        rx1, ry1, rx2, ry2 = region
+        salida = np.zeros((max(0, ry2 - ry1), max(0, rx2 - rx1)), dtype=np.uint8)
+        x1, y1, x2, y2 = self.region
+        ix1, iy1 = max(x1, rx1), max(y1, ry1)
+        ix2, iy2 = min(x2, rx2), min(y2, ry2)
+        if ix2 > ix1 and iy2 > iy1:
+            salida[iy1 - ry1:iy2 - ry1, ix1 - rx1:ix2 - rx1] = \
+                self.recorte[iy1 - y1:iy2 - y1, ix1 - x1:ix2 - x1]
+        return salida
+
+    def to_dense(self, dtype=np.float32) -> np.ndarray:
+        """Reconstruye la máscara de imagen completa (alto, ancho)"""
+        densa = np.zeros(self.shape, dtype=dtype)
+        if self._alto and self._ancho:
+            x1, y1, x2, y2 = self.region
+            densa[y1:y2, x1:x2] = self.recorte
+        return densa
+
+    def __array__(self, dtype=None, copy=None):
+        return self.to_dense(dtype or np.float32)
+
+    def to_rle(self) -> Dict:
+        """
+        Codifica la máscara como RLE estilo COCO no comprimido.
+
+        Solo se materializan las columnas del bbox: las columnas exteriores
+        se añaden como rachas de ceros.
+        """
+        alto, ancho = self.shape
+        columnas = np.zeros((alto, self._ancho), dtype=np.uint8)
+        if self._alto and self._ancho:
+            columnas[self.y1:self.y1 + self._alto] = self.recorte
+        plano = columnas.ravel(order='F')
+
+        cambios = np.flatnonzero(np.diff(plano)) + 1
+        limites = np.concatenate(([0], cambios, [plano.size]))
+        counts = np.diff(limites).tolist()
+        if plano.size and plano[0] == 1:
+            counts.insert(0, 0)
+        elif not counts:
+            counts = [0]
+
+        # Columnas vacías a izquierda y derecha del recorte
+        ceros_izq = self.x1 * alto
+        ceros_der = (ancho - self.x1 - self._ancho) * alto
+        counts[0] += ceros_izq
+        if len(counts) % 2 == 1:
+            counts[-1] += ceros_der
+        elif ceros_der:
+            counts.append(ceros_der)
+
+        return {'size': [alto, ancho], 'counts': [int(c) for c in counts]}
+
+    def __repr__(self) -> str:
+        return (f"MascaraCompacta(region={self.region}, shape={self.shape}, "
+                f"area={self.area}, empaquetada={self._empaquetada})")
+
+
+MascaraEntrada = Union[MascaraCompacta, np.ndarray, Sequence]
+
+
+def como_compacta(mascara: MascaraEntrada, umbral: float = 0.5) -> Optional[MascaraCompacta]:
+    """
+    Normaliza una máscara (compacta, array denso o lista) a MascaraCompacta.
+
+    Returns:
+        MascaraCompacta o None si la entrada es None o no es 2D
+    """
+    if mascara is None:
+        return None
+    if isinstance(mascara, MascaraCompacta):
+        return mascara
+    densa = np.asarray(mascara)
+    if densa.ndim != 2:
+        return None
+    return MascaraCompacta.desde_densa(densa, umbral=umbral)
+
+
+def superponer_mascara(
+    imagen: np.ndarray,
+    mascara: MascaraEntrada,
+    color: Tuple[int, int, int],
+    alpha: float = 0.4
+) -> None:
+    """
+    Colorea la máscara sobre la imagen (in-place) mezclando solo la región del bbox.
+
+    Equivale a cv2.addWeighted(overlay, alpha, imagen, 1 - alpha) sobre la
+    imagen completa, ya que fuera de la máscara overlay e imagen coinciden.
+    """
+    compacta = como_compacta(mascara)
+    if compacta is None or compacta.area == 0:
+        return
+
+    x1, y1, x2, y2 = compacta.region
+    alto, ancho = imagen.shape[:2]
+    x2, y2 = min(x2, ancho), min(y2, alto)
+    if x2 <= x1 or y2 <= y1:
+        return
+
+    roi = imagen[y1:y2, x1:x2]
+    overlay = roi.copy()
+    overlay[compacta.recorte[:y2 - y1, :x2 - x1] > 0] = color
+    imagen[y1:y2, x1:x2] = cv2.addWeighted(overlay, alpha, roi, 1 - alpha, 0)
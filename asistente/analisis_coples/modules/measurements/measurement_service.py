@@ -11,9 +11,11 @@ Extrae características dimensionales de máscaras de segmentación:
 import cv2
 import numpy as np
 import math
-from typing import Dict, Optional, Tuple
+from typing import Dict, List, Optional, Sequence
 import logging
 
+from analisis_coples.modules.mascara_compacta import MascaraCompacta, MascaraEntrada
+
 logger = logging.getLogger(__name__)
 
 
@@ -41,14 +43,18 @@ class MeasurementService:
     
     def calcular_mediciones_completas(
         self,
-        mascara: np.ndarray,
+        mascara: MascaraEntrada,
         convertir_a_mm: bool = False
     ) -> Dict[str, float]:
         """
         Calcula todas las mediciones de una máscara de segmentación.
         
+        Los contornos se extraen una sola vez sobre el recorte del bbox y
+        todas las mediciones salen del contorno principal (son invariantes
+        a la traslación, así que no hace falta la imagen completa).
+        
         Args:
-            mascara: Máscara binaria (numpy array 2D con valores 0 o 255)
+            mascara: MascaraCompacta o máscara binaria (numpy array 2D con valores 0/1 o 0/255)
             convertir_a_mm: Si True, también calcula mediciones en mm
             
         Returns:
@@ -60,20 +66,16 @@ class MeasurementService:
         """
         try:
             # Validar máscara
-            if mascara is None or mascara.size == 0:
+            if mascara is None or (isinstance(mascara, np.ndarray) and mascara.size == 0):
                 logger.warning("Máscara vacía o None")
                 return self._mediciones_vacias()
             
-            # Asegurar que sea binaria
-            if mascara.dtype != np.uint8:
-                mascara = mascara.astype(np.uint8)
-            
-            # Binarizar si no lo está
-            if mascara.max() > 1:
-                _, mascara = cv2.threshold(mascara, 127, 255, cv2.THRESH_BINARY)
-            
-            # Calcular mediciones en píxeles
-            mediciones_px = self._calcular_mediciones_pixeles(mascara)
+            # Calcular mediciones en píxeles (sin píxeles activos: todo en 0)
+            roi = self._preparar_mascara(mascara)
+            if roi is not None:
+                mediciones_px = self._calcular_mediciones_pixeles(roi)
+            else:
+                mediciones_px = self._mediciones_vacias()
             
             # Si se solicita conversión a mm y hay factor disponible
             if convertir_a_mm and self.factor_conversion_px_mm:
@@ -86,34 +88,121 @@ class MeasurementService:
             logger.error(f"Error calculando mediciones: {e}")
             return self._mediciones_vacias()
     
+    def calcular_mediciones_lote(
+        self,
+        mascaras: Sequence[Optional[MascaraEntrada]],
+        convertir_a_mm: bool = False
+    ) -> List[Dict[str, float]]:
+        """
+        Calcula las mediciones de todas las segmentaciones de un análisis.
+        
+        Args:
+            mascaras: Máscaras en el orden de las segmentaciones (None si no tiene)
+            convertir_a_mm: Si True, también calcula mediciones en mm
+            
+        Returns:
+            Lista de dicts de mediciones alineada con `mascaras`
+            (dict vacío para las entradas sin máscara)
+        """
+        return [
+            self.calcular_mediciones_completas(mascara, convertir_a_mm) if mascara is not None else {}
+            for mascara in mascaras
+        ]
+    
+    def _preparar_mascara(self, mascara: Optional[MascaraEntrada]) -> Optional[np.ndarray]:
+        """
+        Reduce la máscara a un ROI binario uint8 ajustado a sus píxeles activos.
+        
+        Returns:
+            ROI binario o None si la máscara está vacía
+        """
+        if mascara is None:
+            return None
+        
+        if isinstance(mascara, MascaraCompacta):
+            roi = mascara.recorte
+        else:
+            roi = np.asarray(mascara)
+            
+            # Asegurar que sea binaria
+            if roi.dtype != np.uint8:
+                roi = roi.astype(np.uint8)
+            
+            # Binarizar si no lo está
+            if roi.size and roi.max() > 1:
+                _, roi = cv2.threshold(roi, 127, 255, cv2.THRESH_BINARY)
+            
+            # Recortar al bbox de los píxeles activos
+            if roi.ndim == 2 and roi.size:
+                x, y, w, h = cv2.boundingRect(roi)
+                roi = roi[y:y + h, x:x + w]
+        
+        if roi.ndim != 2 or roi.size == 0:
+            return None
+        return roi
+    
+    def _contorno_principal(self, roi: np.ndarray) -> Optional[np.ndarray]:
+        """
+        Extrae los contornos externos una sola vez y devuelve el de mayor área.
+        
+        Args:
+            roi: Máscara binaria
+            
+        Returns:
+            Contorno principal o None si no hay contornos
+        """
+        if roi is None:
+            return None
+        
+        contours, _ = cv2.findContours(
+            np.ascontiguousarray(roi),
+            cv2.RETR_EXTERNAL,
+            cv2.CHAIN_APPROX_SIMPLE
+        )
+        
+        if not contours:
+            return None
+        if len(contours) == 1:
+            return contours[0]
+        return max(contours, key=cv2.contourArea)
+    
     def _calcular_mediciones_pixeles(self, mascara: np.ndarray) -> Dict[str, float]:
         """
-        Calcula todas las mediciones en píxeles.
+        Calcula todas las mediciones en píxeles a partir de un único contorno.
         
         Args:
-            mascara: Máscara binaria
+            mascara: Máscara binaria (ROI)
             
         Returns:
             Dict con mediciones en píxeles
         """
-        mediciones = {}
+        try:
+            contorno = self._contorno_principal(mascara)
+        except Exception as e:
+            logger.error(f"Error extrayendo contornos: {e}")
+            return self._mediciones_vacias()
         
-        # 1. Calcular bounding box
-        bbox = self._calcular_bounding_box(mascara)
-        mediciones['ancho_bbox_px'] = bbox['ancho']
-        mediciones['alto_bbox_px'] = bbox['alto']
+        if contorno is None:
+            return self._mediciones_vacias()
+        
+        # 1. Bounding box
+        _, _, w, h = cv2.boundingRect(contorno)
         
-        # 2. Calcular propiedades de máscara
-        props = self._calcular_propiedades_mascara(mascara)
-        mediciones['area_mascara_px'] = props['area']
-        mediciones['perimetro_mascara_px'] = props['perimetro']
+        # 2. Propiedades de máscara
+        area = cv2.contourArea(contorno)
+        perimetro = cv2.arcLength(contorno, closed=True)
         
-        # 3. Calcular propiedades geométricas avanzadas
-        geo = self._calcular_geometria_avanzada(mascara)
-        mediciones['excentricidad'] = geo['excentricidad']
-        mediciones['orientacion_grados'] = geo['orientacion_grados']
+        # 3. Propiedades geométricas avanzadas (momentos del mismo contorno)
+        geo = self._geometria_desde_momentos(cv2.moments(contorno))
         
-        return mediciones
+        return {
+            'ancho_bbox_px': float(w),
+            'alto_bbox_px': float(h),
+            'area_mascara_px': float(area),
+            'perimetro_mascara_px': float(perimetro),
+            'excentricidad': geo['excentricidad'],
+            'orientacion_grados': geo['orientacion_grados'],
+        }
     
     def _calcular_bounding_box(self, mascara: np.ndarray) -> Dict[str, float]:
         """
@@ -126,21 +215,12 @@ class MeasurementService:
             Dict con ancho y alto del bounding box
         """
         try:
-            # Encontrar contornos
-            contours, _ = cv2.findContours(
-                mascara,
-                cv2.RETR_EXTERNAL,
-                cv2.CHAIN_APPROX_SIMPLE
-            )
-            
-            if not contours:
+            contorno = self._contorno_principal(mascara)
+            if contorno is None:
                 return {'ancho': 0.0, 'alto': 0.0}
             
-            # Obtener el contorno más grande
-            contorno_principal = max(contours, key=cv2.contourArea)
-            
             # Calcular bounding box
-            x, y, w, h = cv2.boundingRect(contorno_principal)
+            x, y, w, h = cv2.boundingRect(contorno)
             
             return {
                 'ancho': float(w),
@@ -164,59 +244,30 @@ class MeasurementService:
             Dict con área y perímetro
         """
         try:
-            # Encontrar contornos
-            contours, _ = cv2.findContours(
-                mascara,
-                cv2.RETR_EXTERNAL,
-                cv2.CHAIN_APPROX_SIMPLE
-            )
-            
-            if not contours:
+            contorno = self._contorno_principal(mascara)
+            if contorno is None:
                 return {'area': 0.0, 'perimetro': 0.0}
             
-            # Obtener el contorno más grande
-            contorno_principal = max(contours, key=cv2.contourArea)
-            
-            # Calcular área y perímetro
-            area = cv2.contourArea(contorno_principal)
-            perimetro = cv2.arcLength(contorno_principal, closed=True)
-            
             return {
-                'area': float(area),
-                'perimetro': float(perimetro)
+                'area': float(cv2.contourArea(contorno)),
+                'perimetro': float(cv2.arcLength(contorno, closed=True))
             }
             
         except Exception as e:
             logger.error(f"Error calculando propiedades de máscara: {e}")
             return {'area': 0.0, 'perimetro': 0.0}
     
-    def _calcular_geometria_avanzada(self, mascara: np.ndarray) -> Dict[str, float]:
+    def _geometria_desde_momentos(self, momentos: Dict[str, float]) -> Dict[str, float]:
         """
-        Calcula propiedades geométricas avanzadas usando momentos de imagen.
+        Calcula excentricidad y orientación a partir de los momentos de un contorno.
         
         Args:
-            mascara: Máscara binaria
+            momentos: Resultado de cv2.moments
             
         Returns:
             Dict con excentricidad y orientación
         """
         try:
-            # Encontrar contornos
-            contours, _ = cv2.findContours(
-                mascara,
-                cv2.RETR_EXTERNAL,
-                cv2.CHAIN_APPROX_SIMPLE
-            )
-            
-            if not contours:
-                return {'excentricidad': 0.0, 'orientacion_grados': 0.0}
-            
-            # Obtener el contorno más grande
-            contorno_principal = max(contours, key=cv2.contourArea)
-            
-            # Calcular momentos
-            momentos = cv2.moments(contorno_principal)
-            
             if momentos['m00'] == 0:  # Evitar división por cero
                 return {'excentricidad': 0.0, 'orientacion_grados': 0.0}
             
@@ -263,6 +314,26 @@ class MeasurementService:
             logger.error(f"Error calculando geometría avanzada: {e}")
             return {'excentricidad': 0.0, 'orientacion_grados': 0.0}
     
+    def _calcular_geometria_avanzada(self, mascara: np.ndarray) -> Dict[str, float]:
+        """
+        Calcula propiedades geométricas avanzadas usando momentos de imagen.
+        
+        Args:
+            mascara: Máscara binaria
+            
+        Returns:
+            Dict con excentricidad y orientación
+        """
+        try:
+            contorno = self._contorno_principal(mascara)
+            if contorno is None:
+                return {'excentricidad': 0.0, 'orientacion_grados': 0.0}
+            return self._geometria_desde_momentos(cv2.moments(contorno))
+            
+        except Exception as e:
+            logger.error(f"Error calculando geometría avanzada: {e}")
+            return {'excentricidad': 0.0, 'orientacion_grados': 0.0}
+    
     def _convertir_a_milimetros(self, mediciones_px: Dict[str, float]) -> Dict[str, float]:
         """
         Convierte mediciones de píxeles a milímetros.
@@ -308,7 +379,7 @@ class MeasurementService:
             'orientacion_grados': 0.0,
         }
     
-    def calcular_ancho_mascara(self, mascara: np.ndarray) -> float:
+    def calcular_ancho_mascara(self, mascara: MascaraEntrada) -> float:
         """
         Calcula el ancho de la máscara (bounding box).
         
@@ -318,10 +389,10 @@ class MeasurementService:
         Returns:
             Ancho en píxeles
         """
-        bbox = self._calcular_bounding_box(mascara)
+        bbox = self._calcular_bounding_box(self._preparar_mascara(mascara))
         return bbox['ancho']
     
-    def calcular_alto_mascara(self, mascara: np.ndarray) -> float:
+    def calcular_alto_mascara(self, mascara: MascaraEntrada) -> float:
         """
         Calcula el alto de la máscara (bounding box).
         
@@ -331,10 +402,10 @@ class MeasurementService:
         Returns:
             Alto en píxeles
         """
-        bbox = self._calcular_bounding_box(mascara)
+        bbox = self._calcular_bounding_box(self._preparar_mascara(mascara))
         return bbox['alto']
     
-    def calcular_area_mascara(self, mascara: np.ndarray) -> float:
+    def calcular_area_mascara(self, mascara: MascaraEntrada) -> float:
         """
         Calcula el área de la máscara.
         
@@ -344,10 +415,10 @@ class MeasurementService:
         Returns:
             Área en píxeles cuadrados
         """
-        props = self._calcular_propiedades_mascara(mascara)
+        props = self._calcular_propiedades_mascara(self._preparar_mascara(mascara))
         return props['area']
     
-    def calcular_perimetro_mascara(self, mascara: np.ndarray) -> float:
+    def calcular_perimetro_mascara(self, mascara: MascaraEntrada) -> float:
         """
         Calcula el perímetro de la máscara.
         
@@ -357,7 +428,7 @@ class MeasurementService:
         Returns:
             Perímetro en píxeles
         """
-        props = self._calcular_propiedades_mascara(mascara)
+        props = self._calcular_propiedades_mascara(self._preparar_mascara(mascara))
         return props['perimetro']
 
 
@@ -9,6 +9,9 @@ from datetime import datetime
 from typing import Dict, List, Any, Optional
 import numpy as np
 
+from analisis_coples.modules.mascara_compacta import MascaraCompacta
+
+
 class MetadataStandard:
     """
     Clase para crear metadatos estandarizados para todos los tipos de análisis
@@ -244,7 +247,16 @@ class MetadataStandard:
                 # Información de la máscara si está disponible
                 if "mascara" in segmentacion and segmentacion["mascara"] is not None:
                     mascara = segmentacion["mascara"]
-                    if isinstance(mascara, np.ndarray):
+                    if isinstance(mascara, MascaraCompacta):
+                        # Sin reconstruir la máscara completa: área y región ya están en el recorte
+                        entrada["info_mascara"] = {
+                            "shape": list(mascara.shape),
+                            "tipo": "compacta",
+                            "region": list(mascara.region),
+                            "rango": [0.0, 1.0 if mascara.area > 0 else 0.0],
+                            "pixels_activos": mascara.area
+                        }
+                    elif isinstance(mascara, np.ndarray):
                         entrada["info_mascara"] = {
                             "shape": list(mascara.shape),
                             "tipo": str(mascara.dtype),
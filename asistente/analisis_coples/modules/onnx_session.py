@@ -0,0 +1,176 @@
+"""
+Fábrica de sesiones ONNX Runtime compartida por todos los motores
+(segmentación, detección y clasificación).
+
+Aplica de forma uniforme hilos, nivel de optimización del grafo, modo de
+ejecución, arena de memoria y caché de modelos optimizados. Las opciones
+del proceso se toman de ModelsConfig y pueden sobrescribirse desde la
+ConfiguracionSistema activa.
+"""
+
+import hashlib
+import os
+import threading
+from typing import Any, Dict, List, Optional
+
+from analisis_coples.expo_config import ModelsConfig
+
+
+NIVELES_OPTIMIZACION = ('deshabilitado', 'basico', 'extendido', 'todo')
+MODOS_EJECUCION = ('secuencial', 'paralelo')
+
+_opciones_proceso: Optional[Dict[str, Any]] = None
+_opciones_lock = threading.Lock()
+
+
+def opciones_por_defecto() -> Dict[str, Any]:
+    """Opciones de sesión definidas en ModelsConfig"""
+    return {
+        'intra_op_threads': ModelsConfig.INTRA_OP_THREADS,
+        'inter_op_threads': ModelsConfig.INTER_OP_THREADS,
+        'nivel_optimizacion': ModelsConfig.GRAPH_OPTIMIZATION,
+        'modo_ejecucion': ModelsConfig.EXECUTION_MODE,
+        'arena_memoria': ModelsConfig.ENABLE_CPU_MEM_ARENA,
+        'patron_memoria': ModelsConfig.ENABLE_MEM_PATTERN,
+        'directorio_optimizados': ModelsConfig.OPTIMIZED_MODELS_DIR,
+    }
+
+
+def obtener_opciones_sesion() -> Dict[str, Any]:
+    """Opciones de sesión vigentes en el proceso"""
+    with _opciones_lock:
+        if _opciones_proceso is None:
+            return opciones_por_defecto()
+        return dict(_opciones_proceso)
+
+
+def establecer_opciones_sesion(opciones: Optional[Dict[str, Any]]) -> bool:
+    """
+    Define las opciones de sesión del proceso.
+
+    Las claves ausentes o en None toman el valor de ModelsConfig. Solo
+    afecta a las sesiones creadas a partir de este momento.
+
+    Args:
+        opciones: Dict parcial de opciones (None restablece los valores por defecto)
+
+    Returns:
+        True si las opciones cambiaron
+    """
+    global _opciones_proceso
+
+    nuevas = opciones_por_defecto()
+    for clave, valor in (opciones or {}).items():
+        if clave in nuevas and valor is not None:
+            nuevas[clave] = valor
+
+    with _opciones_lock:
+        anteriores = _opciones_proceso if _opciones_proceso is not None else opciones_por_defecto()
+        _opciones_proceso = nuevas
+        return nuevas != anteriores
+
+
+def construir_session_options(opciones: Optional[Dict[str, Any]] = None):
+    """
+    Construye un ort.SessionOptions a partir de las opciones.
+
+    Args:
+        opciones: Opciones de sesión (por defecto las del proceso)
+
+    Returns:
+        ort.SessionOptions configurado
+    """
+    import onnxruntime as ort
+
+    opciones = opciones or obtener_opciones_sesion()
+
+    niveles = {
+        'deshabilitado': ort.GraphOptimizationLevel.ORT_DISABLE_ALL,
+        'basico': ort.GraphOptimizationLevel.ORT_ENABLE_BASIC,
+        'extendido': ort.GraphOptimizationLevel.ORT_ENABLE_EXTENDED,
+        'todo': ort.GraphOptimizationLevel.ORT_ENABLE_ALL,
+    }
+    modos = {
+        'secuencial': ort.ExecutionMode.ORT_SEQUENTIAL,
+        'paralelo': ort.ExecutionMode.ORT_PARALLEL,
+    }
+
+    session_options = ort.SessionOptions()
+    session_options.intra_op_num_threads = int(opciones['intra_op_threads'])
+    session_options.inter_op_num_threads = int(opciones['inter_op_threads'])
+    session_options.graph_optimization_level = niveles.get(
+        opciones['nivel_optimizacion'], ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+    )
+    session_options.execution_mode = modos.get(
+        opciones['modo_ejecucion'], ort.ExecutionMode.ORT_SEQUENTIAL
+    )
+    session_options.enable_cpu_mem_arena = bool(opciones['arena_memoria'])
+    session_options.enable_mem_pattern = bool(opciones['patron_memoria'])
+    return session_options
+
+
+def ruta_modelo_optimizado(model_path: str, opciones: Dict[str, Any]) -> Optional[str]:
+    """
+    Ruta del modelo optimizado en caché para un modelo y nivel de optimización.
+
+    El nombre incluye una huella de la ruta absoluta, el tamaño y la fecha de
+    modificación del original: si el modelo se reemplaza (aunque conserve el
+    nombre o una fecha anterior) la ruta cambia y se vuelve a optimizar.
+
+    Returns:
+        Ruta del archivo o None si la caché está desactivada o el modelo no existe
+    """
+    directorio = opciones.get('directorio_optimizados')
+    if not directorio:
+        return None
+    try:
+        estado = os.stat(model_path)
+    except OSError:
+        return None
+    huella = hashlib.sha1(
+        f'{os.path.abspath(model_path)}:{estado.st_size}:{estado.st_mtime_ns}'.encode('utf-8')
+    ).hexdigest()[:12]
+    nombre = os.path.splitext(os.path.basename(model_path))[0]
+    return os.path.join(directorio, f"{nombre}.{opciones['nivel_optimizacion']}.{huella}.opt.onnx")
+
+
+def crear_sesion_onnx(
+    model_path: str,
+    providers: Optional[List[str]] = None,
+    opciones: Optional[Dict[str, Any]] = None
+):
+    """
+    Crea una sesión de inferencia con las opciones del proceso.
+
+    Si hay directorio de modelos optimizados, la primera carga guarda el
+    grafo optimizado y las siguientes lo cargan directamente sin volver a
+    optimizar (mientras el modelo original no cambie, ver ruta_modelo_optimizado).
+    Con nivel 'todo' el grafo guardado puede ser específico del hardware,
+    así que la caché debe ser local a cada equipo.
+
+    Args:
+        model_path: Ruta al modelo ONNX
+        providers: Proveedores de ejecución (por defecto ModelsConfig.PROVIDERS)
+        opciones: Opciones de sesión (por defecto las del proceso)
+
+    Returns:
+        ort.InferenceSession
+    """
+    import onnxruntime as ort
+
+    opciones = opciones or obtener_opciones_sesion()
+    providers = providers or ModelsConfig.PROVIDERS
+    session_options = construir_session_options(opciones)
+
+    ruta_cargar = model_path
+    ruta_optimizado = ruta_modelo_optimizado(model_path, opciones)
+    if ruta_optimizado:
+        if os.path.exists(ruta_optimizado):
+            # Ya optimizado: evitar repetir las pasadas de optimización
+            ruta_cargar = ruta_optimizado
+            session_options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_DISABLE_ALL
+        else:
+            os.makedirs(os.path.dirname(ruta_optimizado), exist_ok=True)
+            session_options.optimized_model_filepath = ruta_optimizado
+
+    return ort.InferenceSession(ruta_cargar, sess_options=session_options, providers=providers)
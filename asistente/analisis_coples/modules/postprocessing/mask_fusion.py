@@ -6,7 +6,11 @@ Sistema de fusión de máscaras para objetos pegados
 import cv2
 import numpy as np
 from typing import List, Dict, Tuple, Optional
-import logging
+
+from analisis_coples.modules.logging_config import obtener_logger
+from analisis_coples.modules.mascara_compacta import MascaraCompacta, como_compacta
+
+log = obtener_logger(__name__)
 
 class FusionadorMascaras:
     """
@@ -14,8 +18,6 @@ class FusionadorMascaras:
     """
     
     def __init__(self):
-        self.logger = logging.getLogger(__name__)
-        
         # Parámetros de fusión
         self.distancia_maxima = 50  # píxeles - distancia máxima para considerar objetos "pegados"
         self.overlap_minimo = 0.1   # 10% de overlap mínimo para fusionar
@@ -24,12 +26,12 @@ class FusionadorMascaras:
         # Parámetros de análisis de conectividad
         self.kernel_conectividad = cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (5, 5))
         
-    def analizar_conectividad_mascaras(self, mascaras: List[np.ndarray]) -> List[Dict]:
+    def analizar_conectividad_mascaras(self, mascaras: List[MascaraCompacta]) -> List[Dict]:
         """
         Analiza la conectividad entre máscaras para detectar objetos pegados
         
         Args:
-            mascaras: Lista de máscaras (arrays numpy)
+            mascaras: Lista de máscaras (MascaraCompacta o arrays numpy)
             
         Returns:
             Lista de diccionarios con información de conectividad
@@ -38,12 +40,12 @@ class FusionadorMascaras:
             resultados = []
             
             for i, mascara in enumerate(mascaras):
-                # Encontrar contornos
-                contornos, _ = cv2.findContours(
-                    mascara.astype(np.uint8), 
-                    cv2.RETR_EXTERNAL, 
-                    cv2.CHAIN_APPROX_SIMPLE
-                )
+                mascara = como_compacta(mascara)
+                if mascara is None:
+                    continue
+                
+                # Contornos en coordenadas de imagen (calculados sobre el recorte)
+                contornos = mascara.contours
                 
                 if len(contornos) == 0:
                     continue
@@ -84,7 +86,7 @@ class FusionadorMascaras:
             return resultados
             
         except Exception as e:
-            self.logger.error(f"Error analizando conectividad: {e}")
+            log.error('Error analizando conectividad: %s', e)
             return []
     
     def calcular_distancia_entre_mascaras(self, mascara1_info: Dict, mascara2_info: Dict) -> float:
@@ -124,13 +126,15 @@ class FusionadorMascaras:
             return min(distancia_centroides, distancia_bbox)
             
         except Exception as e:
-            self.logger.error(f"Error calculando distancia: {e}")
+            log.error('Error calculando distancia: %s', e)
             return float('inf')
     
-    def calcular_overlap_mascaras(self, mascara1: np.ndarray, mascara2: np.ndarray) -> float:
+    def calcular_overlap_mascaras(self, mascara1: MascaraCompacta, mascara2: MascaraCompacta) -> float:
         """
         Calcula el porcentaje de overlap entre dos máscaras
         
+        Solo se compara la región que cubre ambos recortes.
+        
         Args:
             mascara1: Primera máscara
             mascara2: Segunda máscara
@@ -139,13 +143,16 @@ class FusionadorMascaras:
             Porcentaje de overlap (0.0 a 1.0)
         """
         try:
+            mascara1, mascara2 = como_compacta(mascara1), como_compacta(mascara2)
+            region = self._region_comun(mascara1, mascara2)
+            binaria1 = mascara1.en_region(region)
+            binaria2 = mascara2.en_region(region)
+            
             # Calcular intersección
-            interseccion = np.logical_and(mascara1 > 0.5, mascara2 > 0.5)
-            area_interseccion = np.sum(interseccion)
+            area_interseccion = np.count_nonzero(binaria1 & binaria2)
             
             # Calcular unión
-            union = np.logical_or(mascara1 > 0.5, mascara2 > 0.5)
-            area_union = np.sum(union)
+            area_union = np.count_nonzero(binaria1 | binaria2)
             
             # Calcular overlap como intersección / unión
             if area_union > 0:
@@ -154,10 +161,10 @@ class FusionadorMascaras:
                 return 0.0
                 
         except Exception as e:
-            self.logger.error(f"Error calculando overlap: {e}")
+            log.error('Error calculando overlap: %s', e)
             return 0.0
     
-    def fusionar_mascaras(self, mascara1: np.ndarray, mascara2: np.ndarray) -> np.ndarray:
+    def fusionar_mascaras(self, mascara1: MascaraCompacta, mascara2: MascaraCompacta) -> MascaraCompacta:
         """
         Fusiona dos máscaras en una sola
         
@@ -169,19 +176,38 @@ class FusionadorMascaras:
             Máscara fusionada
         """
         try:
+            mascara1, mascara2 = como_compacta(mascara1), como_compacta(mascara2)
+            
+            # Región común con margen para que el cierre morfológico no dependa del borde
+            region = self._region_comun(mascara1, mascara2, margen=2)
+            
             # Combinar máscaras usando OR lógico
-            mascara_fusionada = np.logical_or(mascara1 > 0.5, mascara2 > 0.5).astype(np.float32)
+            mascara_fusionada = mascara1.en_region(region) | mascara2.en_region(region)
             
             # Aplicar operaciones morfológicas para suavizar
             kernel = cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (3, 3))
             mascara_fusionada = cv2.morphologyEx(mascara_fusionada, cv2.MORPH_CLOSE, kernel, iterations=1)
             
-            return mascara_fusionada
+            return MascaraCompacta.desde_densa(
+                mascara_fusionada, origen=(region[0], region[1]), shape=mascara1.shape
+            )
             
         except Exception as e:
-            self.logger.error(f"Error fusionando máscaras: {e}")
+            log.error('Error fusionando máscaras: %s', e)
             return mascara1  # Retornar la primera máscara como fallback
     
+    @staticmethod
+    def _region_comun(mascara1: MascaraCompacta, mascara2: MascaraCompacta,
+                      margen: int = 0) -> Tuple[int, int, int, int]:
+        """Región (x1, y1, x2, y2) que contiene ambos recortes, con margen opcional"""
+        ax1, ay1, ax2, ay2 = mascara1.region
+        bx1, by1, bx2, by2 = mascara2.region
+        alto, ancho = mascara1.shape
+        return (
+            max(0, min(ax1, bx1) - margen), max(0, min(ay1, by1) - margen),
+            min(ancho, max(ax2, bx2) + margen), min(alto, max(ay2, by2) + margen)
+        )
+    
     def detectar_objetos_pegados(self, mascaras_info: List[Dict]) -> List[List[int]]:
         """
         Detecta grupos de máscaras que representan objetos pegados
@@ -228,8 +254,10 @@ class FusionadorMascaras:
                     if objetos_pegados:
                         grupo_actual.append(j)
                         mascaras_procesadas.add(j)
-                        print(f"   🔗 Objetos pegados detectados: {i} y {j}")
-                        print(f"      Distancia: {distancia:.1f}px, Overlap: {overlap:.2%}")
+                        log.debug(
+                            '   🔗 Objetos pegados detectados: %s y %s (distancia: %.1fpx, overlap: %.2f%%)',
+                            i, j, distancia, overlap * 100
+                        )
                 
                 # Si el grupo tiene más de una máscara, agregarlo a la lista
                 if len(grupo_actual) > 1:
@@ -238,7 +266,7 @@ class FusionadorMascaras:
             return grupos_fusion
             
         except Exception as e:
-            self.logger.error(f"Error detectando objetos pegados: {e}")
+            log.error('Error detectando objetos pegados: %s', e)
             return []
     
     def procesar_segmentaciones(self, segmentaciones: List[Dict]) -> List[Dict]:
@@ -255,7 +283,7 @@ class FusionadorMascaras:
             if len(segmentaciones) <= 1:
                 return segmentaciones
             
-            print(f"🔍 Analizando {len(segmentaciones)} segmentaciones para objetos pegados...")
+            log.debug('🔍 Analizando %s segmentaciones para objetos pegados...', len(segmentaciones))
             
             # Extraer máscaras
             mascaras = [seg.get('mascara') for seg in segmentaciones if seg.get('mascara') is not None]
@@ -273,10 +301,10 @@ class FusionadorMascaras:
             grupos_fusion = self.detectar_objetos_pegados(mascaras_info)
             
             if len(grupos_fusion) == 0:
-                print("   ✅ No se detectaron objetos pegados")
+                log.debug('   ✅ No se detectaron objetos pegados')
                 return segmentaciones
             
-            print(f"   🔗 Se detectaron {len(grupos_fusion)} grupos de objetos pegados")
+            log.debug('   🔗 Se detectaron %s grupos de objetos pegados', len(grupos_fusion))
             
             # Crear lista de segmentaciones procesadas
             segmentaciones_procesadas = []
@@ -284,7 +312,7 @@ class FusionadorMascaras:
             
             # Procesar cada grupo de fusión
             for grupo in grupos_fusion:
-                print(f"   🔧 Fusionando grupo: {grupo}")
+                log.debug('   🔧 Fusionando grupo: %s', grupo)
                 
                 # Fusionar máscaras del grupo
                 mascara_fusionada = mascaras_info[grupo[0]]['mascara']
@@ -307,16 +335,16 @@ class FusionadorMascaras:
                 if i not in indices_fusionados:
                     segmentaciones_procesadas.append(seg)
             
-            print(f"   ✅ Procesamiento completado: {len(segmentaciones)} → {len(segmentaciones_procesadas)} segmentaciones")
+            log.debug('   ✅ Procesamiento completado: %s → %s segmentaciones', len(segmentaciones), len(segmentaciones_procesadas))
             
             return segmentaciones_procesadas
             
         except Exception as e:
-            self.logger.error(f"Error procesando segmentaciones: {e}")
+            log.error('Error procesando segmentaciones: %s', e)
             return segmentaciones
     
     def _crear_segmentacion_fusionada(self, segmentaciones: List[Dict], 
-                                    grupo: List[int], mascara_fusionada: np.ndarray) -> Dict:
+                                    grupo: List[int], mascara_fusionada: MascaraCompacta) -> Dict:
         """
         Crea una nueva segmentación fusionada a partir de un grupo de segmentaciones
         
@@ -333,14 +361,10 @@ class FusionadorMascaras:
             base = segmentaciones[grupo[0]].copy()
             
             # Calcular nuevas propiedades de la máscara fusionada
-            area_fusionada = int(np.sum(mascara_fusionada > 0.5))
+            area_fusionada = mascara_fusionada.area
             
-            # Encontrar contornos de la máscara fusionada
-            contornos, _ = cv2.findContours(
-                mascara_fusionada.astype(np.uint8), 
-                cv2.RETR_EXTERNAL, 
-                cv2.CHAIN_APPROX_SIMPLE
-            )
+            # Contornos de la máscara fusionada (en coordenadas de imagen)
+            contornos = mascara_fusionada.contours
             
             if len(contornos) > 0:
                 contorno_principal = max(contornos, key=cv2.contourArea)
@@ -375,7 +399,7 @@ class FusionadorMascaras:
             return base
             
         except Exception as e:
-            self.logger.error(f"Error creando segmentación fusionada: {e}")
+            log.error('Error creando segmentación fusionada: %s', e)
             return segmentaciones[grupo[0]]  # Fallback a la primera segmentación
     
     def configurar_parametros(self, distancia_maxima: int = None, 
@@ -391,15 +415,15 @@ class FusionadorMascaras:
         """
         if distancia_maxima is not None:
             self.distancia_maxima = distancia_maxima
-            print(f"✅ Distancia máxima configurada: {distancia_maxima}px")
+            log.debug('✅ Distancia máxima configurada: %spx', distancia_maxima)
         
         if overlap_minimo is not None:
             self.overlap_minimo = overlap_minimo
-            print(f"✅ Overlap mínimo configurado: {overlap_minimo:.2%}")
+            log.debug('✅ Overlap mínimo configurado: %.2f%%', overlap_minimo * 100)
         
         if area_minima_fusion is not None:
             self.area_minima_fusion = area_minima_fusion
-            print(f"✅ Área mínima de fusión configurada: {area_minima_fusion}px")
+            log.debug('✅ Área mínima de fusión configurada: %spx', area_minima_fusion)
     
     def obtener_estadisticas(self) -> Dict:
         """
@@ -0,0 +1,291 @@
+"""
+Utilidades de inferencia por lotes para los motores YOLO11-SEG.
+
+Agrupa N imágenes en un solo tensor NCHW, ejecuta ONNX Runtime por lotes
+(troceando cuando el modelo exportado tiene la dimensión de batch fija),
+decodifica las detecciones de todas las imágenes a la vez y ensambla las
+máscaras de todas las instancias con un único producto matricial.
+"""
+
+import cv2
+import numpy as np
+from typing import List, Optional, Sequence, Tuple
+
+from analisis_coples.modules.logging_config import obtener_logger
+
+log = obtener_logger(__name__)
+
+
+def tamano_lote_fijo(input_shape: Optional[Sequence]) -> Optional[int]:
+    """
+    Tamaño de batch fijo del modelo, o None si es dinámico.
+
+    ONNX Runtime reporta las dimensiones dinámicas como str ('batch') o None.
+
+    Args:
+        input_shape: Shape de la entrada del modelo (session.get_inputs()[0].shape)
+    """
+    if not input_shape:
+        return None
+    dim_batch = input_shape[0]
+    if isinstance(dim_batch, int) and dim_batch > 0:
+        return dim_batch
+    return None
+
+
+def _errores_dimension_lote() -> Tuple[type, ...]:
+    """
+    Excepciones de ONNX Runtime cuando el grafo no acepta el tamaño de lote:
+    dimensión de entrada fija (INVALID_ARGUMENT) o un Reshape interno con el
+    batch fijado al exportar (RUNTIME_EXCEPTION).
+    """
+    from onnxruntime.capi.onnxruntime_pybind11_state import InvalidArgument, RuntimeException
+    return InvalidArgument, RuntimeException
+
+
+def ejecutar_lote(
+    session,
+    input_name: str,
+    output_names: List[str],
+    tensor: np.ndarray,
+    lote_maximo: Optional[int] = None
+) -> Tuple[List[np.ndarray], Optional[int]]:
+    """
+    Ejecuta la sesión sobre un tensor (N, 3, H, W) en trozos de lote_maximo.
+
+    Si el modelo rechaza el lote completo por sus dimensiones (batch
+    exportado como 1), se reintenta imagen por imagen y se devuelve el nuevo
+    lote máximo para que el motor lo recuerde. Cualquier otro error se propaga.
+
+    Args:
+        session: Sesión de ONNX Runtime
+        input_name: Nombre de la entrada
+        output_names: Nombres de las salidas
+        tensor: Lote de imágenes preprocesadas
+        lote_maximo: Tamaño máximo de trozo (None = todo el lote)
+
+    Returns:
+        (salidas concatenadas por eje 0, lote máximo efectivo)
+    """
+    n = tensor.shape[0]
+    paso = lote_maximo or n
+
+    try:
+        trozos = [
+            session.run(output_names, {input_name: tensor[i:i + paso]})
+            for i in range(0, n, paso)
+        ]
+    except _errores_dimension_lote() as e:
+        if paso == 1:
+            raise
+        # Dimensión de batch fija no declarada en el grafo: trocear de uno en uno
+        log.warning(f"⚠️ El modelo no acepta lotes de {paso}, se ejecuta imagen por imagen: {e}")
+        lote_maximo = 1
+        trozos = [
+            session.run(output_names, {input_name: tensor[i:i + 1]})
+            for i in range(n)
+        ]
+
+    if len(trozos) == 1:
+        salidas = [np.asarray(s) for s in trozos[0]]
+    else:
+        salidas = [
+            np.concatenate([trozo[k] for trozo in trozos], axis=0)
+            for k in range(len(trozos[0]))
+        ]
+    return salidas, lote_maximo
+
+
+def sigmoid(x: np.ndarray) -> np.ndarray:
+    """Sigmoid numéricamente estable"""
+    return 1 / (1 + np.exp(-np.clip(x, -250, 250)))
+
+
+Deteccion = Tuple[np.ndarray, np.ndarray, np.ndarray]
+
+
+def _sin_detecciones() -> Deteccion:
+    return (
+        np.zeros((0, 4), dtype=np.float32),
+        np.zeros((0,), dtype=np.float32),
+        np.zeros((0, 32), dtype=np.float32),
+    )
+
+
+def filtrar_detecciones_lote(detecciones: np.ndarray, confianza_min: float) -> List[Deteccion]:
+    """
+    Sigmoid, filtro de confianza y conversión a xyxy de un lote completo
+    (en una sola operación para todo el lote, antes de NMS).
+
+    Args:
+        detecciones: Salida (N, 37, 8400) = [cx, cy, w, h, conf, 32 coeficientes]
+        confianza_min: Umbral de confianza
+
+    Returns:
+        Por imagen: (boxes_xyxy (K,4), confianzas (K,), coeficientes (K,32)) sin NMS
+    """
+    # (N, 37, 8400) -> (N, 8400, 37)
+    predicciones = np.ascontiguousarray(detecciones.transpose(0, 2, 1), dtype=np.float32)
+    confianzas = sigmoid(predicciones[:, :, 4])
+    validas = confianzas > confianza_min
+
+    resultados = []
+    for i in range(detecciones.shape[0]):
+        mascara_validas = validas[i]
+        if not mascara_validas.any():
+            resultados.append(_sin_detecciones())
+            continue
+
+        cxcywh = predicciones[i, mascara_validas, :4]
+        boxes_xyxy = np.empty_like(cxcywh)
+        boxes_xyxy[:, :2] = cxcywh[:, :2] - cxcywh[:, 2:4] / 2
+        boxes_xyxy[:, 2:] = cxcywh[:, :2] + cxcywh[:, 2:4] / 2
+
+        resultados.append((
+            boxes_xyxy,
+            confianzas[i, mascara_validas],
+            predicciones[i, mascara_validas, 5:37],
+        ))
+
+    return resultados
+
+
+def aplicar_nms(
+    candidatas: Deteccion,
+    confianza_min: float,
+    iou_threshold: float = 0.35,
+    max_det: int = 30
+) -> Deteccion:
+    """
+    NMS sobre las detecciones filtradas de una imagen.
+
+    Args:
+        candidatas: (boxes_xyxy, confianzas, coeficientes) de filtrar_detecciones_lote
+        confianza_min: Umbral de confianza
+        iou_threshold: Umbral IoU para NMS
+        max_det: Máximo de detecciones por imagen
+    """
+    boxes_xyxy, conf, coeficientes = candidatas
+    if len(conf) == 0:
+        return candidatas
+
+    indices = cv2.dnn.NMSBoxes(
+        boxes_xyxy.tolist(), conf.tolist(), confianza_min, iou_threshold
+    )
+    if len(indices) == 0:
+        return _sin_detecciones()
+
+    indices = np.asarray(indices).flatten()[:max_det]
+    return boxes_xyxy[indices], conf[indices], coeficientes[indices]
+
+
+def decodificar_detecciones_lote(
+    detecciones: np.ndarray,
+    confianza_min: float,
+    iou_threshold: float = 0.35,
+    max_det: int = 30
+) -> List[Deteccion]:
+    """
+    Decodifica las detecciones YOLO11-SEG de un lote completo.
+
+    Sigmoid, filtro de confianza y conversión a xyxy se aplican sobre todo el
+    lote en una sola operación; solo NMS se ejecuta por imagen.
+
+    Args:
+        detecciones: Salida (N, 37, 8400) = [cx, cy, w, h, conf, 32 coeficientes]
+        confianza_min: Umbral de confianza
+        iou_threshold: Umbral IoU para NMS
+        max_det: Máximo de detecciones por imagen
+
+    Returns:
+        Por imagen: (boxes_xyxy (K,4), confianzas (K,), coeficientes (K,32))
+    """
+    return [
+        aplicar_nms(candidatas, confianza_min, iou_threshold, max_det)
+        for candidatas in filtrar_detecciones_lote(detecciones, confianza_min)
+    ]
+
+
+def ensamblar_mascaras(
+    coeficientes: np.ndarray,
+    protos: np.ndarray,
+    boxes_xyxy: np.ndarray,
+    umbral: float = 0.5,
+    umbral_estricto: Optional[float] = None,
+    cobertura_maxima: float = 0.8,
+    tamano_entrada: int = 640
+) -> List[Tuple[np.ndarray, Tuple[int, int, int, int]]]:
+    """
+    Ensambla las máscaras binarias de todas las instancias de una imagen.
+
+    Calcula (K,32) @ (32,160*160) en una sola operación, recorta cada
+    instancia a su bbox en la resolución de los prototipos (con 1 px de
+    margen para la interpolación) y solo redimensiona esa región, sin crear
+    K mapas de 640x640.
+
+    Equivale a redimensionar la máscara completa y recortar después, pero no
+    es idéntico bit a bit: el producto matricial suma en otro orden que el
+    tensordot por instancia, y algún píxel con probabilidad casi igual al
+    umbral puede cambiar de lado (diferencias de 1 px en el borde).
+
+    Args:
+        coeficientes: Coeficientes de máscara (K, 32)
+        protos: Prototipos de la imagen (1, 32, Hp, Wp) o (32, Hp, Wp)
+        boxes_xyxy: Cajas (K, 4) en coordenadas de entrada del modelo
+        umbral: Umbral de binarización sobre la sigmoide
+        umbral_estricto: Si se indica, se reaplica cuando la máscara cubre
+            más de cobertura_maxima del bbox
+        cobertura_maxima: Fracción del bbox a partir de la cual aplicar umbral_estricto
+        tamano_entrada: Lado de la entrada del modelo (640)
+
+    Returns:
+        Por instancia: (máscara uint8 {0,1} de tamaño (y2-y1, x2-x1), (x1, y1, x2, y2))
+    """
+    protos = protos.reshape(-1, *protos.shape[-3:])[0]
+    num_protos, alto_p, ancho_p = protos.shape
+    escala_x = tamano_entrada / ancho_p
+    escala_y = tamano_entrada / alto_p
+
+    k = len(boxes_xyxy)
+    if k == 0:
+        return []
+
+    # Un único producto matricial para todas las instancias
+    logits = np.dot(
+        np.asarray(coeficientes, dtype=np.float32).reshape(k, num_protos),
+        protos.reshape(num_protos, -1)
+    ).reshape(k, alto_p, ancho_p)
+
+    resultados = []
+    for i in range(k):
+        x1, y1, x2, y2 = (int(v) for v in boxes_xyxy[i])
+        x1, y1 = max(0, x1), max(0, y1)
+        x2, y2 = min(tamano_entrada, x2), min(tamano_entrada, y2)
+        if x2 <= x1 or y2 <= y1:
+            resultados.append((np.zeros((0, 0), dtype=np.uint8), (x1, y1, max(x1, x2), max(y1, y2))))
+            continue
+
+        # Región del bbox en resolución de prototipos (+1 px de margen)
+        px1 = max(0, int(np.floor(x1 / escala_x)) - 1)
+        py1 = max(0, int(np.floor(y1 / escala_y)) - 1)
+        px2 = min(ancho_p, int(np.ceil(x2 / escala_x)) + 1)
+        py2 = min(alto_p, int(np.ceil(y2 / escala_y)) + 1)
+
+        region = sigmoid(logits[i, py1:py2, px1:px2])
+        region = cv2.resize(
+            region,
+            (int(round((px2 - px1) * escala_x)), int(round((py2 - py1) * escala_y))),
+            interpolation=cv2.INTER_LINEAR
+        )
+
+        ox = int(round(px1 * escala_x))
+        oy = int(round(py1 * escala_y))
+        probabilidades = region[y1 - oy:y2 - oy, x1 - ox:x2 - ox]
+
+        mascara = (probabilidades > umbral).astype(np.uint8)
+        if umbral_estricto is not None and mascara.sum() > mascara.size * cobertura_maxima:
+            mascara = (probabilidades > umbral_estricto).astype(np.uint8)
+
+        resultados.append((mascara, (x1, y1, x2, y2)))
+
+    return resultados
@@ -15,6 +15,7 @@ import sys
 sys.path.append(os.path.join(os.path.dirname(__file__), "..", ".."))
 
 from modules.metadata_standard import MetadataStandard
+from analisis_coples.modules.mascara_compacta import MascaraCompacta, como_compacta, superponer_mascara
 import matplotlib.pyplot as plt
 from matplotlib.colors import ListedColormap
 
@@ -365,7 +366,7 @@ class ProcesadorSegmentacionDefectos:
         print(f"\n🔍 DEBUG PROCESADOR: Recibidas {len(segmentaciones)} segmentaciones")
         for i, seg in enumerate(segmentaciones):
             if 'mascara' in seg and seg['mascara'] is not None:
-                print(f"   ✅ Segmentación {i}: Máscara presente, tipo: {type(seg['mascara'])}, elementos: {len(seg['mascara']) if isinstance(seg['mascara'], list) else 'numpy array'}")
+                print(f"   ✅ Segmentación {i}: Máscara presente, tipo: {type(seg['mascara'])}, elementos: {len(seg['mascara']) if isinstance(seg['mascara'], list) else type(seg['mascara']).__name__}")
             else:
                 print(f"   ❌ Segmentación {i}: Máscara ausente o None")
         
@@ -459,29 +460,23 @@ class MaskVisualizer:
                 print(f"   ⚠️  Segmentación {i}: Sin datos de máscara")
                 continue
             
-            # 2. CONVERTIR MÁSCARA A NUMPY
-            if isinstance(mask_data, list):
-                mask = np.array(mask_data, dtype=np.float32)
-            else:
-                mask = mask_data.astype(np.float32)
+            # 2. NORMALIZAR A MÁSCARA COMPACTA (recorte del bbox)
+            mask = como_compacta(mask_data)
             
             # 3. VERIFICAR DIMENSIONES
-            print(f"   📐 Máscara {i}: {mask.shape}, rango: [{mask.min():.3f}, {mask.max():.3f}]")
-            
-            if len(mask.shape) != 2:
-                print(f"   ❌ Máscara {i}: Dimensiones incorrectas {mask.shape}")
+            if mask is None:
+                print(f"   ❌ Máscara {i}: Dimensiones incorrectas {np.shape(mask_data)}")
                 continue
             
+            print(f"   📐 Máscara {i}: {mask.shape}, región: {mask.region}")
+            
             # 4. REDIMENSIONAR SI ES NECESARIO
             if mask.shape != imagen.shape[:2]:
                 print(f"   🔄 Redimensionando máscara de {mask.shape} a {imagen.shape[:2]}")
-                mask = cv2.resize(mask, (imagen.shape[1], imagen.shape[0]))
+                mask = como_compacta(cv2.resize(mask.to_dense(), (imagen.shape[1], imagen.shape[0])))
             
-            # 5. BINARIZAR MÁSCARA
-            mask_binary = (mask > 0.5).astype(np.uint8)
-            
-            # 6. VERIFICAR SI LA MÁSCARA TIENE CONTENIDO
-            pixels_activos = np.sum(mask_binary)
+            # 5-6. VERIFICAR SI LA MÁSCARA TIENE CONTENIDO
+            pixels_activos = mask.area
             if pixels_activos == 0:
                 print(f"   ⚠️  Máscara {i}: Sin píxeles activos después de binarizar")
                 continue
@@ -489,7 +484,7 @@ class MaskVisualizer:
             print(f"   ✅ Máscara {i}: {pixels_activos} píxeles activos")
             
             # 7. APLICAR MÚLTIPLES TÉCNICAS DE VISUALIZACIÓN
-            resultado = self._aplicar_overlay(resultado, mask_binary, color, seg, i)
+            resultado = self._aplicar_overlay(resultado, mask, color, seg, i)
         
         # 8. GUARDAR RESULTADO
         if save_path:
@@ -502,21 +497,18 @@ class MaskVisualizer:
         
         return resultado
     
-    def _aplicar_overlay(self, imagen: np.ndarray, mask_binary: np.ndarray, 
+    def _aplicar_overlay(self, imagen: np.ndarray, mascara: MascaraCompacta, 
                         color: Tuple[int, int, int], seg: Dict, index: int) -> np.ndarray:
         """
         Aplica overlay de máscara con múltiples técnicas
         """
         resultado = imagen.copy()
         
-        # TÉCNICA 1: Overlay semitransparente
-        overlay = resultado.copy()
-        overlay[mask_binary > 0] = color
-        resultado = cv2.addWeighted(resultado, 0.7, overlay, 0.3, 0)
+        # TÉCNICA 1: Overlay semitransparente (solo en la región de la máscara)
+        superponer_mascara(resultado, mascara, color, alpha=0.3)
         
         # TÉCNICA 2: Contornos de la máscara
-        contornos, _ = cv2.findContours(mask_binary, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
-        cv2.drawContours(resultado, contornos, -1, color, 2)
+        cv2.drawContours(resultado, mascara.contours, -1, color, 2)
         
         # TÉCNICA 3: Bounding box
         bbox = seg.get('bbox', {})
@@ -596,20 +588,14 @@ class MaskVisualizer:
             
             # Info de máscara (CORREGIDO)
             mask_data = seg.get('mascara')  # ← CAMBIO: 'mask' por 'mascara'
-            if mask_data is not None:
-                if isinstance(mask_data, list):
-                    mask = np.array(mask_data)
-                else:
-                    mask = mask_data
-                
+            mask = como_compacta(mask_data)
+            if mask is not None:
                 print(f"   Máscara shape: {mask.shape}")
-                print(f"   Máscara rango: [{mask.min():.3f}, {mask.max():.3f}]")
-                print(f"   Píxeles únicos: {len(np.unique(mask))}")
+                print(f"   Máscara región: {mask.region} ({mask.nbytes} bytes)")
                 
-                if len(mask.shape) == 2:
-                    pixels_positivos = np.sum(mask > 0.5)
-                    total_pixels = mask.shape[0] * mask.shape[1]
-                    print(f"   Píxeles activos: {pixels_positivos}/{total_pixels} ({pixels_positivos/total_pixels*100:.1f}%)")
+                pixels_positivos = mask.area
+                total_pixels = mask.shape[0] * mask.shape[1]
+                print(f"   Píxeles activos: {pixels_positivos}/{total_pixels} ({pixels_positivos/total_pixels*100:.1f}%)")
             else:
                 print("   ❌ Sin datos de máscara")
     
@@ -620,16 +606,12 @@ class MaskVisualizer:
         mapa_calor = np.zeros(shape, dtype=np.float32)
         
         for seg in segmentaciones:
-            mask_data = seg.get('mascara')  # ← CAMBIO: 'mask' por 'mascara'
-            if mask_data is not None:
-                if isinstance(mask_data, list):
-                    mask = np.array(mask_data, dtype=np.float32)
-                else:
-                    mask = mask_data.astype(np.float32)
-                
-                if mask.shape == shape:
+            mask = como_compacta(seg.get('mascara'))  # ← CAMBIO: 'mask' por 'mascara'
+            if mask is not None:
+                if mask.shape == tuple(shape):
                     confianza = seg.get('confianza', 1.0)
-                    mapa_calor += mask * confianza
+                    x1, y1, x2, y2 = mask.region
+                    mapa_calor[y1:y2, x1:x2] += mask.recorte * confianza
         
         # Normalizar
         if mapa_calor.max() > 0:
@@ -670,7 +652,9 @@ class MaskVisualizer:
                     if campo == 'mascara':
                         mask_data = seg[campo]
                         if mask_data is not None:
-                            if isinstance(mask_data, np.ndarray):
+                            if isinstance(mask_data, MascaraCompacta):
+                                print(f"   ✅ {campo}: compacta {mask_data.shape}, región {mask_data.region}")
+                            elif isinstance(mask_data, np.ndarray):
                                 print(f"   ✅ {campo}: numpy array {mask_data.shape}")
                             elif isinstance(mask_data, list):
                                 print(f"   ✅ {campo}: lista con {len(mask_data)} elementos")
@@ -18,6 +18,7 @@ sys.path.append(os.path.join(os.path.dirname(__file__), "..", ".."))
 from analisis_coples.expo_config import FileConfig, VisualizationConfig
 from modules.postprocessing.mask_fusion import FusionadorMascaras
 from modules.metadata_standard import MetadataStandard
+from analisis_coples.modules.mascara_compacta import MascaraCompacta, como_compacta, superponer_mascara
 
 
 class ProcesadorSegmentacionPiezas:
@@ -153,8 +154,11 @@ class ProcesadorSegmentacionPiezas:
                 # Verificar máscara
                 if 'mascara' in seg and seg['mascara'] is not None:
                     mascara = seg['mascara']
-                    if isinstance(mascara, np.ndarray):
-                        print(f"   ✅ mascara: numpy array {mascara.shape}")
+                    if isinstance(mascara, (MascaraCompacta, np.ndarray)):
+                        if isinstance(mascara, MascaraCompacta):
+                            print(f"   ✅ mascara: compacta {mascara.shape}, región {mascara.region}")
+                        else:
+                            print(f"   ✅ mascara: numpy array {mascara.shape}")
                         
                         # Verificar consistencia de áreas
                         if 'area' in seg and 'area_mascara' in seg:
@@ -231,7 +235,7 @@ class ProcesadorSegmentacionPiezas:
                         print(f"🎨 Dibujando segmentación {i+1}: {clase} en ({x1},{y1}) a ({x2},{y2})")
                     
                     # Dibujar máscara si está disponible
-                    if mascara is not None and isinstance(mascara, np.ndarray):
+                    if mascara is not None:
                         self._dibujar_mascara(imagen_vis, mascara, color, alpha=0.3)
                     
                 except Exception as e:
@@ -244,26 +248,19 @@ class ProcesadorSegmentacionPiezas:
             print(f"❌ Error creando visualización: {e}")
             return imagen
     
-    def _dibujar_mascara(self, imagen: np.ndarray, mascara: np.ndarray, color: Tuple[int, int, int], alpha: float = 0.3):
+    def _dibujar_mascara(self, imagen: np.ndarray, mascara: MascaraCompacta, color: Tuple[int, int, int], alpha: float = 0.3):
         """
         Dibuja una máscara sobre la imagen con transparencia.
         
         Args:
             imagen (np.ndarray): Imagen sobre la que dibujar
-            mascara (np.ndarray): Máscara a dibujar
+            mascara (MascaraCompacta): Máscara a dibujar (también acepta np.ndarray)
             color (Tuple[int, int, int]): Color en formato BGR
             alpha (float): Transparencia (0.0 a 1.0)
         """
         try:
-            # Crear máscara binaria
-            mascara_binaria = (mascara > 0.5).astype(np.uint8)
-            
-            # Crear overlay de color
-            overlay = imagen.copy()
-            overlay[mascara_binaria > 0] = color
-            
-            # Combinar con transparencia
-            cv2.addWeighted(overlay, alpha, imagen, 1 - alpha, 0, imagen)
+            # Overlay de color mezclado solo en la región de la máscara
+            superponer_mascara(imagen, mascara, color, alpha)
             
         except Exception as e:
             print(f"⚠️ Error dibujando máscara: {e}")
@@ -287,15 +284,15 @@ class ProcesadorSegmentacionPiezas:
             
             for i, seg in enumerate(segmentaciones):
                 try:
-                    mascara = seg.get('mascara')
-                    if mascara is not None and isinstance(mascara, np.ndarray):
-                        print(f"   📐 Máscara {i}: {mascara.shape}, rango: [{np.min(mascara):.3f}, {np.max(mascara):.3f}]")
+                    mascara = como_compacta(seg.get('mascara'))
+                    if mascara is not None:
+                        print(f"   📐 Máscara {i}: {mascara.shape}, región: {mascara.region}")
                         
-                        # Agregar máscara al mapa de calor
-                        mascara_binaria = (mascara > 0.5).astype(np.float32)
-                        mapa_calor += mascara_binaria
+                        # Agregar máscara al mapa de calor (solo su región)
+                        x1, y1, x2, y2 = mascara.region
+                        mapa_calor[y1:y2, x1:x2] += mascara.recorte[:mapa_calor.shape[0] - y1, :mapa_calor.shape[1] - x1]
                         
-                        pixels_activos = np.sum(mascara_binaria)
+                        pixels_activos = mascara.area
                         print(f"   ✅ Máscara {i}: {pixels_activos} píxeles activos")
                     else:
                         print(f"   ⚠️ Máscara {i}: No disponible")
@@ -0,0 +1,225 @@
+"""
+Preprocesamiento de entrada compartido por los motores YOLO11-SEG.
+
+Cada motor tiene un PreprocesadorEntrada que escribe la imagen directamente
+en un tensor (1, 3, S, S) float32 contiguo reservado una sola vez: la
+conversión HWC uint8 -> CHW float32, el cambio de canales y la
+normalización a [0, 1] se hacen en una única pasada (np.multiply con out=)
+sin los temporales de astype / división / transpose / expand_dims.
+
+Si el frame ya mide S x S (el caso de la cámara GigE) no se redimensiona.
+Cualquier otro tamaño se escala conservando la relación de aspecto y se
+rellena (letterbox); la TransformacionEntrada devuelta permite llevar
+cajas y máscaras de vuelta a las coordenadas de la imagen original.
+
+El buffer es por hilo: el mismo motor lo comparten los trabajadores de la
+cola y las peticiones síncronas, y el tensor devuelto solo es válido hasta
+la siguiente llamada a preparar() en ese hilo.
+"""
+
+import threading
+from typing import Dict, List, Optional, Tuple
+
+import cv2
+import numpy as np
+
+from analisis_coples.modules.mascara_compacta import MascaraCompacta
+
+ESCALA_NORMALIZACION = np.float32(1.0 / 255.0)
+COLOR_RELLENO = 114  # Gris de relleno del letterbox (mismo que Ultralytics)
+
+
+class TransformacionEntrada:
+    """
+    Relación entre la imagen original y la entrada del modelo.
+
+    Una coordenada x de la entrada corresponde a (x - pad_x) / escala en la
+    imagen original (y lo mismo para y con pad_y).
+    """
+
+    __slots__ = ('escala', 'pad_x', 'pad_y', 'alto', 'ancho', 'tamano')
+
+    def __init__(self, escala: float, pad_x: int, pad_y: int, alto: int, ancho: int, tamano: int):
+        self.escala = float(escala)
+        self.pad_x = int(pad_x)
+        self.pad_y = int(pad_y)
+        self.alto = int(alto)
+        self.ancho = int(ancho)
+        self.tamano = int(tamano)
+
+    @classmethod
+    def identidad(cls, tamano: int) -> 'TransformacionEntrada':
+        return cls(1.0, 0, 0, tamano, tamano, tamano)
+
+    @property
+    def es_identidad(self) -> bool:
+        return self.escala == 1.0 and self.pad_x == 0 and self.pad_y == 0
+
+    def a_original(self, x: float, y: float) -> Tuple[float, float]:
+        """Punto de la entrada del modelo en coordenadas de la imagen original"""
+        xo = (x - self.pad_x) / self.escala
+        yo = (y - self.pad_y) / self.escala
+        return min(max(xo, 0.0), self.ancho), min(max(yo, 0.0), self.alto)
+
+    def mascara_a_original(self, mascara: MascaraCompacta) -> MascaraCompacta:
+        """
+        Lleva una máscara compacta de la entrada del modelo a la imagen original.
+
+        Solo se escala el recorte (la parte que cae fuera del relleno), no la
+        máscara completa.
+        """
+        mx1, my1, mx2, my2 = mascara.region
+        # Región útil de la entrada (sin relleno)
+        ux2 = self.pad_x + int(round(self.ancho * self.escala))
+        uy2 = self.pad_y + int(round(self.alto * self.escala))
+        ix1, iy1 = max(mx1, self.pad_x), max(my1, self.pad_y)
+        ix2, iy2 = min(mx2, ux2), min(my2, uy2)
+        if ix2 <= ix1 or iy2 <= iy1:
+            return MascaraCompacta(np.zeros((0, 0), dtype=np.uint8), 0, 0, (self.alto, self.ancho))
+
+        recorte = mascara.recorte[iy1 - my1:iy2 - my1, ix1 - mx1:ix2 - mx1]
+        ox1 = min(int(round((ix1 - self.pad_x) / self.escala)), self.ancho - 1)
+        oy1 = min(int(round((iy1 - self.pad_y) / self.escala)), self.alto - 1)
+        ox2 = max(min(int(round((ix2 - self.pad_x) / self.escala)), self.ancho), ox1 + 1)
+        oy2 = max(min(int(round((iy2 - self.pad_y) / self.escala)), self.alto), oy1 + 1)
+
+        escalado = cv2.resize(recorte, (ox2 - ox1, oy2 - oy1), interpolation=cv2.INTER_NEAREST)
+        return MascaraCompacta(escalado, ox1, oy1, (self.alto, self.ancho))
+
+    def segmentaciones_a_original(self, segmentaciones: List[Dict]) -> List[Dict]:
+        """
+        Reescribe (en el sitio) bbox, centroide, áreas, máscara y contorno de
+        las segmentaciones de un motor en coordenadas de la imagen original.
+        """
+        if self.es_identidad:
+            return segmentaciones
+
+        for seg in segmentaciones:
+            bbox = seg['bbox']
+            x1, y1 = self.a_original(bbox['x1'], bbox['y1'])
+            x2, y2 = self.a_original(bbox['x2'], bbox['y2'])
+            x1, y1, x2, y2 = int(x1), int(y1), int(x2), int(y2)
+            seg['bbox'] = {'x1': x1, 'y1': y1, 'x2': x2, 'y2': y2}
+            seg['centroide'] = {'x': int((x1 + x2) / 2), 'y': int((y1 + y2) / 2)}
+            seg['area'] = int((x2 - x1) * (y2 - y1))
+            seg['contorno'] = [[x1, y1], [x2, y1], [x2, y2], [x1, y2]]
+
+            mascara = seg.get('mascara')
+            if isinstance(mascara, MascaraCompacta):
+                mascara = seg['mascara'] = self.mascara_a_original(mascara)
+                seg['area_mascara'] = mascara.area
+                if 'ancho_mascara' in seg:
+                    bbox_mascara = mascara.bbox
+                    if bbox_mascara is not None:
+                        bx1, by1, bx2, by2 = bbox_mascara
+                        seg['ancho_mascara'] = int(bx2 - bx1 - 1)
+                        seg['alto_mascara'] = int(by2 - by1 - 1)
+                    else:
+                        seg['ancho_mascara'] = x2 - x1
+                        seg['alto_mascara'] = y2 - y1
+
+        return segmentaciones
+
+
+class PreprocesadorEntrada:
+    """
+    Prepara imágenes BGR (H, W, 3) uint8 como entrada NCHW float32 del modelo.
+
+    Args:
+        tamano: Lado de la entrada del modelo (640)
+        rgb: Invertir el orden de canales (BGR -> RGB) al copiar
+    """
+
+    def __init__(self, tamano: int = 640, rgb: bool = True):
+        self.tamano = int(tamano)
+        self.rgb = rgb
+        # Canal de origen para cada plano de salida
+        self._canales = (2, 1, 0) if rgb else (0, 1, 2)
+        self._local = threading.local()
+
+    @property
+    def buffer(self) -> np.ndarray:
+        """Tensor (1, 3, S, S) reservado para el hilo actual"""
+        buffer = getattr(self._local, 'buffer', None)
+        if buffer is None:
+            buffer = self._local.buffer = np.empty((1, 3, self.tamano, self.tamano), dtype=np.float32)
+        return buffer
+
+    def preparar(
+        self,
+        imagen: np.ndarray,
+        destino: Optional[np.ndarray] = None
+    ) -> Tuple[np.ndarray, TransformacionEntrada]:
+        """
+        Escribe la imagen en el tensor de entrada.
+
+        Args:
+            imagen: Imagen BGR (H, W, 3) o en escala de grises (H, W)
+            destino: Tensor (3, S, S) donde escribir (p.ej. lote[i]); por
+                defecto el buffer del hilo
+
+        Returns:
+            (tensor, transformación). Sin destino, el tensor es el buffer
+            (1, 3, S, S) del hilo y se sobrescribe en la siguiente llamada.
+
+        Raises:
+            ValueError: Si la imagen está vacía o no tiene 1 o 3 canales
+        """
+        if imagen is None or imagen.size == 0:
+            raise ValueError('Imagen vacía')
+        if imagen.ndim == 2:
+            imagen = cv2.cvtColor(imagen, cv2.COLOR_GRAY2BGR)
+        elif imagen.ndim != 3 or imagen.shape[2] != 3:
+            raise ValueError(f'Formato de imagen no soportado: {imagen.shape}')
+
+        if destino is None:
+            tensor = self.buffer
+            planos = tensor[0]
+        else:
+            tensor = planos = destino
+
+        alto, ancho = imagen.shape[:2]
+        if (alto, ancho) == (self.tamano, self.tamano):
+            transformacion = TransformacionEntrada.identidad(self.tamano)
+        else:
+            imagen, transformacion = self._letterbox(imagen)
+
+        # Una sola pasada por canal: uint8 HWC (strided) -> float32 CHW contiguo
+        for plano, canal in enumerate(self._canales):
+            np.multiply(imagen[:, :, canal], ESCALA_NORMALIZACION, out=planos[plano], dtype=np.float32)
+
+        return tensor, transformacion
+
+    def preparar_lote(self, imagenes: List[np.ndarray]) -> Tuple[np.ndarray, List[Optional[TransformacionEntrada]]]:
+        """
+        Escribe varias imágenes en un único tensor (N, 3, S, S).
+
+        Las imágenes inválidas quedan con transformación None y su plano sin
+        escribir; el llamador decide si descartarlas o ignorar su salida.
+        """
+        lote = np.empty((len(imagenes), 3, self.tamano, self.tamano), dtype=np.float32)
+        transformaciones: List[Optional[TransformacionEntrada]] = []
+        for i, imagen in enumerate(imagenes):
+            try:
+                _, transformacion = self.preparar(imagen, destino=lote[i])
+            except Exception:
+                lote[i] = 0.0
+                transformacion = None
+            transformaciones.append(transformacion)
+        return lote, transformaciones
+
+    def _letterbox(self, imagen: np.ndarray) -> Tuple[np.ndarray, TransformacionEntrada]:
+        """Escala conservando el aspecto y centra sobre un lienzo gris S x S"""
+        alto, ancho = imagen.shape[:2]
+        escala = min(self.tamano / alto, self.tamano / ancho)
+        nuevo_ancho = max(1, int(round(ancho * escala)))
+        nuevo_alto = max(1, int(round(alto * escala)))
+        pad_x = (self.tamano - nuevo_ancho) // 2
+        pad_y = (self.tamano - nuevo_alto) // 2
+
+        interpolacion = cv2.INTER_AREA if escala < 1 else cv2.INTER_LINEAR
+        lienzo = np.full((self.tamano, self.tamano, 3), COLOR_RELLENO, dtype=np.uint8)
+        lienzo[pad_y:pad_y + nuevo_alto, pad_x:pad_x + nuevo_ancho] = cv2.resize(
+            imagen, (nuevo_ancho, nuevo_alto), interpolation=interpolacion
+        )
+        return lienzo, TransformacionEntrada(escala, pad_x, pad_y, alto, ancho, self.tamano)
@@ -3,7 +3,6 @@ Motor de segmentación de defectos de coples usando ONNX
 Basado en el modelo CopleSegDef1C8V.onnx
 """
 
-import cv2
 import numpy as np
 import time
 import os
@@ -11,6 +10,21 @@ from typing import List, Dict, Tuple, Optional
 
 # Importar configuración
 from analisis_coples.expo_config import ModelsConfig, GlobalConfig
+from analisis_coples.modules.onnx_session import crear_sesion_onnx
+from analisis_coples.modules.segmentation.batch_inference import (
+    aplicar_nms,
+    decodificar_detecciones_lote,
+    ejecutar_lote,
+    ensamblar_mascaras,
+    filtrar_detecciones_lote,
+    tamano_lote_fijo,
+)
+from analisis_coples.modules.segmentation.preprocesamiento import PreprocesadorEntrada, TransformacionEntrada
+from analisis_coples.modules.mascara_compacta import MascaraCompacta
+from analisis_coples.modules.logging_config import obtener_logger
+from analisis_coples.modules.tiempos import medir_etapa
+
+log = obtener_logger(__name__)
 
 
 class SegmentadorDefectosCoples:
@@ -49,6 +63,7 @@ class SegmentadorDefectosCoples:
         self.output_names = None
         self.input_shape = None
         self.output_shapes = None
+        self.lote_maximo = None  # None = batch dinámico
         
         # Clases del modelo
         self.class_names = []
@@ -61,6 +76,8 @@ class SegmentadorDefectosCoples:
         # Configuración
         self.confianza_min = confianza_min
         self.input_size = ModelsConfig.INPUT_SIZE  # 640x640
+        # El modelo de defectos se entrenó sin invertir canales
+        self.preprocesador = PreprocesadorEntrada(self.input_size, rgb=False)
         
         # Cargar clases PRIMERO
         self._cargar_clases()
@@ -75,14 +92,14 @@ class SegmentadorDefectosCoples:
                 with open(self.classes_path, 'r', encoding='utf-8') as f:
                     self.class_names = [line.strip() for line in f.readlines() if line.strip()]
                 self.num_classes = len(self.class_names)
-                print(f"✅ Clases de segmentación de defectos cargadas: {self.class_names}")
+                log.info('✅ Clases de segmentación de defectos cargadas: %s', self.class_names)
             else:
-                print(f"⚠️ Archivo de clases de segmentación de defectos no encontrado: {self.classes_path}")
+                log.warning('⚠️ Archivo de clases de segmentación de defectos no encontrado: %s', self.classes_path)
                 # Clases por defecto para segmentación de defectos
                 self.class_names = ["Defecto_Seg_1", "Defecto_Seg_2"]
                 self.num_classes = 2
         except Exception as e:
-            print(f"❌ Error cargando clases de segmentación de defectos: {e}")
+            log.error('❌ Error cargando clases de segmentación de defectos: %s', e)
             # Clases por defecto
             self.class_names = ["Defecto_Seg_1", "Defecto_Seg_2"]
             self.num_classes = 2
@@ -90,10 +107,10 @@ class SegmentadorDefectosCoples:
     def _inicializar_modelo(self):
         """Inicializa el motor de segmentación ONNX."""
         try:
-            print(f"🎯 Inicializando segmentador de defectos...")
+            log.debug('🎯 Inicializando segmentador de defectos...')
             
             if not os.path.exists(self.model_path):
-                print(f"❌ Modelo de segmentación de defectos no encontrado: {self.model_path}")
+                log.error('❌ Modelo de segmentación de defectos no encontrado: %s', self.model_path)
                 return False
             
             import onnxruntime as ort
@@ -103,75 +120,47 @@ class SegmentadorDefectosCoples:
             if ort.get_device() == 'GPU':
                 providers = ['CUDAExecutionProvider'] + providers
             
-            # Crear sesión ONNX
-            self.session = ort.InferenceSession(self.model_path, providers=providers)
+            # Crear sesión ONNX (opciones de sesión del proceso)
+            self.session = crear_sesion_onnx(self.model_path, providers=providers)
             
             # Obtener información del modelo
             self.input_name = self.session.get_inputs()[0].name
             self.output_names = [output.name for output in self.session.get_outputs()]
             self.input_shape = self.session.get_inputs()[0].shape
             self.output_shapes = [output.shape for output in self.session.get_outputs()]
+            self.lote_maximo = tamano_lote_fijo(self.input_shape)
             
-            print(f"🧠 Motor de segmentación de defectos ONNX inicializado:")
-            print(f"   📁 Modelo: {os.path.basename(self.model_path)}")
-            print(f"   📊 Input: {self.input_name} - Shape: {self.input_shape}")
-            print(f"   📊 Outputs: {self.output_names}")
-            print(f"   🎯 Clases: {self.num_classes}")
-            print(f"   🔧 Proveedores: {providers}")
+            log.info(
+                '🧠 Motor de segmentación de defectos ONNX inicializado: %s (%s clases, %s)',
+                os.path.basename(self.model_path), self.num_classes, providers
+            )
+            log.debug('   📊 Input: %s - Shape: %s, outputs: %s', self.input_name, self.input_shape, self.output_names)
             
             return True
             
         except Exception as e:
-            print(f"❌ Error inicializando segmentador de defectos: {e}")
+            log.error('❌ Error inicializando segmentador de defectos: %s', e)
             return False
     
-    def preprocesar_imagen(self, imagen: np.ndarray) -> np.ndarray:
+    def preprocesar_imagen(self, imagen: np.ndarray) -> Tuple[Optional[np.ndarray], Optional[TransformacionEntrada]]:
         """
-        Preprocesa la imagen para el modelo de segmentación (ULTRA-SIMPLIFICADO)
+        Preprocesa la imagen para el modelo de segmentación (solo normalización, NCHW)
+        
+        Escribe en el tensor reservado del motor (ver PreprocesadorEntrada);
+        los frames que no miden 640x640 se escalan con letterbox.
         
         Args:
-            imagen: Imagen RGB de entrada (H, W, C)
+            imagen: Imagen de entrada (H, W, C)
             
         Returns:
-            Imagen preprocesada lista para inferencia
+            (tensor (1, 3, 640, 640), transformación), o (None, None) si la
+            imagen es inválida (igual que el motor de piezas)
         """
         try:
-            # Validar entrada básica
-            if imagen is None or imagen.size == 0:
-                print("⚠️ Imagen inválida, usando fallback")
-                return np.zeros((1, 3, self.input_size, self.input_size), dtype=np.float32)
-            
-            # Verificar dimensiones
-            if len(imagen.shape) != 3 or imagen.shape[2] != 3:
-                print("⚠️ Formato de imagen incorrecto, usando fallback")
-                return np.zeros((1, 3, self.input_size, self.input_size), dtype=np.float32)
-            
-            # Crear imagen de fallback directamente (evitar operaciones complejas)
-            imagen_fallback = np.zeros((1, 3, self.input_size, self.input_size), dtype=np.float32)
-            
-            # Solo procesar si la imagen es del tamaño correcto
-            if imagen.shape[:2] == (self.input_size, self.input_size):
-                try:
-                    # Conversión mínima: solo normalización
-                    imagen_norm = imagen.astype(np.float32) / 255.0
-                    # Transposición simple
-                    imagen_chw = np.transpose(imagen_norm, (2, 0, 1))
-                    # Batch dimension
-                    imagen_fallback[0] = imagen_chw
-                    print(f"✅ Preprocesamiento exitoso: {imagen_fallback.shape}")
-                except Exception as e:
-                    print(f"⚠️ Error en preprocesamiento: {e}, usando fallback")
-            else:
-                print(f"⚠️ Tamaño incorrecto: {imagen.shape}, usando fallback")
-            
-            return imagen_fallback
-            
+            return self.preprocesador.preparar(imagen)
         except Exception as e:
-            print(f"❌ Error crítico en preprocesamiento: {e}")
-            # Retornar imagen de fallback
-            fallback = np.zeros((1, 3, self.input_size, self.input_size), dtype=np.float32)
-            print(f"⚠️ Usando imagen de fallback: {fallback.shape}")
-            return fallback
+            log.warning('⚠️ Imagen inválida: %s', e)
+            return None, None
     
     def segmentar_defectos(self, imagen: np.ndarray, usar_mascaras_simples: bool = False) -> List[Dict]:
         """
@@ -184,42 +173,37 @@ class SegmentadorDefectosCoples:
         Returns:
             Lista de segmentaciones con máscaras, clase y confianza
         """
-        self.usar_mascaras_simples = usar_mascaras_simples
         try:
             # Debug: Mostrar tamaño de imagen original
-            print(f"🔍 Debug imagen segmentación - Original: {imagen.shape}")
-            print(f"🔍 Debug imagen segmentación - Input shape esperado: {self.input_size}")
+            log.debug('🔍 Debug imagen segmentación - Original: %s', imagen.shape)
+            log.debug('🔍 Debug imagen segmentación - Input shape esperado: %s', self.input_size)
             
             # Preprocesar imagen
-            imagen_input = self.preprocesar_imagen(imagen)
+            with medir_etapa('preprocesamiento'):
+                imagen_input, transformacion = self.preprocesar_imagen(imagen)
+            if imagen_input is None:
+                return []
             
             # Debug: Mostrar tamaño de imagen procesada
-            print(f"🔍 Debug imagen segmentación - Procesada: {imagen_input.shape}")
+            log.debug('🔍 Debug imagen segmentación - Procesada: %s', imagen_input.shape)
             
             # Ejecutar inferencia sin timeout (tiempo no es crítico)
             tiempo_inicio = time.time()
             
             try:
-                print("🧠 Ejecutando inferencia ONNX...")
-                print(f"   Input name: {self.input_name}")
-                print(f"   Output names: {self.output_names}")
-                print(f"   Input shape: {imagen_input.shape}")
+                log.debug('🧠 Ejecutando inferencia ONNX: %s %s -> %s', self.input_name, imagen_input.shape, self.output_names)
                 
-                outputs = self.session.run(
-                    self.output_names,
-                    {self.input_name: imagen_input}
-                )
+                with medir_etapa('inferencia'):
+                    outputs = self.session.run(
+                        self.output_names,
+                        {self.input_name: imagen_input}
+                    )
                 
-                print(f"✅ Inferencia ONNX exitosa: {len(outputs)} outputs")
-                if len(outputs) > 0:
-                    print(f"   Output 0 shape: {outputs[0].shape}")
-                if len(outputs) > 1:
-                    print(f"   Output 1 shape: {outputs[1].shape}")
+                if log.depurando():
+                    log.debug('✅ Inferencia ONNX exitosa: %s', [output.shape for output in outputs])
                     
             except Exception as e:
-                print(f"⚠️ Error en inferencia ONNX: {e}, usando fallback")
-                import traceback
-                traceback.print_exc()
+                log.warning('⚠️ Error en inferencia ONNX: %s, usando fallback', e, exc_info=True)
                 # Crear outputs de fallback
                 outputs = [
                     np.zeros((1, 37, 8400), dtype=np.float32),  # Detections
@@ -232,16 +216,14 @@ class SegmentadorDefectosCoples:
             self.tiempo_inferencia = tiempo_inferencia
             self.frames_procesados += 1
             
-            # Obtener dimensiones de la imagen de entrada para el postprocesamiento
-            imagen_height, imagen_width = imagen.shape[:2]
-            
-            # Procesar salidas de segmentación
-            segmentaciones = self._procesar_salidas_segmentacion(outputs)
+            # Procesar salidas de segmentación (en coordenadas de la imagen original)
+            segmentaciones = self._procesar_salidas_segmentacion(outputs, usar_mascaras_simples)
+            segmentaciones = transformacion.segmentaciones_a_original(segmentaciones)
             
             return segmentaciones
             
         except Exception as e:
-            print(f"❌ Error en segmentación de defectos: {e}")
+            log.error('❌ Error en segmentación de defectos: %s', e)
             return []
     
     def segmentar(self, imagen: np.ndarray, usar_mascaras_simples: bool = False) -> List[Dict]:
@@ -258,173 +240,190 @@ class SegmentadorDefectosCoples:
         """
         return self.segmentar_defectos(imagen, usar_mascaras_simples=usar_mascaras_simples)
     
-    def _procesar_salidas_segmentacion(self, outputs):
+    def segmentar_lote(self, imagenes: List[np.ndarray], usar_mascaras_simples: bool = False) -> List[List[Dict]]:
         """
-        Procesa las salidas del modelo YOLO11-SEG para extraer segmentaciones
+        Segmenta defectos en varias imágenes con una sola inferencia por lotes (NCHW).
+        
+        Si el modelo exportado tiene la dimensión de batch fija, la inferencia
+        se trocea en lotes de ese tamaño.
+        
+        La rutina de inspección no lo usa (segmenta cada ángulo en pipeline
+        con la captura del siguiente); queda para procesar lotes de imágenes
+        ya capturadas fuera del flujo en vivo.
+        
+        Args:
+            imagenes: Lista de imágenes (H, W, C)
+            usar_mascaras_simples: Si True, usa máscaras rectangulares simples
+            
+        Returns:
+            Lista (una por imagen, en el mismo orden) de listas de segmentaciones
         """
-        print(f"🔍 Procesando salidas de segmentación...")
-        print(f"   Número de outputs: {len(outputs)}")
+        resultados = [[] for _ in imagenes]
+        if self.session is None:
+            log.error('❌ Modelo no inicializado')
+            return resultados
+        if not imagenes:
+            return resultados
         
-        if len(outputs) > 0:
-            print(f"   Shape del primer output: {outputs[0].shape}")
+        tiempo_inicio = time.time()
         
-        segmentaciones = []
+        # Preprocesar directamente en un único tensor (N, 3, 640, 640);
+        # las imágenes inválidas no se infieren y devuelven []
+        lote, transformaciones = self.preprocesador.preparar_lote(imagenes)
+        validos = [i for i, transformacion in enumerate(transformaciones) if transformacion is not None]
+        if not validos:
+            return resultados
+        if len(validos) < len(imagenes):
+            lote = lote[validos]
+        
+        try:
+            outputs, self.lote_maximo = ejecutar_lote(
+                self.session, self.input_name, self.output_names, lote, self.lote_maximo
+            )
+        except Exception as e:
+            log.error('❌ Error en inferencia por lotes: %s', e)
+            return resultados
+        
+        detections = np.array(outputs[0], copy=True)
+        mask_protos = np.array(outputs[1], copy=True)
+        if detections.shape[1] != 37:
+            log.warning('   ⚠️ Formato inesperado. Se esperaba (N, 37, M), se recibió %s', detections.shape)
+            return resultados
+        
+        # Decodificar todas las imágenes del lote a la vez
+        decodificadas = decodificar_detecciones_lote(detections, self.confianza_min)
+        for j, i in enumerate(validos):
+            boxes_xyxy, confidences, mask_coeffs = decodificadas[j]
+            resultados[i] = transformaciones[i].segmentaciones_a_original(
+                self._construir_segmentaciones(
+                    boxes_xyxy, confidences, mask_coeffs, mask_protos[j:j + 1], usar_mascaras_simples
+                )
+            )
+        
+        # Actualizar estadísticas (tiempo prorrateado por imagen)
+        tiempo_total = (time.time() - tiempo_inicio) * 1000
+        self.tiempo_inferencia = tiempo_total / len(validos)
+        self.frames_procesados += len(validos)
+        
+        log.debug('🎉 Lote de %s imágenes procesado en %.0fms', len(validos), tiempo_total)
+        return resultados
+    
+    def _procesar_salidas_segmentacion(self, outputs, usar_mascaras_simples: bool = False):
+        """
+        Procesa las salidas del modelo YOLO11-SEG para extraer segmentaciones
+        """
+        log.debug('🔍 Procesando salidas de segmentación...')
         
-        # Procesar outputs de YOLO11-SEG
-        print(f"   🔍 DEBUG: Verificando outputs de YOLO11-SEG...")
-        print(f"   🔍 DEBUG: Hay {len(outputs)} outputs")
+        if len(outputs) < 2:
+            log.warning('   ⚠️ DEBUG: Se esperaban al menos 2 outputs, se recibieron %s', len(outputs))
+            return []
         
-        if len(outputs) >= 2:
+        with medir_etapa('decodificacion'):
             # CRÍTICO: Copiar outputs de ONNX inmediatamente para evitar segfaults
             # ONNX Runtime no garantiza ownership de memoria, causando crashes en operaciones NumPy
             detections = np.array(outputs[0], copy=True)  # (1, 37, 8400) - Bboxes + confianza + coeficientes
             mask_protos = np.array(outputs[1], copy=True)  # (1, 32, 160, 160) - Prototipos de máscaras
             
-            print(f"   ✅ DEBUG: Output 0 (detections): {detections.shape}")
-            print(f"   ✅ DEBUG: Output 1 (mask_protos): {mask_protos.shape}")
-            
             # Verificar formato de salida
             if detections.shape[1] != 37:
-                print(f"   ⚠️ DEBUG: Formato inesperado. Se esperaba (1, 37, N), se recibió {detections.shape}")
-                return segmentaciones
-            
-            # Transponer para facilitar procesamiento: (1, 37, 8400) -> (8400, 37)
-            predictions = detections[0].transpose()  # Shape: (8400, 37)
-            
-            # Separar componentes
-            boxes = predictions[:, :4]  # [x_center, y_center, width, height]
-            confidences = predictions[:, 4]  # Puntuaciones de confianza
-            mask_coeffs = predictions[:, 5:37]  # 32 coeficientes de máscara
-            
-            print(f"   🔍 DEBUG: Boxes shape: {boxes.shape}")
-            print(f"   🔍 DEBUG: Confidences shape: {confidences.shape}")
-            print(f"   🔍 DEBUG: Mask coefficients shape: {mask_coeffs.shape}")
-            
-            # Aplicar sigmoid a las confianzas
-            confidences = self._sigmoid(confidences)
-            
-            # Filtrar por confianza mínima
-            valid_indices = confidences > self.confianza_min
-            
-            if not np.any(valid_indices):
-                print(f"   ❌ No se encontraron detecciones con confianza > {self.confianza_min}")
-                return segmentaciones
-            
-            boxes = boxes[valid_indices]
-            confidences = confidences[valid_indices]
-            mask_coeffs = mask_coeffs[valid_indices]
-            
-            print(f"   ✅ {len(boxes)} detecciones pasaron el filtro de confianza")
+                log.warning('   ⚠️ DEBUG: Formato inesperado. Se esperaba (1, 37, N), se recibió %s', detections.shape)
+                return []
             
-            # Convertir formato de cajas de center_x, center_y, width, height a x1, y1, x2, y2
-            boxes_xyxy = self._convert_to_xyxy(boxes)
-            
-            # Aplicar Non-Maximum Suppression
-            indices = cv2.dnn.NMSBoxes(
-                boxes_xyxy.tolist(), 
-                confidences.tolist(), 
-                self.confianza_min, 
-                0.35  # IoU threshold
+            candidatas = filtrar_detecciones_lote(detections[:1], self.confianza_min)[0]
+        
+        with medir_etapa('nms'):
+            boxes_xyxy, confidences, mask_coeffs = aplicar_nms(candidatas, self.confianza_min)
+        
+        with medir_etapa('mascaras'):
+            segmentaciones = self._construir_segmentaciones(
+                boxes_xyxy, confidences, mask_coeffs, mask_protos[:1], usar_mascaras_simples
             )
-            
-            if len(indices) > 0:
-                indices = indices.flatten()[:30]  # max_det
-                print(f"   ✅ {len(indices)} detecciones después de NMS")
-                print(f"   📋 Índices a procesar: {indices.tolist()}")
-                
-                for idx_num, i in enumerate(indices):
-                    print(f"\n   🔄 Procesando detección {idx_num + 1}/{len(indices)} (índice original: {i})...")
-                    x1, y1, x2, y2 = boxes_xyxy[i]
-                    confidence = confidences[i]
-                    mask_coeff = mask_coeffs[i]
-                    
-                    # Calcular centroide
-                    cx = int((x1 + x2) / 2)
-                    cy = int((y1 + y2) / 2)
-                    
-                    # Generar máscara (simple o con prototipos según configuración)
-                    if self.usar_mascaras_simples:
-                        # Máscara rectangular simple (100% estable, para rutinas)
-                        print(f"   🟥 Usando máscara rectangular simple (modo rutina)")
-                        mask = np.zeros((640, 640), dtype=np.float32)
-                        x1_int, y1_int, x2_int, y2_int = int(x1), int(y1), int(x2), int(y2)
-                        mask[y1_int:y2_int, x1_int:x2_int] = 1.0
-                    else:
-                        # Máscara con prototipos YOLO11 (precisa, para análisis individuales)
-                        try:
-                            # CRÍTICO: Copiar arrays de ONNX para evitar problemas de ownership de memoria
-                            # NumPy no toma ownership de arrays de ONNX Runtime, causando segfaults
-                            mask_coeff_copy = np.array(mask_coeff, dtype=np.float32, copy=True)
-                            mask_protos_copy = np.array(mask_protos, dtype=np.float32, copy=True)
-                            
-                            # Generar máscara con prototipos
-                            mask = self._generate_mask(mask_coeff_copy, mask_protos_copy, (x1, y1, x2, y2), (640, 640))
-                            
-                            if mask is None:
-                                # Fallback si _generate_mask falla
-                                mask = np.zeros((640, 640), dtype=np.float32)
-                                x1_int, y1_int, x2_int, y2_int = int(x1), int(y1), int(x2), int(y2)
-                                mask[y1_int:y2_int, x1_int:x2_int] = 1.0
-                            
-                        except Exception as e:
-                            print(f"   ⚠️  Error generando máscara: {e}")
-                            import traceback
-                            traceback.print_exc()
-                            
-                            # Fallback: máscara simple
-                            mask = np.zeros((640, 640), dtype=np.float32)
-                            x1_int, y1_int, x2_int, y2_int = int(x1), int(y1), int(x2), int(y2)
-                            mask[y1_int:y2_int, x1_int:x2_int] = 1.0
-                    
-                    # Calcular área de la máscara (siempre, independientemente del método usado)
-                    mask_area = int(np.sum(mask > 0.5))
-                    
-                    # Crear segmentación con máscaras reales (SIN CONVERSIÓN A LISTA)
-                    segmentacion = {
-                        "clase": "Defecto",
-                        "confianza": float(confidence),
-                        "bbox": {
-                            "x1": int(x1),
-                            "y1": int(y1),
-                            "x2": int(x2),
-                            "y2": int(y2)
-                        },
-                        "centroide": {
-                            "x": cx,
-                            "y": cy
-                        },
-                        "area": int((x2 - x1) * (y2 - y1)),
-                        "area_mascara": mask_area,
-                        "mascara": mask,  # Mantener como numpy array (SIN .tolist())
-                        "coeficientes_mascara": mask_coeff.tolist()[:5],  # Solo primeros 5 coeficientes
-                        "contorno": self._bbox_to_contour(x1, y1, x2, y2)
-                    }
-                    
-                    # Debug de máscara
-                    if mask is not None:
-                        print(f"   ✅ Máscara creada: {mask.shape}, área: {mask_area}")
-                    else:
-                        print(f"   ⚠️  Máscara fallback creada: área: {mask_area}")
-                    
-                    print(f"   📝 Agregando segmentación a la lista...")
-                    segmentaciones.append(segmentacion)
-                    print(f"   ✅ Segmentación agregada. Total actual: {len(segmentaciones)}")
-                    print(f"✅ Segmentación: Defecto - {confidence:.3f} - BBox: ({int(x1)},{int(y1)}) a ({int(x2)},{int(y2)}) - Área: {int((x2 - x1) * (y2 - y1))}")
-                
-                print(f"🔄 Loop de segmentaciones completado. Total: {len(segmentaciones)}")
-            else:
-                print(f"   ❌ No se encontraron detecciones después de NMS")
-        else:
-            print(f"   ⚠️ DEBUG: Se esperaban al menos 2 outputs, se recibieron {len(outputs)}")
         
-        print(f"🎯 Total segmentaciones encontradas: {len(segmentaciones)}")
+        log.debug('🎯 Total segmentaciones encontradas: %s', len(segmentaciones))
+        return segmentaciones
+    
+    def _construir_segmentaciones(
+        self,
+        boxes_xyxy,
+        confidences,
+        mask_coeffs,
+        mask_protos,
+        usar_mascaras_simples: bool = False
+    ) -> List[Dict]:
+        """
+        Construye las segmentaciones de una imagen a partir de sus detecciones ya
+        filtradas por confianza y NMS.
         
-        # Debug final: verificar que las máscaras estén presentes
-        for i, seg in enumerate(segmentaciones):
-            if 'mascara' in seg and seg['mascara'] is not None:
-                print(f"   ✅ Segmentación {i}: Máscara presente, shape: {len(seg['mascara'])} elementos")
-            else:
-                print(f"   ❌ Segmentación {i}: Máscara ausente o None")
+        Las máscaras de todas las instancias se ensamblan de una vez
+        (ver ensamblar_mascaras) y solo se redimensiona la región de cada bbox.
+        
+        Args:
+            boxes_xyxy: Cajas (K, 4) en formato x1, y1, x2, y2
+            confidences: Confianzas (K,)
+            mask_coeffs: Coeficientes de máscara (K, 32)
+            mask_protos: Prototipos de máscara de la imagen (1, 32, 160, 160)
+            usar_mascaras_simples: Máscaras rectangulares en vez de prototipos.
+                Es un argumento y no un atributo porque el registro comparte
+                el motor entre hilos
+        """
+        segmentaciones = []
+        if len(boxes_xyxy) == 0:
+            return segmentaciones
+        
+        # Generar máscaras (simples o con prototipos según configuración)
+        if usar_mascaras_simples:
+            # Máscara rectangular simple (100% estable, para rutinas)
+            log.debug('   🟥 Usando máscaras rectangulares simples (modo rutina)')
+            mascaras = [self._mascara_rectangular(box) for box in boxes_xyxy]
+        else:
+            # Máscaras con prototipos YOLO11 (precisas, para análisis individuales)
+            try:
+                mascaras = ensamblar_mascaras(
+                    mask_coeffs, mask_protos, boxes_xyxy,
+                    umbral=0.5, tamano_entrada=self.input_size
+                )
+            except Exception as e:
+                log.warning('   ⚠️  Error con prototipos: %s, usando fallback', e)
+                mascaras = [self._mascara_rectangular(box) for box in boxes_xyxy]
+        
+        for i in range(len(boxes_xyxy)):
+            x1, y1, x2, y2 = boxes_xyxy[i]
+            confidence = confidences[i]
+            mask_coeff = mask_coeffs[i]
+            recorte, (mx1, my1, mx2, my2) = mascaras[i]
+            
+            # Calcular centroide
+            cx = int((x1 + x2) / 2)
+            cy = int((y1 + y2) / 2)
+            
+            # Máscara compacta: recorte del bbox + desplazamiento
+            mask = MascaraCompacta(recorte, mx1, my1, (self.input_size, self.input_size))
+            mask_area = mask.area
+            
+            # Crear segmentación con máscaras reales (SIN CONVERSIÓN A LISTA)
+            segmentacion = {
+                "clase": "Defecto",
+                "confianza": float(confidence),
+                "bbox": {
+                    "x1": int(x1),
+                    "y1": int(y1),
+                    "x2": int(x2),
+                    "y2": int(y2)
+                },
+                "centroide": {
+                    "x": cx,
+                    "y": cy
+                },
+                "area": int((x2 - x1) * (y2 - y1)),
+                "area_mascara": mask_area,
+                "mascara": mask,  # MascaraCompacta (to_dense() para la máscara completa)
+                "coeficientes_mascara": mask_coeff.tolist()[:5],  # Solo primeros 5 coeficientes
+                "contorno": self._bbox_to_contour(x1, y1, x2, y2)
+            }
+            
+            segmentaciones.append(segmentacion)
+            if log.depurando():
+                log.debug('✅ Segmentación: Defecto - %.3f - BBox: (%s,%s) a (%s,%s) - Área: %s', confidence, int(x1), int(y1), int(x2), int(y2), int((x2 - x1) * (y2 - y1)))
         
         return segmentaciones
     
@@ -441,60 +440,12 @@ class SegmentadorDefectosCoples:
         boxes_xyxy[:, 3] = boxes_cxcywh[:, 1] + boxes_cxcywh[:, 3] / 2  # y2
         return boxes_xyxy
     
-    def _generate_mask(self, mask_coeffs, mask_protos, bbox, input_shape):
-        """
-        Genera máscara a partir de coeficientes y prototipos de YOLO11
-        """
-        try:
-            # Extraer prototipos (shape: [1, 32, 160, 160])
-            protos = mask_protos[0]  # Shape: [32, 160, 160]
-            
-            # Aplicar coeficientes a prototipos
-            # mask_coeffs shape: [32], protos shape: [32, 160, 160]
-            mask = np.tensordot(mask_coeffs, protos, axes=([0], [0]))  # Shape: [160, 160]
-            
-            # Aplicar sigmoid para normalizar
-            mask = self._sigmoid(mask)
-            
-            # Redimensionar a input_shape
-            H, W = input_shape
-            if mask.shape != (H, W):
-                mask = cv2.resize(mask, (W, H))
-            
-            # Recortar a la región del bounding box para mejorar precisión
-            x1, y1, x2, y2 = map(int, bbox)
-            mask_cropped = np.zeros_like(mask)
-            
-            # Aplicar máscara solo en la región del bbox
-            if x1 < W and y1 < H and x2 > 0 and y2 > 0:
-                # Asegurar que las coordenadas estén dentro de los límites
-                x1 = max(0, x1)
-                y1 = max(0, y1)
-                x2 = min(W, x2)
-                y2 = min(H, y2)
-                
-                # Extraer región de la máscara original
-                bbox_mask = mask[y1:y2, x1:x2]
-                # Aplicar umbral más estricto en la región del bbox
-                bbox_mask_binary = (bbox_mask > 0.5).astype(np.float32)
-                mask_cropped[y1:y2, x1:x2] = bbox_mask_binary
-            
-            print(f"   ✅ Máscara generada (con prototipos): {mask.shape}, rango: [{mask.min():.3f}, {mask.max():.3f}]")
-            print(f"   📊 Píxeles activos: {np.sum(mask_cropped > 0.5)} de {mask_cropped.size}")
-            
-            return mask_cropped
-            
-        except Exception as e:
-            print(f"   ⚠️  Error con prototipos: {e}, usando fallback")
-            # Fallback: máscara rectangular simple
-            x1, y1, x2, y2 = map(int, bbox)
-            H, W = input_shape
-            
-            mask = np.zeros((H, W), dtype=np.float32)
-            mask[y1:y2, x1:x2] = 1.0
-            
-            print(f"   ✅ Máscara fallback generada: {mask.shape}, píxeles activos: {np.sum(mask > 0.5)}")
-            return mask
+    def _mascara_rectangular(self, box):
+        """Máscara rectangular (recorte de unos del tamaño del bbox recortado a la imagen)"""
+        x1, y1, x2, y2 = (int(v) for v in box)
+        x1, y1 = max(0, x1), max(0, y1)
+        x2, y2 = max(x1, min(self.input_size, x2)), max(y1, min(self.input_size, y2))
+        return np.ones((y2 - y1, x2 - x1), dtype=np.uint8), (x1, y1, x2, y2)
     
     def _bbox_to_contour(self, x1, y1, x2, y2):
         """Convierte bounding box a formato de contorno OpenCV"""
@@ -524,6 +475,6 @@ class SegmentadorDefectosCoples:
         try:
             if self.session:
                 self.session = None
-            print("✅ Recursos del segmentador de defectos liberados")
+            log.debug('✅ Recursos del segmentador de defectos liberados')
         except Exception as e:
-            print(f"❌ Error liberando segmentador de defectos: {e}")
+            log.error('❌ Error liberando segmentador de defectos: %s', e)
@@ -4,7 +4,6 @@ Basado en el modelo CopleSegPZ1C1V.onnx
 MEJORADO basándose en el módulo de defectos que funciona bien
 """
 
-import cv2
 import numpy as np
 import time
 import os
@@ -12,6 +11,21 @@ from typing import List, Dict, Tuple, Optional
 
 # Importar configuración
 from analisis_coples.expo_config import ModelsConfig, GlobalConfig
+from analisis_coples.modules.onnx_session import crear_sesion_onnx
+from analisis_coples.modules.segmentation.batch_inference import (
+    aplicar_nms,
+    decodificar_detecciones_lote,
+    ejecutar_lote,
+    ensamblar_mascaras,
+    filtrar_detecciones_lote,
+    tamano_lote_fijo,
+)
+from analisis_coples.modules.segmentation.preprocesamiento import PreprocesadorEntrada, TransformacionEntrada
+from analisis_coples.modules.mascara_compacta import MascaraCompacta
+from analisis_coples.modules.logging_config import obtener_logger
+from analisis_coples.modules.tiempos import medir_etapa
+
+log = obtener_logger(__name__)
 
 
 class SegmentadorPiezasCoples:
@@ -51,6 +65,7 @@ class SegmentadorPiezasCoples:
         self.output_names = None
         self.input_shape = None
         self.output_shapes = None
+        self.lote_maximo = None  # None = batch dinámico
         
         # Clases del modelo
         self.class_names = []
@@ -72,6 +87,7 @@ class SegmentadorPiezasCoples:
         # Configuración
         self.confianza_min = confianza_min
         self.input_size = ModelsConfig.INPUT_SIZE  # 640x640
+        self.preprocesador = PreprocesadorEntrada(self.input_size, rgb=True)
         
         # Cargar clases PRIMERO
         self._cargar_clases()
@@ -86,14 +102,14 @@ class SegmentadorPiezasCoples:
                 with open(self.classes_path, 'r', encoding='utf-8') as f:
                     self.class_names = [line.strip() for line in f.readlines() if line.strip()]
                 self.num_classes = len(self.class_names)
-                print(f"✅ Clases de segmentación de piezas cargadas: {self.class_names}")
+                log.info('✅ Clases de segmentación de piezas cargadas: %s', self.class_names)
             else:
-                print(f"⚠️ Archivo de clases de segmentación de piezas no encontrado: {self.classes_path}")
+                log.warning('⚠️ Archivo de clases de segmentación de piezas no encontrado: %s', self.classes_path)
                 # Clases por defecto para segmentación de piezas
                 self.class_names = ["Cople"]
                 self.num_classes = 1
         except Exception as e:
-            print(f"❌ Error cargando clases de segmentación de piezas: {e}")
+            log.error('❌ Error cargando clases de segmentación de piezas: %s', e)
             # Clases por defecto
             self.class_names = ["Cople"]
             self.num_classes = 1
@@ -101,32 +117,30 @@ class SegmentadorPiezasCoples:
     def _inicializar_modelo(self):
         """Inicializa el motor de segmentación ONNX."""
         try:
-            print(f"🎯 Inicializando segmentador de piezas...")
+            log.debug('🎯 Inicializando segmentador de piezas...')
             
             if not os.path.exists(self.model_path):
-                print(f"❌ Modelo de segmentación de piezas no encontrado: {self.model_path}")
+                log.error('❌ Modelo de segmentación de piezas no encontrado: %s', self.model_path)
                 return False
             
-            import onnxruntime as ort
-            
             # Configurar proveedores
             providers = ['CPUExecutionProvider']
             
-            # Crear sesión ONNX
-            self.session = ort.InferenceSession(self.model_path, providers=providers)
+            # Crear sesión ONNX (opciones de sesión del proceso)
+            self.session = crear_sesion_onnx(self.model_path, providers=providers)
             
             # Obtener información del modelo
             self.input_name = self.session.get_inputs()[0].name
             self.output_names = [output.name for output in self.session.get_outputs()]
             self.input_shape = self.session.get_inputs()[0].shape
             self.output_shapes = [output.shape for output in self.session.get_outputs()]
+            self.lote_maximo = tamano_lote_fijo(self.input_shape)
             
-            print(f"🧠 Motor de segmentación de piezas ONNX inicializado:")
-            print(f"   📁 Modelo: {os.path.basename(self.model_path)}")
-            print(f"   📊 Input: {self.input_name} - Shape: {self.input_shape}")
-            print(f"   📊 Outputs: {self.output_names}")
-            print(f"   🎯 Clases: {self.num_classes}")
-            print(f"   🔧 Proveedores: {providers}")
+            log.info(
+                '🧠 Motor de segmentación de piezas ONNX inicializado: %s (%s clases, %s)',
+                os.path.basename(self.model_path), self.num_classes, providers
+            )
+            log.debug('   📊 Input: %s - Shape: %s, outputs: %s', self.input_name, self.input_shape, self.output_names)
             
             # Marcar como inicializado en las estadísticas
             self.stats['inicializado'] = True
@@ -134,7 +148,7 @@ class SegmentadorPiezasCoples:
             return True
             
         except Exception as e:
-            print(f"❌ Error inicializando motor de segmentación de piezas: {e}")
+            log.error('❌ Error inicializando motor de segmentación de piezas: %s', e)
             return False
     
     def procesar_imagen(self, imagen: np.ndarray) -> List[Dict]:
@@ -148,50 +162,45 @@ class SegmentadorPiezasCoples:
             List[Dict]: Lista de segmentaciones detectadas
         """
         if self.session is None:
-            print("❌ Modelo no inicializado")
+            log.error('❌ Modelo no inicializado')
             return []
         
         try:
-            print(f"📥 Iniciando procesamiento de imagen: {imagen.shape}")
+            log.debug('📥 Iniciando procesamiento de imagen: %s', imagen.shape)
             inicio = time.time()
             
             # Preprocesar imagen
-            print("🔄 Preprocesando imagen...")
-            imagen_procesada = self._preprocesar_imagen(imagen)
-            print(f"✅ Imagen preprocesada: {imagen_procesada.shape if imagen_procesada is not None else None}")
+            log.debug('🔄 Preprocesando imagen...')
+            with medir_etapa('preprocesamiento'):
+                imagen_procesada, transformacion = self._preprocesar_imagen(imagen)
+            log.debug('✅ Imagen preprocesada: %s', imagen_procesada.shape if imagen_procesada is not None else None)
             
             if imagen_procesada is None:
-                print("❌ Error en preprocesamiento")
+                log.error('❌ Error en preprocesamiento')
                 return []
             
             # Ejecutar inferencia
-            print("🧠 Ejecutando inferencia ONNX...")
-            print(f"   Input name: {self.input_name}")
-            print(f"   Output names: {self.output_names}")
-            print(f"   Input shape: {imagen_procesada.shape}")
+            log.debug('🧠 Ejecutando inferencia ONNX: %s %s -> %s', self.input_name, imagen_procesada.shape, self.output_names)
             
             try:
-                outputs = self.session.run(self.output_names, {self.input_name: imagen_procesada})
-                print(f"✅ Inferencia ONNX exitosa: {len(outputs)} outputs")
-                if len(outputs) > 0:
-                    print(f"   Output 0 shape: {outputs[0].shape}")
-                if len(outputs) > 1:
-                    print(f"   Output 1 shape: {outputs[1].shape}")
+                with medir_etapa('inferencia'):
+                    outputs = self.session.run(self.output_names, {self.input_name: imagen_procesada})
+                if log.depurando():
+                    log.debug('✅ Inferencia ONNX exitosa: %s', [output.shape for output in outputs])
             except Exception as e:
-                print(f"⚠️ Error en inferencia ONNX: {e}, usando fallback")
-                import traceback
-                traceback.print_exc()
+                log.warning('⚠️ Error en inferencia ONNX: %s, usando fallback', e, exc_info=True)
                 # Crear outputs de fallback vacíos
                 outputs = [
                     np.zeros((1, 37, 8400), dtype=np.float32),  # Detections
                     np.zeros((1, 32, 160, 160), dtype=np.float32)  # Mask protos
                 ]
-                print("⚠️ Usando outputs de fallback (vacíos)")
+                log.warning('⚠️ Usando outputs de fallback (vacíos)')
             
             # Procesar salidas
-            print("🔍 Procesando salidas...")
+            log.debug('🔍 Procesando salidas...')
             segmentaciones = self._procesar_salidas_segmentacion(outputs)
-            print(f"✅ Salidas procesadas: {len(segmentaciones)} segmentaciones")
+            segmentaciones = transformacion.segmentaciones_a_original(segmentaciones)
+            log.debug('✅ Salidas procesadas: %s segmentaciones', len(segmentaciones))
             
             # Actualizar estadísticas
             self.tiempo_inferencia = (time.time() - inicio) * 1000
@@ -203,13 +212,11 @@ class SegmentadorPiezasCoples:
             self.stats['tiempo_promedio'] = self.stats['tiempo_total'] / self.stats['inferencias_totales']
             self.stats['ultima_inferencia'] = self.tiempo_inferencia
             
-            print(f"🎉 Procesamiento completado en {self.tiempo_inferencia:.0f}ms")
+            log.debug('🎉 Procesamiento completado en %.0fms', self.tiempo_inferencia)
             return segmentaciones
             
         except Exception as e:
-            print(f"❌ Error procesando imagen: {e}")
-            import traceback
-            traceback.print_exc()
+            log.error('❌ Error procesando imagen: %s', e, exc_info=True)
             return []
     
     def segmentar(self, imagen: np.ndarray) -> List[Dict]:
@@ -225,202 +232,203 @@ class SegmentadorPiezasCoples:
         """
         return self.procesar_imagen(imagen)
     
-    def _preprocesar_imagen(self, imagen: np.ndarray) -> np.ndarray:
-        """Preprocesa la imagen para el modelo ONNX."""
-        try:
-            # Redimensionar a 640x640
-            imagen_resized = cv2.resize(imagen, (self.input_size, self.input_size))
-            
-            # Convertir BGR a RGB
-            imagen_rgb = cv2.cvtColor(imagen_resized, cv2.COLOR_BGR2RGB)
-            
-            # Normalizar a [0, 1]
-            imagen_normalizada = imagen_rgb.astype(np.float32) / 255.0
-            
-            # Transponer a formato CHW (Channels, Height, Width)
-            imagen_chw = np.transpose(imagen_normalizada, (2, 0, 1))
-            
-            # Agregar dimensión de batch
-            imagen_batch = np.expand_dims(imagen_chw, axis=0)
-            
-            return imagen_batch
+    def segmentar_lote(self, imagenes: List[np.ndarray]) -> List[List[Dict]]:
+        """
+        Segmenta varias imágenes con una sola inferencia por lotes (NCHW).
+        
+        Si el modelo exportado tiene la dimensión de batch fija, la inferencia
+        se trocea en lotes de ese tamaño.
+        
+        La rutina de inspección no lo usa (segmenta cada ángulo en pipeline
+        con la captura del siguiente); queda para procesar lotes de imágenes
+        ya capturadas fuera del flujo en vivo.
+        
+        Args:
+            imagenes: Lista de imágenes BGR
             
+        Returns:
+            Lista (una por imagen, en el mismo orden) de listas de segmentaciones
+        """
+        resultados = [[] for _ in imagenes]
+        if self.session is None:
+            log.error('❌ Modelo no inicializado')
+            return resultados
+        if not imagenes:
+            return resultados
+        
+        inicio = time.time()
+        
+        # Preprocesar directamente en un único tensor (N, 3, 640, 640)
+        lote, transformaciones = self.preprocesador.preparar_lote(imagenes)
+        validos = [i for i, transformacion in enumerate(transformaciones) if transformacion is not None]
+        if not validos:
+            return resultados
+        if len(validos) < len(imagenes):
+            lote = lote[validos]
+        
+        try:
+            outputs, self.lote_maximo = ejecutar_lote(
+                self.session, self.input_name, self.output_names, lote, self.lote_maximo
+            )
+        except Exception as e:
+            log.error('❌ Error en inferencia por lotes: %s', e)
+            return resultados
+        
+        detections = np.array(outputs[0], copy=True)
+        mask_protos = np.array(outputs[1], copy=True)
+        if detections.shape[1] != 37:
+            log.warning('   ⚠️ Formato inesperado. Se esperaba (N, 37, M), se recibió %s', detections.shape)
+            return resultados
+        
+        # Decodificar todas las imágenes del lote a la vez
+        decodificadas = decodificar_detecciones_lote(detections, self.confianza_min)
+        for j, i in enumerate(validos):
+            boxes_xyxy, confidences, mask_coeffs = decodificadas[j]
+            resultados[i] = transformaciones[i].segmentaciones_a_original(
+                self._construir_segmentaciones(boxes_xyxy, confidences, mask_coeffs, mask_protos[j:j + 1])
+            )
+        
+        # Actualizar estadísticas (tiempo prorrateado por imagen)
+        tiempo_total = (time.time() - inicio) * 1000
+        self.tiempo_inferencia = tiempo_total / len(validos)
+        self.frames_procesados += len(validos)
+        self.stats['inferencias_totales'] += len(validos)
+        self.stats['tiempo_total'] += tiempo_total
+        self.stats['tiempo_promedio'] = self.stats['tiempo_total'] / self.stats['inferencias_totales']
+        self.stats['ultima_inferencia'] = self.tiempo_inferencia
+        
+        log.debug('🎉 Lote de %s imágenes procesado en %.0fms', len(validos), tiempo_total)
+        return resultados
+    
+    def _preprocesar_imagen(self, imagen: np.ndarray) -> Tuple[Optional[np.ndarray], Optional[TransformacionEntrada]]:
+        """
+        Preprocesa la imagen para el modelo ONNX (RGB, [0, 1], NCHW).
+        
+        Escribe en el tensor reservado del motor (ver PreprocesadorEntrada);
+        los frames que no miden 640x640 se escalan con letterbox.
+        
+        Returns:
+            (tensor (1, 3, 640, 640), transformación), o (None, None) si falla
+        """
+        try:
+            return self.preprocesador.preparar(imagen)
         except Exception as e:
-            print(f"❌ Error preprocesando imagen: {e}")
-            return None
+            log.error('❌ Error preprocesando imagen: %s', e)
+            return None, None
     
     def _procesar_salidas_segmentacion(self, outputs):
         """
         Procesa las salidas del modelo YOLO11-SEG para extraer segmentaciones
         BASADO EN EL MÉTODO DE DEFECTOS QUE FUNCIONA BIEN
         """
-        print(f"🔍 Procesando salidas de segmentación de piezas...")
-        print(f"   Número de outputs: {len(outputs)}")
-        
-        if len(outputs) > 0:
-            print(f"   Shape del primer output: {outputs[0].shape}")
+        log.debug('🔍 Procesando salidas de segmentación de piezas...')
         
-        segmentaciones = []
-        
-        # Procesar outputs de YOLO11-SEG
-        print(f"   🔍 DEBUG: Verificando outputs de YOLO11-SEG...")
-        print(f"   🔍 DEBUG: Hay {len(outputs)} outputs")
+        if len(outputs) < 2:
+            log.warning('   ⚠️ DEBUG: Se esperaban al menos 2 outputs, se recibieron %s', len(outputs))
+            return []
         
-        if len(outputs) >= 2:
+        with medir_etapa('decodificacion'):
             # CRÍTICO: Copiar outputs de ONNX inmediatamente para evitar segfaults
             # ONNX Runtime no garantiza ownership de memoria, causando crashes en operaciones NumPy
             detections = np.array(outputs[0], copy=True)  # (1, 37, 8400) - Bboxes + confianza + coeficientes
             mask_protos = np.array(outputs[1], copy=True)  # (1, 32, 160, 160) - Prototipos de máscaras
             
-            print(f"   ✅ DEBUG: Output 0 (detections): {detections.shape}")
-            print(f"   ✅ DEBUG: Output 1 (mask_protos): {mask_protos.shape}")
-            
             # Verificar formato de salida
             if detections.shape[1] != 37:
-                print(f"   ⚠️ DEBUG: Formato inesperado. Se esperaba (1, 37, N), se recibió {detections.shape}")
-                return segmentaciones
-            
-            # Transponer para facilitar procesamiento: (1, 37, 8400) -> (8400, 37)
-            predictions = detections[0].transpose()  # Shape: (8400, 37)
-            
-            # Separar componentes
-            boxes = predictions[:, :4]  # [x_center, y_center, width, height]
-            confidences = predictions[:, 4]  # Puntuaciones de confianza
-            mask_coeffs = predictions[:, 5:37]  # 32 coeficientes de máscara
-            
-            print(f"   🔍 DEBUG: Boxes shape: {boxes.shape}")
-            print(f"   🔍 DEBUG: Confidences shape: {confidences.shape}")
-            print(f"   🔍 DEBUG: Mask coefficients shape: {mask_coeffs.shape}")
-            
-            # Aplicar sigmoid a las confianzas
-            confidences = self._sigmoid(confidences)
-            
-            # Filtrar por confianza mínima
-            valid_indices = confidences > self.confianza_min
-            
-            if not np.any(valid_indices):
-                print(f"   ❌ No se encontraron detecciones con confianza > {self.confianza_min}")
-                return segmentaciones
-            
-            boxes = boxes[valid_indices]
-            confidences = confidences[valid_indices]
-            mask_coeffs = mask_coeffs[valid_indices]
-            
-            print(f"   ✅ {len(boxes)} detecciones pasaron el filtro de confianza")
-            
-            # Convertir formato de cajas de center_x, center_y, width, height a x1, y1, x2, y2
-            boxes_xyxy = self._convert_to_xyxy(boxes)
-            
-            # Aplicar Non-Maximum Suppression
-            indices = cv2.dnn.NMSBoxes(
-                boxes_xyxy.tolist(), 
-                confidences.tolist(), 
-                self.confianza_min, 
-                0.35  # IoU threshold
-            )
+                log.warning('   ⚠️ DEBUG: Formato inesperado. Se esperaba (1, 37, N), se recibió %s', detections.shape)
+                return []
             
-            if len(indices) > 0:
-                indices = indices.flatten()[:30]  # max_det
-                print(f"   ✅ {len(indices)} detecciones después de NMS")
-                
-                for i in indices:
-                    x1, y1, x2, y2 = boxes_xyxy[i]
-                    confidence = confidences[i]
-                    mask_coeff = mask_coeffs[i]
-                    
-                    # Calcular centroide
-                    cx = int((x1 + x2) / 2)
-                    cy = int((y1 + y2) / 2)
-                    
-                    # Generar máscara combinando coeficientes con prototipos
-                    try:
-                        # CRÍTICO: Copiar arrays de ONNX para evitar problemas de ownership de memoria
-                        # NumPy no toma ownership de arrays de ONNX Runtime, causando segfaults
-                        mask_coeff_copy = np.array(mask_coeff, dtype=np.float32, copy=True)
-                        mask_protos_copy = np.array(mask_protos, dtype=np.float32, copy=True)
-                        
-                        # Generar máscara con prototipos
-                        mask = self._generate_mask(mask_coeff_copy, mask_protos_copy, (x1, y1, x2, y2), (640, 640))
-                        
-                        if mask is None:
-                            # Fallback si _generate_mask falla
-                            mask = np.zeros((640, 640), dtype=np.float32)
-                            x1_int, y1_int, x2_int, y2_int = int(x1), int(y1), int(x2), int(y2)
-                            mask[y1_int:y2_int, x1_int:x2_int] = 1.0
-                        
-                    except Exception as e:
-                        print(f"   ⚠️  Error generando máscara: {e}")
-                        import traceback
-                        traceback.print_exc()
-                        
-                        # Fallback: máscara simple
-                        mask = np.zeros((640, 640), dtype=np.float32)
-                        x1_int, y1_int, x2_int, y2_int = int(x1), int(y1), int(x2), int(y2)
-                        mask[y1_int:y2_int, x1_int:x2_int] = 1.0
-                    
-                    # Calcular área de la máscara (siempre, independientemente del método usado)
-                    mask_area = int(np.sum(mask > 0.5))
-                    
-                    # Calcular dimensiones reales de la máscara
-                    if mask is not None:
-                        # Encontrar píxeles activos en la máscara
-                        y_coords, x_coords = np.where(mask > 0.5)
-                        if len(x_coords) > 0 and len(y_coords) > 0:
-                            ancho_mascara_real = int(np.max(x_coords) - np.min(x_coords))
-                            alto_mascara_real = int(np.max(y_coords) - np.min(y_coords))
-                        else:
-                            # Fallback a dimensiones del bbox
-                            ancho_mascara_real = int(x2 - x1)
-                            alto_mascara_real = int(y2 - y1)
-                    else:
-                        # Fallback a dimensiones del bbox
-                        ancho_mascara_real = int(x2 - x1)
-                        alto_mascara_real = int(y2 - y1)
-                    
-                    # Crear segmentación con máscaras reales
-                    segmentacion = {
-                        "clase": "Cople",
-                        "confianza": float(confidence),
-                        "bbox": {
-                            "x1": int(x1),
-                            "y1": int(y1),
-                            "x2": int(x2),
-                            "y2": int(y2)
-                        },
-                        "centroide": {
-                            "x": cx,
-                            "y": cy
-                        },
-                        "area": int((x2 - x1) * (y2 - y1)),
-                        "area_mascara": mask_area,
-                        "ancho_mascara": ancho_mascara_real,
-                        "alto_mascara": alto_mascara_real,
-                        "mascara": mask,  # Mantener como numpy array
-                        "coeficientes_mascara": mask_coeff.tolist()[:5],  # Solo primeros 5 coeficientes
-                        "contorno": self._bbox_to_contour(x1, y1, x2, y2)
-                    }
-                    
-                    # Debug de máscara
-                    if mask is not None:
-                        print(f"   ✅ Máscara creada: {mask.shape}, área: {mask_area}")
-                    else:
-                        print(f"   ⚠️  Máscara fallback creada: área: {mask_area}")
-                    
-                    segmentaciones.append(segmentacion)
-                    print(f"✅ Segmentación: Cople - {confidence:.3f} - BBox: ({int(x1)},{int(y1)}) a ({int(x2)},{int(y2)}) - Área: {int((x2 - x1) * (y2 - y1))} - Máscara: {ancho_mascara_real}x{alto_mascara_real}")
-            else:
-                print(f"   ❌ No se encontraron detecciones después de NMS")
-        else:
-            print(f"   ⚠️ DEBUG: Se esperaban al menos 2 outputs, se recibieron {len(outputs)}")
+            candidatas = filtrar_detecciones_lote(detections[:1], self.confianza_min)[0]
+        
+        with medir_etapa('nms'):
+            boxes_xyxy, confidences, mask_coeffs = aplicar_nms(candidatas, self.confianza_min)
+        
+        with medir_etapa('mascaras'):
+            segmentaciones = self._construir_segmentaciones(boxes_xyxy, confidences, mask_coeffs, mask_protos[:1])
+        
+        log.debug('🎯 Total segmentaciones de piezas encontradas: %s', len(segmentaciones))
+        return segmentaciones
+    
+    def _construir_segmentaciones(self, boxes_xyxy, confidences, mask_coeffs, mask_protos) -> List[Dict]:
+        """
+        Construye las segmentaciones de una imagen a partir de sus detecciones ya
+        filtradas por confianza y NMS.
         
-        print(f"🎯 Total segmentaciones de piezas encontradas: {len(segmentaciones)}")
+        Las máscaras de todas las instancias se ensamblan de una vez
+        (ver ensamblar_mascaras) y solo se redimensiona la región de cada bbox.
         
-        # Debug final: verificar que las máscaras estén presentes
-        for i, seg in enumerate(segmentaciones):
-            if 'mascara' in seg and seg['mascara'] is not None:
-                print(f"   ✅ Segmentación {i}: Máscara presente, shape: {len(seg['mascara'])} elementos")
+        Args:
+            boxes_xyxy: Cajas (K, 4) en formato x1, y1, x2, y2
+            confidences: Confianzas (K,)
+            mask_coeffs: Coeficientes de máscara (K, 32)
+            mask_protos: Prototipos de máscara de la imagen (1, 32, 160, 160)
+        """
+        segmentaciones = []
+        if len(boxes_xyxy) == 0:
+            return segmentaciones
+        
+        try:
+            # Umbral 0.7, y 0.8 si la máscara cubre >80% del bbox
+            mascaras = ensamblar_mascaras(
+                mask_coeffs, mask_protos, boxes_xyxy,
+                umbral=0.7, umbral_estricto=0.8, cobertura_maxima=0.8,
+                tamano_entrada=self.input_size
+            )
+        except Exception as e:
+            log.warning('   ⚠️  Error generando máscaras con prototipos: %s, usando fallback', e)
+            mascaras = [self._mascara_rectangular(box) for box in boxes_xyxy]
+        
+        for i in range(len(boxes_xyxy)):
+            x1, y1, x2, y2 = boxes_xyxy[i]
+            confidence = confidences[i]
+            mask_coeff = mask_coeffs[i]
+            recorte, (mx1, my1, mx2, my2) = mascaras[i]
+            
+            # Calcular centroide
+            cx = int((x1 + x2) / 2)
+            cy = int((y1 + y2) / 2)
+            
+            # Máscara compacta: recorte del bbox + desplazamiento
+            mask = MascaraCompacta(recorte, mx1, my1, (self.input_size, self.input_size))
+            mask_area = mask.area
+            
+            # Dimensiones reales de la máscara
+            bbox_mascara = mask.bbox
+            if bbox_mascara is not None:
+                bx1, by1, bx2, by2 = bbox_mascara
+                ancho_mascara_real = int(bx2 - bx1 - 1)
+                alto_mascara_real = int(by2 - by1 - 1)
             else:
-                print(f"   ❌ Segmentación {i}: Máscara ausente o None")
+                # Fallback a dimensiones del bbox
+                ancho_mascara_real = int(x2 - x1)
+                alto_mascara_real = int(y2 - y1)
+            
+            # Crear segmentación con máscaras reales
+            segmentacion = {
+                "clase": "Cople",
+                "confianza": float(confidence),
+                "bbox": {
+                    "x1": int(x1),
+                    "y1": int(y1),
+                    "x2": int(x2),
+                    "y2": int(y2)
+                },
+                "centroide": {
+                    "x": cx,
+                    "y": cy
+                },
+                "area": int((x2 - x1) * (y2 - y1)),
+                "area_mascara": mask_area,
+                "ancho_mascara": ancho_mascara_real,
+                "alto_mascara": alto_mascara_real,
+                "mascara": mask,  # MascaraCompacta (to_dense() para la máscara completa)
+                "coeficientes_mascara": mask_coeff.tolist()[:5],  # Solo primeros 5 coeficientes
+                "contorno": self._bbox_to_contour(x1, y1, x2, y2)
+            }
+            
+            segmentaciones.append(segmentacion)
+            if log.depurando():
+                log.debug('✅ Segmentación: Cople - %.3f - BBox: (%s,%s) a (%s,%s) - Área: %s - Máscara: %sx%s', confidence, int(x1), int(y1), int(x2), int(y2), int((x2 - x1) * (y2 - y1)), ancho_mascara_real, alto_mascara_real)
         
         return segmentaciones
     
@@ -437,71 +445,12 @@ class SegmentadorPiezasCoples:
         boxes_xyxy[:, 3] = boxes_cxcywh[:, 1] + boxes_cxcywh[:, 3] / 2  # y2
         return boxes_xyxy
     
-    def _generate_mask(self, mask_coeffs, mask_protos, bbox, input_shape):
-        """
-        Genera máscara a partir de coeficientes y prototipos de YOLO11
-        OPTIMIZADO PARA EVITAR TIMEOUTS DE CPU
-        """
-        try:
-            # Extraer prototipos (shape: [1, 32, 160, 160])
-            protos = mask_protos[0]  # Shape: [32, 160, 160]
-            
-            # OPTIMIZACIÓN: Usar np.dot en lugar de np.tensordot para mejor rendimiento
-            # Reshape para operación más eficiente
-            protos_reshaped = protos.reshape(32, -1)  # Shape: [32, 160*160]
-            
-            # Producto matricial para generar máscara
-            mask_flat = np.dot(mask_coeffs, protos_reshaped)  # Shape: [160*160]
-            mask = mask_flat.reshape(160, 160)  # Shape: [160, 160]
-            
-            # Aplicar sigmoid para normalizar
-            mask = self._sigmoid(mask)
-            
-            # Redimensionar a input_shape
-            H, W = input_shape
-            if mask.shape != (H, W):
-                mask = cv2.resize(mask, (W, H))
-            
-            # Recortar a la región del bounding box para mejorar precisión
-            x1, y1, x2, y2 = map(int, bbox)
-            mask_cropped = np.zeros_like(mask)
-            
-            # Aplicar máscara solo en la región del bbox
-            if x1 < W and y1 < H and x2 > 0 and y2 > 0:
-                x1 = max(0, x1)
-                y1 = max(0, y1)
-                x2 = min(W, x2)
-                y2 = min(H, y2)
-                
-                # Extraer región de la máscara original
-                bbox_mask = mask[y1:y2, x1:x2]
-                
-                # Aplicar umbral para binarizar la máscara
-                bbox_mask_binary = (bbox_mask > 0.7).astype(np.float32)
-                mask_cropped[y1:y2, x1:x2] = bbox_mask_binary
-                
-                # Validar que la máscara no sea demasiado grande (ajuste dinámico)
-                pixels_activos = np.sum(mask_cropped > 0.5)
-                area_bbox = (x2 - x1) * (y2 - y1)
-                
-                if pixels_activos > area_bbox * 0.8:
-                    # Aplicar umbral más estricto si la máscara cubre >80% del bbox
-                    bbox_mask_binary = (bbox_mask > 0.8).astype(np.float32)
-                    mask_cropped[y1:y2, x1:x2] = bbox_mask_binary
-            
-            return mask_cropped
-            
-        except Exception as e:
-            print(f"   ⚠️  Error generando máscara con prototipos: {e}, usando fallback")
-            # Fallback: máscara rectangular simple
-            x1, y1, x2, y2 = map(int, bbox)
-            H, W = input_shape
-            
-            mask = np.zeros((H, W), dtype=np.float32)
-            mask[y1:y2, x1:x2] = 1.0
-            
-            print(f"   ✅ Máscara fallback generada: {mask.shape}, píxeles activos: {np.sum(mask > 0.5)}")
-            return mask
+    def _mascara_rectangular(self, box):
+        """Máscara rectangular (recorte de unos del tamaño del bbox recortado a la imagen)"""
+        x1, y1, x2, y2 = (int(v) for v in box)
+        x1, y1 = max(0, x1), max(0, y1)
+        x2, y2 = max(x1, min(self.input_size, x2)), max(y1, min(self.input_size, y2))
+        return np.ones((y2 - y1, x2 - x1), dtype=np.uint8), (x1, y1, x2, y2)
     
     def _bbox_to_contour(self, x1, y1, x2, y2):
         """Convierte bbox a contorno"""
@@ -524,4 +473,4 @@ class SegmentadorPiezasCoples:
         if self.session:
             del self.session
             self.session = None
-        print("✅ Recursos del segmentador de piezas liberados")
+        log.debug('✅ Recursos del segmentador de piezas liberados')
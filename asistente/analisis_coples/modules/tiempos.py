@@ -0,0 +1,84 @@
+"""
+Tiempos por etapa de un análisis.
+
+Un RegistroTiempos acumula la duración (ms) de cada etapa del pipeline
+(preprocesamiento, inferencia, decodificación, NMS, máscaras, mediciones,
+visualización, codificación JPEG, persistencia...). El servicio que ejecuta el
+análisis lo activa con `with registro.activo():` y los motores marcan sus
+etapas con `medir_etapa(...)` sin recibirlo como argumento; fuera de un
+registro activo, medir_etapa no hace nada.
+"""
+
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Optional
+
+# Etapas conocidas, en el orden del pipeline
+ETAPAS = (
+    'captura',
+    'preprocesamiento',
+    'inferencia',
+    'decodificacion',
+    'nms',
+    'mascaras',
+    'mediciones',
+    'visualizacion',
+    'codificacion_jpeg',
+    'persistencia',
+)
+
+_registro_activo: ContextVar[Optional['RegistroTiempos']] = ContextVar('registro_tiempos', default=None)
+
+
+class RegistroTiempos:
+    """Duración acumulada (ms) de cada etapa de un análisis"""
+
+    def __init__(self):
+        self.etapas: Dict[str, float] = {}
+        self._inicio = time.perf_counter()
+
+    def agregar(self, etapa: str, duracion_ms: float) -> None:
+        """Suma una duración a la etapa (una etapa puede medirse varias veces)"""
+        self.etapas[etapa] = self.etapas.get(etapa, 0.0) + duracion_ms
+
+    @contextmanager
+    def medir(self, etapa: str):
+        inicio = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.agregar(etapa, (time.perf_counter() - inicio) * 1000)
+
+    @contextmanager
+    def activo(self):
+        """Hace de este registro el destino de medir_etapa en el contexto actual"""
+        token = _registro_activo.set(self)
+        try:
+            yield self
+        finally:
+            _registro_activo.reset(token)
+
+    def transcurrido_ms(self) -> float:
+        """Tiempo desde que se creó el registro"""
+        return (time.perf_counter() - self._inicio) * 1000
+
+    def como_dict(self) -> Dict[str, float]:
+        """Etapas como {'<etapa>_ms': ms}, en el orden del pipeline"""
+        orden = sorted(self.etapas, key=lambda e: ETAPAS.index(e) if e in ETAPAS else len(ETAPAS))
+        return {f'{etapa}_ms': round(self.etapas[etapa], 2) for etapa in orden}
+
+
+def registro_activo() -> Optional[RegistroTiempos]:
+    return _registro_activo.get()
+
+
+@contextmanager
+def medir_etapa(etapa: str):
+    """Mide una etapa en el registro activo (no-op si no hay ninguno)"""
+    registro = _registro_activo.get()
+    if registro is None:
+        yield
+        return
+    with registro.medir(etapa):
+        yield
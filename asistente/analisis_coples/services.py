@@ -29,12 +29,15 @@ from utils import guardar_imagen_clasificacion
 
 # Importar modelos Django
 from .models import ConfiguracionSistema, AnalisisCople
+from .services.persistencia_service import (
+    construir_segmentaciones_defectos,
+    construir_segmentaciones_piezas,
+    persistir_analisis,
+)
 from .resultados_models import (
     ResultadoClasificacion,
     DeteccionPieza,
-    DeteccionDefecto,
-    SegmentacionDefecto,
-    SegmentacionPieza
+    DeteccionDefecto
 )
 
 logger = logging.getLogger(__name__)
@@ -269,12 +272,14 @@ class ServicioAnalisisCoples:
             self._guardar_resultados_clasificacion(analisis_db, resultados)
             self._guardar_detecciones_piezas(analisis_db, resultados)
             self._guardar_detecciones_defectos(analisis_db, resultados)
-            self._guardar_segmentaciones_defectos(analisis_db, resultados)
-            self._guardar_segmentaciones_piezas(analisis_db, resultados)
+            filas = (
+                self._construir_segmentaciones(analisis_db, resultados, "segmentaciones_defectos")
+                + self._construir_segmentaciones(analisis_db, resultados, "segmentaciones_piezas")
+            )
             
-            # Marcar como completado
+            # Marcar como completado y guardar segmentaciones + registro en una transacción
             analisis_db.estado = 'completado'
-            analisis_db.save()
+            persistir_analisis(analisis_db, filas, tiempos=dict(resultados.get("tiempos", {})))
             
         except Exception as e:
             logger.error(f"Error procesando resultados: {e}")
@@ -357,10 +362,18 @@ class ServicioAnalisisCoples:
                 area=deteccion.get("area", 0)
             )
     
-    def _guardar_segmentaciones_defectos(self, analisis_db: AnalisisCople, resultados: Dict[str, Any]):
-        """Guarda las segmentaciones de defectos con mediciones calculadas"""
-        if "segmentaciones_defectos" not in resultados:
-            return
+    def _construir_segmentaciones(self, analisis_db: AnalisisCople, resultados: Dict[str, Any], clave: str) -> list:
+        """
+        Calcula las mediciones y construye (sin guardar) las segmentaciones de
+        piezas o defectos para escribirlas después con bulk_create.
+        
+        Args:
+            analisis_db: Análisis padre
+            resultados: Resultados del sistema de análisis
+            clave: 'segmentaciones_piezas' o 'segmentaciones_defectos'
+        """
+        if clave not in resultados:
+            return []
         
         # Obtener servicio de mediciones
         measurement_service = get_measurement_service()
@@ -370,121 +383,22 @@ class ServicioAnalisisCoples:
         if config and config.factor_conversion_px_mm:
             measurement_service.set_conversion_factor(config.factor_conversion_px_mm)
         
-        for segmentacion in resultados["segmentaciones_defectos"]:
-            bbox = segmentacion.get("bbox", {})
-            centroide = segmentacion.get("centroide", {})
-            
-            # Calcular mediciones si hay máscara
-            mediciones = {}
-            mascara_raw = segmentacion.get("mascara")
-            if mascara_raw is not None:
-                import numpy as np
-                # Convertir máscara a numpy array si es necesario
-                if not isinstance(mascara_raw, np.ndarray):
-                    mascara_raw = np.array(mascara_raw, dtype=np.uint8)
-                
-                # Calcular mediciones completas
-                mediciones = measurement_service.calcular_mediciones_completas(
-                    mascara_raw,
-                    convertir_a_mm=bool(config and config.factor_conversion_px_mm)
-                )
-                logger.info(f"📐 Mediciones calculadas para defecto {segmentacion.get('clase')}: {mediciones}")
-            
-            SegmentacionDefecto.objects.create(
-                analisis=analisis_db,
-                clase=segmentacion.get("clase", ""),
-                confianza=segmentacion.get("confianza", 0.0),
-                bbox_x1=bbox.get("x1", 0),
-                bbox_y1=bbox.get("y1", 0),
-                bbox_x2=bbox.get("x2", 0),
-                bbox_y2=bbox.get("y2", 0),
-                # Dimensiones del bounding box
-                ancho_bbox_px=mediciones.get("ancho_bbox_px", 0.0),
-                alto_bbox_px=mediciones.get("alto_bbox_px", 0.0),
-                centroide_x=centroide.get("x", 0),
-                centroide_y=centroide.get("y", 0),
-                # Propiedades de la máscara
-                area_mascara_px=int(mediciones.get("area_mascara_px", 0)),
-                ancho_mascara_px=mediciones.get("ancho_bbox_px", 0.0),  # Usar ancho del bbox
-                alto_mascara_px=mediciones.get("alto_bbox_px", 0.0),  # Usar alto del bbox
-                perimetro_mascara_px=mediciones.get("perimetro_mascara_px", 0.0),
-                # Geometría avanzada
-                excentricidad=mediciones.get("excentricidad", 0.0),
-                orientacion_grados=mediciones.get("orientacion_grados", 0.0),
-                # Mediciones en mm (si están disponibles)
-                ancho_bbox_mm=mediciones.get("ancho_bbox_mm"),
-                alto_bbox_mm=mediciones.get("alto_bbox_mm"),
-                ancho_mascara_mm=mediciones.get("ancho_bbox_mm"),  # Usar ancho del bbox
-                alto_mascara_mm=mediciones.get("alto_bbox_mm"),  # Usar alto del bbox
-                perimetro_mascara_mm=mediciones.get("perimetro_mascara_mm"),
-                area_mascara_mm=mediciones.get("area_mascara_mm"),
-                coeficientes_mascara=segmentacion.get("coeficientes_mascara", [])
-            )
-    
-    def _guardar_segmentaciones_piezas(self, analisis_db: AnalisisCople, resultados: Dict[str, Any]):
-        """Guarda las segmentaciones de piezas con mediciones calculadas"""
-        if "segmentaciones_piezas" not in resultados:
-            return
+        segmentaciones = resultados[clave]
+        es_pieza = clave == 'segmentaciones_piezas'
         
-        # Obtener servicio de mediciones
-        measurement_service = get_measurement_service()
+        # Calcular mediciones de todas las máscaras (dict vacío si no hay máscara)
+        mediciones_lote = measurement_service.calcular_mediciones_lote(
+            [segmentacion.get("mascara") for segmentacion in segmentaciones],
+            convertir_a_mm=bool(config and config.factor_conversion_px_mm)
+        )
         
-        # Cargar configuración para factor de conversión (si existe)
-        config = ConfiguracionSistema.objects.filter(activa=True).first()
-        if config and config.factor_conversion_px_mm:
-            measurement_service.set_conversion_factor(config.factor_conversion_px_mm)
+        for segmentacion, mediciones in zip(segmentaciones, mediciones_lote):
+            if mediciones:
+                logger.info(f"📐 Mediciones calculadas para {'pieza' if es_pieza else 'defecto'} {segmentacion.get('clase')}: {mediciones}")
         
-        for segmentacion in resultados["segmentaciones_piezas"]:
-            bbox = segmentacion.get("bbox", {})
-            centroide = segmentacion.get("centroide", {})
-            
-            # Calcular mediciones si hay máscara
-            mediciones = {}
-            mascara_raw = segmentacion.get("mascara")
-            if mascara_raw is not None:
-                import numpy as np
-                # Convertir máscara a numpy array si es necesario
-                if not isinstance(mascara_raw, np.ndarray):
-                    mascara_raw = np.array(mascara_raw, dtype=np.uint8)
-                
-                # Calcular mediciones completas
-                mediciones = measurement_service.calcular_mediciones_completas(
-                    mascara_raw,
-                    convertir_a_mm=bool(config and config.factor_conversion_px_mm)
-                )
-                logger.info(f"📐 Mediciones calculadas para pieza {segmentacion.get('clase')}: {mediciones}")
-            
-            SegmentacionPieza.objects.create(
-                analisis=analisis_db,
-                clase=segmentacion.get("clase", ""),
-                confianza=segmentacion.get("confianza", 0.0),
-                bbox_x1=bbox.get("x1", 0),
-                bbox_y1=bbox.get("y1", 0),
-                bbox_x2=bbox.get("x2", 0),
-                bbox_y2=bbox.get("y2", 0),
-                # Dimensiones del bounding box
-                ancho_bbox_px=mediciones.get("ancho_bbox_px", 0.0),
-                alto_bbox_px=mediciones.get("alto_bbox_px", 0.0),
-                centroide_x=centroide.get("x", 0),
-                centroide_y=centroide.get("y", 0),
-                # Propiedades de la máscara
-                area_mascara_px=int(mediciones.get("area_mascara_px", 0)),
-                ancho_mascara_px=mediciones.get("ancho_bbox_px", 0.0),  # Usar ancho del bbox
-                alto_mascara_px=mediciones.get("alto_bbox_px", 0.0),  # Usar alto del bbox
-                perimetro_mascara_px=mediciones.get("perimetro_mascara_px", 0.0),
-                # Geometría avanzada
-                excentricidad=mediciones.get("excentricidad", 0.0),
-                orientacion_grados=mediciones.get("orientacion_grados", 0.0),
-                # Mediciones en mm (si están disponibles)
-                ancho_bbox_mm=mediciones.get("ancho_bbox_mm"),
-                alto_bbox_mm=mediciones.get("alto_bbox_mm"),
-                ancho_mascara_mm=mediciones.get("ancho_bbox_mm"),  # Usar ancho del bbox
-                alto_mascara_mm=mediciones.get("alto_bbox_mm"),  # Usar alto del bbox
-                perimetro_mascara_mm=mediciones.get("perimetro_mascara_mm"),
-                area_mascara_mm=mediciones.get("area_mascara_mm"),
-                coeficientes_mascara=segmentacion.get("coeficientes_mascara", [])
-            )
-    
+        construir = construir_segmentaciones_piezas if es_pieza else construir_segmentaciones_defectos
+        return construir(analisis_db, segmentaciones, mediciones_lote, clase_por_defecto="")
+
     def obtener_estadisticas_sistema(self) -> Dict[str, Any]:
         """
         Obtiene estadísticas del sistema de análisis
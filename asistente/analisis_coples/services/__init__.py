@@ -3,12 +3,15 @@ Servicios del sistema de análisis de coples.
 """
 
 from .camera_service import CameraService, get_camera_service
+from .model_registry import ModelRegistry, get_model_registry
 from .segmentation_analysis_service import SegmentationAnalysisService, get_segmentation_analysis_service
 from .rutina_inspeccion_service import RutinaInspeccionService, get_rutina_inspeccion_service
 
 __all__ = [
     'CameraService',
     'get_camera_service',
+    'ModelRegistry',
+    'get_model_registry',
     'SegmentationAnalysisService',
     'get_segmentation_analysis_service',
     'RutinaInspeccionService',
@@ -0,0 +1,381 @@
+"""
+Daemon de cámara y cliente IPC.
+
+Con varios workers de Gunicorn solo el proceso que abrió la cámara puede
+capturar. El daemon (manage.py camara_daemon) es el único dueño de la cámara
+GigE o webcam y atiende a los demás procesos:
+
+- Control (inicializar, preview, hibernación, estado) por un socket Unix
+  local con mensajes JSON de una línea.
+- Capturas y preview por memoria compartida: el daemon escribe el frame en un
+  anillo (AnilloFramesCompartido) y responde solo con su secuencia; el
+  cliente lo lee sin serializar la imagen.
+
+ClienteCamara expone la misma interfaz que CameraService, así que vistas y
+servicios no distinguen si la cámara está en el propio proceso o en el daemon.
+"""
+
+import json
+import logging
+import os
+import socket
+import socketserver
+import threading
+from typing import Any, Dict, Optional, Tuple
+
+import numpy as np
+
+from django.db import connection
+
+from ..expo_config import CameraConfig
+from ..models import EstadoCamara
+from ..modules.capture.anillo_compartido import AnilloFramesCompartido
+from .difusor_preview import DifusorPreview, FramePreview
+from .relevo_preview import RelevoPreview
+
+logger = logging.getLogger(__name__)
+
+
+def _enviar(archivo, mensaje: Dict[str, Any]) -> None:
+    archivo.write(json.dumps(mensaje).encode('utf-8') + b'\n')
+    archivo.flush()
+
+
+def _recibir(archivo) -> Optional[Dict[str, Any]]:
+    linea = archivo.readline()
+    if not linea:
+        return None
+    return json.loads(linea)
+
+
+# ----------------------------------------------------------------------
+# Servidor (proceso dueño de la cámara)
+# ----------------------------------------------------------------------
+
+class _ManejadorConexion(socketserver.StreamRequestHandler):
+    """Atiende los mensajes de una conexión hasta que el cliente la cierra"""
+
+    def handle(self):
+        while True:
+            try:
+                mensaje = _recibir(self.rfile)
+            except (ValueError, ConnectionError):
+                return
+            if mensaje is None:
+                return
+            respuesta = self.server.daemon_camara.atender(
+                mensaje.get('comando', ''),
+                mensaje.get('args') or {}
+            )
+            try:
+                _enviar(self.wfile, respuesta)
+            except (BrokenPipeError, ConnectionError):
+                return
+
+    def finish(self):
+        super().finish()
+        # Cada conexión corre en su hilo: no dejar su conexión a BD abierta
+        connection.close()
+
+
+class _ServidorSocket(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+class DaemonCamara:
+    """
+    Dueño de la cámara: envuelve un CameraService local y atiende los
+    comandos de los clientes por el socket.
+    """
+
+    def __init__(self, camera_service, ruta_socket: str):
+        """
+        Args:
+            camera_service: CameraService local (abre la cámara en este proceso)
+            ruta_socket: Ruta del socket Unix
+        """
+        self.servicio = camera_service
+        self.ruta_socket = ruta_socket
+        self.servidor: Optional[_ServidorSocket] = None
+
+        self.anillo_capturas: Optional[AnilloFramesCompartido] = None
+        self.captura_lock = threading.Lock()
+
+        self.comandos = {
+            'ping': lambda: {'success': True, 'pid': os.getpid()},
+            'inicializar': self.servicio.inicializar_camara,
+            'liberar': self.servicio.liberar_camara,
+            'capturar': self._capturar,
+            'capturar_posterior': self._capturar_posterior,
+            'iniciar_preview': self.servicio.iniciar_preview,
+            'detener_preview': self.servicio.detener_preview,
+            'hibernar': self.servicio.hibernar,
+            'reactivar_preview': self.servicio.reactivar_preview,
+            'resetear_hibernacion': self._resetear_hibernacion,
+            'estado': self._estado,
+        }
+
+    def atender(self, comando: str, args: Dict[str, Any]) -> Dict[str, Any]:
+        """Ejecuta un comando y devuelve la respuesta serializable"""
+        funcion = self.comandos.get(comando)
+        if funcion is None:
+            return {'success': False, 'error': f'Comando desconocido: {comando}'}
+        try:
+            return funcion(**args)
+        except Exception as e:
+            logger.error(f"Error atendiendo comando '{comando}': {e}")
+            return {'success': False, 'error': str(e)}
+
+    def _capturar(self) -> Dict[str, Any]:
+        """Captura un frame y lo deja en el anillo de capturas"""
+        with self.captura_lock:
+            exito, imagen = self.servicio.capturar_imagen()
+            if not exito or imagen is None:
+                return {'success': False, 'error': 'Error capturando imagen de la cámara'}
+            return self._publicar_captura(imagen)
+
+    def _capturar_posterior(
+        self,
+        no_antes_de: Optional[float] = None,
+        despues_de_seq: int = 0,
+        timeout: float = CameraConfig.CAPTURE_TIMEOUT
+    ) -> Dict[str, Any]:
+        """Espera el primer frame posterior al evento y lo deja en el anillo de capturas"""
+        with self.captura_lock:
+            exito, imagen, seq_camara, timestamp = self.servicio.capturar_imagen_posterior(
+                no_antes_de, despues_de_seq, timeout
+            )
+            if not exito or imagen is None:
+                return {'success': False, 'error': 'No llegó un frame posterior al evento'}
+            respuesta = self._publicar_captura(imagen)
+            respuesta.update({'seq_camara': seq_camara, 'timestamp': timestamp})
+            return respuesta
+
+    def _publicar_captura(self, imagen: np.ndarray) -> Dict[str, Any]:
+        shape = imagen.shape if imagen.ndim == 3 else (*imagen.shape, 1)
+        if self.anillo_capturas is None or self.anillo_capturas.shape != shape:
+            if self.anillo_capturas is not None:
+                self.anillo_capturas.cerrar()
+            self.anillo_capturas = AnilloFramesCompartido.crear(
+                CameraConfig.CAPTURA_SHM_NAME, shape, CameraConfig.CAPTURA_SHM_SLOTS
+            )
+        seq = self.anillo_capturas.escribir(imagen)
+        return {'success': True, 'seq': seq, 'ndim': imagen.ndim}
+
+    def _resetear_hibernacion(self) -> Dict[str, Any]:
+        self.servicio.resetear_timer_hibernacion()
+        return {'success': True}
+
+    def _estado(self) -> Dict[str, Any]:
+        estado = self.servicio.obtener_estado()
+        # El estado vivo del daemon manda sobre el de BD
+        estado['activa'] = self.servicio.es_dueno_camara()
+        estado['en_preview'] = self.servicio.preview_activo
+        estado['daemon_pid'] = os.getpid()
+        return estado
+
+    def _reiniciar_estado_bd(self) -> None:
+        """Al arrancar no hay cámara abierta, aunque la BD diga otra cosa tras una caída"""
+        estado = EstadoCamara.get_estado()
+        estado.activa = False
+        estado.en_preview = False
+        estado.hibernada = False
+        estado.save()
+
+    def servir(self) -> None:
+        """Escucha en el socket hasta que se llame a detener()"""
+        if not self.servicio.es_dueno_camara():
+            self._reiniciar_estado_bd()
+
+        if os.path.exists(self.ruta_socket):
+            os.unlink(self.ruta_socket)
+        os.makedirs(os.path.dirname(self.ruta_socket) or '.', exist_ok=True)
+
+        self.servidor = _ServidorSocket(self.ruta_socket, _ManejadorConexion)
+        self.servidor.daemon_camara = self
+        os.chmod(self.ruta_socket, 0o660)
+
+        logger.info(f"📷 Daemon de cámara escuchando en {self.ruta_socket}")
+        self.servidor.serve_forever(poll_interval=0.5)
+
+    def detener(self) -> None:
+        """Deja de atender, libera la cámara y elimina socket y anillos"""
+        if self.servidor is not None:
+            self.servidor.shutdown()
+            self.servidor.server_close()
+            self.servidor = None
+
+        self.servicio.liberar_camara()
+
+        with self.captura_lock:
+            if self.anillo_capturas is not None:
+                self.anillo_capturas.cerrar()
+                self.anillo_capturas = None
+
+        if os.path.exists(self.ruta_socket):
+            os.unlink(self.ruta_socket)
+        logger.info("📷 Daemon de cámara detenido")
+
+
+# ----------------------------------------------------------------------
+# Cliente (workers web, trabajadores de la cola)
+# ----------------------------------------------------------------------
+
+class ClienteCamara:
+    """
+    Cliente ligero del daemon de cámara con la interfaz de CameraService.
+    """
+
+    def __init__(self, ruta_socket: str, timeout: float = CameraConfig.DAEMON_TIMEOUT):
+        self.ruta_socket = ruta_socket
+        self.timeout = timeout
+
+        self.difusor_preview = DifusorPreview()
+        self.relevo_preview = RelevoPreview(self.difusor_preview)
+
+        self.anillo_capturas: Optional[AnilloFramesCompartido] = None
+        self.anillo_lock = threading.Lock()
+
+    def _llamar(self, comando: str, espera: Optional[float] = None, **args) -> Dict[str, Any]:
+        """Envía un comando al daemon y devuelve su respuesta (`espera`: timeout del socket)"""
+        try:
+            with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as conexion:
+                conexion.settimeout(espera or self.timeout)
+                conexion.connect(self.ruta_socket)
+                with conexion.makefile('rwb') as archivo:
+                    _enviar(archivo, {'comando': comando, 'args': args})
+                    respuesta = _recibir(archivo)
+        except (FileNotFoundError, ConnectionRefusedError):
+            logger.error(f"Daemon de cámara no disponible en {self.ruta_socket}")
+            return {'success': False, 'error': 'Daemon de cámara no disponible'}
+        except (OSError, ValueError) as e:
+            logger.error(f"Error comunicando con el daemon de cámara ({comando}): {e}")
+            return {'success': False, 'error': f'Error comunicando con el daemon de cámara: {e}'}
+
+        if respuesta is None:
+            return {'success': False, 'error': 'El daemon de cámara cerró la conexión'}
+        return respuesta
+
+    def daemon_disponible(self) -> bool:
+        return self._llamar('ping', espera=1.0).get('success', False)
+
+    # Control ---------------------------------------------------------------
+
+    def inicializar_camara(self, ip_camara: str = "172.16.1.24") -> Dict[str, Any]:
+        return self._llamar('inicializar', espera=CameraConfig.DAEMON_TIMEOUT_INICIALIZAR, ip_camara=ip_camara)
+
+    def liberar_camara(self) -> Dict[str, Any]:
+        return self._llamar('liberar')
+
+    def iniciar_preview(self, fps: int = 5) -> Dict[str, Any]:
+        return self._llamar('iniciar_preview', fps=fps)
+
+    def detener_preview(self) -> Dict[str, Any]:
+        return self._llamar('detener_preview')
+
+    def hibernar(self) -> Dict[str, Any]:
+        return self._llamar('hibernar')
+
+    def reactivar_preview(self, fps: int = 5) -> Dict[str, Any]:
+        return self._llamar('reactivar_preview', fps=fps)
+
+    def resetear_timer_hibernacion(self) -> None:
+        self._llamar('resetear_hibernacion')
+
+    def obtener_estado(self) -> Dict[str, Any]:
+        estado = self._llamar('estado')
+        if 'error' in estado:
+            # Sin daemon no hay cámara, diga lo que diga la BD
+            estado.update({'activa': False, 'en_preview': False})
+        estado['tiene_frame'] = estado.get('tiene_frame', False) or self.difusor_preview.ultimo() is not None
+        estado['clientes_preview'] = self.difusor_preview.num_suscriptores
+        return estado
+
+    # Capturas --------------------------------------------------------------
+
+    def _abrir_anillo_capturas(self) -> Optional[AnilloFramesCompartido]:
+        with self.anillo_lock:
+            if self.anillo_capturas is not None and not self.anillo_capturas.activo:
+                self.anillo_capturas.cerrar()
+                self.anillo_capturas = None
+            if self.anillo_capturas is None:
+                self.anillo_capturas = AnilloFramesCompartido.abrir(CameraConfig.CAPTURA_SHM_NAME)
+            return self.anillo_capturas
+
+    def _leer_captura(self, respuesta: Dict[str, Any]) -> Optional[np.ndarray]:
+        """Lee del anillo de capturas el frame que indica la respuesta del daemon"""
+        # El daemon recrea el anillo si cambia la resolución; se reabre solo
+        anillo = self._abrir_anillo_capturas()
+        leido = anillo.leer(respuesta['seq'], copiar=True) if anillo is not None else None
+        if leido is None:
+            logger.error("La captura ya no está en el anillo compartido")
+            return None
+        imagen = leido[2]
+        if respuesta.get('ndim') == 2:
+            imagen = imagen[:, :, 0]
+        return imagen
+
+    def capturar_imagen(self) -> Tuple[bool, Optional[np.ndarray]]:
+        """
+        Pide una captura al daemon y la lee del anillo de capturas.
+
+        Returns:
+            Tuple[bool, Optional[np.ndarray]]: (éxito, imagen)
+        """
+        respuesta = self._llamar('capturar')
+        if not respuesta.get('success'):
+            logger.error(f"Error capturando imagen: {respuesta.get('error')}")
+            return (False, None)
+
+        imagen = self._leer_captura(respuesta)
+        return (imagen is not None, imagen)
+
+    def capturar_imagen_posterior(
+        self,
+        no_antes_de: Optional[float] = None,
+        despues_de_seq: int = 0,
+        timeout: float = CameraConfig.CAPTURE_TIMEOUT
+    ) -> Tuple[bool, Optional[np.ndarray], int, float]:
+        """
+        Captura en el daemon el primer frame expuesto después del evento
+        (time.time() es común a todos los procesos de la máquina).
+
+        Returns:
+            Tuple[bool, Optional[np.ndarray], int, float]: (éxito, imagen, seq, timestamp)
+        """
+        respuesta = self._llamar(
+            'capturar_posterior',
+            espera=timeout + self.timeout,
+            no_antes_de=no_antes_de,
+            despues_de_seq=despues_de_seq,
+            timeout=timeout
+        )
+        if not respuesta.get('success'):
+            logger.error(f"Error capturando imagen posterior: {respuesta.get('error')}")
+            return (False, None, 0, 0.0)
+
+        imagen = self._leer_captura(respuesta)
+        if imagen is None:
+            return (False, None, 0, 0.0)
+        return (True, imagen, respuesta['seq_camara'], respuesta['timestamp'])
+
+    # Preview ---------------------------------------------------------------
+
+    def es_dueno_camara(self) -> bool:
+        return False
+
+    def preview_disponible(self) -> bool:
+        return self.relevo_preview.disponible()
+
+    def asegurar_relevo_preview(self) -> None:
+        self.relevo_preview.asegurar()
+
+    def obtener_frame_preview(self) -> Optional[FramePreview]:
+        self.relevo_preview.asegurar()
+        return self.difusor_preview.ultimo()
+
+    @property
+    def preview_activo(self) -> bool:
+        return self.preview_disponible()
+
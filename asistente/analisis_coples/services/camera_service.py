@@ -4,6 +4,8 @@ Servicio de control de cámara GigE Vision.
 Gestiona:
 - Inicialización y liberación de cámara GigE
 - Preview a 5 FPS con auto-hibernación
+- Frames del preview en memoria compartida para los demás procesos
+- Cliente del daemon de cámara cuando otro proceso es el dueño (camara_ipc)
 - Estado persistente en BD (EstadoCamara)
 - Carga dinámica de modelos (uno a la vez para optimizar RAM)
 """
@@ -11,17 +13,25 @@ Gestiona:
 import logging
 import threading
 import time
-from typing import Optional, Dict, Any, Tuple
+from typing import TYPE_CHECKING, Optional, Dict, Any, List, Tuple, Union
 from datetime import datetime, timedelta
 import numpy as np
 import cv2
 
+from django.conf import settings
 from django.utils import timezone
-from django.core.cache import cache
 
 from ..models import EstadoCamara
 from ..modules.capture.camera_controller import CamaraTiempoOptimizada
+from ..modules.capture.camara_simulada import CamaraSimulada
 from ..modules.capture.webcam_fallback import WebcamFallback, detectar_mejor_webcam
+from ..modules.capture.anillo_compartido import AnilloFramesCompartido
+from ..expo_config import CameraConfig
+from .difusor_preview import DifusorPreview, FramePreview
+from .relevo_preview import RelevoPreview
+
+if TYPE_CHECKING:
+    from .camara_ipc import ClienteCamara
 
 logger = logging.getLogger(__name__)
 
@@ -57,6 +67,19 @@ class CameraService:
         self.ultimo_frame_timestamp: Optional[datetime] = None
         self.frame_lock: threading.Lock = threading.Lock()
         
+        # JPEG del preview: se codifica una vez por frame y se difunde a todos los clientes
+        self.difusor_preview = DifusorPreview()
+        self.calidad_jpeg_preview: int = 85
+        
+        # Frames compartidos con otros procesos: el dueño de la cámara escribe
+        # el anillo, el resto lo lee y re-difunde el preview (RelevoPreview)
+        self.anillo_preview: Optional[AnilloFramesCompartido] = None
+        self.relevo_preview = RelevoPreview(
+            self.difusor_preview,
+            calidad_jpeg=self.calidad_jpeg_preview,
+            debe_continuar=lambda: not self.es_dueno_camara()
+        )
+        
         # Cargar estado de BD
         self._sincronizar_estado_bd()
     
@@ -119,21 +142,31 @@ class CameraService:
             Dict con resultado de la operación
         """
         try:
-            logger.info(f"Inicializando cámara GigE en {ip_camara}...")
-            
-            # Intentar cámara GigE primero
-            self.camara_gige = CamaraTiempoOptimizada(ip=ip_camara)
+            simulada = CameraConfig.BACKEND == 'simulado'
+            logger.info(f"Inicializando cámara {'simulada' if simulada else 'GigE'} en {ip_camara}...")
+            
+            # Intentar cámara GigE primero (o la simulada, con el mismo controlador)
+            if simulada:
+                self.camara_gige = CamaraSimulada(
+                    fuente=CameraConfig.SIMULADA_FUENTE or None,
+                    jitter=CameraConfig.SIMULADA_JITTER,
+                    tasa_perdida=CameraConfig.SIMULADA_PERDIDA,
+                    ip=ip_camara
+                )
+            else:
+                self.camara_gige = CamaraTiempoOptimizada(ip=ip_camara)
             
-            if self.camara_gige.configurar_camara():
+            if self.camara_gige.inicializar():
                 self.usando_webcam = False
                 self._actualizar_estado_bd(activa=True, hibernada=False)
                 
-                logger.info("✅ Cámara GigE inicializada correctamente")
+                tipo_camara = 'simulada' if simulada else 'gige'
+                logger.info(f"✅ Cámara {tipo_camara} inicializada correctamente")
                 return {
                     'success': True,
-                    'tipo_camara': 'gige',
+                    'tipo_camara': tipo_camara,
                     'ip': ip_camara,
-                    'message': 'Cámara GigE inicializada correctamente'
+                    'message': f'Cámara {tipo_camara} inicializada correctamente'
                 }
             else:
                 logger.warning("No se pudo inicializar cámara GigE, intentando webcam...")
@@ -193,6 +226,11 @@ class CameraService:
                 self.webcam.liberar()
                 self.webcam = None
             
+            # Eliminar el anillo compartido (los lectores lo ven cerrado)
+            if self.anillo_preview is not None and self.anillo_preview.propietario:
+                self.anillo_preview.cerrar()
+                self.anillo_preview = None
+            
             self.usando_webcam = False
             self._actualizar_estado_bd(
                 activa=False, 
@@ -230,6 +268,10 @@ class CameraService:
                 return (True, imagen) if imagen is not None else (False, None)
             
             else:
+                # Sin cámara en este proceso: usar el último frame del dueño de la cámara
+                leido = self._leer_anillo()
+                if leido is not None:
+                    return (True, leido[2])
                 logger.error("No hay cámara inicializada")
                 return (False, None)
                 
@@ -237,6 +279,67 @@ class CameraService:
             logger.error(f"Error capturando imagen: {e}")
             return (False, None)
     
+    def capturar_imagen_posterior(
+        self,
+        no_antes_de: Optional[float] = None,
+        despues_de_seq: int = 0,
+        timeout: float = CameraConfig.CAPTURE_TIMEOUT
+    ) -> Tuple[bool, Optional[np.ndarray], int, float]:
+        """
+        Captura el primer frame expuesto después de un evento, esperando
+        por evento a que llegue (ver capturar_frame_posterior de cada cámara).
+        
+        Args:
+            no_antes_de: time.time() del evento (None = sin restricción)
+            despues_de_seq: Secuencia de la cámara ya usada (0 = cualquiera)
+            timeout: Segundos máximos de espera
+            
+        Returns:
+            Tuple[bool, Optional[np.ndarray], int, float]: (éxito, imagen, seq, timestamp)
+        """
+        try:
+            camara = self.webcam if self.usando_webcam else self.camara_gige
+            if camara is not None:
+                capturado = camara.capturar_frame_posterior(no_antes_de, despues_de_seq, timeout)
+            else:
+                # Sin cámara en este proceso: esperar el frame en el anillo del dueño
+                capturado = self.relevo_preview.esperar_frame_posterior(no_antes_de, despues_de_seq, timeout)
+            
+            if capturado is None:
+                logger.error(f"Timeout esperando frame posterior al evento ({timeout}s)")
+                return (False, None, 0, 0.0)
+            
+            seq, timestamp, imagen = capturado
+            return (True, imagen, seq, timestamp)
+            
+        except Exception as e:
+            logger.error(f"Error capturando imagen posterior: {e}")
+            return (False, None, 0, 0.0)
+    
+    def capturar_rafaga(self, num_frames: int = 3) -> Tuple[bool, List[np.ndarray]]:
+        """
+        Captura varios frames seguidos de la cámara GigE (un disparo por
+        frame en modo 'software', frames consecutivos en modo continuo).
+        
+        Args:
+            num_frames: Frames de la ráfaga
+            
+        Returns:
+            Tuple[bool, List[np.ndarray]]: (ráfaga completa, imágenes)
+        """
+        try:
+            if self.camara_gige is None or self.usando_webcam:
+                logger.error("La ráfaga requiere la cámara GigE en este proceso")
+                return (False, [])
+            
+            rafaga = self.camara_gige.capturar_rafaga(num_frames)
+            imagenes = [frame for _, _, frame in rafaga]
+            return (len(imagenes) == num_frames, imagenes)
+            
+        except Exception as e:
+            logger.error(f"Error capturando ráfaga: {e}")
+            return (False, [])
+    
     def iniciar_preview(self, fps: int = 5) -> Dict[str, Any]:
         """
         Inicia el preview de la cámara a FPS especificados.
@@ -324,6 +427,9 @@ class CameraService:
             if self.preview_thread and self.preview_thread.is_alive():
                 self.preview_thread.join(timeout=2.0)
             
+            # Terminar los streams abiertos
+            self.difusor_preview.cerrar()
+            
             # Si es cámara GigE, detener captura continua
             if self.camara_gige and not self.usando_webcam:
                 logger.info("🛑 Deteniendo captura continua de cámara GigE...")
@@ -404,29 +510,57 @@ class CameraService:
                 'error': str(e)
             }
     
-    def obtener_frame_preview(self) -> Optional[bytes]:
+    def obtener_frame_preview(self) -> Optional[FramePreview]:
         """
-        Obtiene el último frame del preview en formato JPEG.
+        Obtiene el último frame del preview ya codificado en JPEG.
+        
+        No vuelve a codificar: el JPEG se genera una sola vez en _preview_loop
+        (o, en procesos sin cámara, en el relevo desde el anillo compartido).
         
         Returns:
-            bytes: Imagen JPEG encodificada o None
+            FramePreview (jpeg, seq, etag) o None
         """
+        if not self.es_dueno_camara():
+            self.asegurar_relevo_preview()
+        return self.difusor_preview.ultimo()
+    
+    def es_dueno_camara(self) -> bool:
+        """True si la cámara está abierta en este proceso"""
+        return self.camara_gige is not None or self.webcam is not None
+    
+    def preview_disponible(self) -> bool:
+        """True si hay preview en este proceso o frames recientes en el anillo compartido"""
+        if self.preview_activo:
+            return True
+        return self._leer_anillo(copiar=False) is not None
+    
+    def _publicar_en_anillo(self, frame: np.ndarray) -> None:
+        """Escribe el frame en el anillo compartido (lo crea o recrea si cambió la forma)"""
         try:
-            with self.frame_lock:
-                if self.ultimo_frame is None:
-                    return None
-                
-                # Encodificar a JPEG con calidad optimizada para preview
-                _, buffer = cv2.imencode(
-                    '.jpg',
-                    self.ultimo_frame,
-                    [cv2.IMWRITE_JPEG_QUALITY, 85]
+            shape = frame.shape if frame.ndim == 3 else (*frame.shape, 1)
+            anillo = self.anillo_preview
+            if anillo is None or not anillo.propietario or anillo.shape != shape:
+                if anillo is not None:
+                    anillo.cerrar()
+                self.anillo_preview = AnilloFramesCompartido.crear(
+                    CameraConfig.PREVIEW_SHM_NAME, shape, CameraConfig.PREVIEW_SHM_SLOTS
                 )
-                return buffer.tobytes()
-                
+            self.anillo_preview.escribir(frame)
         except Exception as e:
-            logger.error(f"Error obteniendo frame de preview: {e}")
+            logger.error(f"Error publicando frame en memoria compartida: {e}")
+    
+    def _leer_anillo(self, copiar: bool = True) -> Optional[Tuple[int, float, np.ndarray]]:
+        """Último frame reciente del anillo compartido (solo procesos sin cámara)"""
+        if self.es_dueno_camara():
             return None
+        return self.relevo_preview.leer(copiar=copiar)
+    
+    def asegurar_relevo_preview(self) -> None:
+        """
+        En un proceso sin cámara, arranca el relevo que lee el anillo
+        compartido y publica los JPEG en el difusor local.
+        """
+        self.relevo_preview.asegurar()
     
     def _preview_loop(self) -> None:
         """
@@ -444,12 +578,22 @@ class CameraService:
                 
                 if exito and frame is not None:
                     # Guardar frame para preview
+                    # capturar_imagen ya entrega una copia propia del frame
                     with self.frame_lock:
-                        self.ultimo_frame = frame.copy()
+                        self.ultimo_frame = frame
                         self.ultimo_frame_timestamp = datetime.now()
                     
-                    # Almacenar en cache para acceso rápido
-                    cache.set('camera_preview_frame', frame, timeout=2)
+                    # Codificar a JPEG una sola vez y difundir a todos los clientes
+                    ok, buffer = cv2.imencode(
+                        '.jpg',
+                        frame,
+                        [cv2.IMWRITE_JPEG_QUALITY, self.calidad_jpeg_preview]
+                    )
+                    if ok:
+                        self.difusor_preview.publicar(buffer.tobytes())
+                    
+                    # Publicar en memoria compartida para los demás procesos
+                    self._publicar_en_anillo(frame)
                 
                 # Control de FPS
                 tiempo_transcurrido = time.time() - inicio
@@ -509,7 +653,8 @@ class CameraService:
                 'frame_rate_actual': estado_bd.frame_rate_actual,
                 'ultimo_uso': estado_bd.ultimo_uso.isoformat() if estado_bd.ultimo_uso else None,
                 'usando_webcam': self.usando_webcam,
-                'tiene_frame': self.ultimo_frame is not None
+                'tiene_frame': self.ultimo_frame is not None or self.difusor_preview.ultimo() is not None,
+                'clientes_preview': self.difusor_preview.num_suscriptores
             }
             
         except Exception as e:
@@ -520,20 +665,28 @@ class CameraService:
 
 
 # Instancia singleton del servicio
-_camera_service_instance: Optional[CameraService] = None
+_camera_service_instance: Optional[Union[CameraService, 'ClienteCamara']] = None
 
 
-def get_camera_service() -> CameraService:
+def get_camera_service() -> Union[CameraService, 'ClienteCamara']:
     """
     Obtiene la instancia singleton del servicio de cámara.
     
+    Con ANALISIS_CAMARA_SOCKET configurado la cámara vive en el daemon
+    (manage.py camara_daemon) y se devuelve un ClienteCamara con la misma
+    interfaz; si no, la cámara se abre en este proceso.
+    
     Returns:
-        CameraService: Instancia del servicio
+        CameraService o ClienteCamara
     """
     global _camera_service_instance
     
     if _camera_service_instance is None:
-        _camera_service_instance = CameraService()
+        ruta_socket = getattr(settings, 'ANALISIS_CAMARA_SOCKET', '')
+        if ruta_socket:
+            from .camara_ipc import ClienteCamara
+            _camera_service_instance = ClienteCamara(ruta_socket)
+        else:
+            _camera_service_instance = CameraService()
     
     return _camera_service_instance
-
@@ -0,0 +1,111 @@
+"""
+Difusión del preview de la cámara a varios clientes.
+
+El loop de preview codifica cada frame a JPEG una sola vez y lo publica
+aquí; los clientes (stream MJPEG o peticiones de frame suelto) leen siempre
+el último JPEG publicado. Cada suscriptor lleva su propio número de
+secuencia, así que un cliente lento salta directamente al frame más reciente
+en lugar de acumular frames atrasados.
+"""
+
+import hashlib
+import threading
+import time
+from typing import Optional
+
+
+class FramePreview:
+    """JPEG publicado con su número de secuencia y ETag"""
+
+    __slots__ = ('seq', 'jpeg', 'etag', 'timestamp')
+
+    def __init__(self, seq: int, jpeg: bytes):
+        self.seq = seq
+        self.jpeg = jpeg
+        # ETag fuerte: depende del contenido, válido entre procesos
+        self.etag = f'"{hashlib.blake2b(jpeg, digest_size=8).hexdigest()}"'
+        self.timestamp = time.time()
+
+
+class DifusorPreview:
+    """Último frame JPEG del preview con espera bloqueante para suscriptores"""
+
+    def __init__(self):
+        self._condicion = threading.Condition()
+        self._ultimo: Optional[FramePreview] = None
+        self._seq = 0
+        self._suscriptores = 0
+        self._cerrado = False
+
+    def publicar(self, jpeg: bytes) -> FramePreview:
+        """Publica un nuevo frame y despierta a todos los suscriptores"""
+        with self._condicion:
+            self._seq += 1
+            self._ultimo = FramePreview(self._seq, jpeg)
+            self._cerrado = False
+            self._condicion.notify_all()
+            return self._ultimo
+
+    def cerrar(self) -> None:
+        """Indica que el preview se detuvo; los suscriptores dejan de esperar"""
+        with self._condicion:
+            self._cerrado = True
+            self._condicion.notify_all()
+
+    def ultimo(self) -> Optional[FramePreview]:
+        """Último frame publicado (o None)"""
+        with self._condicion:
+            return self._ultimo
+
+    def esperar_frame(self, despues_de_seq: int = 0, timeout: float = 5.0) -> Optional[FramePreview]:
+        """
+        Espera un frame con secuencia mayor que `despues_de_seq`.
+
+        Devuelve el más reciente aunque se hayan publicado varios desde la
+        última lectura (los intermedios se descartan).
+
+        Returns:
+            FramePreview o None si vence el timeout o el preview se detuvo
+        """
+        limite = time.monotonic() + timeout
+        with self._condicion:
+            while self._ultimo is None or self._ultimo.seq <= despues_de_seq:
+                restante = limite - time.monotonic()
+                if self._cerrado or restante <= 0:
+                    return None
+                self._condicion.wait(restante)
+            return self._ultimo
+
+    def suscribir(self) -> None:
+        with self._condicion:
+            self._suscriptores += 1
+
+    def desuscribir(self) -> None:
+        with self._condicion:
+            self._suscriptores = max(0, self._suscriptores - 1)
+
+    @property
+    def num_suscriptores(self) -> int:
+        return self._suscriptores
+
+    def stream_mjpeg(self, boundary: str = 'frame', timeout: float = 5.0):
+        """
+        Generador de partes multipart/x-mixed-replace para un cliente.
+
+        Termina cuando el preview se detiene o no llegan frames en `timeout`.
+        """
+        self.suscribir()
+        try:
+            seq = 0
+            while True:
+                frame = self.esperar_frame(seq, timeout)
+                if frame is None:
+                    return
+                seq = frame.seq
+                yield (
+                    f'--{boundary}\r\n'
+                    f'Content-Type: image/jpeg\r\n'
+                    f'Content-Length: {len(frame.jpeg)}\r\n\r\n'
+                ).encode('ascii') + frame.jpeg + b'\r\n'
+        finally:
+            self.desuscribir()
@@ -0,0 +1,376 @@
+"""
+Estadísticas agregadas de los análisis para el dashboard.
+
+Los conteos y promedios se calculan en la base de datos con Count/Sum
+condicionales (filter=Q(...)): una consulta sobre AnalisisCople y una por
+tabla de segmentaciones, sin importar cuántos análisis haya en el
+historial. Juntar las dos tablas de segmentaciones en un mismo SELECT
+multiplicaría las filas (defectos x piezas), por eso van por separado.
+
+El resultado se cachea por alcance (usuario y filtros). Cada escritura de un
+AnalisisCople incrementa una versión en la caché y deja obsoletas todas las
+entradas; el TTL acota el desfase cuando la escritura ocurre en otro proceso
+y la caché no es compartida (LocMemCache).
+
+Resúmenes diarios (EstadisticasSistema): cuando un análisis pasa a
+'completado' o 'error' se suma a la fila de su día con un único UPDATE con
+F(); los promedios se actualizan como media incremental a partir de los
+valores previos de la fila (en PostgreSQL y SQLite el SET ve los valores
+anteriores a la actualización). `manage.py recalcular_estadisticas`
+reconstruye rangos de días desde los análisis.
+"""
+
+import hashlib
+import logging
+import time
+from datetime import date
+from typing import Any, Dict, Optional
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Avg, Count, F, Q, QuerySet, Sum, Value
+from django.db.models.functions import Coalesce, TruncDate
+from django.utils import timezone
+
+from ..models import AnalisisCople
+from ..resultados_models import EstadisticasSistema, SegmentacionDefecto, SegmentacionPieza
+
+logger = logging.getLogger(__name__)
+
+CLAVE_VERSION = 'analisis_coples:estadisticas:version'
+ESTADOS_FINALES = ('completado', 'error')
+
+
+def calcular_estadisticas(analisis: QuerySet) -> Dict[str, Any]:
+    """
+    Estadísticas de un queryset de AnalisisCople.
+
+    Returns:
+        {'base_datos': {...}, 'por_tipo': {...}, 'segmentacion': {...}}
+    """
+    analisis = analisis.order_by()
+    tipos = [tipo for tipo, _ in AnalisisCople.TIPO_ANALISIS_CHOICES]
+
+    conteos = analisis.aggregate(
+        total=Count('pk'),
+        exitosos=Count('pk', filter=Q(estado='completado')),
+        con_error=Count('pk', filter=Q(estado='error')),
+        **{f'tipo_{tipo}': Count('pk', filter=Q(tipo_analisis=tipo)) for tipo in tipos}
+    )
+    total_analisis = conteos['total']
+    analisis_exitosos = conteos['exitosos']
+
+    completados = analisis.filter(estado='completado').values('pk')
+    defectos = SegmentacionDefecto.objects.filter(analisis__in=completados).aggregate(
+        total=Count('pk'), suma_confianza=Sum('confianza')
+    )
+    piezas = SegmentacionPieza.objects.filter(analisis__in=completados).aggregate(
+        total=Count('pk'), suma_confianza=Sum('confianza')
+    )
+    total_defectos = defectos['total']
+    total_piezas = piezas['total']
+
+    # Promedio de todas las segmentaciones (defectos y piezas juntos)
+    total_segmentaciones = total_defectos + total_piezas
+    confianza_promedio = 0.0
+    if total_segmentaciones:
+        suma = (defectos['suma_confianza'] or 0.0) + (piezas['suma_confianza'] or 0.0)
+        confianza_promedio = suma / total_segmentaciones
+
+    return {
+        'base_datos': {
+            'total_analisis': total_analisis,
+            'analisis_exitosos': analisis_exitosos,
+            'analisis_con_error': conteos['con_error'],
+            'tasa_exito': (analisis_exitosos / total_analisis * 100) if total_analisis > 0 else 0
+        },
+        'por_tipo': {tipo: conteos[f'tipo_{tipo}'] for tipo in tipos},
+        'segmentacion': {
+            'total_defectos': total_defectos,
+            'total_piezas': total_piezas,
+            'confianza_promedio': confianza_promedio,
+            'promedio_por_analisis': {
+                'defectos': (total_defectos / analisis_exitosos) if analisis_exitosos > 0 else 0,
+                'piezas': (total_piezas / analisis_exitosos) if analisis_exitosos > 0 else 0
+            }
+        }
+    }
+
+
+def _contar_por_tipo(analisis: QuerySet) -> Dict[str, int]:
+    tipos = [tipo for tipo, _ in AnalisisCople.TIPO_ANALISIS_CHOICES]
+    conteos = analisis.order_by().aggregate(
+        **{tipo: Count('pk', filter=Q(tipo_analisis=tipo)) for tipo in tipos}
+    )
+    return {tipo: conteos[tipo] for tipo in tipos}
+
+
+def estadisticas_desde_resumenes(
+    analisis: QuerySet,
+    desde: Optional[date] = None,
+    hasta: Optional[date] = None
+) -> Dict[str, Any]:
+    """
+    Mismas estadísticas que calcular_estadisticas, sumando los resúmenes
+    diarios en lugar de recorrer los análisis y sus segmentaciones.
+
+    Solo cuenta análisis terminados ('completado' o 'error'). El reparto por
+    tipo, que los resúmenes no guardan, sigue saliendo de `analisis`.
+    """
+    resumenes = EstadisticasSistema.objects.all()
+    if desde:
+        resumenes = resumenes.filter(fecha__gte=desde)
+    if hasta:
+        resumenes = resumenes.filter(fecha__lte=hasta)
+
+    segmentaciones_dia = F('total_defectos_detectados') + F('total_piezas_detectadas')
+    totales = resumenes.order_by().aggregate(
+        total=Coalesce(Sum('total_analisis'), 0),
+        exitosos=Coalesce(Sum('analisis_exitosos'), 0),
+        con_error=Coalesce(Sum('analisis_con_error'), 0),
+        defectos=Coalesce(Sum('total_defectos_detectados'), 0),
+        piezas=Coalesce(Sum('total_piezas_detectadas'), 0),
+        suma_confianza=Coalesce(Sum(F('confianza_promedio') * segmentaciones_dia), Value(0.0)),
+    )
+    total_analisis = totales['total']
+    analisis_exitosos = totales['exitosos']
+    total_defectos = totales['defectos']
+    total_piezas = totales['piezas']
+    total_segmentaciones = total_defectos + total_piezas
+
+    return {
+        'base_datos': {
+            'total_analisis': total_analisis,
+            'analisis_exitosos': analisis_exitosos,
+            'analisis_con_error': totales['con_error'],
+            'tasa_exito': (analisis_exitosos / total_analisis * 100) if total_analisis > 0 else 0
+        },
+        'por_tipo': _contar_por_tipo(analisis),
+        'segmentacion': {
+            'total_defectos': total_defectos,
+            'total_piezas': total_piezas,
+            'confianza_promedio': (totales['suma_confianza'] / total_segmentaciones) if total_segmentaciones else 0.0,
+            'promedio_por_analisis': {
+                'defectos': (total_defectos / analisis_exitosos) if analisis_exitosos > 0 else 0,
+                'piezas': (total_piezas / analisis_exitosos) if analisis_exitosos > 0 else 0
+            }
+        }
+    }
+
+
+def _version_nueva() -> int:
+    # Si la versión se pierde (expulsión, reinicio de Redis) no debe volver a
+    # un valor ya usado, o reaparecerían entradas obsoletas
+    return int(time.time() * 1000)
+
+
+def _version() -> int:
+    version = cache.get(CLAVE_VERSION)
+    if version is None:
+        version = _version_nueva()
+        if not cache.add(CLAVE_VERSION, version, timeout=None):
+            version = cache.get(CLAVE_VERSION, version)
+    return version
+
+
+def obtener_estadisticas(
+    analisis: QuerySet,
+    alcance: str,
+    usar_resumenes: bool = False,
+    desde: Optional[date] = None,
+    hasta: Optional[date] = None
+) -> Dict[str, Any]:
+    """
+    Estadísticas cacheadas.
+
+    Args:
+        analisis: Queryset ya filtrado (usuario, tipo, estado, fechas)
+        alcance: Texto que identifica esos filtros (forma parte de la clave)
+        usar_resumenes: Leer los resúmenes diarios (solo válido si `analisis`
+            no está filtrado más que por fechas, p.ej. superusuario)
+        desde, hasta: Rango de fechas de los resúmenes
+    """
+    resumen = hashlib.sha1(f'{alcance}:{usar_resumenes}'.encode('utf-8')).hexdigest()[:16]
+    clave = f'analisis_coples:estadisticas:{_version()}:{resumen}'
+
+    estadisticas = cache.get(clave)
+    if estadisticas is None:
+        if usar_resumenes:
+            estadisticas = estadisticas_desde_resumenes(analisis, desde, hasta)
+        else:
+            estadisticas = calcular_estadisticas(analisis)
+        cache.set(clave, estadisticas, timeout=getattr(settings, 'ANALISIS_ESTADISTICAS_CACHE_S', 30))
+    return estadisticas
+
+
+def _incrementar_version() -> None:
+    try:
+        cache.incr(CLAVE_VERSION)
+    except ValueError:
+        # La versión no existe (caché vacía o expulsada)
+        cache.set(CLAVE_VERSION, _version_nueva(), timeout=None)
+    except Exception as e:
+        logger.warning(f"No se pudo invalidar la caché de estadísticas: {e}")
+
+
+def invalidar_estadisticas(sender=None, **kwargs) -> None:
+    """
+    Deja obsoletas las estadísticas cacheadas (receptor de post_save/post_delete).
+
+    Se aplaza al commit: invalidar antes dejaría que otra petición volviera a
+    cachear los datos previos a la transacción.
+    """
+    transaction.on_commit(_incrementar_version)
+
+
+# ----------------------------------------------------------------------
+# Resúmenes diarios (EstadisticasSistema)
+# ----------------------------------------------------------------------
+
+def _media_incremental(campo: str, valor: float, campo_n: str):
+    """media + (valor - media) / (n + 1), con media y n previos de la fila"""
+    return F(campo) + (Value(float(valor)) - F(campo)) / (F(campo_n) + 1.0)
+
+
+def registrar_en_resumen_diario(analisis: AnalisisCople) -> None:
+    """
+    Suma un análisis terminado a la fila EstadisticasSistema de su día.
+
+    El llamador garantiza que el análisis acaba de pasar a un estado final
+    (ver registrar_transicion_estado); no se vuelve a comprobar aquí.
+    """
+    fecha = timezone.localdate(analisis.timestamp_procesamiento)
+
+    with transaction.atomic():
+        EstadisticasSistema.objects.get_or_create(fecha=fecha)
+        cambios = {'total_analisis': F('total_analisis') + 1}
+
+        if analisis.estado == 'error':
+            cambios['analisis_con_error'] = F('analisis_con_error') + 1
+        else:
+            defectos = SegmentacionDefecto.objects.filter(analisis=analisis).aggregate(
+                total=Count('pk'), suma_confianza=Sum('confianza')
+            )
+            piezas = SegmentacionPieza.objects.filter(analisis=analisis).aggregate(
+                total=Count('pk'), suma_confianza=Sum('confianza')
+            )
+            segmentacion_ms = (analisis.tiempo_segmentacion_defectos_ms or 0.0) + (analisis.tiempo_segmentacion_piezas_ms or 0.0)
+
+            cambios.update(
+                analisis_exitosos=F('analisis_exitosos') + 1,
+                total_defectos_detectados=F('total_defectos_detectados') + defectos['total'],
+                total_piezas_detectadas=F('total_piezas_detectadas') + piezas['total'],
+                tiempo_promedio_captura_ms=_media_incremental(
+                    'tiempo_promedio_captura_ms', analisis.tiempo_captura_ms or 0.0, 'analisis_exitosos'
+                ),
+                tiempo_promedio_segmentacion_ms=_media_incremental(
+                    'tiempo_promedio_segmentacion_ms', segmentacion_ms, 'analisis_exitosos'
+                ),
+                tiempo_promedio_total_ms=_media_incremental(
+                    'tiempo_promedio_total_ms', analisis.tiempo_total_ms or 0.0, 'analisis_exitosos'
+                ),
+            )
+
+            # Confianza media ponderada por número de segmentaciones
+            nuevas = defectos['total'] + piezas['total']
+            if nuevas:
+                previas = F('total_defectos_detectados') + F('total_piezas_detectadas')
+                suma = (defectos['suma_confianza'] or 0.0) + (piezas['suma_confianza'] or 0.0)
+                cambios['confianza_promedio'] = (F('confianza_promedio') * previas + suma) / (previas + nuevas)
+
+        EstadisticasSistema.objects.filter(fecha=fecha).update(**cambios)
+
+
+def recordar_estado_previo(sender, instance: AnalisisCople, **kwargs) -> None:
+    """Receptor de pre_save: estado del análisis guardado en la BD antes de escribir"""
+    if instance.pk is None:
+        instance._estado_previo = None
+        return
+    instance._estado_previo = (
+        AnalisisCople.objects.filter(pk=instance.pk).values_list('estado', flat=True).first()
+    )
+
+
+def registrar_transicion_estado(sender, instance: AnalisisCople, created: bool = False, **kwargs) -> None:
+    """
+    Receptor de post_save: suma el análisis al resumen del día solo cuando
+    pasa a un estado final.
+
+    Se compara con el estado leído de la BD en pre_save (no con el de la
+    instancia), así que volver a guardar un análisis terminado, o guardar
+    una copia obsoleta, no lo cuenta dos veces.
+    """
+    if instance.estado not in ESTADOS_FINALES:
+        return
+    if getattr(instance, '_estado_previo', None) in ESTADOS_FINALES:
+        return
+    try:
+        registrar_en_resumen_diario(instance)
+    except Exception as e:
+        logger.error(f"Error actualizando el resumen diario de {instance.id_analisis}: {e}")
+
+
+def recalcular_resumenes(desde: date, hasta: date) -> int:
+    """
+    Reconstruye desde los análisis las filas EstadisticasSistema de [desde, hasta].
+
+    Los días sin análisis terminados se eliminan. Pensado para rellenar
+    histórico o corregir días ya cerrados; un análisis que termine en un día
+    mientras se recalcula puede quedar fuera hasta el siguiente recálculo.
+
+    Returns:
+        Número de días con análisis
+    """
+    analisis = AnalisisCople.objects.filter(
+        timestamp_procesamiento__date__gte=desde,
+        timestamp_procesamiento__date__lte=hasta,
+        estado__in=ESTADOS_FINALES,
+    ).order_by()
+    completado = Q(estado='completado')
+
+    por_dia = analisis.annotate(fecha=TruncDate('timestamp_procesamiento')).values('fecha').annotate(
+        total=Count('pk'),
+        exitosos=Count('pk', filter=completado),
+        con_error=Count('pk', filter=Q(estado='error')),
+        captura=Avg('tiempo_captura_ms', filter=completado),
+        segmentacion=Avg(
+            Coalesce('tiempo_segmentacion_defectos_ms', Value(0.0)) + Coalesce('tiempo_segmentacion_piezas_ms', Value(0.0)),
+            filter=completado
+        ),
+        total_ms=Avg('tiempo_total_ms', filter=completado),
+    )
+
+    completados = analisis.filter(completado).values('pk')
+    segmentaciones: Dict[date, Dict[str, float]] = {}
+    for modelo, campo in ((SegmentacionDefecto, 'defectos'), (SegmentacionPieza, 'piezas')):
+        filas = modelo.objects.filter(analisis__in=completados).annotate(
+            fecha=TruncDate('analisis__timestamp_procesamiento')
+        ).values('fecha').annotate(total=Count('pk'), suma_confianza=Sum('confianza')).order_by()
+        for fila in filas:
+            dia = segmentaciones.setdefault(fila['fecha'], {'defectos': 0, 'piezas': 0, 'suma_confianza': 0.0})
+            dia[campo] = fila['total']
+            dia['suma_confianza'] += fila['suma_confianza'] or 0.0
+
+    with transaction.atomic():
+        fechas = []
+        for fila in por_dia:
+            fecha = fila['fecha']
+            fechas.append(fecha)
+            dia = segmentaciones.get(fecha, {'defectos': 0, 'piezas': 0, 'suma_confianza': 0.0})
+            total_segmentaciones = dia['defectos'] + dia['piezas']
+            EstadisticasSistema.objects.update_or_create(fecha=fecha, defaults={
+                'total_analisis': fila['total'],
+                'analisis_exitosos': fila['exitosos'],
+                'analisis_con_error': fila['con_error'],
+                'total_defectos_detectados': dia['defectos'],
+                'total_piezas_detectadas': dia['piezas'],
+                'tiempo_promedio_captura_ms': fila['captura'] or 0.0,
+                'tiempo_promedio_segmentacion_ms': fila['segmentacion'] or 0.0,
+                'tiempo_promedio_total_ms': fila['total_ms'] or 0.0,
+                'confianza_promedio': (dia['suma_confianza'] / total_segmentaciones) if total_segmentaciones else 0.0,
+            })
+        EstadisticasSistema.objects.filter(fecha__gte=desde, fecha__lte=hasta).exclude(fecha__in=fechas).delete()
+
+    invalidar_estadisticas()
+    return len(fechas)
@@ -0,0 +1,241 @@
+"""
+Métricas de latencia del pipeline en formato Prometheus.
+
+Cada análisis completado aporta sus tiempos por etapa (ver modules/tiempos.py)
+a un histograma por (tipo de análisis, etapa). Además de los buckets
+acumulados, se guarda una ventana de las últimas muestras para publicar
+p50/p95/p99 recientes sin que Prometheus tenga que calcularlos.
+
+Cada proceso (workers de gunicorn, manage.py procesar_trabajos) acumula sus
+métricas en memoria y publica una instantánea en la caché compartida (Redis en
+producción) tras cada análisis. /metrics suma las instantáneas de todos los
+procesos, así que no importa qué proceso atienda el scrape. Las instantáneas
+caducan a los ANALISIS_METRICAS_TTL_S sin análisis nuevos (0 = solo métricas
+del proceso que responde).
+"""
+
+import logging
+import threading
+from collections import deque
+from typing import Any, Deque, Dict, Iterable, List, Mapping, Optional, Sequence, Tuple
+
+import numpy as np
+from django.conf import settings
+from django.core.cache import cache
+
+logger = logging.getLogger(__name__)
+
+# Límites superiores de los buckets (ms)
+BUCKETS_MS = (1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+CUANTILES = (0.5, 0.95, 0.99)
+TAMANO_VENTANA = 500
+
+PREFIJO = 'analisis_coples'
+
+# Contador de procesos que han publicado; cada uno guarda su instantánea en
+# CLAVE_INSTANTANEA.format(n) con el número que le dio cache.incr
+CLAVE_NUM_PROCESOS = f'{PREFIJO}:metricas:procesos'
+CLAVE_INSTANTANEA = PREFIJO + ':metricas:proceso:{}'
+
+
+class HistogramaLatencia:
+    """Histograma acumulado más una ventana de las últimas muestras"""
+
+    def __init__(self, buckets: Sequence[float] = BUCKETS_MS, tamano_ventana: Optional[int] = TAMANO_VENTANA):
+        self.buckets = tuple(buckets)
+        self.conteos = [0] * len(self.buckets)
+        self.total = 0
+        self.suma = 0.0
+        self.ventana: Deque[float] = deque(maxlen=tamano_ventana)
+
+    def observar(self, valor_ms: float) -> None:
+        for i, limite in enumerate(self.buckets):
+            if valor_ms <= limite:
+                self.conteos[i] += 1
+        self.total += 1
+        self.suma += valor_ms
+        self.ventana.append(valor_ms)
+
+    def cuantiles(self, cuantiles: Sequence[float] = CUANTILES) -> List[Tuple[float, float]]:
+        if not self.ventana:
+            return []
+        valores = np.percentile(np.fromiter(self.ventana, dtype=np.float64), [q * 100 for q in cuantiles])
+        return list(zip(cuantiles, valores.tolist()))
+
+    def como_dict(self) -> Dict[str, Any]:
+        return {
+            'buckets': list(self.buckets),
+            'conteos': list(self.conteos),
+            'total': self.total,
+            'suma': self.suma,
+            'ventana': list(self.ventana),
+        }
+
+    def sumar(self, estado: Mapping[str, Any]) -> None:
+        """Acumula el histograma de otro proceso (ver como_dict)"""
+        if tuple(estado['buckets']) != self.buckets:
+            return
+        self.conteos = [a + b for a, b in zip(self.conteos, estado['conteos'])]
+        self.total += estado['total']
+        self.suma += estado['suma']
+        self.ventana.extend(estado['ventana'])
+
+
+class MetricasService:
+    """Histogramas de latencia por tipo de análisis y etapa"""
+
+    def __init__(self, ttl_compartidas_s: Optional[float] = None):
+        """
+        Args:
+            ttl_compartidas_s: Vigencia de la instantánea en la caché compartida
+                (por defecto ANALISIS_METRICAS_TTL_S; 0 = no compartir)
+        """
+        if ttl_compartidas_s is None:
+            ttl_compartidas_s = getattr(settings, 'ANALISIS_METRICAS_TTL_S', 86400)
+        self.ttl_compartidas_s = ttl_compartidas_s
+        self._lock = threading.Lock()
+        self._histogramas: Dict[Tuple[str, str], HistogramaLatencia] = {}
+        self._analisis: Dict[Tuple[str, str], int] = {}
+        self._clave_instantanea: Optional[str] = None
+
+    def registrar_analisis(self, tipo_analisis: str, tiempos: Mapping[str, float], estado: str = 'completado') -> None:
+        """
+        Registra los tiempos de un análisis.
+
+        Args:
+            tipo_analisis: 'medicion_piezas', 'medicion_defectos', ...
+            tiempos: {'<etapa>_ms': ms}, como se guardan en metadatos_json['tiempos']
+            estado: Estado final del análisis
+        """
+        with self._lock:
+            clave_analisis = (tipo_analisis, estado)
+            self._analisis[clave_analisis] = self._analisis.get(clave_analisis, 0) + 1
+            for nombre, valor in tiempos.items():
+                if not nombre.endswith('_ms') or not isinstance(valor, (int, float)):
+                    continue
+                clave = (tipo_analisis, nombre[:-3])
+                histograma = self._histogramas.get(clave)
+                if histograma is None:
+                    histograma = self._histogramas[clave] = HistogramaLatencia()
+                histograma.observar(float(valor))
+
+        self._publicar()
+
+    # ==================== Agregación entre procesos ====================
+
+    def instantanea(self) -> Dict[str, Any]:
+        """Estado del proceso serializable (contadores e histogramas)"""
+        with self._lock:
+            return {
+                'analisis': dict(self._analisis),
+                'histogramas': {clave: hist.como_dict() for clave, hist in self._histogramas.items()},
+            }
+
+    def _publicar(self) -> None:
+        """Guarda la instantánea del proceso en la caché compartida"""
+        if not self.ttl_compartidas_s:
+            return
+        try:
+            if self._clave_instantanea is None:
+                cache.add(CLAVE_NUM_PROCESOS, 0, timeout=None)
+                numero = cache.incr(CLAVE_NUM_PROCESOS)
+                if numero is None:
+                    return
+                self._clave_instantanea = CLAVE_INSTANTANEA.format(numero)
+            cache.set(self._clave_instantanea, self.instantanea(), timeout=self.ttl_compartidas_s)
+        except Exception as e:
+            logger.warning(f"⚠️ No se pudieron publicar las métricas en la caché: {e}")
+
+    def _instantaneas_otros_procesos(self) -> List[Dict[str, Any]]:
+        """Instantáneas vigentes del resto de procesos"""
+        if not self.ttl_compartidas_s:
+            return []
+        try:
+            num_procesos = cache.get(CLAVE_NUM_PROCESOS) or 0
+            claves = [CLAVE_INSTANTANEA.format(n) for n in range(1, num_procesos + 1)]
+            claves = [clave for clave in claves if clave != self._clave_instantanea]
+            return list(cache.get_many(claves).values()) if claves else []
+        except Exception as e:
+            logger.warning(f"⚠️ No se pudieron leer las métricas de otros procesos: {e}")
+            return []
+
+    @staticmethod
+    def _combinar(instantaneas: Iterable[Mapping[str, Any]]):
+        """Suma contadores e histogramas de varias instantáneas"""
+        analisis: Dict[Tuple[str, str], int] = {}
+        histogramas: Dict[Tuple[str, str], HistogramaLatencia] = {}
+        for instantanea in instantaneas:
+            for clave, total in instantanea['analisis'].items():
+                analisis[clave] = analisis.get(clave, 0) + total
+            for clave, estado in instantanea['histogramas'].items():
+                histograma = histogramas.get(clave)
+                if histograma is None:
+                    # Ventana sin límite: conserva las muestras recientes de todos los procesos
+                    histograma = histogramas[clave] = HistogramaLatencia(estado['buckets'], tamano_ventana=None)
+                histograma.sumar(estado)
+        return analisis, histogramas
+
+    def exportar_prometheus(self) -> str:
+        """
+        Texto en el formato de exposición de Prometheus (0.0.4) con las
+        métricas de todos los procesos que publican en la caché.
+        """
+        nombre_hist = f'{PREFIJO}_etapa_duracion_ms'
+        nombre_cuantil = f'{PREFIJO}_etapa_duracion_reciente_ms'
+        nombre_total = f'{PREFIJO}_analisis_total'
+
+        analisis, histogramas = self._combinar(
+            [self.instantanea(), *self._instantaneas_otros_procesos()]
+        )
+
+        lineas = [
+            f'# HELP {nombre_total} Análisis procesados por tipo y estado.',
+            f'# TYPE {nombre_total} counter',
+        ]
+        for (tipo, estado), total in sorted(analisis.items()):
+            lineas.append(f'{nombre_total}{{tipo="{tipo}",estado="{estado}"}} {total}')
+
+        lineas += [
+            f'# HELP {nombre_hist} Duración de cada etapa del análisis (ms).',
+            f'# TYPE {nombre_hist} histogram',
+        ]
+        for (tipo, etapa), hist in sorted(histogramas.items()):
+            etiquetas = f'tipo="{tipo}",etapa="{etapa}"'
+            for limite, conteo in zip(hist.buckets, hist.conteos):
+                lineas.append(f'{nombre_hist}_bucket{{{etiquetas},le="{limite:g}"}} {conteo}')
+            lineas.append(f'{nombre_hist}_bucket{{{etiquetas},le="+Inf"}} {hist.total}')
+            lineas.append(f'{nombre_hist}_sum{{{etiquetas}}} {hist.suma:.3f}')
+            lineas.append(f'{nombre_hist}_count{{{etiquetas}}} {hist.total}')
+
+        lineas += [
+            f'# HELP {nombre_cuantil} Cuantiles de las últimas {TAMANO_VENTANA} muestras por etapa de cada proceso (ms).',
+            f'# TYPE {nombre_cuantil} summary',
+        ]
+        for (tipo, etapa), hist in sorted(histogramas.items()):
+            etiquetas = f'tipo="{tipo}",etapa="{etapa}"'
+            for cuantil, valor in hist.cuantiles():
+                lineas.append(f'{nombre_cuantil}{{{etiquetas},quantile="{cuantil:g}"}} {valor:.3f}')
+            lineas.append(f'{nombre_cuantil}_sum{{{etiquetas}}} {sum(hist.ventana):.3f}')
+            lineas.append(f'{nombre_cuantil}_count{{{etiquetas}}} {len(hist.ventana)}')
+
+        return '\n'.join(lineas) + '\n'
+
+    def reiniciar(self) -> None:
+        with self._lock:
+            self._histogramas.clear()
+            self._analisis.clear()
+        self._publicar()
+
+
+# Instancia singleton
+_metricas_service: Optional[MetricasService] = None
+_metricas_lock = threading.Lock()
+
+
+def get_metricas_service() -> MetricasService:
+    """Obtiene la instancia de métricas del proceso"""
+    global _metricas_service
+    with _metricas_lock:
+        if _metricas_service is None:
+            _metricas_service = MetricasService()
+        return _metricas_service
@@ -0,0 +1,307 @@
+"""
+Registro de modelos ONNX compartido por proceso.
+
+Mantiene calientes los segmentadores de piezas y defectos para que las
+peticiones no paguen la carga del modelo en cada análisis:
+
+1. Cada modelo se construye una sola vez por proceso (fábrica registrada)
+2. Los modelos cargados se ordenan por uso (LRU)
+3. Si la memoria estimada supera el presupuesto se desaloja el menos usado
+4. Se registran cargas, aciertos, desalojos y tiempos de carga
+"""
+
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional
+
+from ..expo_config import ModelsConfig
+from ..modules.onnx_session import establecer_opciones_sesion, obtener_opciones_sesion
+
+logger = logging.getLogger(__name__)
+
+
+def _crear_segmentador_piezas():
+    from ..modules.segmentation.segmentation_piezas_engine import SegmentadorPiezasCoples
+    return SegmentadorPiezasCoples()
+
+
+def _crear_segmentador_defectos():
+    from ..modules.segmentation.segmentation_defectos_engine import SegmentadorDefectosCoples
+    return SegmentadorDefectosCoples()
+
+
+class ModelRegistry:
+    """
+    Registro LRU de motores de inferencia con presupuesto de memoria.
+
+    Las sesiones de ONNX Runtime son seguras para llamadas concurrentes a
+    ``run()``, así que una misma instancia se comparte entre hilos. Desalojar
+    un modelo solo elimina la referencia del registro (no llama a ``liberar()``):
+    quien lo esté usando conserva la suya y la sesión se libera al terminar.
+    """
+
+    def __init__(self, presupuesto_memoria_mb: Optional[float] = None):
+        """
+        Inicializa el registro.
+
+        Args:
+            presupuesto_memoria_mb: Memoria máxima estimada para modelos cargados
+        """
+        if presupuesto_memoria_mb is None:
+            presupuesto_memoria_mb = ModelsConfig.REGISTRY_MEMORY_BUDGET_MB
+        self.presupuesto_memoria_mb = float(presupuesto_memoria_mb)
+
+        self._fabricas: Dict[str, Callable[[], Any]] = {}
+        self._modelos: 'OrderedDict[str, Dict[str, Any]]' = OrderedDict()
+        self._stats: Dict[str, Dict[str, Any]] = {}
+
+        # RLock: la fábrica se ejecuta dentro del lock para evitar cargas dobles
+        self._lock = threading.RLock()
+
+    # ==================== Registro de fábricas ====================
+
+    def registrar(self, nombre: str, fabrica: Callable[[], Any]) -> None:
+        """
+        Registra la fábrica de un modelo.
+
+        Args:
+            nombre: Identificador del modelo ('piezas', 'defectos', ...)
+            fabrica: Callable sin argumentos que construye el motor
+        """
+        with self._lock:
+            self._fabricas[nombre] = fabrica
+            self._stats.setdefault(nombre, {
+                'cargas': 0,
+                'aciertos': 0,
+                'desalojos': 0,
+                'errores': 0,
+                'tiempo_ultima_carga_ms': 0.0,
+                'tiempo_total_carga_ms': 0.0,
+                'ultimo_uso': None,
+            })
+
+    def modelos_registrados(self) -> List[str]:
+        """Nombres de los modelos con fábrica registrada"""
+        return list(self._fabricas.keys())
+
+    # ==================== Acceso ====================
+
+    def obtener(self, nombre: str) -> Optional[Any]:
+        """
+        Devuelve el motor cargado, construyéndolo si hace falta.
+
+        Args:
+            nombre: Identificador del modelo
+
+        Returns:
+            Instancia del motor o None si no se pudo cargar
+        """
+        with self._lock:
+            if nombre not in self._fabricas:
+                logger.error(f"❌ Modelo no registrado: {nombre}")
+                return None
+
+            stats = self._stats[nombre]
+            entrada = self._modelos.get(nombre)
+            if entrada is not None:
+                self._modelos.move_to_end(nombre)
+                stats['aciertos'] += 1
+                stats['ultimo_uso'] = time.time()
+                return entrada['motor']
+
+            return self._cargar(nombre)
+
+    def esta_cargado(self, nombre: str) -> bool:
+        """Indica si el modelo está cargado en el registro"""
+        with self._lock:
+            return nombre in self._modelos
+
+    def precargar(self, nombres: Optional[List[str]] = None) -> Dict[str, bool]:
+        """
+        Carga por adelantado los modelos indicados.
+
+        Args:
+            nombres: Modelos a precargar (por defecto ModelsConfig.PRELOAD_MODELS)
+
+        Returns:
+            Dict nombre -> si quedó cargado
+        """
+        if nombres is None:
+            nombres = ModelsConfig.PRELOAD_MODELS
+
+        resultado = {}
+        for nombre in nombres:
+            resultado[nombre] = self.obtener(nombre) is not None
+
+        logger.info(f"🔥 Precarga de modelos completada: {resultado}")
+        return resultado
+
+    def liberar(self, nombre: Optional[str] = None) -> None:
+        """
+        Libera un modelo del registro (o todos si no se indica nombre).
+
+        Args:
+            nombre: Identificador del modelo
+        """
+        with self._lock:
+            nombres = [nombre] if nombre else list(self._modelos.keys())
+            for n in nombres:
+                if self._modelos.pop(n, None) is not None:
+                    logger.info(f"🧹 Modelo liberado: {n}")
+
+    def aplicar_opciones_onnx(self, opciones: Optional[Dict[str, Any]]) -> bool:
+        """
+        Aplica las opciones de sesión ONNX del proceso.
+
+        Si cambian respecto a las vigentes, los modelos cargados se descartan
+        para que la siguiente petición los reconstruya con las nuevas opciones.
+
+        Args:
+            opciones: Opciones de sesión (ver ConfiguracionSistema.obtener_opciones_onnx)
+
+        Returns:
+            True si las opciones cambiaron
+        """
+        with self._lock:
+            if not establecer_opciones_sesion(opciones):
+                return False
+            logger.info(f"⚙️ Opciones de sesión ONNX actualizadas: {opciones}")
+            self.liberar()
+            return True
+
+    # ==================== Carga y desalojo ====================
+
+    def _cargar(self, nombre: str) -> Optional[Any]:
+        """Construye el motor y lo inserta como el más reciente"""
+        stats = self._stats[nombre]
+
+        logger.info(f"🎯 Cargando modelo '{nombre}' en el registro...")
+        inicio = time.time()
+        try:
+            motor = self._fabricas[nombre]()
+        except Exception as e:
+            stats['errores'] += 1
+            logger.error(f"❌ Error construyendo modelo '{nombre}': {e}")
+            return None
+        tiempo_ms = (time.time() - inicio) * 1000
+
+        if getattr(motor, 'session', None) is None:
+            stats['errores'] += 1
+            logger.error(f"❌ Modelo '{nombre}' sin sesión ONNX (¿archivo ausente?)")
+            return None
+
+        memoria_mb = self._estimar_memoria_mb(motor)
+        self._desalojar_hasta(memoria_mb)
+
+        self._modelos[nombre] = {
+            'motor': motor,
+            'memoria_mb': memoria_mb,
+            'cargado_en': time.time(),
+        }
+        stats['cargas'] += 1
+        stats['tiempo_ultima_carga_ms'] = tiempo_ms
+        stats['tiempo_total_carga_ms'] += tiempo_ms
+        stats['ultimo_uso'] = time.time()
+
+        logger.info(
+            f"✅ Modelo '{nombre}' cargado en {tiempo_ms:.1f}ms "
+            f"(~{memoria_mb:.1f}MB, total {self.memoria_en_uso_mb():.1f}/{self.presupuesto_memoria_mb:.0f}MB)"
+        )
+        return motor
+
+    def _desalojar_hasta(self, memoria_requerida_mb: float) -> None:
+        """Desaloja modelos LRU hasta que quepa la memoria requerida"""
+        while self._modelos and self.memoria_en_uso_mb() + memoria_requerida_mb > self.presupuesto_memoria_mb:
+            nombre, _ = self._modelos.popitem(last=False)
+            self._stats[nombre]['desalojos'] += 1
+            logger.info(f"♻️ Modelo '{nombre}' desalojado por presupuesto de memoria")
+
+    def _estimar_memoria_mb(self, motor: Any) -> float:
+        """Estima la memoria del motor a partir del tamaño del archivo ONNX"""
+        try:
+            tamano = os.path.getsize(motor.model_path)
+        except (AttributeError, OSError, TypeError):
+            return 0.0
+        return tamano / (1024 * 1024) * ModelsConfig.REGISTRY_MEMORY_FACTOR
+
+    # ==================== Estadísticas ====================
+
+    def memoria_en_uso_mb(self) -> float:
+        """Memoria estimada de todos los modelos cargados"""
+        return sum(e['memoria_mb'] for e in self._modelos.values())
+
+    def obtener_estadisticas(self) -> Dict[str, Any]:
+        """
+        Estadísticas del registro.
+
+        Returns:
+            Dict con presupuesto, memoria en uso y contadores por modelo
+        """
+        with self._lock:
+            modelos = {}
+            for nombre, stats in self._stats.items():
+                entrada = self._modelos.get(nombre)
+                cargas = stats['cargas']
+                modelos[nombre] = {
+                    **stats,
+                    'cargado': entrada is not None,
+                    'memoria_estimada_mb': round(entrada['memoria_mb'], 2) if entrada else 0.0,
+                    'tiempo_promedio_carga_ms': (
+                        stats['tiempo_total_carga_ms'] / cargas if cargas else 0.0
+                    ),
+                }
+
+            return {
+                'opciones_sesion': obtener_opciones_sesion(),
+                'presupuesto_memoria_mb': self.presupuesto_memoria_mb,
+                'memoria_en_uso_mb': round(self.memoria_en_uso_mb(), 2),
+                'orden_lru': list(self._modelos.keys()),
+                'modelos': modelos,
+            }
+
+
+# Instancia global del registro (singleton)
+_model_registry_instance = None
+_model_registry_lock = threading.Lock()
+
+
+def get_model_registry() -> ModelRegistry:
+    """
+    Obtiene la instancia global del registro de modelos.
+
+    Returns:
+        Instancia de ModelRegistry con los segmentadores registrados
+    """
+    global _model_registry_instance
+
+    if _model_registry_instance is None:
+        with _model_registry_lock:
+            if _model_registry_instance is None:
+                registro = ModelRegistry()
+                registro.registrar('piezas', _crear_segmentador_piezas)
+                registro.registrar('defectos', _crear_segmentador_defectos)
+                _model_registry_instance = registro
+
+    return _model_registry_instance
+
+
+def precargar_modelos() -> Dict[str, bool]:
+    """
+    Precarga los modelos con las opciones ONNX de la configuración activa.
+
+    Pensada para ejecutarse en segundo plano al arrancar el servidor.
+    """
+    registro = get_model_registry()
+    try:
+        from ..models import ConfiguracionSistema
+
+        config = ConfiguracionSistema.objects.filter(activa=True).first()
+        if config is not None:
+            registro.aplicar_opciones_onnx(config.obtener_opciones_onnx())
+    except Exception as e:
+        logger.warning(f"⚠️ No se pudo leer la configuración activa, usando ModelsConfig: {e}")
+
+    return registro.precargar()
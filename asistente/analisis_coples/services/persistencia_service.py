@@ -0,0 +1,163 @@
+"""
+Persistencia en bloque de los resultados de un análisis.
+
+Las segmentaciones se construyen como objetos sin guardar y se escriben con
+un único bulk_create por modelo; la actualización del AnalisisCople padre va
+en la misma transacción corta. El tiempo de escritura se añade al desglose
+de tiempos del análisis (metadatos_json['tiempos']['escritura_bd_ms']) y el
+desglose completo se suma a las métricas del proceso (metricas_service).
+"""
+
+import logging
+import time
+from typing import Any, Dict, List, Optional, Sequence
+
+from django.db import transaction
+
+from ..models import AnalisisCople
+from ..resultados_models import SegmentacionDefecto, SegmentacionPieza
+from .metricas_service import get_metricas_service
+
+logger = logging.getLogger(__name__)
+
+
+def construir_segmentaciones(
+    modelo,
+    analisis_db: AnalisisCople,
+    segmentaciones: Sequence[Dict[str, Any]],
+    mediciones_lote: Sequence[Dict[str, float]],
+    clase_por_defecto: str = ''
+) -> List:
+    """
+    Construye (sin guardar) las filas de SegmentacionPieza o SegmentacionDefecto.
+
+    Args:
+        modelo: SegmentacionPieza o SegmentacionDefecto
+        analisis_db: Análisis padre (ya guardado)
+        segmentaciones: Segmentaciones del motor
+        mediciones_lote: Mediciones alineadas con `segmentaciones`
+            (MeasurementService.calcular_mediciones_lote)
+        clase_por_defecto: Clase a usar si la segmentación no la trae
+
+    Returns:
+        Lista de instancias sin guardar
+    """
+    filas = []
+    for seg, mediciones in zip(segmentaciones, mediciones_lote):
+        bbox = seg.get('bbox', {})
+        centroide = seg.get('centroide', {})
+        filas.append(modelo(
+            analisis=analisis_db,
+            clase=seg.get('clase', clase_por_defecto),
+            confianza=seg.get('confianza', 0.0),
+            bbox_x1=bbox.get('x1', 0),
+            bbox_y1=bbox.get('y1', 0),
+            bbox_x2=bbox.get('x2', 0),
+            bbox_y2=bbox.get('y2', 0),
+            # Dimensiones del bounding box
+            ancho_bbox_px=mediciones.get('ancho_bbox_px', 0.0),
+            alto_bbox_px=mediciones.get('alto_bbox_px', 0.0),
+            centroide_x=centroide.get('x', 0),
+            centroide_y=centroide.get('y', 0),
+            # Propiedades de la máscara
+            area_mascara_px=int(mediciones.get('area_mascara_px', 0)),
+            ancho_mascara_px=mediciones.get('ancho_bbox_px', 0.0),  # Usar ancho del bbox
+            alto_mascara_px=mediciones.get('alto_bbox_px', 0.0),  # Usar alto del bbox
+            perimetro_mascara_px=mediciones.get('perimetro_mascara_px', 0.0),
+            # Geometría avanzada
+            excentricidad=mediciones.get('excentricidad', 0.0),
+            orientacion_grados=mediciones.get('orientacion_grados', 0.0),
+            # Mediciones en mm (si están disponibles)
+            ancho_bbox_mm=mediciones.get('ancho_bbox_mm'),
+            alto_bbox_mm=mediciones.get('alto_bbox_mm'),
+            ancho_mascara_mm=mediciones.get('ancho_bbox_mm'),  # Usar ancho del bbox
+            alto_mascara_mm=mediciones.get('alto_bbox_mm'),  # Usar alto del bbox
+            perimetro_mascara_mm=mediciones.get('perimetro_mascara_mm'),
+            area_mascara_mm=mediciones.get('area_mascara_mm'),
+            coeficientes_mascara=seg.get('coeficientes_mascara', [])
+        ))
+    return filas
+
+
+def construir_segmentaciones_piezas(analisis_db, segmentaciones, mediciones_lote, clase_por_defecto='Cople'):
+    """Filas de SegmentacionPieza sin guardar"""
+    return construir_segmentaciones(
+        SegmentacionPieza, analisis_db, segmentaciones, mediciones_lote, clase_por_defecto
+    )
+
+
+def construir_segmentaciones_defectos(analisis_db, segmentaciones, mediciones_lote, clase_por_defecto='Defecto'):
+    """Filas de SegmentacionDefecto sin guardar"""
+    return construir_segmentaciones(
+        SegmentacionDefecto, analisis_db, segmentaciones, mediciones_lote, clase_por_defecto
+    )
+
+
+def guardar_en_bloque(filas: Sequence) -> float:
+    """
+    Inserta las filas con un bulk_create por modelo.
+
+    Returns:
+        Tiempo de escritura en ms
+    """
+    inicio = time.perf_counter()
+    por_modelo: Dict[Any, List] = {}
+    for fila in filas:
+        por_modelo.setdefault(type(fila), []).append(fila)
+    for modelo, grupo in por_modelo.items():
+        modelo.objects.bulk_create(grupo)
+    return (time.perf_counter() - inicio) * 1000
+
+
+def persistir_analisis(
+    analisis_db: AnalisisCople,
+    filas: Sequence = (),
+    tiempos: Optional[Dict[str, float]] = None,
+    inicio_total: Optional[float] = None
+) -> float:
+    """
+    Escribe las segmentaciones y actualiza el análisis padre en una sola transacción.
+
+    Los archivos (imagen procesada) deben guardarse en el storage antes de
+    llamar a esta función para no alargar la transacción.
+
+    Args:
+        analisis_db: Análisis padre con los campos ya actualizados
+        filas: Segmentaciones sin guardar (de cualquier modelo)
+        tiempos: Desglose de tiempos del análisis; se le añade escritura_bd_ms
+            y se guarda en metadatos_json['tiempos']. Con la duración total de
+            la escritura (persistencia_ms) se registra en las métricas
+        inicio_total: time.time() del inicio del análisis; si se indica,
+            tiempo_total_ms incluye la escritura de las segmentaciones
+
+    Returns:
+        Tiempo total de escritura en BD (ms), incluida la actualización del padre
+    """
+    inicio = time.perf_counter()
+
+    with transaction.atomic():
+        tiempo_bloque_ms = guardar_en_bloque(filas)
+
+        if inicio_total is not None:
+            analisis_db.tiempo_total_ms = (time.time() - inicio_total) * 1000
+
+        if tiempos is not None:
+            tiempos['escritura_bd_ms'] = round(tiempo_bloque_ms, 2)
+            if inicio_total is not None:
+                tiempos['total_ms'] = round(analisis_db.tiempo_total_ms, 2)
+            metadatos = dict(analisis_db.metadatos_json or {})
+            metadatos['tiempos'] = tiempos
+            analisis_db.metadatos_json = metadatos
+
+        analisis_db.save()
+
+    tiempo_escritura_ms = (time.perf_counter() - inicio) * 1000
+    logger.info(f"💾 {len(filas)} segmentaciones + análisis guardados en {tiempo_escritura_ms:.1f}ms")
+
+    if tiempos is not None:
+        get_metricas_service().registrar_analisis(
+            analisis_db.tipo_analisis,
+            {**tiempos, 'persistencia_ms': tiempo_escritura_ms},
+            analisis_db.estado
+        )
+    return tiempo_escritura_ms
@@ -0,0 +1,162 @@
+"""
+Relevo del preview desde el anillo compartido.
+
+Un proceso que no tiene la cámara (worker de Gunicorn, cliente del daemon de
+cámara) abre el anillo de frames que escribe el dueño de la cámara, codifica
+cada frame nuevo a JPEG una sola vez y lo publica en su DifusorPreview local.
+El hilo de relevo solo corre mientras hay clientes del preview.
+"""
+
+import logging
+import threading
+import time
+from typing import Callable, Optional, Tuple
+
+import cv2
+import numpy as np
+
+from ..expo_config import CameraConfig
+from ..modules.capture.anillo_compartido import AnilloFramesCompartido
+from .difusor_preview import DifusorPreview
+
+logger = logging.getLogger(__name__)
+
+
+class RelevoPreview:
+    """Lector del anillo compartido del preview que re-difunde en este proceso"""
+
+    def __init__(
+        self,
+        difusor: DifusorPreview,
+        nombre_anillo: str = CameraConfig.PREVIEW_SHM_NAME,
+        calidad_jpeg: int = 85,
+        debe_continuar: Optional[Callable[[], bool]] = None,
+        segundos_sin_demanda: float = 5.0
+    ):
+        """
+        Args:
+            difusor: Difusor local donde se publican los JPEG
+            nombre_anillo: Nombre del segmento de memoria compartida
+            calidad_jpeg: Calidad de codificación del preview
+            debe_continuar: Condición adicional para mantener el relevo
+                (p.ej. que la cámara no se haya abierto en este proceso)
+            segundos_sin_demanda: Tiempo sin clientes tras el que se detiene
+        """
+        self.difusor = difusor
+        self.nombre_anillo = nombre_anillo
+        self.calidad_jpeg = calidad_jpeg
+        self.debe_continuar = debe_continuar or (lambda: True)
+        self.segundos_sin_demanda = segundos_sin_demanda
+
+        self.anillo: Optional[AnilloFramesCompartido] = None
+        self.anillo_lock = threading.Lock()
+        self.hilo: Optional[threading.Thread] = None
+        self.hilo_lock = threading.Lock()
+        self.ultima_demanda: float = 0.0
+
+    def _abrir_anillo(self) -> Optional[AnilloFramesCompartido]:
+        """Abre (o reabre si el dueño lo recreó) el anillo compartido"""
+        with self.anillo_lock:
+            if self.anillo is not None and not self.anillo.activo:
+                self.anillo.cerrar()
+                self.anillo = None
+            if self.anillo is None:
+                self.anillo = AnilloFramesCompartido.abrir(self.nombre_anillo)
+            return self.anillo
+
+    def leer(self, copiar: bool = True) -> Optional[Tuple[int, float, np.ndarray]]:
+        """Último frame reciente del anillo: (seq, timestamp, frame) o None"""
+        try:
+            anillo = self._abrir_anillo()
+            if anillo is None:
+                return None
+            leido = anillo.leer(copiar=copiar)
+            if leido is None or time.time() - leido[1] > CameraConfig.PREVIEW_MAX_AGE:
+                return None
+            return leido
+        except Exception as e:
+            logger.error(f"Error leyendo frame de memoria compartida: {e}")
+            return None
+
+    def esperar_frame_posterior(
+        self,
+        no_antes_de: Optional[float] = None,
+        despues_de_seq: int = 0,
+        timeout: float = CameraConfig.CAPTURE_TIMEOUT
+    ) -> Optional[Tuple[int, float, np.ndarray]]:
+        """
+        Copia del primer frame del anillo publicado después de `no_antes_de`
+        (el anillo entre procesos no notifica: se sondea su secuencia).
+        """
+        anillo = self._abrir_anillo()
+        if anillo is None:
+            return None
+        limite = time.monotonic() + timeout
+        seq = despues_de_seq
+        while True:
+            restante = limite - time.monotonic()
+            if restante <= 0:
+                return None
+            leido = anillo.esperar_frame(seq, restante, copiar=True)
+            if leido is None:
+                return None
+            seq = leido[0]
+            if no_antes_de is None or leido[1] >= no_antes_de:
+                return leido
+
+    def disponible(self) -> bool:
+        """True si el dueño de la cámara está publicando frames recientes"""
+        return self.leer(copiar=False) is not None
+
+    def asegurar(self) -> None:
+        """
+        Arranca el hilo de relevo si no está corriendo y hay frames en el
+        anillo; espera brevemente el primer JPEG.
+        """
+        self.ultima_demanda = time.monotonic()
+        with self.hilo_lock:
+            if self.hilo is not None and self.hilo.is_alive():
+                return
+            if not self.disponible():
+                return
+            self.hilo = threading.Thread(
+                target=self._loop,
+                name='RelevoPreview',
+                daemon=True
+            )
+            self.hilo.start()
+        # Primer frame disponible sin esperar al siguiente ciclo del hilo
+        self.difusor.esperar_frame(0, timeout=0.5)
+
+    def _loop(self) -> None:
+        logger.info("📡 Relevo de preview desde memoria compartida iniciado")
+        seq = 0
+        while self.debe_continuar():
+            try:
+                anillo = self._abrir_anillo()
+                if anillo is None:
+                    break
+
+                leido = anillo.esperar_frame(seq, timeout=1.0, copiar=False)
+                if leido is not None:
+                    seq, _, frame = leido
+                    ok, buffer = cv2.imencode('.jpg', frame, [cv2.IMWRITE_JPEG_QUALITY, self.calidad_jpeg])
+                    # Publicar solo si el escritor no reutilizó el slot durante la codificación
+                    if ok and anillo.leer(seq, copiar=False) is not None:
+                        self.difusor.publicar(buffer.tobytes())
+                elif not anillo.activo:
+                    break
+            except Exception as e:
+                logger.error(f"Error en relevo de preview: {e}")
+                break
+
+            # Sin clientes durante un rato: dejar de relevar
+            if (self.difusor.num_suscriptores == 0
+                    and time.monotonic() - self.ultima_demanda > self.segundos_sin_demanda):
+                break
+
+        if self.debe_continuar():
+            # Terminar los streams abiertos (si la cámara pasó a este proceso,
+            # su loop de preview sigue publicando en el mismo difusor)
+            self.difusor.cerrar()
+        logger.info("📡 Relevo de preview detenido")
@@ -3,29 +3,33 @@ Servicio de Rutina de Inspección Multi-Ángulo.
 
 Flujo:
 1. Iniciar rutina (crear registro en BD)
-2. Capturar 4 imágenes automáticamente (cada 2 segundos)
-3. Analizar cada imagen (solo defectos, con máscaras simples)
-4. Generar imagen consolidada (Grid 2x2)
-5. Generar reporte consolidado
-6. Finalizar rutina
+2. Capturar 4 imágenes automáticamente y analizarlas en pipeline: el ángulo k
+   se analiza (solo defectos, con máscaras simples) mientras se captura el k+1
+3. Generar imagen consolidada (Grid 2x2)
+4. Generar reporte consolidado
+5. Finalizar rutina
 """
 
 import logging
+import queue
+import threading
 import time
 import uuid
 import os
 import cv2
 import numpy as np
-from typing import Dict, Any, Optional, List
-from datetime import datetime
+from typing import Dict, Any, Optional, List, Callable
+from datetime import datetime, timezone as dt_timezone
 
 from django.utils import timezone
 from django.contrib.auth import get_user_model
 from django.conf import settings
-from django.core.files.base import ContentFile
+from django.db import connection
 
 from ..models import ConfiguracionSistema, RutinaInspeccion, AnalisisCople
+from ..modules.tiempos import RegistroTiempos
 from .segmentation_analysis_service import get_segmentation_analysis_service
+from .persistencia_service import persistir_analisis
 
 logger = logging.getLogger(__name__)
 
@@ -40,12 +44,19 @@ class RutinaInspeccionService:
     desde diferentes ángulos y genera un reporte consolidado.
     """
     
-    def __init__(self):
-        """Inicializa el servicio"""
-        self.segmentation_service = get_segmentation_analysis_service()
+    def __init__(self, segmentation_service=None):
+        """
+        Inicializa el servicio
+        
+        Args:
+            segmentation_service: Servicio de segmentación (por defecto el singleton)
+        """
+        self.segmentation_service = segmentation_service or get_segmentation_analysis_service()
         self.num_angulos = 4  # Número de ángulos a capturar (reducido para barrido más rápido)
-        self.delay_entre_capturas = 2  # Segundos entre capturas (solo captura, sin ONNX)
-        self.delay_entre_analisis = 2  # Segundos entre análisis (con máscaras simples es estable)
+        # Segundos para que el brazo se posicione entre ángulos (ANALISIS_RUTINA_INTERVALO_S)
+        self.intervalo_posicionamiento = float(getattr(settings, 'ANALISIS_RUTINA_INTERVALO_S', 2.0))
+        self.tamano_cola_capturas = 2  # Capturas en espera de análisis
+        self.guardar_capturas = False  # Guardar PNG de cada ángulo en media/rutinas/<id> (auditoría)
     
     def iniciar_rutina(
         self,
@@ -93,8 +104,8 @@ class RutinaInspeccionService:
                 'rutina_id': rutina.id,
                 'id_rutina': id_rutina,
                 'num_angulos': self.num_angulos,
-                'delay_segundos': self.delay_entre_capturas,
-                'mensaje': f'Rutina iniciada. Se capturarán {self.num_angulos} imágenes con {self.delay_entre_capturas}s entre cada una.'
+                'delay_segundos': self.intervalo_posicionamiento,
+                'mensaje': f'Rutina iniciada. Se capturarán y analizarán {self.num_angulos} imágenes.'
             }
             
         except Exception as e:
@@ -107,169 +118,133 @@ class RutinaInspeccionService:
     def ejecutar_barrido_automatico(
         self,
         rutina_id: int,
-        usuario: Optional[User] = None
+        usuario: Optional[User] = None,
+        progreso: Optional[Callable[[int, str], None]] = None
     ) -> Dict[str, Any]:
         """
-        Ejecuta el barrido automático de 6 ángulos.
+        Ejecuta el barrido automático de todos los ángulos en pipeline.
         
-        ESTRATEGIA DE 2 FASES (para prevenir segfaults en inferencias consecutivas):
-        FASE 1: Capturar 6 imágenes y guardarlas en disco
-        FASE 2: Analizar las 6 imágenes guardadas (una por una)
+        Un hilo captura los ángulos y los entrega por una cola acotada en
+        memoria; este hilo los segmenta con la sesión ONNX ya cargada y los
+        guarda mientras se captura el siguiente ángulo. El tiempo total queda
+        en ~tiempo de captura + una inferencia.
         
         Args:
             rutina_id: ID de la rutina
             usuario: Usuario que ejecuta la rutina
+            progreso: Callback opcional (porcentaje, mensaje) para reportar avance
         
         Returns:
             Dict con resultado del barrido
         """
+        progreso = progreso or (lambda porcentaje, mensaje: None)
+        
         try:
             rutina = RutinaInspeccion.objects.get(id=rutina_id)
             
-            logger.info(f"📸 Iniciando barrido automático para rutina {rutina.id_rutina}")
-            logger.info(f"   FASE 1: Capturar {self.num_angulos} imágenes con {self.delay_entre_capturas}s entre cada una")
-            logger.info(f"   FASE 2: Analizar las {self.num_angulos} imágenes guardadas")
+            logger.info(f"📸 Iniciando barrido en pipeline para rutina {rutina.id_rutina} ({self.num_angulos} ángulos)")
+            inicio_barrido = time.time()
             
-            # FASE 1: CAPTURA DE IMÁGENES (guardar en disco, no RAM)
-            imagenes_paths = []
-            temp_dir = os.path.join(settings.MEDIA_ROOT, 'temp_rutinas', rutina.id_rutina)
-            os.makedirs(temp_dir, exist_ok=True)
+            # Cargar la sesión antes de empezar a capturar (persistente entre ángulos)
+            if not self.segmentation_service._inicializar_segmentador('defectos', rutina.configuracion):
+                return {
+                    'success': False,
+                    'error': 'Error inicializando segmentador de defectos'
+                }
             
-            for angulo in range(1, self.num_angulos + 1):
-                logger.info(f"\n📸 FASE 1 - Capturando imagen {angulo}/{self.num_angulos}...")
-                
-                # Capturar imagen
-                estado_camara = self.segmentation_service.camera_service.obtener_estado()
-                if not estado_camara['activa']:
-                    logger.error(f"❌ Cámara no activa en ángulo {angulo}")
-                    continue
-                
-                exito, imagen = self.segmentation_service.camera_service.capturar_imagen()
-                
-                if not exito or imagen is None:
-                    logger.error(f"❌ Error capturando imagen en ángulo {angulo}")
-                    continue
-                
-                # Guardar imagen en disco (PNG sin pérdida, evita corrupción de JPEG)
-                filename = f"angulo_{angulo}.png"
-                filepath = os.path.join(temp_dir, filename)
-                
-                # Verificar imagen antes de guardar
-                logger.info(f"   📊 Imagen a guardar: shape={imagen.shape}, dtype={imagen.dtype}, min={imagen.min()}, max={imagen.max()}")
-                
-                # Guardar en PNG (sin compresión/pérdida)
-                exito_guardado = cv2.imwrite(filepath, imagen)
-                
-                if not exito_guardado:
-                    logger.error(f"❌ Error guardando imagen {angulo}")
-                    continue
-                
-                # Verificar que se guardó correctamente leyendo de vuelta
-                test_read = cv2.imread(filepath)
-                if test_read is None:
-                    logger.error(f"❌ Imagen {angulo} corrupta en disco, no se puede leer")
-                    continue
-                
-                logger.info(f"   ✅ Verificación: imagen leída correctamente, shape={test_read.shape}")
-                
-                imagenes_paths.append({
-                    'angulo': angulo,
-                    'filepath': filepath,
-                    'timestamp': timezone.now()
-                })
-                
-                # Actualizar contador
-                rutina.num_imagenes_capturadas = angulo
-                rutina.save()
-                
-                logger.info(f"✅ Imagen {angulo} guardada y verificada en disco: {filename}")
-                
-                # Esperar antes de la siguiente captura (delay corto, solo captura)
-                if angulo < self.num_angulos:
-                    logger.info(f"⏳ Esperando {self.delay_entre_capturas}s...")
-                    time.sleep(self.delay_entre_capturas)
+            # El estado vive en BD: consultarlo aquí y no desde el hilo de captura
+            if not self.segmentation_service.camera_service.obtener_estado().get('activa'):
+                return {
+                    'success': False,
+                    'error': 'Cámara no activa'
+                }
             
-            logger.info(f"\n✅ FASE 1 COMPLETADA: {len(imagenes_paths)} imágenes guardadas en disco")
+            dir_auditoria = None
+            if self.guardar_capturas:
+                dir_auditoria = os.path.join(settings.MEDIA_ROOT, 'rutinas', rutina.id_rutina)
+                os.makedirs(dir_auditoria, exist_ok=True)
+            
+            # Captura en segundo plano -> cola acotada -> análisis en este hilo
+            cola_capturas: queue.Queue = queue.Queue(maxsize=self.tamano_cola_capturas)
+            detener = threading.Event()
+            hilo_captura = threading.Thread(
+                target=self._capturar_angulos,
+                args=(cola_capturas, detener, dir_auditoria),
+                name=f'CapturaRutina-{rutina.id_rutina}',
+                daemon=True
+            )
+            hilo_captura.start()
             
-            # FASE 2: ANÁLISIS DE IMÁGENES (desde disco, con delay largo)
-            logger.info(f"\n🔍 FASE 2 - Analizando {len(imagenes_paths)} imágenes desde disco...")
-            logger.info(f"   Delay entre análisis: {self.delay_entre_analisis}s (liberar memoria ONNX)")
             analisis_ids = []
-            
-            for idx, imagen_data in enumerate(imagenes_paths):
-                angulo = imagen_data['angulo']
-                filepath = imagen_data['filepath']
-                
-                logger.info(f"\n🔬 Analizando imagen {idx + 1}/{len(imagenes_paths)} (Ángulo {angulo})...")
-                
-                # Leer imagen desde disco
-                imagen = cv2.imread(filepath)
-                if imagen is None:
-                    logger.error(f"❌ Error leyendo imagen desde {filepath}")
-                    continue
-                
-                # Verificar integridad de la imagen leída
-                logger.info(f"   📊 Imagen leída: shape={imagen.shape}, dtype={imagen.dtype}, min={imagen.min()}, max={imagen.max()}")
-                
-                # Validar que la imagen sea correcta
-                if imagen.shape != (640, 640, 3):
-                    logger.error(f"❌ Imagen con shape incorrecto: {imagen.shape}, esperado (640, 640, 3)")
-                    continue
-                
-                if imagen.dtype != np.uint8:
-                    logger.error(f"❌ Imagen con dtype incorrecto: {imagen.dtype}, esperado uint8")
-                    continue
-                
-                if np.isnan(imagen).any() or np.isinf(imagen).any():
-                    logger.error(f"❌ Imagen contiene NaN o Inf")
-                    continue
-                
-                logger.info(f"   ✅ Imagen válida, procediendo con análisis...")
-                
-                # Analizar imagen (crea análisis en BD)
-                resultado = self._analizar_imagen_guardada(
-                    imagen=imagen,
-                    usuario=usuario,
-                    configuracion=rutina.configuracion,
-                    timestamp_captura=imagen_data['timestamp']
-                )
-                
-                if 'error' in resultado:
-                    logger.error(f"❌ Error analizando ángulo {angulo}: {resultado['error']}")
-                    continue
-                
-                analisis_ids.append(resultado['analisis_id'])
-                logger.info(f"✅ Ángulo {angulo} analizado: {resultado['id_analisis']}")
-                
-                # Liberar segmentador y esperar antes del siguiente análisis
-                if self.segmentation_service.segmentador_defectos:
-                    logger.info(f"🧹 Liberando segmentador...")
-                    del self.segmentation_service.segmentador_defectos
-                    self.segmentation_service.segmentador_defectos = None
-                    import gc
-                    gc.collect()
-                    logger.info(f"✅ Memoria liberada")
-                
-                # Delay largo entre análisis para dar tiempo a liberar memoria ONNX
-                if idx < len(imagenes_paths) - 1:
-                    logger.info(f"⏳ Esperando {self.delay_entre_analisis}s antes del siguiente análisis...")
-                    time.sleep(self.delay_entre_analisis)
-            
-            # Limpiar archivos temporales
+            num_capturadas = 0
             try:
-                import shutil
-                shutil.rmtree(temp_dir)
-                logger.info(f"🗑️  Imágenes temporales eliminadas: {temp_dir}")
-            except Exception as e:
-                logger.warning(f"⚠️  No se pudieron eliminar archivos temporales: {e}")
-            
-            logger.info(f"\n✅ FASE 2 COMPLETADA: {len(analisis_ids)} imágenes analizadas")
-            logger.info(f"\n✅ Barrido total completado: {len(analisis_ids)} ángulos exitosos")
+                while True:
+                    captura = cola_capturas.get()
+                    if captura is None:
+                        break
+                    
+                    angulo, imagen, timestamp_captura, tiempo_captura_ms, inicio_total = captura
+                    num_capturadas += 1
+                    RutinaInspeccion.objects.filter(id=rutina.id).update(
+                        num_imagenes_capturadas=num_capturadas
+                    )
+                    
+                    if not self._imagen_valida(imagen, angulo):
+                        continue
+                    
+                    progreso(
+                        (angulo - 1) * 100 // self.num_angulos,
+                        f"Analizando ángulo {angulo}/{self.num_angulos}"
+                    )
+                    
+                    registro = RegistroTiempos()
+                    registro.agregar('captura', tiempo_captura_ms)
+                    with registro.activo():
+                        inicio_seg = time.time()
+                        segmentaciones = self.segmentation_service.segmentador_defectos.segmentar(
+                            imagen,
+                            usar_mascaras_simples=True  # Forzar máscaras simples para rutinas
+                        )
+                        tiempo_seg = (time.time() - inicio_seg) * 1000
+                        
+                        # Analizar imagen (crea análisis en BD)
+                        resultado = self._analizar_imagen_guardada(
+                            imagen=imagen,
+                            usuario=usuario,
+                            configuracion=rutina.configuracion,
+                            timestamp_captura=timestamp_captura,
+                            segmentaciones=segmentaciones,
+                            tiempo_segmentacion_ms=tiempo_seg,
+                            registro=registro,
+                            inicio_total=inicio_total
+                        )
+                    
+                    if 'error' in resultado:
+                        logger.error(f"❌ Error analizando ángulo {angulo}: {resultado['error']}")
+                        continue
+                    
+                    analisis_ids.append(resultado['analisis_id'])
+                    logger.info(f"✅ Ángulo {angulo} analizado en {tiempo_seg:.0f}ms: {resultado['id_analisis']}")
+                    progreso(angulo * 100 // self.num_angulos, f"Ángulo {angulo} analizado")
+            finally:
+                # Si el análisis falla, no dejar el hilo de captura bloqueado en la cola
+                detener.set()
+                while hilo_captura.is_alive():
+                    try:
+                        cola_capturas.get_nowait()
+                    except queue.Empty:
+                        hilo_captura.join(timeout=0.1)
+            
+            tiempo_barrido = time.time() - inicio_barrido
+            logger.info(
+                f"✅ Barrido completado: {len(analisis_ids)}/{num_capturadas} ángulos en {tiempo_barrido:.1f}s"
+            )
             
             return {
                 'success': True,
                 'analisis_ids': analisis_ids,
                 'num_capturas': len(analisis_ids),
+                'tiempo_barrido_s': round(tiempo_barrido, 2),
                 'mensaje': f'Barrido completado: {len(analisis_ids)} imágenes capturadas y analizadas'
             }
             
@@ -285,20 +260,99 @@ class RutinaInspeccionService:
                 'error': f'Error en barrido: {str(e)}'
             }
     
+    def _capturar_angulos(
+        self,
+        cola_capturas: queue.Queue,
+        detener: threading.Event,
+        dir_auditoria: Optional[str] = None
+    ) -> None:
+        """
+        Hilo productor: captura cada ángulo y lo pone en la cola.
+        
+        La cola acotada frena la captura si el análisis se retrasa. Siempre
+        termina con None para que el consumidor sepa que no hay más ángulos.
+        No consulta la BD: el estado de la cámara lo comprueba el consumidor
+        antes de lanzar este hilo.
+        """
+        camera_service = self.segmentation_service.camera_service
+        seq_anterior = 0
+        try:
+            for angulo in range(1, self.num_angulos + 1):
+                if detener.is_set():
+                    break
+                
+                # Tiempo para que el brazo se posicione en el siguiente ángulo
+                if angulo > 1 and self.intervalo_posicionamiento > 0:
+                    if detener.wait(self.intervalo_posicionamiento):
+                        break
+                
+                # Pieza en posición: usar el primer frame expuesto después de
+                # este momento (y distinto del ángulo anterior), no el que
+                # hubiera en el buffer
+                posicionado = time.time()
+                exito, imagen, seq, timestamp = camera_service.capturar_imagen_posterior(
+                    no_antes_de=posicionado,
+                    despues_de_seq=seq_anterior
+                )
+                if not exito or imagen is None:
+                    # seq_anterior se conserva: el siguiente ángulo no puede
+                    # reutilizar el frame del último ángulo capturado
+                    logger.error(f"❌ Error capturando imagen en ángulo {angulo}")
+                    continue
+                seq_anterior = seq
+                
+                tiempo_captura_ms = (time.time() - posicionado) * 1000
+                timestamp_captura = datetime.fromtimestamp(timestamp, tz=dt_timezone.utc)
+                
+                # Copia en disco solo para auditoría (PNG sin pérdida)
+                if dir_auditoria and not cv2.imwrite(os.path.join(dir_auditoria, f"angulo_{angulo}.png"), imagen):
+                    logger.warning(f"⚠️ No se pudo guardar la captura de auditoría del ángulo {angulo}")
+                
+                logger.info(f"📸 Ángulo {angulo}/{self.num_angulos} capturado")
+                cola_capturas.put((angulo, imagen, timestamp_captura, tiempo_captura_ms, posicionado))
+        except Exception as e:
+            logger.error(f"❌ Error en hilo de captura: {e}", exc_info=True)
+        finally:
+            # Hilo nuevo por barrido: no dejar abierta una conexión propia
+            connection.close()
+            cola_capturas.put(None)
+    
+    def _imagen_valida(self, imagen: np.ndarray, angulo: int) -> bool:
+        """Verifica shape y dtype de la captura antes de analizarla"""
+        if imagen.shape != (640, 640, 3):
+            logger.error(f"❌ Ángulo {angulo}: shape incorrecto {imagen.shape}, esperado (640, 640, 3)")
+            return False
+        if imagen.dtype != np.uint8:
+            logger.error(f"❌ Ángulo {angulo}: dtype incorrecto {imagen.dtype}, esperado uint8")
+            return False
+        return True
+    
     def _analizar_imagen_guardada(
         self,
         imagen: np.ndarray,
         usuario: Optional[User],
         configuracion: Optional[ConfiguracionSistema],
-        timestamp_captura
+        timestamp_captura,
+        segmentaciones: Optional[List[Dict]] = None,
+        tiempo_segmentacion_ms: float = 0.0,
+        registro: Optional[RegistroTiempos] = None,
+        inicio_total: Optional[float] = None
     ) -> Dict[str, Any]:
         """
         Analiza una imagen ya capturada (no captura nueva).
         Similar a analizar_imagen pero usa imagen ya guardada.
+        
+        Si se pasan segmentaciones (ya calculadas por el barrido) no se vuelve a
+        ejecutar la inferencia. `registro` trae los tiempos por etapa ya
+        medidos (p.ej. de la segmentación) para completarlos y guardarlos.
+        `inicio_total` es el time.time() del inicio de la captura:
+        tiempo_total_ms va desde ahí hasta la escritura en BD.
         """
+        registro = registro or RegistroTiempos()
+        inicio_total = inicio_total if inicio_total is not None else time.time()
         try:
             # Inicializar segmentador de defectos
-            if not self.segmentation_service._inicializar_segmentador('defectos'):
+            if not self.segmentation_service._inicializar_segmentador('defectos', configuracion):
                 return {'error': 'Error inicializando segmentador de defectos'}
             
             # Configurar factor de conversión si existe
@@ -323,56 +377,49 @@ class RutinaInspeccionService:
                 resolucion_ancho=imagen.shape[1],
                 resolucion_alto=imagen.shape[0],
                 resolucion_canales=imagen.shape[2] if len(imagen.shape) > 2 else 1,
-                tiempo_captura_ms=0.0,
+                tiempo_captura_ms=registro.etapas.get('captura', 0.0),
                 tiempo_segmentacion_defectos_ms=0.0,
                 tiempo_segmentacion_piezas_ms=0.0,
                 tiempo_total_ms=0.0,
                 metadatos_json={}
             )
             
-            # Ejecutar segmentación con máscaras SIMPLES (estable para rutinas)
-            logger.info(f"   🎯 Usando máscaras rectangulares simples (modo rutina, 100% estable)")
-            inicio_seg = time.time()
-            segmentaciones = self.segmentation_service.segmentador_defectos.segmentar(
-                imagen, 
-                usar_mascaras_simples=True  # Forzar máscaras simples para rutinas
-            )
-            tiempo_seg = (time.time() - inicio_seg) * 1000
-            analisis_db.tiempo_segmentacion_defectos_ms = tiempo_seg
-            
-            # Guardar segmentaciones
-            self.segmentation_service._guardar_segmentaciones_defectos(
-                analisis_db, segmentaciones, configuracion
-            )
-            
-            # Generar imagen procesada
-            imagen_procesada = self.segmentation_service._generar_imagen_procesada(
-                imagen, segmentaciones, 'medicion_defectos'
-            )
-            
-            # Guardar imagen procesada (inline, igual que en segmentation_analysis_service)
-            if imagen_procesada is not None:
-                try:
-                    from django.core.files.base import ContentFile
-                    
-                    # Codificar imagen
-                    _, buffer = cv2.imencode('.jpg', imagen_procesada)
-                    imagen_bytes = buffer.tobytes()
-                    
-                    # Nombre del archivo
-                    nombre_archivo = f"analisis_{id_analisis}.jpg"
-                    
-                    # Guardar usando ContentFile
-                    analisis_db.archivo_imagen = ContentFile(imagen_bytes, name=nombre_archivo)
-                    logger.info(f"💾 Imagen procesada guardada: {nombre_archivo}")
-                    
-                except Exception as e:
-                    logger.error(f"❌ Error guardando imagen procesada: {e}", exc_info=True)
-            
-            # Finalizar
-            analisis_db.tiempo_total_ms = tiempo_seg
-            analisis_db.estado = 'completado'
-            analisis_db.save()
+            with registro.activo():
+                if segmentaciones is None:
+                    # Ejecutar segmentación con máscaras SIMPLES (estable para rutinas)
+                    logger.info(f"   🎯 Usando máscaras rectangulares simples (modo rutina, 100% estable)")
+                    inicio_seg = time.time()
+                    segmentaciones = self.segmentation_service.segmentador_defectos.segmentar(
+                        imagen, 
+                        usar_mascaras_simples=True  # Forzar máscaras simples para rutinas
+                    )
+                    tiempo_seg = (time.time() - inicio_seg) * 1000
+                else:
+                    tiempo_seg = tiempo_segmentacion_ms
+                analisis_db.tiempo_segmentacion_defectos_ms = tiempo_seg
+                
+                # Mediciones y filas a guardar
+                inicio_post = time.time()
+                with registro.medir('mediciones'):
+                    filas = self.segmentation_service._construir_segmentaciones_defectos(
+                        analisis_db, segmentaciones, configuracion
+                    )
+                
+                # Generar y guardar imagen procesada (antes de la transacción)
+                with registro.medir('visualizacion'):
+                    imagen_procesada = self.segmentation_service._generar_imagen_procesada(
+                        imagen, segmentaciones, 'medicion_defectos'
+                    )
+                self.segmentation_service._guardar_imagen_procesada(analisis_db, imagen_procesada)
+                
+                # Finalizar: segmentaciones + registro en una sola transacción
+                analisis_db.estado = 'completado'
+                tiempos = {
+                    'segmentacion_ms': round(tiempo_seg, 2),
+                    'postproceso_ms': round((time.time() - inicio_post) * 1000, 2),
+                    **registro.como_dict(),
+                }
+                persistir_analisis(analisis_db, filas, tiempos=tiempos, inicio_total=inicio_total)
             
             return {
                 'id_analisis': id_analisis,
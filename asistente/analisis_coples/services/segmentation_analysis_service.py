@@ -26,13 +26,111 @@ from django.core.files.base import ContentFile
 from ..models import ConfiguracionSistema, AnalisisCople
 from ..resultados_models import SegmentacionPieza, SegmentacionDefecto
 from ..modules.measurements import get_measurement_service
+from ..modules.mascara_compacta import como_compacta, superponer_mascara
+from ..modules.tiempos import RegistroTiempos, medir_etapa
 from .camera_service import get_camera_service
+from .model_registry import get_model_registry
+from .persistencia_service import (
+    construir_segmentaciones_defectos,
+    construir_segmentaciones_piezas,
+    persistir_analisis,
+)
 
 logger = logging.getLogger(__name__)
 
 User = get_user_model()
 
 
+def generar_imagen_procesada(
+    imagen: np.ndarray,
+    segmentaciones: list,
+    tipo_analisis: str
+) -> Optional[np.ndarray]:
+    """
+    Genera imagen procesada con máscaras dibujadas.
+
+    Args:
+        imagen: Imagen original
+        segmentaciones: Lista de segmentaciones con máscaras
+        tipo_analisis: Tipo de análisis para el color
+
+    Returns:
+        Imagen con máscaras dibujadas o None si falla
+    """
+    try:
+        if not segmentaciones:
+            logger.warning("No hay segmentaciones para visualizar")
+            return None
+
+        # Copiar imagen para no modificar la original
+        imagen_vis = imagen.copy()
+
+        # Definir color según tipo
+        if tipo_analisis == 'medicion_piezas':
+            color_base = (0, 255, 0)  # Verde para piezas
+        else:
+            color_base = (0, 0, 255)  # Rojo para defectos
+
+        logger.info(f"🎨 Dibujando {len(segmentaciones)} máscaras en imagen...")
+
+        # Dibujar cada máscara
+        for idx, seg in enumerate(segmentaciones):
+            mascara = seg.get('mascara')
+            bbox = seg.get('bbox', {})
+
+            if mascara is None:
+                continue
+
+            # Máscara compacta: solo se trabaja sobre la región del bbox
+            mascara = como_compacta(mascara)
+            if mascara is None:
+                continue
+
+            # Redimensionar si es necesario
+            if mascara.shape != imagen.shape[:2]:
+                mascara = como_compacta(
+                    cv2.resize(mascara.to_dense(), (imagen.shape[1], imagen.shape[0]))
+                )
+
+            # Verificar píxeles activos
+            pixels_activos = mascara.area
+            if pixels_activos == 0:
+                logger.warning(f"  ⚠️ Máscara {idx}: Sin píxeles activos")
+                continue
+
+            logger.info(f"  ✅ Máscara {idx}: {pixels_activos} píxeles activos")
+
+            # Overlay con transparencia (alpha=0.4) limitado a la región de la máscara
+            superponer_mascara(imagen_vis, mascara, color_base, alpha=0.4)
+
+            # Dibujar contorno de la máscara
+            cv2.drawContours(imagen_vis, mascara.contours, -1, color_base, 2)
+
+            # Dibujar bounding box si existe
+            if bbox:
+                x1, y1 = int(bbox.get('x1', 0)), int(bbox.get('y1', 0))
+                x2, y2 = int(bbox.get('x2', 0)), int(bbox.get('y2', 0))
+                cv2.rectangle(imagen_vis, (x1, y1), (x2, y2), color_base, 2)
+
+                # Agregar etiqueta
+                clase = seg.get('clase', 'Objeto')
+                confianza = seg.get('confianza', 0.0)
+                etiqueta = f"{clase}: {confianza:.2f}"
+
+                # Fondo para el texto
+                (tw, th), _ = cv2.getTextSize(etiqueta, cv2.FONT_HERSHEY_SIMPLEX, 0.6, 2)
+                cv2.rectangle(imagen_vis, (x1, y1 - th - 10), (x1 + tw, y1), color_base, -1)
+                cv2.putText(imagen_vis, etiqueta, (x1, y1 - 5), 
+                           cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255, 255, 255), 2)
+
+        logger.info(f"✅ Imagen procesada generada: {imagen_vis.shape}")
+        return imagen_vis
+
+    except Exception as e:
+        logger.error(f"❌ Error generando imagen procesada: {e}", exc_info=True)
+        return None
+
+
 class SegmentationAnalysisService:
     """
     Servicio simplificado para análisis de segmentación con mediciones.
@@ -46,60 +144,39 @@ class SegmentationAnalysisService:
         self.segmentador_defectos = None
         self.measurement_service = get_measurement_service()
         self.camera_service = get_camera_service()
+        self.model_registry = get_model_registry()
     
-    def _inicializar_segmentador(self, tipo: str):
+    def _inicializar_segmentador(self, tipo: str, config: Optional[ConfiguracionSistema] = None):
         """
-        Inicializa un segmentador específico y libera el otro para ahorrar RAM.
-        Solo mantiene un modelo ONNX cargado a la vez.
+        Obtiene el segmentador indicado desde el registro de modelos.
+        
+        Los modelos se mantienen calientes en el registro del proceso, así que
+        cambiar entre piezas y defectos no vuelve a cargar el ONNX.
         
         Args:
             tipo: 'piezas' o 'defectos'
+            config: Configuración del análisis; si es la activa, aplica sus
+                opciones de ONNX Runtime (opcional)
         """
-        import sys
-        import os
+        if tipo not in ('piezas', 'defectos'):
+            logger.error(f"❌ Tipo de segmentador desconocido: {tipo}")
+            return False
         
-        # Agregar path
-        current_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-        if current_dir not in sys.path:
-            sys.path.insert(0, current_dir)
+        # Las opciones de ONNX Runtime son del proceso: solo las fija la
+        # configuración activa. Otra configuración usa los modelos ya cargados
+        # en vez de descartarlos y recargarlos en cada petición
+        if config is not None and config.activa:
+            self.model_registry.aplicar_opciones_onnx(config.obtener_opciones_onnx())
         
-        # Importar segmentadores
-        from modules.segmentation.segmentation_piezas_engine import SegmentadorPiezasCoples
-        from modules.segmentation.segmentation_defectos_engine import SegmentadorDefectosCoples
+        segmentador = self.model_registry.obtener(tipo)
+        if segmentador is None:
+            logger.error(f"❌ Error inicializando segmentador de {tipo}")
+            return False
         
         if tipo == 'piezas':
-            # Liberar segmentador de defectos si existe
-            if self.segmentador_defectos is not None:
-                logger.info("🔄 Liberando segmentador de defectos para cargar piezas...")
-                if hasattr(self.segmentador_defectos, 'liberar'):
-                    self.segmentador_defectos.liberar()
-                self.segmentador_defectos = None
-            
-            # Inicializar segmentador de piezas si no existe
-            if self.segmentador_piezas is None:
-                logger.info("🎯 Inicializando segmentador de piezas...")
-                self.segmentador_piezas = SegmentadorPiezasCoples()
-                if not self.segmentador_piezas.stats['inicializado']:
-                    logger.error("❌ Error inicializando segmentador de piezas")
-                    return False
-                logger.info("✅ Segmentador de piezas listo")
-        
-        elif tipo == 'defectos':
-            # Liberar segmentador de piezas si existe
-            if self.segmentador_piezas is not None:
-                logger.info("🔄 Liberando segmentador de piezas para cargar defectos...")
-                if hasattr(self.segmentador_piezas, 'liberar'):
-                    self.segmentador_piezas.liberar()
-                self.segmentador_piezas = None
-            
-            # Inicializar segmentador de defectos si no existe
-            if self.segmentador_defectos is None:
-                logger.info("🎯 Inicializando segmentador de defectos...")
-                self.segmentador_defectos = SegmentadorDefectosCoples()
-                if not self.segmentador_defectos._inicializar_modelo():
-                    logger.error("❌ Error inicializando segmentador de defectos")
-                    return False
-                logger.info("✅ Segmentador de defectos listo")
+            self.segmentador_piezas = segmentador
+        else:
+            self.segmentador_defectos = segmentador
         
         return True
     
@@ -128,12 +205,7 @@ class SegmentationAnalysisService:
                     'error': 'No hay cámara inicializada. Inicializa la cámara primero.'
                 }
             
-            # 2. Inicializar el segmentador correcto según el tipo
-            tipo_segmentador = 'piezas' if tipo_analisis == 'medicion_piezas' else 'defectos'
-            if not self._inicializar_segmentador(tipo_segmentador):
-                return {'error': f'Error inicializando segmentador de {tipo_segmentador}'}
-            
-            # 3. Obtener configuración
+            # 2. Obtener configuración
             if configuracion_id:
                 config = ConfiguracionSistema.objects.get(id=configuracion_id)
             else:
@@ -142,13 +214,21 @@ class SegmentationAnalysisService:
             if not config:
                 return {'error': 'No hay configuración activa'}
             
+            # 3. Inicializar el segmentador correcto según el tipo
+            tipo_segmentador = 'piezas' if tipo_analisis == 'medicion_piezas' else 'defectos'
+            if not self._inicializar_segmentador(tipo_segmentador, config):
+                return {'error': f'Error inicializando segmentador de {tipo_segmentador}'}
+            
             # Configurar factor de conversión si existe
             if config.factor_conversion_px_mm:
                 self.measurement_service.set_conversion_factor(config.factor_conversion_px_mm)
             
-            # 4. Capturar imagen desde cámara activa
+            # 4. Capturar imagen desde cámara activa (los tiempos por etapa cuentan desde aquí)
+            registro = RegistroTiempos()
+            inicio_total = time.time()
             logger.info(f"📸 Capturando imagen desde {'GigE' if not estado_camara.get('usando_webcam') else 'Webcam'}...")
-            exito, imagen = self.camera_service.capturar_imagen()
+            with registro.medir('captura'):
+                exito, imagen = self.camera_service.capturar_imagen()
             
             if not exito or imagen is None:
                 return {'error': 'Error capturando imagen de la cámara'}
@@ -171,7 +251,7 @@ class SegmentationAnalysisService:
                 resolucion_ancho=imagen.shape[1],
                 resolucion_alto=imagen.shape[0],
                 resolucion_canales=imagen.shape[2] if len(imagen.shape) > 2 else 1,
-                tiempo_captura_ms=0.0,
+                tiempo_captura_ms=registro.etapas['captura'],
                 tiempo_segmentacion_defectos_ms=0.0,
                 tiempo_segmentacion_piezas_ms=0.0,
                 tiempo_total_ms=0.0,
@@ -180,304 +260,176 @@ class SegmentationAnalysisService:
             
             logger.info(f"📝 Registro creado: {id_analisis}")
             
-            # 7. Ejecutar segmentación según tipo
-            inicio_seg = time.time()
+            # 7-9 con el registro activo: los motores y servicios anotan sus etapas en él
+            with registro.activo():
+                return self._segmentar_y_persistir(analisis_db, imagen, tipo_analisis, config, registro, inicio_total)
             
-            if tipo_analisis == 'medicion_piezas':
-                try:
-                    logger.info("🔩 Ejecutando segmentación de piezas...")
-                    logger.info(f"   Imagen shape: {imagen.shape}, dtype: {imagen.dtype}")
-                    logger.info(f"   Segmentador: {type(self.segmentador_piezas)}")
-                    
-                    # Ejecutar segmentación
-                    segmentaciones = self.segmentador_piezas.segmentar(imagen)
-                    
-                    logger.info(f"✅ Segmentación completada: {len(segmentaciones) if segmentaciones else 0} resultados")
-                    
-                    tiempo_seg = (time.time() - inicio_seg) * 1000
-                    analisis_db.tiempo_segmentacion_piezas_ms = tiempo_seg
-                    
-                    # Guardar segmentaciones con mediciones
-                    self._guardar_segmentaciones_piezas(analisis_db, segmentaciones, config)
-                    
-                except Exception as e:
-                    logger.error(f"❌ Error en segmentación de piezas: {e}", exc_info=True)
-                    analisis_db.estado = 'error'
-                    analisis_db.save()
-                    return {'error': f'Error en segmentación: {str(e)}'}
+        except Exception as e:
+            logger.error(f"❌ Error en análisis: {e}", exc_info=True)
+            return {'error': str(e)}
+    
+    def _segmentar_y_persistir(
+        self,
+        analisis_db: AnalisisCople,
+        imagen: np.ndarray,
+        tipo_analisis: str,
+        config: ConfiguracionSistema,
+        registro: RegistroTiempos,
+        inicio_total: float
+    ) -> Dict[str, Any]:
+        """
+        Segmenta, mide, dibuja y guarda un análisis ya creado en BD.
+        
+        Cada etapa queda en `registro`; el desglose se guarda en
+        metadatos_json['tiempos'] y se suma a las métricas del proceso.
+        tiempo_total_ms va desde la captura hasta la escritura en BD.
+        """
+        id_analisis = analisis_db.id_analisis
+        
+        # 7. Ejecutar segmentación según tipo
+        inicio_seg = time.time()
+        
+        if tipo_analisis == 'medicion_piezas':
+            try:
+                logger.info("🔩 Ejecutando segmentación de piezas...")
+                logger.info(f"   Imagen shape: {imagen.shape}, dtype: {imagen.dtype}")
+                logger.info(f"   Segmentador: {type(self.segmentador_piezas)}")
+                
+                # Ejecutar segmentación
+                segmentaciones = self.segmentador_piezas.segmentar(imagen)
+                
+                logger.info(f"✅ Segmentación completada: {len(segmentaciones) if segmentaciones else 0} resultados")
                 
-            elif tipo_analisis == 'medicion_defectos':
-                logger.info("⚠️  Ejecutando segmentación de defectos...")
-                segmentaciones = self.segmentador_defectos.segmentar(imagen)
                 tiempo_seg = (time.time() - inicio_seg) * 1000
-                analisis_db.tiempo_segmentacion_defectos_ms = tiempo_seg
+                analisis_db.tiempo_segmentacion_piezas_ms = tiempo_seg
                 
-                # Guardar segmentaciones con mediciones
-                self._guardar_segmentaciones_defectos(analisis_db, segmentaciones, config)
-            
-            # 8. Generar y guardar imagen procesada con máscaras
-            logger.info("🖼️  Generando imagen procesada...")
+                # Mediciones y filas a guardar
+                inicio_med = time.time()
+                filas = self._construir_segmentaciones_piezas(analisis_db, segmentaciones, config)
+                
+            except Exception as e:
+                logger.error(f"❌ Error en segmentación de piezas: {e}", exc_info=True)
+                analisis_db.estado = 'error'
+                analisis_db.save()
+                return {'error': f'Error en segmentación: {str(e)}'}
+            
+        elif tipo_analisis == 'medicion_defectos':
+            logger.info("⚠️  Ejecutando segmentación de defectos...")
+            segmentaciones = self.segmentador_defectos.segmentar(imagen)
+            tiempo_seg = (time.time() - inicio_seg) * 1000
+            analisis_db.tiempo_segmentacion_defectos_ms = tiempo_seg
+            
+            # Mediciones y filas a guardar
+            inicio_med = time.time()
+            filas = self._construir_segmentaciones_defectos(analisis_db, segmentaciones, config)
+        
+        registro.agregar('mediciones', (time.time() - inicio_med) * 1000)
+        
+        # 8. Generar y guardar imagen procesada con máscaras
+        logger.info("🖼️  Generando imagen procesada...")
+        with registro.medir('visualizacion'):
             imagen_procesada = self._generar_imagen_procesada(imagen, segmentaciones, tipo_analisis)
-            
-            if imagen_procesada is not None:
-                try:
-                    # Codificar imagen
-                    _, buffer = cv2.imencode('.jpg', imagen_procesada)
-                    imagen_bytes = buffer.tobytes()
-                    
-                    # Nombre del archivo
-                    nombre_archivo = f"analisis_{id_analisis}.jpg"
-                    
-                    # Guardar usando ContentFile directamente
-                    from django.core.files.base import ContentFile
-                    analisis_db.archivo_imagen = ContentFile(imagen_bytes, name=nombre_archivo)
-                    
-                    logger.info(f"💾 Imagen procesada guardada: {nombre_archivo}")
-                    
-                except Exception as e:
-                    logger.error(f"❌ Error guardando imagen procesada: {e}", exc_info=True)
-            else:
-                logger.warning("⚠️ No se pudo generar imagen procesada")
-            
-            # 9. Actualizar registro
-            analisis_db.tiempo_total_ms = (time.time() - inicio_seg) * 1000
-            analisis_db.estado = 'completado'
-            analisis_db.save()
-            
-            logger.info(f"✅ Análisis completado: {id_analisis}")
-            logger.info(f"   Segmentaciones: {len(segmentaciones) if segmentaciones else 0}")
-            logger.info(f"   Tiempo: {analisis_db.tiempo_total_ms:.0f}ms")
-            
-            return {
-                'id_analisis': id_analisis,
-                'analisis_id': analisis_db.id,
-                'estado': 'completado',
-                'segmentaciones_count': len(segmentaciones) if segmentaciones else 0,
-                'tiempo_total_ms': analisis_db.tiempo_total_ms
-            }
-            
-        except Exception as e:
-            logger.error(f"❌ Error en análisis: {e}", exc_info=True)
-            return {'error': str(e)}
+        self._guardar_imagen_procesada(analisis_db, imagen_procesada)
+        
+        # 9. Guardar segmentaciones y actualizar registro (una transacción)
+        analisis_db.estado = 'completado'
+        tiempos = {'segmentacion_ms': round(tiempo_seg, 2), **registro.como_dict()}
+        persistir_analisis(analisis_db, filas, tiempos=tiempos, inicio_total=inicio_total)
+        
+        logger.info(f"✅ Análisis completado: {id_analisis}")
+        logger.info(f"   Segmentaciones: {len(segmentaciones) if segmentaciones else 0}")
+        logger.info(f"   Tiempo: {analisis_db.tiempo_total_ms:.0f}ms")
+        
+        return {
+            'id_analisis': id_analisis,
+            'analisis_id': analisis_db.id,
+            'estado': 'completado',
+            'segmentaciones_count': len(segmentaciones) if segmentaciones else 0,
+            'tiempo_total_ms': analisis_db.tiempo_total_ms
+        }
     
-    def _guardar_segmentaciones_piezas(
+    def _construir_segmentaciones_piezas(
         self,
         analisis_db: AnalisisCople,
         segmentaciones: list,
         config: ConfiguracionSistema
-    ):
-        """Guarda segmentaciones de piezas con mediciones"""
-        import numpy as np
-        
+    ) -> List[SegmentacionPieza]:
+        """Calcula las mediciones y construye (sin guardar) las segmentaciones de piezas"""
         if not segmentaciones:
             logger.warning("No hay segmentaciones de piezas para guardar")
-            return
+            return []
         
-        logger.info(f"📐 Guardando {len(segmentaciones)} segmentaciones de piezas...")
+        logger.info(f"📐 Midiendo {len(segmentaciones)} segmentaciones de piezas...")
         
-        for idx, seg in enumerate(segmentaciones):
-            # Extraer datos
-            bbox = seg.get('bbox', {})
-            mascara = seg.get('mascara')
-            
-            # Calcular mediciones si hay máscara
-            mediciones = {}
-            if mascara is not None:
-                if not isinstance(mascara, np.ndarray):
-                    mascara = np.array(mascara, dtype=np.uint8)
-                
-                mediciones = self.measurement_service.calcular_mediciones_completas(
-                    mascara,
-                    convertir_a_mm=bool(config.factor_conversion_px_mm)
-                )
+        # Mediciones de todas las máscaras del análisis (dict vacío si no hay máscara)
+        mediciones_lote = self.measurement_service.calcular_mediciones_lote(
+            [seg.get('mascara') for seg in segmentaciones],
+            convertir_a_mm=bool(config and config.factor_conversion_px_mm)
+        )
+        
+        for idx, mediciones in enumerate(mediciones_lote):
+            if mediciones:
                 logger.info(f"  📏 Pieza {idx}: {mediciones.get('ancho_bbox_px')}x{mediciones.get('alto_bbox_px')}px, área={mediciones.get('area_mascara_px')}px²")
-            
-            # Guardar en BD
-            SegmentacionPieza.objects.create(
-                analisis=analisis_db,
-                clase=seg.get('clase', 'Cople'),
-                confianza=seg.get('confianza', 0.0),
-                bbox_x1=bbox.get('x1', 0),
-                bbox_y1=bbox.get('y1', 0),
-                bbox_x2=bbox.get('x2', 0),
-                bbox_y2=bbox.get('y2', 0),
-                ancho_bbox_px=mediciones.get('ancho_bbox_px', 0.0),
-                alto_bbox_px=mediciones.get('alto_bbox_px', 0.0),
-                centroide_x=seg.get('centroide', {}).get('x', 0),
-                centroide_y=seg.get('centroide', {}).get('y', 0),
-                area_mascara_px=int(mediciones.get('area_mascara_px', 0)),
-                ancho_mascara_px=mediciones.get('ancho_bbox_px', 0.0),
-                alto_mascara_px=mediciones.get('alto_bbox_px', 0.0),
-                perimetro_mascara_px=mediciones.get('perimetro_mascara_px', 0.0),
-                excentricidad=mediciones.get('excentricidad', 0.0),
-                orientacion_grados=mediciones.get('orientacion_grados', 0.0),
-                ancho_bbox_mm=mediciones.get('ancho_bbox_mm'),
-                alto_bbox_mm=mediciones.get('alto_bbox_mm'),
-                ancho_mascara_mm=mediciones.get('ancho_bbox_mm'),
-                alto_mascara_mm=mediciones.get('alto_bbox_mm'),
-                perimetro_mascara_mm=mediciones.get('perimetro_mascara_mm'),
-                area_mascara_mm=mediciones.get('area_mascara_mm'),
-                coeficientes_mascara=seg.get('coeficientes_mascara', [])
-            )
         
-        logger.info(f"✅ {len(segmentaciones)} segmentaciones de piezas guardadas")
+        return construir_segmentaciones_piezas(analisis_db, segmentaciones, mediciones_lote)
     
-    def _guardar_segmentaciones_defectos(
+    def _construir_segmentaciones_defectos(
         self,
         analisis_db: AnalisisCople,
         segmentaciones: list,
         config: ConfiguracionSistema
-    ):
-        """Guarda segmentaciones de defectos con mediciones"""
-        import numpy as np
-        
+    ) -> List[SegmentacionDefecto]:
+        """Calcula las mediciones y construye (sin guardar) las segmentaciones de defectos"""
         if not segmentaciones:
             logger.warning("No hay segmentaciones de defectos para guardar")
-            return
+            return []
         
-        logger.info(f"📐 Guardando {len(segmentaciones)} segmentaciones de defectos...")
+        logger.info(f"📐 Midiendo {len(segmentaciones)} segmentaciones de defectos...")
         
-        for idx, seg in enumerate(segmentaciones):
-            # Extraer datos
-            bbox = seg.get('bbox', {})
-            mascara = seg.get('mascara')
-            
-            # Calcular mediciones si hay máscara
-            mediciones = {}
-            if mascara is not None:
-                if not isinstance(mascara, np.ndarray):
-                    mascara = np.array(mascara, dtype=np.uint8)
-                
-                mediciones = self.measurement_service.calcular_mediciones_completas(
-                    mascara,
-                    convertir_a_mm=bool(config.factor_conversion_px_mm)
-                )
+        # Mediciones de todas las máscaras del análisis (dict vacío si no hay máscara)
+        mediciones_lote = self.measurement_service.calcular_mediciones_lote(
+            [seg.get('mascara') for seg in segmentaciones],
+            convertir_a_mm=bool(config and config.factor_conversion_px_mm)
+        )
+        
+        for idx, mediciones in enumerate(mediciones_lote):
+            if mediciones:
                 logger.info(f"  📏 Defecto {idx}: {mediciones.get('ancho_bbox_px')}x{mediciones.get('alto_bbox_px')}px, área={mediciones.get('area_mascara_px')}px²")
-            
-            # Guardar en BD
-            SegmentacionDefecto.objects.create(
-                analisis=analisis_db,
-                clase=seg.get('clase', 'Defecto'),
-                confianza=seg.get('confianza', 0.0),
-                bbox_x1=bbox.get('x1', 0),
-                bbox_y1=bbox.get('y1', 0),
-                bbox_x2=bbox.get('x2', 0),
-                bbox_y2=bbox.get('y2', 0),
-                ancho_bbox_px=mediciones.get('ancho_bbox_px', 0.0),
-                alto_bbox_px=mediciones.get('alto_bbox_px', 0.0),
-                centroide_x=seg.get('centroide', {}).get('x', 0),
-                centroide_y=seg.get('centroide', {}).get('y', 0),
-                area_mascara_px=int(mediciones.get('area_mascara_px', 0)),
-                ancho_mascara_px=mediciones.get('ancho_bbox_px', 0.0),
-                alto_mascara_px=mediciones.get('alto_bbox_px', 0.0),
-                perimetro_mascara_px=mediciones.get('perimetro_mascara_px', 0.0),
-                excentricidad=mediciones.get('excentricidad', 0.0),
-                orientacion_grados=mediciones.get('orientacion_grados', 0.0),
-                ancho_bbox_mm=mediciones.get('ancho_bbox_mm'),
-                alto_bbox_mm=mediciones.get('alto_bbox_mm'),
-                ancho_mascara_mm=mediciones.get('ancho_bbox_mm'),
-                alto_mascara_mm=mediciones.get('alto_bbox_mm'),
-                perimetro_mascara_mm=mediciones.get('perimetro_mascara_mm'),
-                area_mascara_mm=mediciones.get('area_mascara_mm'),
-                coeficientes_mascara=seg.get('coeficientes_mascara', [])
-            )
         
-        logger.info(f"✅ {len(segmentaciones)} segmentaciones de defectos guardadas")
+        return construir_segmentaciones_defectos(analisis_db, segmentaciones, mediciones_lote)
     
-    def _generar_imagen_procesada(
-        self,
-        imagen: np.ndarray,
-        segmentaciones: list,
-        tipo_analisis: str
-    ) -> Optional[np.ndarray]:
+    def _guardar_imagen_procesada(self, analisis_db: AnalisisCople, imagen_procesada: Optional[np.ndarray]):
         """
-        Genera imagen procesada con máscaras dibujadas.
+        Codifica y guarda la imagen procesada en el storage sin guardar el registro.
         
-        Args:
-            imagen: Imagen original
-            segmentaciones: Lista de segmentaciones con máscaras
-            tipo_analisis: Tipo de análisis para el color
-            
-        Returns:
-            Imagen con máscaras dibujadas o None si falla
+        Se hace antes de la transacción de persistencia para mantenerla corta.
         """
+        if imagen_procesada is None:
+            logger.warning("⚠️ No se pudo generar imagen procesada")
+            return
+        
         try:
-            if not segmentaciones:
-                logger.warning("No hay segmentaciones para visualizar")
-                return None
-            
-            # Copiar imagen para no modificar la original
-            imagen_vis = imagen.copy()
+            # Codificar imagen
+            with medir_etapa('codificacion_jpeg'):
+                _, buffer = cv2.imencode('.jpg', imagen_procesada)
             
-            # Definir color según tipo
-            if tipo_analisis == 'medicion_piezas':
-                color_base = (0, 255, 0)  # Verde para piezas
-            else:
-                color_base = (0, 0, 255)  # Rojo para defectos
+            # Nombre del archivo
+            nombre_archivo = f"analisis_{analisis_db.id_analisis}.jpg"
             
-            logger.info(f"🎨 Dibujando {len(segmentaciones)} máscaras en imagen...")
-            
-            # Dibujar cada máscara
-            for idx, seg in enumerate(segmentaciones):
-                mascara = seg.get('mascara')
-                bbox = seg.get('bbox', {})
-                
-                if mascara is None:
-                    continue
-                
-                # Convertir máscara a numpy si es necesario
-                if not isinstance(mascara, np.ndarray):
-                    mascara = np.array(mascara, dtype=np.float32)
-                
-                # Redimensionar si es necesario
-                if mascara.shape != imagen.shape[:2]:
-                    mascara = cv2.resize(mascara, (imagen.shape[1], imagen.shape[0]))
-                
-                # Binarizar máscara
-                mascara_binaria = (mascara > 0.5).astype(np.uint8)
-                
-                # Verificar píxeles activos
-                pixels_activos = np.sum(mascara_binaria)
-                if pixels_activos == 0:
-                    logger.warning(f"  ⚠️ Máscara {idx}: Sin píxeles activos")
-                    continue
-                
-                logger.info(f"  ✅ Máscara {idx}: {pixels_activos} píxeles activos")
-                
-                # Crear overlay con transparencia
-                overlay = imagen_vis.copy()
-                overlay[mascara_binaria > 0] = color_base
-                
-                # Combinar con transparencia (alpha=0.4)
-                cv2.addWeighted(overlay, 0.4, imagen_vis, 0.6, 0, imagen_vis)
-                
-                # Dibujar contorno de la máscara
-                contornos, _ = cv2.findContours(mascara_binaria, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
-                cv2.drawContours(imagen_vis, contornos, -1, color_base, 2)
-                
-                # Dibujar bounding box si existe
-                if bbox:
-                    x1, y1 = int(bbox.get('x1', 0)), int(bbox.get('y1', 0))
-                    x2, y2 = int(bbox.get('x2', 0)), int(bbox.get('y2', 0))
-                    cv2.rectangle(imagen_vis, (x1, y1), (x2, y2), color_base, 2)
-                    
-                    # Agregar etiqueta
-                    clase = seg.get('clase', 'Objeto')
-                    confianza = seg.get('confianza', 0.0)
-                    etiqueta = f"{clase}: {confianza:.2f}"
-                    
-                    # Fondo para el texto
-                    (tw, th), _ = cv2.getTextSize(etiqueta, cv2.FONT_HERSHEY_SIMPLEX, 0.6, 2)
-                    cv2.rectangle(imagen_vis, (x1, y1 - th - 10), (x1 + tw, y1), color_base, -1)
-                    cv2.putText(imagen_vis, etiqueta, (x1, y1 - 5), 
-                               cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255, 255, 255), 2)
-            
-            logger.info(f"✅ Imagen procesada generada: {imagen_vis.shape}")
-            return imagen_vis
+            analisis_db.archivo_imagen.save(nombre_archivo, ContentFile(buffer.tobytes()), save=False)
+            logger.info(f"💾 Imagen procesada guardada: {nombre_archivo}")
             
         except Exception as e:
-            logger.error(f"❌ Error generando imagen procesada: {e}", exc_info=True)
-            return None
+            logger.error(f"❌ Error guardando imagen procesada: {e}", exc_info=True)
+    
+    def _generar_imagen_procesada(
+        self,
+        imagen: np.ndarray,
+        segmentaciones: list,
+        tipo_analisis: str
+    ) -> Optional[np.ndarray]:
+        """Ver generar_imagen_procesada"""
+        return generar_imagen_procesada(imagen, segmentaciones, tipo_analisis)
 
 
 # Instancia singleton
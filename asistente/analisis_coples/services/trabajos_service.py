@@ -0,0 +1,420 @@
+"""
+Cola de trabajos para análisis y rutinas de inspección.
+
+Los endpoints encolan un TrabajoAnalisis y responden de inmediato con su id;
+los trabajadores lo toman de la cola, ejecutan la tarea registrada y dejan
+progreso, resultado o error en la misma fila para que el cliente consulte.
+
+Implementaciones de la cola (settings.ANALISIS_COLA_TRABAJOS):
+- 'base_datos': la tabla TrabajoAnalisis es la cola. La consumen los hilos
+  trabajadores del servidor (settings.ANALISIS_TRABAJADORES_SERVIDOR) y/o
+  procesos externos (manage.py procesar_trabajos).
+- 'en_proceso': ejecuta la tarea dentro de encolar(); para pruebas.
+
+Mientras ejecuta, el trabajador renueva timestamp_latido. Si el proceso
+muere, el latido vence (settings.ANALISIS_TRABAJO_VENCIMIENTO_S) y el
+siguiente trabajador que consulta la cola marca el trabajo como error.
+"""
+
+import logging
+import os
+import socket
+import threading
+import time
+from abc import ABC, abstractmethod
+from datetime import timedelta
+from typing import Any, Callable, Dict, List, Optional
+
+from django.conf import settings
+from django.db import close_old_connections, connection, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from ..models import TrabajoAnalisis
+from ..modules.logging_config import traza
+
+logger = logging.getLogger(__name__)
+
+# Tareas registradas: nombre -> función(trabajo, progreso) -> dict de resultado
+_tareas: Dict[str, Callable[[TrabajoAnalisis, Callable[[int, str], None]], Dict[str, Any]]] = {}
+
+
+class ErrorTrabajo(Exception):
+    """Fallo esperado de una tarea; se registra en el log sin traceback"""
+
+
+def tarea(nombre: str):
+    """Decorador para registrar una función como tarea de la cola"""
+    def registrar(funcion):
+        _tareas[nombre] = funcion
+        return funcion
+    return registrar
+
+
+def vencimiento_trabajos() -> float:
+    """Segundos sin latido tras los que un trabajo 'en_proceso' se da por caído"""
+    return float(getattr(settings, 'ANALISIS_TRABAJO_VENCIMIENTO_S', 120))
+
+
+def trabajo_activo(tipo: str, **parametros) -> Optional[TrabajoAnalisis]:
+    """Trabajo pendiente o en proceso del tipo indicado con esos parámetros"""
+    filtros = {f'parametros__{clave}': valor for clave, valor in parametros.items()}
+    return TrabajoAnalisis.objects.filter(
+        tipo=tipo, estado__in=('pendiente', 'en_proceso'), **filtros
+    ).first()
+
+
+def actualizar_progreso(trabajo_id, progreso: int, mensaje: str = '') -> None:
+    """Guarda el progreso de un trabajo (una sola sentencia UPDATE)"""
+    TrabajoAnalisis.objects.filter(id=trabajo_id).update(
+        progreso=max(0, min(100, int(progreso))),
+        mensaje=mensaje[:255]
+    )
+
+
+def ejecutar_trabajo(trabajo: TrabajoAnalisis) -> TrabajoAnalisis:
+    """
+    Ejecuta un trabajo ya tomado (estado 'en_proceso') y guarda su resultado.
+
+    Cada paso se guarda en su propia transacción corta; la tarea no se
+    ejecuta dentro de ninguna transacción abierta por la cola.
+    """
+    funcion = _tareas.get(trabajo.tipo)
+
+    def progreso(porcentaje: int, mensaje: str = '') -> None:
+        actualizar_progreso(trabajo.id, porcentaje, mensaje)
+
+    try:
+        if funcion is None:
+            raise ErrorTrabajo(f"Tipo de trabajo desconocido: {trabajo.tipo}")
+
+        logger.info(f"⚙️ Ejecutando trabajo {trabajo.id} ({trabajo.tipo})")
+        # Traza de diagnóstico si se pidió al encolar (o por muestreo)
+        with traza(trabajo.parametros.get('traza', False)):
+            trabajo.resultado = funcion(trabajo, progreso) or {}
+        trabajo.estado = 'completado'
+        trabajo.progreso = 100
+        trabajo.mensaje = 'Completado'
+        logger.info(f"✅ Trabajo {trabajo.id} completado")
+
+    except ErrorTrabajo as e:
+        trabajo.estado = 'error'
+        trabajo.mensaje_error = str(e)
+        logger.error(f"❌ Trabajo {trabajo.id} falló: {e}")
+
+    except Exception as e:
+        trabajo.estado = 'error'
+        trabajo.mensaje_error = str(e)
+        logger.error(f"❌ Error ejecutando trabajo {trabajo.id}: {e}", exc_info=True)
+
+    trabajo.timestamp_fin = timezone.now()
+    trabajo.save(update_fields=[
+        'estado', 'resultado', 'progreso', 'mensaje', 'mensaje_error', 'timestamp_fin'
+    ])
+    return trabajo
+
+
+class ColaTrabajos(ABC):
+    """Interfaz de la cola de trabajos"""
+
+    @abstractmethod
+    def encolar(self, tipo: str, parametros: Optional[Dict[str, Any]] = None, usuario=None) -> TrabajoAnalisis:
+        """Registra un trabajo y lo devuelve"""
+
+    @abstractmethod
+    def tomar_siguiente(self, trabajador: str, tipos: Optional[List[str]] = None) -> Optional[TrabajoAnalisis]:
+        """Marca como 'en_proceso' el trabajo pendiente más antiguo y lo devuelve"""
+
+    @abstractmethod
+    def esperar(self, timeout: float) -> None:
+        """Bloquea hasta que haya trabajo nuevo o venza el timeout"""
+
+
+class ColaBaseDatos(ColaTrabajos):
+    """
+    Cola persistente sobre la tabla TrabajoAnalisis.
+
+    Un trabajo se toma con un UPDATE condicionado a estado='pendiente', así
+    que varios hilos o procesos pueden consumir la misma tabla sin tomar dos
+    veces el mismo trabajo (no requiere SELECT ... FOR UPDATE).
+    """
+
+    def __init__(self):
+        self._nuevo_trabajo = threading.Event()
+        self._ultima_recuperacion = 0.0
+
+    def encolar(self, tipo: str, parametros: Optional[Dict[str, Any]] = None, usuario=None) -> TrabajoAnalisis:
+        trabajo = TrabajoAnalisis.objects.create(
+            tipo=tipo,
+            parametros=parametros or {},
+            usuario=usuario if usuario is not None and usuario.is_authenticated else None
+        )
+        # Despertar a los hilos del servidor cuando la fila sea visible
+        transaction.on_commit(self._nuevo_trabajo.set)
+        logger.info(f"📥 Trabajo {trabajo.id} ({tipo}) encolado")
+        return trabajo
+
+    def tomar_siguiente(self, trabajador: str, tipos: Optional[List[str]] = None) -> Optional[TrabajoAnalisis]:
+        # Revisar latidos vencidos como mucho cada medio vencimiento
+        if time.monotonic() - self._ultima_recuperacion >= vencimiento_trabajos() / 2:
+            self._ultima_recuperacion = time.monotonic()
+            self.recuperar_vencidos()
+
+        pendientes = TrabajoAnalisis.objects.filter(estado='pendiente')
+        if tipos:
+            pendientes = pendientes.filter(tipo__in=tipos)
+
+        for trabajo_id in pendientes.order_by('timestamp_creacion').values_list('id', flat=True)[:10]:
+            ahora = timezone.now()
+            tomado = TrabajoAnalisis.objects.filter(id=trabajo_id, estado='pendiente').update(
+                estado='en_proceso',
+                trabajador=trabajador[:100],
+                timestamp_inicio=ahora,
+                timestamp_latido=ahora
+            )
+            if tomado:
+                return TrabajoAnalisis.objects.select_related('usuario').get(id=trabajo_id)
+        return None
+
+    def recuperar_vencidos(self) -> int:
+        """
+        Marca como error los trabajos 'en_proceso' cuyo trabajador dejó de
+        renovar el latido (proceso caído).
+
+        No se vuelven a encolar: repetir más tarde una captura no analizaría
+        la misma pieza. El cliente ve el error y puede lanzarlo de nuevo.
+
+        Returns:
+            Número de trabajos marcados
+        """
+        ahora = timezone.now()
+        limite = ahora - timedelta(seconds=vencimiento_trabajos())
+        marcados = TrabajoAnalisis.objects.filter(estado='en_proceso').filter(
+            Q(timestamp_latido__lt=limite) | Q(timestamp_latido__isnull=True, timestamp_inicio__lt=limite)
+        ).update(
+            estado='error',
+            mensaje_error='El trabajador dejó de responder',
+            timestamp_fin=ahora
+        )
+        if marcados:
+            logger.warning(f"⚠️ {marcados} trabajo(s) sin latido marcados como error")
+        return marcados
+
+    def esperar(self, timeout: float) -> None:
+        self._nuevo_trabajo.wait(timeout)
+        self._nuevo_trabajo.clear()
+
+
+class ColaEnProceso(ColaBaseDatos):
+    """Ejecuta cada trabajo dentro de encolar(); sustituto de la cola para pruebas"""
+
+    def encolar(self, tipo: str, parametros: Optional[Dict[str, Any]] = None, usuario=None) -> TrabajoAnalisis:
+        trabajo = TrabajoAnalisis.objects.create(
+            tipo=tipo,
+            parametros=parametros or {},
+            usuario=usuario if usuario is not None and usuario.is_authenticated else None,
+            estado='en_proceso',
+            trabajador='en_proceso',
+            timestamp_inicio=timezone.now(),
+            timestamp_latido=timezone.now()
+        )
+        return ejecutar_trabajo(trabajo)
+
+
+class _Latido:
+    """Renueva timestamp_latido de un trabajo desde un hilo mientras se ejecuta"""
+
+    def __init__(self, trabajo_id, intervalo: float):
+        self.trabajo_id = trabajo_id
+        self.intervalo = intervalo
+        self._fin = threading.Event()
+        self._hilo = threading.Thread(target=self._latir, name=f'Latido-{trabajo_id}', daemon=True)
+
+    def __enter__(self):
+        self._hilo.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._fin.set()
+        self._hilo.join()
+
+    def _latir(self) -> None:
+        try:
+            while not self._fin.wait(self.intervalo):
+                TrabajoAnalisis.objects.filter(id=self.trabajo_id, estado='en_proceso').update(
+                    timestamp_latido=timezone.now()
+                )
+        except Exception as e:
+            logger.warning(f"⚠️ Latido del trabajo {self.trabajo_id} interrumpido: {e}")
+        finally:
+            connection.close()
+
+
+class Trabajador:
+    """
+    Consume la cola y ejecuta los trabajos uno a uno.
+
+    Se usa tanto en los hilos del servidor como en los procesos de
+    manage.py procesar_trabajos.
+    """
+
+    def __init__(
+        self,
+        cola: ColaTrabajos,
+        nombre: Optional[str] = None,
+        tipos: Optional[List[str]] = None,
+        intervalo_sondeo: float = 1.0
+    ):
+        self.cola = cola
+        self.nombre = nombre or f"{socket.gethostname()}:{os.getpid()}:{threading.get_ident()}"
+        self.tipos = tipos
+        self.intervalo_sondeo = intervalo_sondeo
+        self.detener_event = threading.Event()
+
+    def ejecutar_pendientes(self, maximo: Optional[int] = None) -> int:
+        """Ejecuta trabajos hasta vaciar la cola (o hasta `maximo`)"""
+        ejecutados = 0
+        while maximo is None or ejecutados < maximo:
+            close_old_connections()
+            trabajo = self.cola.tomar_siguiente(self.nombre, self.tipos)
+            if trabajo is None:
+                break
+            with _Latido(trabajo.id, vencimiento_trabajos() / 4):
+                ejecutar_trabajo(trabajo)
+            ejecutados += 1
+        return ejecutados
+
+    def ejecutar(self) -> None:
+        """Bucle principal hasta detener()"""
+        logger.info(f"👷 Trabajador {self.nombre} iniciado")
+        while not self.detener_event.is_set():
+            try:
+                if not self.ejecutar_pendientes():
+                    self.cola.esperar(self.intervalo_sondeo)
+            except Exception as e:
+                logger.error(f"❌ Error en trabajador {self.nombre}: {e}", exc_info=True)
+                self.detener_event.wait(self.intervalo_sondeo)
+        close_old_connections()
+        logger.info(f"👷 Trabajador {self.nombre} detenido")
+
+    def detener(self) -> None:
+        self.detener_event.set()
+
+
+# Instancia global de la cola
+_cola_trabajos: Optional[ColaTrabajos] = None
+_trabajadores_servidor: List[threading.Thread] = []
+_trabajadores_lock = threading.Lock()
+
+
+def get_cola_trabajos() -> ColaTrabajos:
+    """Obtiene la cola configurada en settings.ANALISIS_COLA_TRABAJOS"""
+    global _cola_trabajos
+    if _cola_trabajos is None:
+        tipo_cola = getattr(settings, 'ANALISIS_COLA_TRABAJOS', 'base_datos')
+        _cola_trabajos = ColaEnProceso() if tipo_cola == 'en_proceso' else ColaBaseDatos()
+    return _cola_trabajos
+
+
+def iniciar_trabajadores_servidor(num_trabajadores: int) -> None:
+    """
+    Arranca hilos trabajadores dentro del proceso servidor.
+
+    Comparten la cámara y los modelos ya cargados en el proceso; la petición
+    HTTP solo encola y responde.
+    """
+    with _trabajadores_lock:
+        if _trabajadores_servidor:
+            return
+        cola = get_cola_trabajos()
+        for i in range(num_trabajadores):
+            trabajador = Trabajador(cola, nombre=f"{socket.gethostname()}:{os.getpid()}:servidor-{i}")
+            hilo = threading.Thread(target=trabajador.ejecutar, name=f'TrabajadorAnalisis-{i}', daemon=True)
+            hilo.start()
+            _trabajadores_servidor.append(hilo)
+    logger.info(f"👷 {num_trabajadores} trabajador(es) de análisis iniciados en el servidor")
+
+
+# ---------------------------------------------------------------------------
+# Tareas
+# ---------------------------------------------------------------------------
+
+@tarea('realizar_analisis')
+def tarea_realizar_analisis(trabajo: TrabajoAnalisis, progreso) -> Dict[str, Any]:
+    """Captura y analiza una imagen con el servicio de análisis completo"""
+    from ..services_real import servicio_analisis_real as servicio_analisis
+
+    tipo_analisis = trabajo.parametros.get('tipo_analisis', 'completo')
+    configuracion_id = trabajo.parametros.get('configuracion_id')
+
+    # Inicializar sistema si es necesario
+    if not servicio_analisis.inicializado:
+        progreso(5, 'Inicializando sistema de análisis')
+        if not servicio_analisis.inicializar_sistema(configuracion_id):
+            raise ErrorTrabajo('Error inicializando el sistema de análisis')
+
+    progreso(10, 'Capturando y analizando')
+    if tipo_analisis == 'clasificacion':
+        resultado = servicio_analisis.realizar_analisis_clasificacion(trabajo.usuario)
+    else:
+        # Para otros tipos de análisis, usar análisis completo por ahora
+        resultado = servicio_analisis.realizar_analisis_completo(trabajo.usuario)
+
+    if 'error' in resultado:
+        raise ErrorTrabajo(resultado['error'])
+
+    from ..models import AnalisisCople
+    analisis = AnalisisCople.objects.only('id').get(id_analisis=resultado['id_analisis'])
+    return {
+        'analisis_id': analisis.id,
+        'id_analisis': resultado['id_analisis'],
+    }
+
+
+@tarea('analizar_imagen')
+def tarea_analizar_imagen(trabajo: TrabajoAnalisis, progreso) -> Dict[str, Any]:
+    """Captura una imagen y la segmenta (medición de piezas o defectos)"""
+    from .segmentation_analysis_service import get_segmentation_analysis_service
+
+    progreso(10, 'Capturando y analizando')
+    resultado = get_segmentation_analysis_service().analizar_imagen(
+        tipo_analisis=trabajo.parametros['tipo_analisis'],
+        usuario=trabajo.usuario,
+        configuracion_id=trabajo.parametros.get('configuracion_id')
+    )
+    if 'error' in resultado:
+        raise ErrorTrabajo(resultado['error'])
+
+    return {
+        'analisis_id': resultado['analisis_id'],
+        'id_analisis': resultado['id_analisis'],
+    }
+
+
+@tarea('ejecutar_barrido')
+def tarea_ejecutar_barrido(trabajo: TrabajoAnalisis, progreso) -> Dict[str, Any]:
+    """Ejecuta el barrido de una rutina y la finaliza"""
+    from .rutina_inspeccion_service import get_rutina_inspeccion_service
+
+    rutina_id = trabajo.parametros['rutina_id']
+    rutina_service = get_rutina_inspeccion_service()
+
+    resultado = rutina_service.ejecutar_barrido_automatico(
+        rutina_id=rutina_id,
+        usuario=trabajo.usuario,
+        progreso=lambda porcentaje, mensaje: progreso(int(porcentaje * 0.9), mensaje)
+    )
+    if not resultado.get('success'):
+        raise ErrorTrabajo(resultado.get('error', 'Error ejecutando barrido'))
+
+    # Finalizar rutina automáticamente
+    progreso(90, 'Generando reporte consolidado')
+    resultado_finalizacion = rutina_service.finalizar_rutina(rutina_id)
+    if not resultado_finalizacion.get('success'):
+        raise ErrorTrabajo(resultado_finalizacion.get('error', 'Error finalizando rutina'))
+
+    return {
+        'rutina_id': rutina_id,
+        'num_capturas': resultado['num_capturas'],
+        'analisis_ids': resultado['analisis_ids'],
+    }
@@ -35,6 +35,7 @@ import cv2
 from .modules.analysis_system import SistemaAnalisisIntegrado
 from .modules.capture.webcam_fallback import WebcamFallback, detectar_mejor_webcam
 from .expo_config import WebcamConfig, ModelsConfig
+from .services.persistencia_service import persistir_analisis
 
 logger = logging.getLogger(__name__)
 
@@ -225,20 +226,21 @@ class ServicioAnalisisCoplesReal:
             # Guardar resultados en base de datos
             logger.info(f"💾 Guardando resultados en BD...")
             
-            # Guardar segmentaciones de piezas
+            # Mediciones y filas de segmentaciones (piezas y defectos)
+            filas = []
             if "segmentaciones_piezas" in resultados:
                 logger.info(f"🔩 Guardando {len(resultados['segmentaciones_piezas'])} segmentaciones de piezas")
-                self._guardar_segmentaciones_piezas(analisis_db, resultados)
+                filas += self._construir_segmentaciones(analisis_db, resultados, "segmentaciones_piezas")
             
-            # Guardar segmentaciones de defectos
             if "segmentaciones_defectos" in resultados:
                 logger.info(f"⚠️ Guardando {len(resultados['segmentaciones_defectos'])} segmentaciones de defectos")
-                self._guardar_segmentaciones_defectos(analisis_db, resultados)
+                filas += self._construir_segmentaciones(analisis_db, resultados, "segmentaciones_defectos")
             
-            # Actualizar registro con tiempos
+            # Actualizar registro con tiempos y guardar todo en una transacción
             analisis_db.tiempo_total_ms = resultados.get("tiempo_total", 0) * 1000
             analisis_db.estado = 'completado'
-            analisis_db.save()
+            tiempos = dict(resultados.get("tiempos", {}))
+            persistir_analisis(analisis_db, filas, tiempos=tiempos)
             
             logger.info(f"✅ Análisis completo finalizado: {id_analisis}")
             
@@ -722,16 +724,26 @@ class ServicioAnalisisCoplesReal:
             logger.error(f"Error obteniendo estadísticas: {e}")
             return {"error": str(e)}
     
-    def _guardar_segmentaciones_defectos(self, analisis_db: AnalisisCople, resultados: Dict[str, Any]):
-        """Guarda las segmentaciones de defectos con mediciones calculadas"""
-        if "segmentaciones_defectos" not in resultados:
-            logger.warning("No hay segmentaciones de defectos en resultados")
-            return
+    def _construir_segmentaciones(self, analisis_db: AnalisisCople, resultados: Dict[str, Any], clave: str) -> list:
+        """
+        Calcula las mediciones y construye (sin guardar) las segmentaciones de
+        piezas o defectos para escribirlas después con bulk_create.
+        
+        Args:
+            analisis_db: Análisis padre
+            resultados: Resultados del sistema de análisis
+            clave: 'segmentaciones_piezas' o 'segmentaciones_defectos'
+        """
+        if clave not in resultados:
+            logger.warning(f"No hay {clave.replace('_', ' de ')} en resultados")
+            return []
         
         from modules.measurements import get_measurement_service
         from .models import ConfiguracionSistema
-        from .resultados_models import SegmentacionDefecto
-        import numpy as np
+        from .services.persistencia_service import (
+            construir_segmentaciones_defectos,
+            construir_segmentaciones_piezas,
+        )
         
         # Obtener servicio de mediciones
         measurement_service = get_measurement_service()
@@ -741,122 +753,22 @@ class ServicioAnalisisCoplesReal:
         if config and config.factor_conversion_px_mm:
             measurement_service.set_conversion_factor(config.factor_conversion_px_mm)
         
-        segmentaciones = resultados["segmentaciones_defectos"]
-        logger.info(f"📐 Procesando {len(segmentaciones)} segmentaciones de defectos")
-        
-        for idx, segmentacion in enumerate(segmentaciones):
-            bbox = segmentacion.get("bbox", {})
-            centroide = segmentacion.get("centroide", {})
-            
-            # Calcular mediciones si hay máscara
-            mediciones = {}
-            mascara_raw = segmentacion.get("mascara")
-            if mascara_raw is not None:
-                # Convertir máscara a numpy array si es necesario
-                if not isinstance(mascara_raw, np.ndarray):
-                    mascara_raw = np.array(mascara_raw, dtype=np.uint8)
-                
-                # Calcular mediciones completas
-                mediciones = measurement_service.calcular_mediciones_completas(
-                    mascara_raw,
-                    convertir_a_mm=bool(config and config.factor_conversion_px_mm)
-                )
-                logger.info(f"📏 Defecto {idx}: ancho={mediciones.get('ancho_bbox_px')}px, área={mediciones.get('area_mascara_px')}px²")
-            
-            SegmentacionDefecto.objects.create(
-                analisis=analisis_db,
-                clase=segmentacion.get("clase", ""),
-                confianza=segmentacion.get("confianza", 0.0),
-                bbox_x1=bbox.get("x1", 0),
-                bbox_y1=bbox.get("y1", 0),
-                bbox_x2=bbox.get("x2", 0),
-                bbox_y2=bbox.get("y2", 0),
-                ancho_bbox_px=mediciones.get("ancho_bbox_px", 0.0),
-                alto_bbox_px=mediciones.get("alto_bbox_px", 0.0),
-                centroide_x=centroide.get("x", 0),
-                centroide_y=centroide.get("y", 0),
-                area_mascara_px=int(mediciones.get("area_mascara_px", 0)),
-                ancho_mascara_px=mediciones.get("ancho_bbox_px", 0.0),
-                alto_mascara_px=mediciones.get("alto_bbox_px", 0.0),
-                perimetro_mascara_px=mediciones.get("perimetro_mascara_px", 0.0),
-                excentricidad=mediciones.get("excentricidad", 0.0),
-                orientacion_grados=mediciones.get("orientacion_grados", 0.0),
-                ancho_bbox_mm=mediciones.get("ancho_bbox_mm"),
-                alto_bbox_mm=mediciones.get("alto_bbox_mm"),
-                ancho_mascara_mm=mediciones.get("ancho_bbox_mm"),
-                alto_mascara_mm=mediciones.get("alto_bbox_mm"),
-                perimetro_mascara_mm=mediciones.get("perimetro_mascara_mm"),
-                area_mascara_mm=mediciones.get("area_mascara_mm"),
-                coeficientes_mascara=segmentacion.get("coeficientes_mascara", [])
-            )
-    
-    def _guardar_segmentaciones_piezas(self, analisis_db: AnalisisCople, resultados: Dict[str, Any]):
-        """Guarda las segmentaciones de piezas con mediciones calculadas"""
-        if "segmentaciones_piezas" not in resultados:
-            logger.warning("No hay segmentaciones de piezas en resultados")
-            return
+        segmentaciones = resultados[clave]
+        es_pieza = clave == 'segmentaciones_piezas'
+        logger.info(f"📐 Procesando {len(segmentaciones)} segmentaciones de {'piezas' if es_pieza else 'defectos'}")
         
-        from modules.measurements import get_measurement_service
-        from .models import ConfiguracionSistema
-        from .resultados_models import SegmentacionPieza
-        import numpy as np
-        
-        # Obtener servicio de mediciones
-        measurement_service = get_measurement_service()
-        
-        # Cargar configuración para factor de conversión (si existe)
-        config = ConfiguracionSistema.objects.filter(activa=True).first()
-        if config and config.factor_conversion_px_mm:
-            measurement_service.set_conversion_factor(config.factor_conversion_px_mm)
+        # Calcular mediciones de todas las máscaras (dict vacío si no hay máscara)
+        mediciones_lote = measurement_service.calcular_mediciones_lote(
+            [segmentacion.get("mascara") for segmentacion in segmentaciones],
+            convertir_a_mm=bool(config and config.factor_conversion_px_mm)
+        )
         
-        segmentaciones = resultados["segmentaciones_piezas"]
-        logger.info(f"📐 Procesando {len(segmentaciones)} segmentaciones de piezas")
+        for idx, mediciones in enumerate(mediciones_lote):
+            if mediciones:
+                logger.info(f"📏 {'Pieza' if es_pieza else 'Defecto'} {idx}: ancho={mediciones.get('ancho_bbox_px')}px, área={mediciones.get('area_mascara_px')}px²")
         
-        for idx, segmentacion in enumerate(segmentaciones):
-            bbox = segmentacion.get("bbox", {})
-            centroide = segmentacion.get("centroide", {})
-            
-            # Calcular mediciones si hay máscara
-            mediciones = {}
-            mascara_raw = segmentacion.get("mascara")
-            if mascara_raw is not None:
-                # Convertir máscara a numpy array si es necesario
-                if not isinstance(mascara_raw, np.ndarray):
-                    mascara_raw = np.array(mascara_raw, dtype=np.uint8)
-                
-                # Calcular mediciones completas
-                mediciones = measurement_service.calcular_mediciones_completas(
-                    mascara_raw,
-                    convertir_a_mm=bool(config and config.factor_conversion_px_mm)
-                )
-                logger.info(f"📏 Pieza {idx}: ancho={mediciones.get('ancho_bbox_px')}px, área={mediciones.get('area_mascara_px')}px²")
-            
-            SegmentacionPieza.objects.create(
-                analisis=analisis_db,
-                clase=segmentacion.get("clase", ""),
-                confianza=segmentacion.get("confianza", 0.0),
-                bbox_x1=bbox.get("x1", 0),
-                bbox_y1=bbox.get("y1", 0),
-                bbox_x2=bbox.get("x2", 0),
-                bbox_y2=bbox.get("y2", 0),
-                ancho_bbox_px=mediciones.get("ancho_bbox_px", 0.0),
-                alto_bbox_px=mediciones.get("alto_bbox_px", 0.0),
-                centroide_x=centroide.get("x", 0),
-                centroide_y=centroide.get("y", 0),
-                area_mascara_px=int(mediciones.get("area_mascara_px", 0)),
-                ancho_mascara_px=mediciones.get("ancho_bbox_px", 0.0),
-                alto_mascara_px=mediciones.get("alto_bbox_px", 0.0),
-                perimetro_mascara_px=mediciones.get("perimetro_mascara_px", 0.0),
-                excentricidad=mediciones.get("excentricidad", 0.0),
-                orientacion_grados=mediciones.get("orientacion_grados", 0.0),
-                ancho_bbox_mm=mediciones.get("ancho_bbox_mm"),
-                alto_bbox_mm=mediciones.get("alto_bbox_mm"),
-                ancho_mascara_mm=mediciones.get("ancho_bbox_mm"),
-                alto_mascara_mm=mediciones.get("alto_bbox_mm"),
-                perimetro_mascara_mm=mediciones.get("perimetro_mascara_mm"),
-                area_mascara_mm=mediciones.get("area_mascara_mm"),
-                coeficientes_mascara=segmentacion.get("coeficientes_mascara", [])
-            )
+        construir = construir_segmentaciones_piezas if es_pieza else construir_segmentaciones_defectos
+        return construir(analisis_db, segmentaciones, mediciones_lote, clase_por_defecto="")
     
     def liberar_sistema(self):
         """Libera los recursos del sistema de análisis"""
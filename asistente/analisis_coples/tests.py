@@ -1,3 +1,1107 @@
-from django.test import TestCase
+import logging
+import os
+import tempfile
+import threading
+import time
+from datetime import timedelta
+from unittest import mock
+from urllib.parse import parse_qs, urlparse
 
-# Create your tests here.
+import cv2
+import numpy as np
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.db import connection
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from .api.serializers import AnalisisCopleSerializer, SegmentacionDefectoSerializer
+from .api.views import AnalisisCopleViewSet
+from .benchmarks.pipeline import Cronometro, cargar_corpus, resumir
+from .modules.logging_config import obtener_logger, traza
+from .modules.capture.anillo_compartido import AnilloFramesCompartido
+from .modules.capture.anillo_frames import AnilloFrames
+from .modules.capture.camara_simulada import CamaraSimulada
+from .modules.capture.camera_controller import CamaraTiempoOptimizada
+from .modules.capture.gev_simulado import GevSimulado
+from .modules.capture.webcam_fallback import WebcamFallback
+from .modules.mascara_compacta import MascaraCompacta
+from .modules.onnx_session import construir_session_options, crear_sesion_onnx, opciones_por_defecto
+from .modules.segmentation.batch_inference import ensamblar_mascaras, sigmoid, tamano_lote_fijo
+from .modules.segmentation.preprocesamiento import PreprocesadorEntrada
+from .modules.segmentation.segmentation_defectos_engine import SegmentadorDefectosCoples
+from .modules.segmentation.segmentation_piezas_engine import SegmentadorPiezasCoples
+from .modules.tiempos import RegistroTiempos, medir_etapa
+from .modules.measurements import MeasurementService
+from .models import AnalisisCople, ConfiguracionSistema, TrabajoAnalisis
+from .resultados_models import EstadisticasSistema
+from .services.persistencia_service import construir_segmentaciones_defectos, persistir_analisis
+from .services.rutina_inspeccion_service import RutinaInspeccionService
+from .services.segmentation_analysis_service import SegmentationAnalysisService
+from .services import trabajos_service
+from .services.camara_ipc import ClienteCamara, DaemonCamara
+from .services.difusor_preview import DifusorPreview
+from .services.trabajos_service import ColaBaseDatos, ColaEnProceso, ErrorTrabajo, Trabajador
+from .services.estadisticas_service import obtener_estadisticas, recalcular_resumenes
+from .services.metricas_service import MetricasService, get_metricas_service
+from .services.model_registry import ModelRegistry
+
+
+class _MotorFalso:
+    """Motor mínimo con la interfaz que espera el registro"""
+
+    def __init__(self):
+        self.session = object()
+        self.model_path = None
+
+
+class _SesionFalsa:
+    """
+    Sesión ONNX mínima con salidas YOLO11-SEG: una detección por imagen cuya
+    posición depende del brillo de la imagen, y prototipos a cero (la máscara
+    por prototipos queda vacía; la rectangular, llena).
+    """
+
+    def __init__(self, forma_entrada=('batch', 3, 640, 640), retardo=0.0, rechazar_lotes=False):
+        self.forma_entrada = list(forma_entrada)
+        self.retardo = retardo
+        self.rechazar_lotes = rechazar_lotes
+        self.lotes = []
+
+    def run(self, output_names, entradas):
+        tensor = next(iter(entradas.values()))
+        n = tensor.shape[0]
+        self.lotes.append(n)
+        if self.rechazar_lotes and n > 1:
+            from onnxruntime.capi.onnxruntime_pybind11_state import InvalidArgument
+            raise InvalidArgument('Got invalid dimensions for input: images')
+        if self.retardo:
+            time.sleep(self.retardo)
+
+        detecciones = np.zeros((n, 37, 8400), dtype=np.float32)
+        detecciones[:, 4, :] = -10.0
+        for i in range(n):
+            cx = 100.0 + 400.0 * float(tensor[i].mean())
+            detecciones[i, :5, 0] = (cx, 200.0, 40.0, 60.0, 10.0)
+        return [detecciones, np.zeros((n, 32, 160, 160), dtype=np.float32)]
+
+
+def _motor_con_sesion(clase, sesion):
+    """Motor real con la sesión ONNX sustituida por una falsa"""
+    motor = clase(model_path=os.path.join(tempfile.gettempdir(), 'no_existe.onnx'))
+    motor.session = sesion
+    motor.input_name = 'images'
+    motor.output_names = ['output0', 'output1']
+    motor.input_shape = sesion.forma_entrada
+    motor.lote_maximo = tamano_lote_fijo(motor.input_shape)
+    return motor
+
+
+class ModelRegistryTests(SimpleTestCase):
+
+    def test_reutiliza_modelo_cargado(self):
+        registro = ModelRegistry(presupuesto_memoria_mb=100)
+        registro.registrar('piezas', _MotorFalso)
+
+        primero = registro.obtener('piezas')
+        segundo = registro.obtener('piezas')
+
+        self.assertIs(primero, segundo)
+        stats = registro.obtener_estadisticas()['modelos']['piezas']
+        self.assertEqual(stats['cargas'], 1)
+        self.assertEqual(stats['aciertos'], 1)
+
+    def test_desaloja_lru_al_superar_presupuesto(self):
+        registro = ModelRegistry(presupuesto_memoria_mb=10)
+        registro._estimar_memoria_mb = lambda motor: 6.0
+        registro.registrar('piezas', _MotorFalso)
+        registro.registrar('defectos', _MotorFalso)
+
+        registro.obtener('piezas')
+        registro.obtener('defectos')
+
+        self.assertFalse(registro.esta_cargado('piezas'))
+        self.assertTrue(registro.esta_cargado('defectos'))
+        self.assertEqual(registro.obtener_estadisticas()['modelos']['piezas']['desalojos'], 1)
+
+    def test_modelo_sin_sesion_no_se_registra(self):
+        registro = ModelRegistry()
+        motor = _MotorFalso()
+        motor.session = None
+        registro.registrar('defectos', lambda: motor)
+
+        self.assertIsNone(registro.obtener('defectos'))
+        self.assertFalse(registro.esta_cargado('defectos'))
+
+    def test_motor_compartido_entre_hilos_respeta_el_modo_de_mascara(self):
+        registro = ModelRegistry()
+        registro.registrar('defectos', lambda: _motor_con_sesion(SegmentadorDefectosCoples, _SesionFalsa(retardo=0.002)))
+        imagen = np.full((640, 640, 3), 64, dtype=np.uint8)
+        areas = {True: [], False: []}
+
+        def segmentar(simples):
+            motor = registro.obtener('defectos')
+            for _ in range(20):
+                segmentaciones = motor.segmentar(imagen, usar_mascaras_simples=simples)
+                areas[simples].append(segmentaciones[0]['area_mascara'])
+
+        hilos = [threading.Thread(target=segmentar, args=(simples,)) for simples in (True, False)]
+        for hilo in hilos:
+            hilo.start()
+        for hilo in hilos:
+            hilo.join()
+
+        # Rectangular: el bbox completo (40x60); prototipos a cero: vacía
+        self.assertEqual(set(areas[True]), {40 * 60})
+        self.assertEqual(set(areas[False]), {0})
+
+
+class SesionOnnxTests(TestCase):
+
+    def test_aplica_opciones_de_la_configuracion(self):
+        import onnxruntime as ort
+
+        config = ConfiguracionSistema.objects.create(
+            nombre='pruebas',
+            onnx_intra_op_threads=3,
+            onnx_inter_op_threads=1,
+            onnx_nivel_optimizacion='basico',
+            onnx_modo_ejecucion='paralelo',
+            onnx_arena_memoria=False,
+            onnx_patron_memoria=False,
+        )
+
+        opciones = construir_session_options({**opciones_por_defecto(), **config.obtener_opciones_onnx()})
+
+        self.assertEqual(opciones.intra_op_num_threads, 3)
+        self.assertEqual(opciones.inter_op_num_threads, 1)
+        self.assertEqual(opciones.graph_optimization_level, ort.GraphOptimizationLevel.ORT_ENABLE_BASIC)
+        self.assertEqual(opciones.execution_mode, ort.ExecutionMode.ORT_PARALLEL)
+        self.assertFalse(opciones.enable_cpu_mem_arena)
+        self.assertFalse(opciones.enable_mem_pattern)
+
+    def test_reutiliza_el_modelo_optimizado_hasta_que_cambia_el_original(self):
+        import onnxruntime as ort
+
+        cargas = []
+
+        def sesion(ruta, sess_options=None, providers=None):
+            cargas.append((ruta, sess_options.graph_optimization_level, sess_options.optimized_model_filepath))
+            if sess_options.optimized_model_filepath:
+                with open(sess_options.optimized_model_filepath, 'wb') as f:
+                    f.write(b'optimizado')
+            return object()
+
+        with tempfile.TemporaryDirectory() as directorio:
+            modelo = os.path.join(directorio, 'modelo.onnx')
+            with open(modelo, 'wb') as f:
+                f.write(b'v1')
+            opciones = {
+                **opciones_por_defecto(),
+                'nivel_optimizacion': 'extendido',
+                'directorio_optimizados': os.path.join(directorio, 'optimizados'),
+            }
+
+            with mock.patch.object(ort, 'InferenceSession', side_effect=sesion):
+                crear_sesion_onnx(modelo, opciones=opciones)
+                crear_sesion_onnx(modelo, opciones=opciones)
+                with open(modelo, 'wb') as f:
+                    f.write(b'v2 reentrenado')
+                crear_sesion_onnx(modelo, opciones=opciones)
+
+        (ruta_1, nivel_1, guardar_1), (ruta_2, nivel_2, guardar_2), (ruta_3, _, guardar_3) = cargas
+        # Primera carga: optimiza el original y guarda el grafo
+        self.assertEqual(ruta_1, modelo)
+        self.assertEqual(nivel_1, ort.GraphOptimizationLevel.ORT_ENABLE_EXTENDED)
+        self.assertTrue(guardar_1)
+        # Segunda: carga el optimizado sin volver a optimizar
+        self.assertEqual(ruta_2, guardar_1)
+        self.assertEqual(nivel_2, ort.GraphOptimizationLevel.ORT_DISABLE_ALL)
+        self.assertFalse(guardar_2)
+        # El original cambió: se optimiza de nuevo en otra ruta
+        self.assertEqual(ruta_3, modelo)
+        self.assertTrue(guardar_3)
+        self.assertNotEqual(guardar_3, guardar_1)
+
+
+class MascaraCompactaTests(SimpleTestCase):
+
+    def setUp(self):
+        self.densa = np.zeros((64, 80), dtype=np.float32)
+        self.densa[10:30, 20:50] = 1
+        self.densa[15:18, 25:40] = 0
+
+    def test_equivale_a_mascara_densa(self):
+        for empaquetar in (False, True):
+            mascara = MascaraCompacta.desde_densa(self.densa, empaquetar=empaquetar)
+
+            self.assertEqual(mascara.region, (20, 10, 50, 30))
+            self.assertEqual(mascara.bbox, (20, 10, 50, 30))
+            self.assertEqual(mascara.area, int(self.densa.sum()))
+            np.testing.assert_array_equal(mascara.to_dense(), self.densa)
+            self.assertLess(mascara.nbytes, self.densa.nbytes)
+
+    def test_rle_ida_y_vuelta(self):
+        mascara = MascaraCompacta.desde_densa(self.densa)
+        rle = mascara.to_rle()
+
+        self.assertEqual(rle['size'], [64, 80])
+        self.assertEqual(sum(rle['counts']), 64 * 80)
+        np.testing.assert_array_equal(MascaraCompacta.desde_rle(rle).to_dense(), self.densa)
+
+
+class EnsamblarMascarasTests(SimpleTestCase):
+
+    @staticmethod
+    def _mascara_referencia(coeficientes, protos, bbox):
+        """Camino original: sigmoide del mapa completo, resize a 640 y recorte"""
+        probabilidades = sigmoid(np.tensordot(coeficientes, protos[0], axes=([0], [0])))
+        probabilidades = cv2.resize(probabilidades, (640, 640))
+        x1, y1, x2, y2 = bbox
+        return (probabilidades[y1:y2, x1:x2] > 0.5).astype(np.uint8)
+
+    def test_equivale_al_resize_completo(self):
+        rng = np.random.default_rng(0)
+        protos = rng.normal(size=(1, 32, 160, 160)).astype(np.float32)
+        coeficientes = rng.normal(scale=0.3, size=(40, 32)).astype(np.float32)
+        esquinas = rng.integers(0, 600, size=(40, 2))
+        lados = rng.integers(5, 200, size=(40, 2))
+        boxes = np.hstack([esquinas, esquinas + lados]).astype(np.float32)
+        boxes[0] = (0, 0, 640, 640)
+
+        distintos = total = 0
+        for (mascara, bbox), coef in zip(ensamblar_mascaras(coeficientes, protos, boxes), coeficientes):
+            esperada = self._mascara_referencia(coef, protos, bbox)
+            self.assertEqual(mascara.shape, esperada.shape)
+            distintos += int(np.count_nonzero(mascara != esperada))
+            total += esperada.size
+
+        # Solo píxeles sueltos en el umbral por el orden de suma del producto
+        self.assertLessEqual(distintos, total // 10000)
+
+
+class SegmentacionLoteTests(SimpleTestCase):
+
+    def setUp(self):
+        self.a = np.full((640, 640, 3), 40, dtype=np.uint8)
+        self.b = np.full((480, 640, 3), 200, dtype=np.uint8)
+
+    @staticmethod
+    def _comparable(resultado):
+        """Segmentaciones con la máscara compacta como bytes densos"""
+        return [
+            {**seg, 'mascara': seg['mascara'].to_dense(np.uint8).tobytes()}
+            for seg in resultado
+        ]
+
+    def _assert_lote_igual_a_individual(self, motor, imagenes):
+        lote = motor.segmentar_lote(imagenes)
+        individuales = [motor.segmentar(imagen) for imagen in imagenes]
+
+        self.assertEqual(
+            [self._comparable(r) for r in lote],
+            [self._comparable(r) for r in individuales]
+        )
+        return lote
+
+    def test_lote_equivale_a_segmentar_cada_imagen(self):
+        for clase in (SegmentadorDefectosCoples, SegmentadorPiezasCoples):
+            with self.subTest(motor=clase.__name__):
+                sesion = _SesionFalsa()
+                motor = _motor_con_sesion(clase, sesion)
+
+                lote = self._assert_lote_igual_a_individual(motor, [self.a, self.b])
+
+                self.assertEqual(sesion.lotes[0], 2)
+                self.assertNotEqual(lote[0][0]['bbox'], lote[1][0]['bbox'])
+
+    def test_batch_fijo_se_trocea(self):
+        sesion = _SesionFalsa(forma_entrada=(1, 3, 640, 640))
+        motor = _motor_con_sesion(SegmentadorDefectosCoples, sesion)
+        self.assertEqual(motor.lote_maximo, 1)
+
+        self._assert_lote_igual_a_individual(motor, [self.a, self.b, self.a])
+
+        self.assertEqual(sesion.lotes, [1] * 6)
+
+    def test_modelo_que_rechaza_lotes_cae_a_imagen_por_imagen(self):
+        sesion = _SesionFalsa(rechazar_lotes=True)
+        motor = _motor_con_sesion(SegmentadorDefectosCoples, sesion)
+        self.assertIsNone(motor.lote_maximo)
+
+        lote = motor.segmentar_lote([self.a, self.b])
+
+        self.assertEqual(sesion.lotes, [2, 1, 1])
+        self.assertEqual(motor.lote_maximo, 1)
+        self.assertEqual(len(lote[0]), 1)
+        self.assertEqual(len(lote[1]), 1)
+
+        # El siguiente lote ya no intenta N > 1
+        motor.segmentar_lote([self.a, self.b])
+        self.assertEqual(sesion.lotes, [2, 1, 1, 1, 1])
+
+    def test_imagenes_invalidas_no_se_infieren(self):
+        for clase in (SegmentadorDefectosCoples, SegmentadorPiezasCoples):
+            with self.subTest(motor=clase.__name__):
+                sesion = _SesionFalsa()
+                motor = _motor_con_sesion(clase, sesion)
+                invalida = np.zeros((0, 0, 3), dtype=np.uint8)
+
+                lote = motor.segmentar_lote([self.a, invalida, self.b])
+
+                self.assertEqual(sesion.lotes, [2])
+                self.assertEqual(lote[1], [])
+                self.assertEqual(len(lote[0]), 1)
+                self.assertEqual(motor.segmentar(invalida), [])
+                self.assertEqual(sesion.lotes, [2])
+
+
+class MeasurementServiceTests(SimpleTestCase):
+
+    def test_lote_compacta_igual_a_densa(self):
+        densa = np.zeros((640, 640), dtype=np.uint8)
+        densa[100:140, 200:290] = 1
+        servicio = MeasurementService()
+
+        compacta, esperado = servicio.calcular_mediciones_lote(
+            [MascaraCompacta.desde_densa(densa), densa * 255]
+        )
+
+        self.assertEqual(compacta, esperado)
+        self.assertEqual(compacta['ancho_bbox_px'], 90.0)
+        self.assertEqual(compacta['alto_bbox_px'], 40.0)
+
+    def test_lote_sin_mascara_devuelve_vacio(self):
+        self.assertEqual(MeasurementService().calcular_mediciones_lote([None]), [{}])
+
+
+class PersistenciaServiceTests(TestCase):
+
+    def setUp(self):
+        self.analisis = AnalisisCople.objects.create(
+            id_analisis='test_persistencia',
+            timestamp_captura=timezone.now(),
+            archivo_json='test.json',
+            resolucion_ancho=640,
+            resolucion_alto=640,
+            resolucion_canales=3,
+            tiempo_captura_ms=0.0,
+            tiempo_total_ms=0.0,
+        )
+
+    def test_un_insert_y_un_update_por_analisis(self):
+        segmentaciones = [
+            {'clase': 'Defecto', 'confianza': 0.9, 'bbox': {'x1': i, 'y1': i, 'x2': i + 10, 'y2': i + 10}}
+            for i in range(5)
+        ]
+        filas = construir_segmentaciones_defectos(self.analisis, segmentaciones, [{}] * 5)
+        tiempos = {'segmentacion_ms': 1.0}
+
+        # SAVEPOINT + INSERT + SELECT (estado previo) + UPDATE + RELEASE
+        with self.assertNumQueries(5):
+            persistir_analisis(self.analisis, filas, tiempos=tiempos)
+
+        self.assertEqual(self.analisis.segmentaciones_defectos.count(), 5)
+        self.analisis.refresh_from_db()
+        self.assertIn('escritura_bd_ms', self.analisis.metadatos_json['tiempos'])
+
+    def test_resumen_diario_al_terminar_y_recalculo(self):
+        self.analisis.tiempo_captura_ms = 12.0
+        self.analisis.estado = 'completado'
+        segmentaciones = [
+            {'clase': 'Defecto', 'confianza': 0.8, 'bbox': {'x1': i, 'y1': i, 'x2': i + 10, 'y2': i + 10}}
+            for i in range(3)
+        ]
+        persistir_analisis(self.analisis, construir_segmentaciones_defectos(self.analisis, segmentaciones, [{}] * 3))
+        self.analisis.save()  # volver a guardar un análisis terminado no lo cuenta otra vez
+        AnalisisCople.objects.create(
+            id_analisis='test_persistencia_error',
+            timestamp_captura=timezone.now(),
+            estado='error',
+            archivo_json='test.json',
+            resolucion_ancho=640,
+            resolucion_alto=640,
+            resolucion_canales=3,
+            tiempo_captura_ms=0.0,
+            tiempo_total_ms=0.0,
+        )
+
+        hoy = timezone.localdate()
+        campos = ('total_analisis', 'analisis_exitosos', 'analisis_con_error',
+                  'total_defectos_detectados', 'tiempo_promedio_captura_ms', 'confianza_promedio')
+        incremental = EstadisticasSistema.objects.filter(fecha=hoy).values(*campos).get()
+        self.assertEqual(incremental['total_analisis'], 2)
+        self.assertEqual(incremental['analisis_exitosos'], 1)
+        self.assertEqual(incremental['analisis_con_error'], 1)
+        self.assertEqual(incremental['total_defectos_detectados'], 3)
+        self.assertAlmostEqual(incremental['tiempo_promedio_captura_ms'], 12.0)
+        self.assertAlmostEqual(incremental['confianza_promedio'], 0.8)
+
+        self.assertEqual(recalcular_resumenes(hoy, hoy), 1)
+        recalculado = EstadisticasSistema.objects.filter(fecha=hoy).values(*campos).get()
+        for campo in campos:
+            self.assertAlmostEqual(recalculado[campo], incremental[campo])
+
+
+class AnalisisListadoTests(TestCase):
+
+    def setUp(self):
+        self.usuario = get_user_model().objects.create_superuser(
+            username='admin_listado', email='admin@example.com', password='x'
+        )
+        for i in range(6):
+            analisis = AnalisisCople.objects.create(
+                id_analisis=f'test_listado_{i}',
+                timestamp_captura=timezone.now(),
+                tipo_analisis='medicion_defectos',
+                estado='completado',
+                usuario=self.usuario,
+                archivo_json='test.json',
+                resolucion_ancho=640,
+                resolucion_alto=640,
+                resolucion_canales=3,
+                tiempo_captura_ms=0.0,
+                tiempo_total_ms=0.0,
+            )
+            segmentaciones = [
+                {'clase': 'Defecto', 'confianza': 0.9, 'bbox': {'x1': j, 'y1': j, 'x2': j + 10, 'y2': j + 10}}
+                for j in range(2)
+            ]
+            persistir_analisis(analisis, construir_segmentaciones_defectos(analisis, segmentaciones, [{}] * 2))
+
+    def test_crear_encola_el_analisis(self):
+        recibidos = []
+
+        def tarea(trabajo, progreso):
+            recibidos.append(trabajo.parametros)
+            return {'analisis_id': 1}
+
+        self.addCleanup(trabajos_service._tareas.__setitem__, 'analizar_imagen', trabajos_service._tareas['analizar_imagen'])
+        trabajos_service._tareas['analizar_imagen'] = tarea
+        request = APIRequestFactory().post(
+            '/api/analisis/resultados/', {'tipo_analisis': 'medicion_defectos'}, format='json'
+        )
+        force_authenticate(request, user=self.usuario)
+
+        respuesta = AnalisisCopleViewSet.as_view({'post': 'create'})(request)
+
+        self.assertEqual(respuesta.status_code, 202)
+        trabajo = TrabajoAnalisis.objects.get(id=respuesta.data['trabajo_id'])
+        self.assertEqual(trabajo.tipo, 'analizar_imagen')
+        self.assertEqual(trabajo.usuario, self.usuario)
+        self.assertEqual(recibidos[0]['tipo_analisis'], 'medicion_defectos')
+
+    def _listar(self, **parametros):
+        request = APIRequestFactory().get('/api/analisis/resultados/', parametros)
+        force_authenticate(request, user=self.usuario)
+        return AnalisisCopleViewSet.as_view({'get': 'list'})(request)
+
+    def test_consultas_constantes_con_el_tamano_de_pagina(self):
+        consultas = []
+        for page_size in (2, 5):
+            with CaptureQueriesContext(connection) as contexto:
+                respuesta = self._listar(page_size=page_size)
+            consultas.append(len(contexto))
+            self.assertEqual(len(respuesta.data['results']), page_size)
+            self.assertEqual(respuesta.data['results'][0]['num_defectos'], 2)
+        self.assertEqual(consultas[0], consultas[1])
+
+    def test_cursor_recorre_todas_las_filas_y_sin_parametros_devuelve_lista(self):
+        vistos = []
+        respuesta = self._listar(page_size=4)
+        vistos += [fila['id_analisis'] for fila in respuesta.data['results']]
+        cursor = parse_qs(urlparse(respuesta.data['next']).query)['cursor'][0]
+        respuesta = self._listar(page_size=4, cursor=cursor)
+        vistos += [fila['id_analisis'] for fila in respuesta.data['results']]
+        self.assertEqual(sorted(vistos), [f'test_listado_{i}' for i in range(6)])
+        self.assertIsNone(respuesta.data['next'])
+
+        self.assertEqual(len(self._listar().data), 6)
+
+    def test_detalle_con_values_igual_al_serializer_anidado(self):
+        analisis = AnalisisCople.objects.get(id_analisis='test_listado_0')
+        esperado = SegmentacionDefectoSerializer(analisis.segmentaciones_defectos.order_by('id'), many=True).data
+        obtenido = AnalisisCopleSerializer(analisis).data['segmentaciones_defectos']
+
+        self.assertEqual(sorted(obtenido, key=lambda s: s['id']), esperado)
+        with self.assertNumQueries(3):
+            datos = AnalisisCopleSerializer(AnalisisCople.objects.select_related('usuario'), many=True).data
+        self.assertEqual(len(datos), 6)
+        self.assertTrue(all(len(d['segmentaciones_defectos']) == 2 for d in datos))
+
+    def test_campos_omite_segmentaciones(self):
+        analisis = AnalisisCople.objects.get(id_analisis='test_listado_0')
+        request = APIRequestFactory().get(f'/api/analisis/resultados/{analisis.pk}/', {'campos': 'id,estado'})
+        force_authenticate(request, user=self.usuario)
+
+        with self.assertNumQueries(1):
+            respuesta = AnalisisCopleViewSet.as_view({'get': 'retrieve'})(request, pk=analisis.pk)
+        self.assertEqual(set(respuesta.data), {'id', 'estado'})
+
+    def test_imagen_procesada_binaria_con_etag_y_rango(self):
+        analisis = AnalisisCople.objects.get(id_analisis='test_listado_0')
+        contenido = bytes(range(256)) * 4
+        vista = AnalisisCopleViewSet.as_view({'get': 'imagen_procesada'})
+
+        def pedir(**cabeceras):
+            request = APIRequestFactory().get(f'/api/analisis/resultados/{analisis.pk}/imagen_procesada/', **cabeceras)
+            force_authenticate(request, user=self.usuario)
+            return vista(request, pk=analisis.pk)
+
+        with tempfile.TemporaryDirectory() as directorio, override_settings(MEDIA_ROOT=directorio):
+            analisis.archivo_imagen.save('procesada.jpg', ContentFile(contenido))
+
+            respuesta = pedir()
+            self.assertEqual(respuesta.status_code, 200)
+            self.assertEqual(b''.join(respuesta.streaming_content), contenido)
+            self.assertIn('immutable', respuesta['Cache-Control'])
+            etag = respuesta['ETag']
+
+            respuesta = pedir(HTTP_IF_NONE_MATCH=etag)
+            self.assertEqual(respuesta.status_code, 304)
+            self.assertEqual(respuesta['ETag'], etag)
+
+            respuesta = pedir(HTTP_RANGE='bytes=10-19')
+            self.assertEqual(respuesta.status_code, 206)
+            self.assertEqual(respuesta['Content-Range'], f'bytes 10-19/{len(contenido)}')
+            self.assertEqual(b''.join(respuesta.streaming_content), contenido[10:20])
+
+            self.assertEqual(pedir(HTTP_RANGE=f'bytes={len(contenido)}-').status_code, 416)
+
+    def test_estadisticas_agregadas_en_bd_y_cache_invalidada_al_escribir(self):
+        with self.assertNumQueries(3):
+            estadisticas = obtener_estadisticas(AnalisisCople.objects.all(), 'prueba')
+        self.assertEqual(estadisticas['base_datos']['total_analisis'], 6)
+        self.assertEqual(estadisticas['por_tipo']['medicion_defectos'], 6)
+        self.assertEqual(estadisticas['segmentacion']['total_defectos'], 12)
+        self.assertAlmostEqual(estadisticas['segmentacion']['confianza_promedio'], 0.9)
+
+        with self.assertNumQueries(0):
+            obtener_estadisticas(AnalisisCople.objects.all(), 'prueba')
+
+        analisis = AnalisisCople.objects.get(id_analisis='test_listado_0')
+        analisis.estado = 'error'
+        with self.captureOnCommitCallbacks(execute=True):
+            analisis.save()
+        estadisticas = obtener_estadisticas(AnalisisCople.objects.all(), 'prueba')
+        self.assertEqual(estadisticas['base_datos']['analisis_con_error'], 1)
+        self.assertEqual(estadisticas['segmentacion']['total_defectos'], 10)
+
+
+class _CamaraRutina:
+    """CameraService mínimo para el barrido: frames numerados con retardo de exposición"""
+
+    def __init__(self, retardo=0.05, fallos=()):
+        self.retardo = retardo
+        self.fallos = set(fallos)
+        self.seq = 0
+        self.llamadas = 0
+        self.despues_de = []
+        self.intervalos = []
+
+    def obtener_estado(self):
+        return {'activa': True}
+
+    def capturar_imagen_posterior(self, no_antes_de=None, despues_de_seq=0, timeout=None):
+        self.llamadas += 1
+        self.despues_de.append(despues_de_seq)
+        inicio = time.monotonic()
+        time.sleep(self.retardo)
+        if self.llamadas in self.fallos:
+            return False, None, 0, 0.0
+        self.seq += 1
+        self.intervalos.append((inicio, time.monotonic()))
+        # El timestamp identifica el frame: 1000 + seq
+        return True, np.full((640, 640, 3), self.seq, dtype=np.uint8), self.seq, 1000.0 + self.seq
+
+
+class _SegmentadorRutina:
+    """Segmentador de defectos falso: sin detecciones, con retardo de inferencia"""
+
+    def __init__(self, retardo=0.05, fallar=False):
+        self.retardo = retardo
+        self.fallar = fallar
+        self.intervalos = []
+
+    def segmentar(self, imagen, usar_mascaras_simples=False):
+        if self.fallar:
+            raise RuntimeError('fallo de inferencia')
+        inicio = time.monotonic()
+        time.sleep(self.retardo)
+        self.intervalos.append((inicio, time.monotonic()))
+        return []
+
+
+class _ServicioSegmentacionRutina(SegmentationAnalysisService):
+    """Servicio de segmentación con cámara y segmentador falsos (sin registro de modelos)"""
+
+    def __init__(self, camara, segmentador):
+        self.segmentador_piezas = None
+        self.segmentador_defectos = segmentador
+        self.measurement_service = MeasurementService()
+        self.camera_service = camara
+
+    def _inicializar_segmentador(self, tipo, config=None):
+        return True
+
+
+class RutinaInspeccionPipelineTests(TestCase):
+
+    def setUp(self):
+        directorio = tempfile.TemporaryDirectory()
+        self.addCleanup(directorio.cleanup)
+        ajustes = override_settings(MEDIA_ROOT=directorio.name)
+        ajustes.enable()
+        self.addCleanup(ajustes.disable)
+        self.usuario = get_user_model().objects.create_user(username='operador', password='x')
+
+    def _barrer(self, camara, segmentador):
+        servicio = RutinaInspeccionService(_ServicioSegmentacionRutina(camara, segmentador))
+        servicio.intervalo_posicionamiento = 0.0
+        servicio.tamano_cola_capturas = 1
+        rutina = servicio.iniciar_rutina(usuario=self.usuario)
+        return servicio.ejecutar_barrido_automatico(rutina['rutina_id'], usuario=self.usuario)
+
+    def test_captura_solapa_con_analisis_y_persiste_en_orden(self):
+        camara = _CamaraRutina()
+        segmentador = _SegmentadorRutina()
+
+        resultado = self._barrer(camara, segmentador)
+
+        self.assertTrue(resultado['success'])
+        self.assertEqual(resultado['num_capturas'], 4)
+        capturas = [
+            AnalisisCople.objects.get(id=analisis_id).timestamp_captura.timestamp()
+            for analisis_id in resultado['analisis_ids']
+        ]
+        self.assertEqual(capturas, [1001.0, 1002.0, 1003.0, 1004.0])
+        # El ángulo k+1 se empieza a capturar antes de terminar de analizar el k
+        for k in range(3):
+            self.assertLess(camara.intervalos[k + 1][0], segmentador.intervalos[k][1])
+
+    def test_fallo_de_captura_no_reinicia_la_secuencia(self):
+        camara = _CamaraRutina(retardo=0.0, fallos={2})
+
+        resultado = self._barrer(camara, _SegmentadorRutina(retardo=0.0))
+
+        self.assertEqual(resultado['num_capturas'], 3)
+        # Tras el fallo se sigue pidiendo un frame posterior al del ángulo 1
+        self.assertEqual(camara.despues_de, [0, 1, 1, 2])
+
+    def test_fallo_del_analisis_no_bloquea_la_captura(self):
+        camara = _CamaraRutina(retardo=0.0)
+
+        resultado = self._barrer(camara, _SegmentadorRutina(fallar=True))
+
+        self.assertFalse(resultado['success'])
+        self.assertIn('fallo de inferencia', resultado['error'])
+        # El productor terminó aunque la cola (tamaño 1) se quedó sin consumidor
+        self.assertFalse(any(h.name.startswith('CapturaRutina-') for h in threading.enumerate()))
+
+
+class TrabajosServiceTests(TestCase):
+
+    def setUp(self):
+        def tarea_prueba(trabajo, progreso):
+            progreso(50, 'a medias')
+            if trabajo.parametros.get('fallar'):
+                raise ErrorTrabajo('fallo de prueba')
+            return {'doble': trabajo.parametros['valor'] * 2}
+
+        trabajos_service._tareas['prueba'] = tarea_prueba
+        self.addCleanup(trabajos_service._tareas.pop, 'prueba')
+
+    def test_cola_base_datos_encola_y_trabajador_ejecuta(self):
+        cola = ColaBaseDatos()
+        trabajo = cola.encolar('prueba', {'valor': 21})
+        self.assertEqual(trabajo.estado, 'pendiente')
+
+        ejecutados = Trabajador(cola, nombre='test').ejecutar_pendientes()
+
+        self.assertEqual(ejecutados, 1)
+        trabajo.refresh_from_db()
+        self.assertEqual(trabajo.estado, 'completado')
+        self.assertEqual(trabajo.resultado, {'doble': 42})
+        self.assertEqual(trabajo.trabajador, 'test')
+        self.assertIsNone(cola.tomar_siguiente('otro'))
+
+    def test_cola_en_proceso_guarda_error(self):
+        trabajo = ColaEnProceso().encolar('prueba', {'fallar': True})
+
+        self.assertEqual(trabajo.estado, 'error')
+        self.assertEqual(trabajo.mensaje_error, 'fallo de prueba')
+
+    @override_settings(ANALISIS_TRABAJO_VENCIMIENTO_S=60)
+    def test_trabajo_sin_latido_se_marca_como_error(self):
+        cola = ColaBaseDatos()
+        caido = cola.encolar('ejecutar_barrido', {'rutina_id': 7})
+        self.assertEqual(cola.tomar_siguiente('caido').id, caido.id)
+        self.assertEqual(trabajos_service.trabajo_activo('ejecutar_barrido', rutina_id=7).id, caido.id)
+        self.assertIsNone(trabajos_service.trabajo_activo('ejecutar_barrido', rutina_id=8))
+
+        vivo = cola.encolar('prueba', {'valor': 1})
+        cola.tomar_siguiente('vivo')
+        TrabajoAnalisis.objects.filter(id=caido.id).update(
+            timestamp_latido=timezone.now() - timedelta(seconds=61)
+        )
+
+        self.assertEqual(cola.recuperar_vencidos(), 1)
+        caido.refresh_from_db()
+        vivo.refresh_from_db()
+        self.assertEqual(caido.estado, 'error')
+        self.assertEqual(vivo.estado, 'en_proceso')
+        self.assertIsNone(trabajos_service.trabajo_activo('ejecutar_barrido', rutina_id=7))
+
+
+class DifusorPreviewTests(SimpleTestCase):
+
+    def test_cliente_lento_recibe_el_frame_mas_reciente(self):
+        difusor = DifusorPreview()
+        primero = difusor.publicar(b'uno')
+        difusor.publicar(b'dos')
+        difusor.publicar(b'tres')
+
+        frame = difusor.esperar_frame(primero.seq, timeout=0.1)
+
+        self.assertEqual(frame.jpeg, b'tres')
+        self.assertIsNone(difusor.esperar_frame(frame.seq, timeout=0.01))
+
+    def test_stream_termina_al_cerrar(self):
+        difusor = DifusorPreview()
+        difusor.publicar(b'jpeg')
+        stream = difusor.stream_mjpeg('frame', timeout=1.0)
+
+        parte = next(stream)
+        difusor.cerrar()
+
+        self.assertTrue(parte.startswith(b'--frame\r\nContent-Type: image/jpeg'))
+        self.assertTrue(parte.endswith(b'jpeg\r\n'))
+        self.assertEqual(list(stream), [])
+        self.assertEqual(difusor.num_suscriptores, 0)
+
+
+class AnilloFramesCompartidoTests(SimpleTestCase):
+
+    def test_lector_ve_los_frames_del_dueno(self):
+        nombre = f'test_anillo_{id(self)}'
+        dueno = AnilloFramesCompartido.crear(nombre, (4, 6, 3), num_slots=3)
+        lector = AnilloFramesCompartido.abrir(nombre)
+        try:
+            for valor in range(1, 6):
+                dueno.escribir(np.full((4, 6, 3), valor, dtype=np.uint8), timestamp=float(valor))
+
+            seq, timestamp, frame = lector.esperar_frame(0, timeout=0.1, copiar=False)
+
+            self.assertEqual(seq, 5)
+            self.assertEqual(timestamp, 5.0)
+            self.assertTrue((frame == 5).all())
+            self.assertFalse(frame.flags.writeable)
+            # Los slots ya sobrescritos dejan de ser legibles
+            self.assertIsNone(lector.leer(2))
+            self.assertIsNone(lector.esperar_frame(seq, timeout=0.01))
+            del frame
+        finally:
+            dueno.cerrar()
+
+        self.assertFalse(lector.activo)
+        lector.cerrar()
+        self.assertIsNone(AnilloFramesCompartido.abrir(nombre))
+
+
+class _CamaraFalsa:
+    """CameraService mínimo para el daemon: devuelve siempre la misma imagen"""
+
+    preview_activo = False
+
+    def __init__(self):
+        self.imagen = np.arange(4 * 5 * 3, dtype=np.uint8).reshape(4, 5, 3)
+
+    def capturar_imagen(self):
+        return True, self.imagen
+
+    def es_dueno_camara(self):
+        return True
+
+    def obtener_estado(self):
+        return {'activa': False, 'usando_webcam': False}
+
+    def liberar_camara(self, **kwargs):
+        return {'success': True}
+
+    inicializar_camara = iniciar_preview = detener_preview = hibernar = reactivar_preview = liberar_camara
+
+
+class DaemonCamaraTests(SimpleTestCase):
+
+    def setUp(self):
+        self.ruta_socket = os.path.join(tempfile.mkdtemp(), 'camara.sock')
+        self.daemon = DaemonCamara(_CamaraFalsa(), self.ruta_socket)
+        hilo = threading.Thread(target=self.daemon.servir, daemon=True)
+        hilo.start()
+        while self.daemon.servidor is None:
+            hilo.join(0.01)
+        self.addCleanup(self.daemon.detener)
+
+    def test_cliente_captura_por_memoria_compartida(self):
+        cliente = ClienteCamara(self.ruta_socket)
+
+        exito, imagen = cliente.capturar_imagen()
+        estado = cliente.obtener_estado()
+
+        self.assertTrue(exito)
+        np.testing.assert_array_equal(imagen, self.daemon.servicio.imagen)
+        self.assertTrue(estado['activa'])
+        self.assertEqual(estado['daemon_pid'], os.getpid())
+        self.assertFalse(cliente._llamar('desconocido')['success'])
+
+    def test_sin_daemon_la_camara_no_esta_activa(self):
+        cliente = ClienteCamara(self.ruta_socket + '.inexistente')
+
+        self.assertEqual(cliente.capturar_imagen(), (False, None))
+        self.assertFalse(cliente.obtener_estado()['activa'])
+
+
+class AnilloFramesTests(SimpleTestCase):
+
+    def test_demosaico_en_slot_y_espera_de_frame_nuevo(self):
+        anillo = AnilloFrames((4, 4, 3), num_slots=3)
+        bayer = np.full((4, 4), 200, dtype=np.uint8)
+
+        def escribir():
+            slot = anillo.slot_escritura()
+            cv2.cvtColor(bayer, cv2.COLOR_BayerBG2BGR, dst=slot)
+            anillo.publicar(timestamp=1.5)
+
+        threading.Timer(0.05, escribir).start()
+        seq, timestamp, frame = anillo.esperar_frame(0, timeout=2.0)
+
+        self.assertEqual((seq, timestamp), (1, 1.5))
+        self.assertTrue((frame == 200).all())
+        self.assertFalse(frame.flags.writeable)
+        self.assertIsNone(anillo.esperar_frame(seq, timeout=0.01))
+
+    def test_frames_sobrescritos_dejan_de_ser_legibles(self):
+        anillo = AnilloFrames((2, 2, 3), num_slots=2)
+        for _ in range(3):
+            anillo.slot_escritura()[:] = 0
+            anillo.publicar()
+
+        self.assertIsNone(anillo.leer(1))
+        self.assertEqual(anillo.leer()[0], 3)
+        self.assertEqual(anillo.frames_validos(), 2)
+
+
+class _CapturaFalsa:
+    """cv2.VideoCapture mínimo: un frame cada 10 ms con el contador en los píxeles"""
+
+    def __init__(self):
+        self.contador = 0
+
+    def read(self):
+        time.sleep(0.01)
+        self.contador += 1
+        return True, np.full((8, 8, 3), self.contador % 256, dtype=np.uint8)
+
+
+class CapturaPosteriorTests(SimpleTestCase):
+
+    def test_webcam_entrega_frame_expuesto_despues_del_evento(self):
+        webcam = WebcamFallback(width=8, height=8, use_crop=False)
+        webcam.cap = _CapturaFalsa()
+        webcam.inicializado = True
+        self.addCleanup(webcam.detener_captura_continua)
+
+        primero = webcam.capturar_frame_posterior(timeout=1.0)
+        evento = time.time()
+        seq, timestamp, frame = webcam.capturar_frame_posterior(
+            no_antes_de=evento, despues_de_seq=primero[0], timeout=1.0
+        )
+
+        self.assertGreater(seq, primero[0])
+        self.assertGreaterEqual(timestamp - webcam.periodo_frame, evento)
+        self.assertTrue(frame.flags.writeable)  # copia propia, no vista del anillo
+
+
+class DisparoSoftwareTests(SimpleTestCase):
+
+    def setUp(self):
+        self.camara = CamaraTiempoOptimizada(gev=GevSimulado())
+        self.assertTrue(self.camara.configurar_camara())
+        self.assertTrue(self.camara.configurar_modo_disparo('software'))
+        self.addCleanup(self.camara.liberar)
+
+    def test_sin_disparo_no_llegan_frames(self):
+        seq, _, frame = self.camara.capturar_disparo(timeout=1.0)
+
+        self.assertEqual(frame.shape, (640, 640, 3))
+        self.assertIsNone(self.camara.esperar_frame(seq, timeout=0.2))
+        self.assertEqual(self.camara.gev.frames_generados, 1)
+
+    def test_rafaga_captura_frames_consecutivos(self):
+        rafaga = self.camara.capturar_rafaga(3, timeout=1.0)
+
+        self.assertEqual([seq for seq, _, _ in rafaga], [1, 2, 3])
+        self.assertEqual(self.camara.gev.frames_generados, 3)
+
+
+class CamaraSimuladaTests(SimpleTestCase):
+
+    def test_reproduce_fuente_y_descarta_frames_perdidos(self):
+        with tempfile.TemporaryDirectory() as directorio:
+            for i, valor in enumerate((50, 150)):
+                np.save(os.path.join(directorio, f'{i}.npy'), np.full((640, 640), valor, dtype=np.uint8))
+
+            camara = CamaraSimulada(fuente=directorio, fps=100, jitter=0.002, tasa_perdida=0.3, semilla=1)
+            self.assertTrue(camara.inicializar())
+            self.addCleanup(camara.liberar)
+            self.assertTrue(camara.iniciar_captura_continua())
+
+            valores = set()
+            seq = 0
+            while len(valores) < 2:
+                leido = camara.esperar_frame(seq, timeout=1.0)
+                self.assertIsNotNone(leido)
+                seq = leido[0]
+                valores.add(int(leido[2][320, 320, 1]))
+
+            stats = camara.obtener_estadisticas()
+            self.assertEqual(valores, {50, 150})
+            self.assertTrue(stats['simulada'])
+            self.assertGreater(stats['frames_perdidos'], 0)
+            # Los frames incompletos no llegan al anillo
+            self.assertLessEqual(seq, stats['frames_generados'] - stats['frames_perdidos'])
+
+
+class BenchmarkPipelineTests(SimpleTestCase):
+
+    def test_resumen_por_etapa(self):
+        cronometro = Cronometro()
+        for _ in range(3):
+            with cronometro.medir('nms'):
+                pass
+        resumen = cronometro.resumen()
+        self.assertEqual(resumen['nms']['n'], 3)
+        self.assertLessEqual(resumen['nms']['p50_ms'], resumen['nms']['p99_ms'])
+        self.assertEqual(resumir([1.0, 2.0, 3.0])['p50_ms'], 2.0)
+        self.assertEqual(resumir([]), {'n': 0})
+
+    def test_corpus_de_directorio(self):
+        with tempfile.TemporaryDirectory() as directorio:
+            for i in range(3):
+                np.save(os.path.join(directorio, f'{i}.npy'), np.full((32, 32), i, dtype=np.uint8))
+            frames = cargar_corpus(directorio, max_frames=2)
+        self.assertEqual(len(frames), 2)
+        self.assertEqual(frames[0].shape, (32, 32, 3))
+
+
+class PreprocesadorEntradaTests(SimpleTestCase):
+
+    def test_frame_640_sin_redimensionar_y_buffer_reutilizado(self):
+        imagen = np.random.default_rng(0).integers(0, 256, (640, 640, 3), dtype=np.uint8)
+        preprocesador = PreprocesadorEntrada(640, rgb=True)
+        tensor, transformacion = preprocesador.preparar(imagen)
+
+        esperado = np.transpose(cv2.cvtColor(imagen, cv2.COLOR_BGR2RGB).astype(np.float32) / 255.0, (2, 0, 1))
+        self.assertTrue(transformacion.es_identidad)
+        self.assertEqual(tensor.shape, (1, 3, 640, 640))
+        self.assertTrue(tensor.flags['C_CONTIGUOUS'])
+        np.testing.assert_allclose(tensor[0], esperado, atol=1e-6)
+        self.assertIs(preprocesador.preparar(imagen)[0], tensor)
+
+    def test_letterbox_y_vuelta_a_coordenadas_originales(self):
+        preprocesador = PreprocesadorEntrada(640, rgb=False)
+        _, transformacion = preprocesador.preparar(np.zeros((240, 320, 3), dtype=np.uint8))
+        self.assertEqual((transformacion.escala, transformacion.pad_x, transformacion.pad_y), (2.0, 0, 80))
+
+        # Caja y máscara de 40x40 en la entrada del modelo -> 20x20 en la original
+        mascara = MascaraCompacta(np.ones((40, 40), dtype=np.uint8), 100, 180, (640, 640))
+        segmentacion = {'bbox': {'x1': 100, 'y1': 180, 'x2': 140, 'y2': 220}, 'mascara': mascara}
+        transformacion.segmentaciones_a_original([segmentacion])
+
+        self.assertEqual(segmentacion['bbox'], {'x1': 50, 'y1': 50, 'x2': 70, 'y2': 70})
+        self.assertEqual(segmentacion['mascara'].shape, (240, 320))
+        self.assertEqual(segmentacion['mascara'].region, (50, 50, 70, 70))
+        self.assertEqual(segmentacion['area_mascara'], 400)
+
+
+class TiemposMetricasTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+
+    def test_medir_etapa_solo_con_registro_activo(self):
+        registro = RegistroTiempos()
+        with medir_etapa('inferencia'):
+            pass
+        with registro.activo():
+            with medir_etapa('nms'):
+                pass
+            with medir_etapa('captura'):
+                pass
+        self.assertEqual(list(registro.como_dict()), ['captura_ms', 'nms_ms'])
+
+    def test_exportar_histograma_prometheus(self):
+        metricas = MetricasService()
+        for valor in (3.0, 30.0, 300.0):
+            metricas.registrar_analisis('medicion_piezas', {'inferencia_ms': valor})
+        texto = metricas.exportar_prometheus()
+        etiquetas = 'tipo="medicion_piezas",etapa="inferencia"'
+        self.assertIn(f'analisis_coples_etapa_duracion_ms_bucket{{{etiquetas},le="50"}} 2', texto)
+        self.assertIn(f'analisis_coples_etapa_duracion_ms_count{{{etiquetas}}} 3', texto)
+        self.assertIn(f'analisis_coples_etapa_duracion_reciente_ms{{{etiquetas},quantile="0.5"}} 30.000', texto)
+
+    def test_metrics_suma_todos_los_procesos(self):
+        servidor, trabajador, otro_worker = MetricasService(), MetricasService(), MetricasService()
+        servidor.registrar_analisis('medicion_piezas', {'inferencia_ms': 3.0})
+        trabajador.registrar_analisis('medicion_piezas', {'inferencia_ms': 30.0})
+        trabajador.registrar_analisis('medicion_piezas', {'inferencia_ms': 300.0}, 'error')
+
+        # Responde el scrape un proceso que no ha analizado nada
+        texto = otro_worker.exportar_prometheus()
+
+        etiquetas = 'tipo="medicion_piezas",etapa="inferencia"'
+        self.assertIn(f'analisis_coples_etapa_duracion_ms_bucket{{{etiquetas},le="50"}} 2', texto)
+        self.assertIn(f'analisis_coples_etapa_duracion_ms_count{{{etiquetas}}} 3', texto)
+        self.assertIn(f'analisis_coples_etapa_duracion_reciente_ms{{{etiquetas},quantile="0.5"}} 30.000', texto)
+        self.assertIn('analisis_coples_analisis_total{tipo="medicion_piezas",estado="completado"} 2', texto)
+        self.assertIn('analisis_coples_analisis_total{tipo="medicion_piezas",estado="error"} 1', texto)
+        # El proceso que publica no se cuenta dos veces
+        self.assertEqual(servidor.exportar_prometheus(), texto)
+
+    def test_sin_cache_compartida_solo_el_proceso(self):
+        MetricasService().registrar_analisis('medicion_piezas', {'inferencia_ms': 3.0})
+        texto = MetricasService(ttl_compartidas_s=0).exportar_prometheus()
+        self.assertNotIn('etapa="inferencia"', texto)
+
+    @override_settings(ANALISIS_METRICAS_TOKEN='secreto')
+    def test_endpoint_metrics(self):
+        get_metricas_service().registrar_analisis('medicion_defectos', {'nms_ms': 1.0})
+        self.assertEqual(self.client.get('/metrics').status_code, 401)
+        respuesta = self.client.get('/metrics', HTTP_AUTHORIZATION='Bearer secreto')
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertTrue(respuesta['Content-Type'].startswith('text/plain'))
+        self.assertIn(b'etapa="nms"', respuesta.content)
+
+
+class LoggingTrazaTests(SimpleTestCase):
+
+    def test_debug_solo_dentro_de_una_traza(self):
+        log = obtener_logger('analisis_coples.tests.traza')
+        mensajes = []
+        manejador = logging.Handler()
+        manejador.emit = lambda registro: mensajes.append((registro.levelname, registro.getMessage()))
+        log._logger.addHandler(manejador)
+        log._logger.setLevel(logging.INFO)
+        self.addCleanup(log._logger.removeHandler, manejador)
+
+        self.assertFalse(log.depurando())
+        log.debug('fuera %s', 1)
+        with traza(True):
+            self.assertTrue(log.depurando())
+            log.debug('dentro %s', 2)
+        log.info('info %s', 3)
+        self.assertEqual(mensajes, [('DEBUG', 'dentro 2'), ('INFO', 'info 3')])
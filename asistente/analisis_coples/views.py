@@ -1,3 +1,31 @@
-from django.shortcuts import render
+import hmac
 
-# Create your views here.
+from django.conf import settings
+from django.db import transaction
+from django.http import HttpResponse
+from django.views.decorators.http import require_GET
+
+from .services.metricas_service import get_metricas_service
+
+
+@transaction.non_atomic_requests
+@require_GET
+def metricas(request):
+    """
+    Latencias por etapa del pipeline en formato de exposición de Prometheus,
+    sumadas entre todos los procesos (ver metricas_service).
+
+    Si settings.ANALISIS_METRICAS_TOKEN está definido, exige
+    `Authorization: Bearer <token>`. No toca la base de datos, así que se
+    excluye de ATOMIC_REQUESTS.
+    """
+    token = getattr(settings, 'ANALISIS_METRICAS_TOKEN', '')
+    if token:
+        esperado = f'Bearer {token}'
+        if not hmac.compare_digest(request.headers.get('Authorization', ''), esperado):
+            return HttpResponse(status=401)
+
+    return HttpResponse(
+        get_metricas_service().exportar_prometheus(),
+        content_type='text/plain; version=0.0.4; charset=utf-8'
+    )
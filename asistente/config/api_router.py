@@ -15,7 +15,8 @@ from analisis_coples.api.views import (
     AnalisisCopleViewSet,
     EstadisticasSistemaViewSet,
     SistemaControlViewSet,
-    RutinaInspeccionViewSet
+    RutinaInspeccionViewSet,
+    TrabajoAnalisisViewSet
 )
 from analisis_coples.api import image_views
 from analisis_coples.api.camera_views import CamaraControlViewSet
@@ -33,6 +34,7 @@ router.register(r"analisis/resultados", AnalisisCopleViewSet, basename="analisis
 router.register(r"analisis/estadisticas", EstadisticasSistemaViewSet, basename="estadisticas")
 router.register(r"analisis/sistema", SistemaControlViewSet, basename="sistema")
 router.register(r"analisis/rutinas", RutinaInspeccionViewSet, basename="rutinas")
+router.register(r"analisis/trabajos", TrabajoAnalisisViewSet, basename="trabajos")
 
 # API de control de cámara
 router.register(r"camara", CamaraControlViewSet, basename="camara")
@@ -319,6 +319,35 @@ SPECTACULAR_SETTINGS = {
 # Your stuff...
 # ------------------------------------------------------------------------------
 
+# Precargar los modelos ONNX de segmentación al arrancar el servidor
+ANALISIS_PRECARGAR_MODELOS = env.bool("ANALISIS_PRECARGAR_MODELOS", default=True)
+
+# Cola de trabajos de análisis: 'base_datos' (tabla TrabajoAnalisis) o 'en_proceso' (pruebas)
+ANALISIS_COLA_TRABAJOS = env("ANALISIS_COLA_TRABAJOS", default="base_datos")
+# Hilos trabajadores dentro del servidor (0 si se usa manage.py procesar_trabajos).
+# Los workers de gunicorn que no abrieron la cámara capturan del anillo compartido
+# del dueño (mismo contenedor). Un procesar_trabajos en otro contenedor no lo ve:
+# necesita el daemon de cámara (ANALISIS_CAMARA_SOCKET) y compartir su IPC
+ANALISIS_TRABAJADORES_SERVIDOR = env.int("ANALISIS_TRABAJADORES_SERVIDOR", default=1)
+# Segundos sin latido tras los que un trabajo en proceso se marca como error (trabajador caído)
+ANALISIS_TRABAJO_VENCIMIENTO_S = env.int("ANALISIS_TRABAJO_VENCIMIENTO_S", default=120)
+# Segundos de espera entre ángulos de la rutina de inspección (posicionamiento del brazo)
+ANALISIS_RUTINA_INTERVALO_S = env.float("ANALISIS_RUTINA_INTERVALO_S", default=2.0)
+# Socket del daemon de cámara (manage.py camara_daemon). Vacío: cada proceso abre la cámara
+ANALISIS_CAMARA_SOCKET = env("ANALISIS_CAMARA_SOCKET", default="")
+# Token Bearer exigido por /metrics (Prometheus). Vacío: endpoint abierto
+ANALISIS_METRICAS_TOKEN = env("ANALISIS_METRICAS_TOKEN", default="")
+# Vigencia (s) de las métricas de cada proceso en la caché compartida que agrega /metrics
+# (0: /metrics solo muestra las del proceso que responde)
+ANALISIS_METRICAS_TTL_S = env.int("ANALISIS_METRICAS_TTL_S", default=86400)
+# Fracción (0-1) de análisis con traza de diagnóstico (DEBUG) aunque el nivel sea INFO
+ANALISIS_TRAZA_MUESTREO = env.float("ANALISIS_TRAZA_MUESTREO", default=0.0)
+# Vigencia (s) de las estadísticas cacheadas del dashboard; se invalidan al escribir análisis
+ANALISIS_ESTADISTICAS_CACHE_S = env.int("ANALISIS_ESTADISTICAS_CACHE_S", default=30)
+# Prefijo de la location `internal` de nginx para servir imágenes con X-Accel-Redirect
+# (p.ej. "/media-interno/"). Requiere que la API pase por ese nginx. Vacío: las sirve Django
+ANALISIS_IMAGENES_X_ACCEL = env("ANALISIS_IMAGENES_X_ACCEL", default="")
+
 SIMPLE_JWT = {
     # Duración del access token (antes: 5 minutos)
     'ACCESS_TOKEN_LIFETIME': timedelta(hours=1),       # o el tiempo que prefieras
@@ -36,3 +36,7 @@ TEMPLATES[0]["OPTIONS"]["debug"] = True  # type: ignore[index]
 MEDIA_URL = "http://media.testserver/"
 # Your stuff...
 # ------------------------------------------------------------------------------
+
+ANALISIS_PRECARGAR_MODELOS = False
+ANALISIS_COLA_TRABAJOS = "en_proceso"
+ANALISIS_TRABAJADORES_SERVIDOR = 0
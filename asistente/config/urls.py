@@ -9,6 +9,8 @@ from drf_spectacular.views import SpectacularAPIView, SpectacularSwaggerView
 from rest_framework.authtoken.views import obtain_auth_token
 from rest_framework_simplejwt.views import TokenObtainPairView, TokenRefreshView
 
+from analisis_coples.views import metricas
+
 urlpatterns = [
     # Páginas base (puedes eliminarlas si no las usas)
     path("", TemplateView.as_view(template_name="pages/home.html"), name="home"),
@@ -23,6 +25,7 @@ urlpatterns = [
     
     # Sistema de análisis de coples
     path("analisis/", include("analisis_coples.urls", namespace="analisis_coples")),
+    path("metrics", metricas, name="metrics"),
 
     # API (nucleo del backend)
     path("api/", include("config.api_router")),
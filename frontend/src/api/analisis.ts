@@ -226,9 +226,10 @@ export const analisisAPI = {
   getResumenEstadisticas: (): Promise<any> =>
     API.get('analisis/estadisticas/resumen/').then(res => res.data),
 
-  // Imágenes procesadas
-  getImagenProcesada: (analisisId: number): Promise<{image_data: string, analisis_id: string, timestamp: string}> =>
-    API.get(`analisis/resultados/${analisisId}/imagen_procesada/`).then(res => res.data),
+  // Imágenes procesadas (JPEG binario; usar con URL.createObjectURL).
+  // ?formato=base64 queda solo para clientes externos
+  getImagenProcesada: (analisisId: number): Promise<Blob> =>
+    API.get(`analisis/resultados/${analisisId}/imagen_procesada/`, { responseType: 'blob' }).then(res => res.data),
 
   getMiniaturaAnalisis: (analisisId: number): Promise<{thumbnail_data: string, analisis_id: string}> =>
     API.get(`analisis/resultados/${analisisId}/miniatura/`).then(res => res.data),
@@ -99,3 +99,14 @@ export const getPreviewFrameUrl = (): string => {
   return `${cleanBaseURL}/camara/preview/frame/`;
 };
 
+/**
+ * Obtiene la URL del stream MJPEG del preview (usable directamente en <img>)
+ * @returns URL completa del endpoint de stream
+ */
+export const getPreviewStreamUrl = (): string => {
+  const baseURL = API.defaults.baseURL || 'http://localhost:8000/api/';
+  // Eliminar trailing slash del baseURL para evitar doble slash
+  const cleanBaseURL = baseURL.endsWith('/') ? baseURL.slice(0, -1) : baseURL;
+  return `${cleanBaseURL}/camara/preview/stream/`;
+};
+
@@ -1,5 +1,6 @@
 // src/api/rutinas.ts
 import API from './axios';
+import { TrabajoEncoladoResponse } from './trabajos';
 
 // Interfaces para Rutina de Inspección Multi-Ángulo
 export interface AnguloReporte {
@@ -70,13 +71,14 @@ export interface IniciarRutinaResponse {
   delay_segundos: number;
 }
 
-export interface EjecutarBarridoResponse {
-  message: string;
-  rutina: RutinaInspeccion;
+export interface ResultadoBarrido {
+  rutina_id: number;
   num_capturas: number;
   analisis_ids: number[];
 }
 
+export type EjecutarBarridoResponse = TrabajoEncoladoResponse<ResultadoBarrido>;
+
 export interface ReporteResponse {
   id_rutina: string;
   estado: string;
@@ -111,8 +113,8 @@ export const rutinasAPI = {
   },
 
   /**
-   * Ejecuta el barrido automático de 6 ángulos
-   * NOTA: Esta operación toma ~18 segundos
+   * Encola el barrido automático de la rutina.
+   * Devuelve el trabajo; usar trabajosAPI.esperarTrabajo para seguir el progreso
    */
   ejecutarBarrido: async (rutinaId: number): Promise<EjecutarBarridoResponse> => {
     const response = await API.post(`analisis/rutinas/${rutinaId}/ejecutar_barrido/`);
@@ -0,0 +1,58 @@
+// src/api/trabajos.ts
+import API from './axios';
+
+// Trabajo en cola (análisis o barrido) ejecutado fuera de la petición HTTP
+export interface TrabajoAnalisis<R = Record<string, any>> {
+  id: string;
+  tipo: 'realizar_analisis' | 'analizar_imagen' | 'ejecutar_barrido';
+  tipo_display: string;
+  estado: 'pendiente' | 'en_proceso' | 'completado' | 'error';
+  estado_display: string;
+  parametros: Record<string, any>;
+  resultado: R;
+  progreso: number;
+  mensaje: string;
+  mensaje_error: string;
+  timestamp_creacion: string;
+  timestamp_inicio: string | null;
+  timestamp_fin: string | null;
+}
+
+export interface TrabajoEncoladoResponse<R = Record<string, any>> {
+  message: string;
+  trabajo_id?: string;
+  trabajo: TrabajoAnalisis<R>;
+}
+
+export const trabajosAPI = {
+  /**
+   * Obtiene el estado de un trabajo
+   */
+  getTrabajo: async <R = Record<string, any>>(id: string): Promise<TrabajoAnalisis<R>> => {
+    const response = await API.get(`analisis/trabajos/${id}/`);
+    return response.data;
+  },
+
+  /**
+   * Consulta el trabajo hasta que termine y devuelve el trabajo completado.
+   * Lanza un Error con el mensaje del servidor si el trabajo falla.
+   */
+  esperarTrabajo: async <R = Record<string, any>>(
+    trabajo: TrabajoAnalisis<R>,
+    onProgreso?: (trabajo: TrabajoAnalisis<R>) => void,
+    intervaloMs: number = 1000
+  ): Promise<TrabajoAnalisis<R>> => {
+    let actual = trabajo;
+    while (actual.estado === 'pendiente' || actual.estado === 'en_proceso') {
+      onProgreso?.(actual);
+      await new Promise((resolve) => setTimeout(resolve, intervaloMs));
+      actual = await trabajosAPI.getTrabajo<R>(actual.id);
+    }
+    onProgreso?.(actual);
+
+    if (actual.estado === 'error') {
+      throw new Error(actual.mensaje_error || 'Error ejecutando trabajo');
+    }
+    return actual;
+  },
+};
@@ -31,7 +31,7 @@ import {
   iniciarPreview,
   detenerPreview,
   reactivarPreview,
-  getPreviewFrameUrl
+  getPreviewStreamUrl
 } from '../api/camara';
 import type { EstadoCamaraResponse } from '../api/camara';
 import Swal from 'sweetalert2';
@@ -40,7 +40,7 @@ const CameraPreview: React.FC = () => {
   const [estado, setEstado] = useState<EstadoCamaraResponse | null>(null);
   const [cargando, setCargando] = useState(false);
   const [error, setError] = useState<string | null>(null);
-  const [frameKey, setFrameKey] = useState(0);
+  const [streamKey, setStreamKey] = useState(0);
 
   // Cargar estado inicial
   useEffect(() => {
@@ -49,13 +49,10 @@ const CameraPreview: React.FC = () => {
     return () => clearInterval(interval);
   }, []);
 
-  // Actualizar frames cuando preview está activo
+  // Reabrir el stream MJPEG cada vez que se (re)activa el preview
   useEffect(() => {
     if (estado?.estado_bd.en_preview) {
-      const interval = setInterval(() => {
-        setFrameKey(prev => prev + 1);
-      }, 200); // 5 FPS = 200ms
-      return () => clearInterval(interval);
+      setStreamKey(prev => prev + 1);
     }
   }, [estado?.estado_bd.en_preview]);
 
@@ -247,7 +244,7 @@ const CameraPreview: React.FC = () => {
         >
           {estado?.estado_bd.en_preview ? (
             <img
-              src={`${getPreviewFrameUrl()}?t=${frameKey}`}
+              src={`${getPreviewStreamUrl()}?t=${streamKey}`}
               alt="Camera Preview"
               style={{
                 maxWidth: '100%',
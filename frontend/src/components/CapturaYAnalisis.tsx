@@ -28,6 +28,7 @@ import {
 } from '@mui/icons-material';
 import Swal from 'sweetalert2';
 import API from '../api/axios';
+import { trabajosAPI } from '../api/trabajos';
 
 interface ResultadoAnalisis {
   id: number;
@@ -102,11 +103,15 @@ const CapturaYAnalisis: React.FC = () => {
       setImagenCapturada(capturaResponse.data.imagen_url);
       setTimestampCaptura(capturaResponse.data.timestamp);
       
-      // Paso 2: Analizar automáticamente
-      const analisisResponse = await API.post('/analisis/resultados/', {
+      // Paso 2: Encolar el análisis y esperar a que el trabajador lo termine
+      const encoladoResponse = await API.post('/analisis/resultados/', {
         tipo_analisis: tipoAnalisis
       });
+      const trabajo = await trabajosAPI.esperarTrabajo<{ analisis_id: number }>(
+        encoladoResponse.data.trabajo
+      );
 
+      const analisisResponse = await API.get(`/analisis/resultados/${trabajo.resultado.analisis_id}/`);
       const analisis = analisisResponse.data;
       setUltimoAnalisis({
         id: analisis.id,
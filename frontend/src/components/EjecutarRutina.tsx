@@ -18,6 +18,7 @@ import {
 } from '@mui/icons-material';
 import Swal from 'sweetalert2';
 import { rutinasAPI } from '../api/rutinas';
+import { trabajosAPI } from '../api/trabajos';
 import { useNavigate } from 'react-router-dom';
 
 const EjecutarRutina: React.FC = () => {
@@ -37,15 +38,19 @@ const EjecutarRutina: React.FC = () => {
       
       setProgreso(10);
 
-      // Ejecutar barrido automático
+      // Encolar barrido automático y seguir su progreso
       const barridoResponse = await rutinasAPI.ejecutarBarrido(inicioResponse.rutina.id);
+      const trabajo = await trabajosAPI.esperarTrabajo(
+        barridoResponse.trabajo,
+        (actual) => setProgreso(Math.max(10, actual.progreso))
+      );
       
       setProgreso(100);
 
       await Swal.fire({
         title: '✅ Rutina Completada',
         html: `
-          <p><strong>${barridoResponse.num_capturas}</strong> imágenes capturadas y analizadas</p>
+          <p><strong>${trabajo.resultado.num_capturas}</strong> imágenes capturadas y analizadas</p>
           <p style="margin-top: 10px;">
             <a href="/rutina-inspeccion" style="color: #2196f3; text-decoration: none;">
               📊 Ver resultados detallados →
@@ -94,13 +99,13 @@ const EjecutarRutina: React.FC = () => {
             🎬 Captura automática: <strong>4 imágenes</strong>
           </Typography>
           <Typography variant="body2" color="text.secondary" gutterBottom>
-            ⏱️ Intervalo de captura: <strong>2 segundos</strong>
+            ⚡ Captura y análisis: <strong>en paralelo</strong>
           </Typography>
           <Typography variant="body2" color="text.secondary" gutterBottom>
             🔍 Análisis: <strong>Solo defectos</strong>
           </Typography>
           <Typography variant="body2" color="text.secondary">
-            ⏱️ Tiempo estimado: <strong>~20 segundos</strong>
+            ⏱️ Tiempo estimado: <strong>captura + una inferencia</strong>
           </Typography>
         </Box>
 
@@ -130,7 +135,7 @@ const EjecutarRutina: React.FC = () => {
 
         {ejecutando && (
           <Alert severity="info" sx={{ mt: 2 }}>
-            🎬 El barrido tomará aproximadamente 20 segundos. Por favor espera...
+            🎬 Ejecutando barrido. Por favor espera...
           </Alert>
         )}
       </CardContent>
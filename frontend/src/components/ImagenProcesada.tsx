@@ -23,7 +23,7 @@ import { analisisAPI } from '../api/analisis';
 interface ImagenProcesadaProps {
   analisisId: number;
   showThumbnail?: boolean;
-  onImageLoad?: (imageData: string) => void;
+  onImageLoad?: (imageUrl: string) => void;
 }
 
 const ImagenProcesada: React.FC<ImagenProcesadaProps> = ({
@@ -31,7 +31,7 @@ const ImagenProcesada: React.FC<ImagenProcesadaProps> = ({
   showThumbnail = false,
   onImageLoad,
 }) => {
-  const [imageData, setImageData] = useState<string | null>(null);
+  const [imageUrl, setImageUrl] = useState<string | null>(null);
   const [thumbnailData, setThumbnailData] = useState<string | null>(null);
   const [loading, setLoading] = useState(true);
   const [error, setError] = useState<string | null>(null);
@@ -42,6 +42,15 @@ const ImagenProcesada: React.FC<ImagenProcesadaProps> = ({
     loadImage();
   }, [analisisId, showThumbnail]);
 
+  // Liberar el blob de la imagen anterior al cambiarla o desmontar
+  useEffect(() => {
+    return () => {
+      if (imageUrl) {
+        URL.revokeObjectURL(imageUrl);
+      }
+    };
+  }, [imageUrl]);
+
   const loadImage = async () => {
     try {
       setLoading(true);
@@ -54,13 +63,12 @@ const ImagenProcesada: React.FC<ImagenProcesadaProps> = ({
         console.log('✅ Thumbnail data length:', response.thumbnail_data?.length);
         setThumbnailData(response.thumbnail_data);
       } else {
-        const response = await analisisAPI.getImagenProcesada(analisisId);
-        console.log('✅ Imagen response:', response);
-        console.log('✅ Image data type:', typeof response.image_data);
-        console.log('✅ Image data length:', response.image_data?.length);
-        setImageData(response.image_data);
+        const blob = await analisisAPI.getImagenProcesada(analisisId);
+        console.log('✅ Imagen recibida:', blob.type, blob.size);
+        const url = URL.createObjectURL(blob);
+        setImageUrl(url);
         if (onImageLoad) {
-          onImageLoad(response.image_data);
+          onImageLoad(url);
         }
       }
     } catch (err) {
@@ -80,10 +88,10 @@ const ImagenProcesada: React.FC<ImagenProcesadaProps> = ({
   };
 
   const handleDownload = () => {
-    if (imageData) {
+    if (imageUrl) {
       const link = document.createElement('a');
-      link.href = `data:image/png;base64,${imageData}`;
-      link.download = `analisis_${analisisId}_procesada.png`;
+      link.href = imageUrl;
+      link.download = `analisis_${analisisId}_procesada.jpg`;
       document.body.appendChild(link);
       link.click();
       document.body.removeChild(link);
@@ -124,14 +132,17 @@ const ImagenProcesada: React.FC<ImagenProcesadaProps> = ({
     );
   }
 
-  const currentImageData = showThumbnail ? thumbnailData : imageData;
+  // Miniatura en base64 (JSON); imagen completa como blob
+  const currentImageSrc = showThumbnail
+    ? (thumbnailData ? `data:image/png;base64,${thumbnailData}` : null)
+    : imageUrl;
 
-  console.log('Current image data:', currentImageData ? 'Present' : 'Missing');
+  console.log('Current image:', currentImageSrc ? 'Present' : 'Missing');
   console.log('Show thumbnail:', showThumbnail);
   console.log('Thumbnail data:', thumbnailData ? 'Present' : 'Missing');
-  console.log('Image data:', imageData ? 'Present' : 'Missing');
+  console.log('Image URL:', imageUrl ? 'Present' : 'Missing');
 
-  if (!currentImageData) {
+  if (!currentImageSrc) {
     return (
       <Alert severity="warning">
         No hay imagen procesada disponible para este análisis
@@ -152,7 +163,7 @@ const ImagenProcesada: React.FC<ImagenProcesadaProps> = ({
         }}
       >
       <img
-        src={`data:image/png;base64,${currentImageData}`}
+        src={currentImageSrc}
         alt={`Análisis ${analisisId} procesado`}
         style={{
           width: '100%',
@@ -227,10 +238,10 @@ const ImagenProcesada: React.FC<ImagenProcesadaProps> = ({
         }}
         onClick={() => setShowFullscreen(true)}
       >
-        {currentImageData ? (
+        {thumbnailData ? (
           <Box sx={{ textAlign: 'center' }}>
             <img
-              src={`data:image/png;base64,${currentImageData}`}
+              src={currentImageSrc}
               alt={`Análisis ${analisisId} procesado`}
               style={{
                 width: '180px',
@@ -244,16 +255,16 @@ const ImagenProcesada: React.FC<ImagenProcesadaProps> = ({
               onLoad={() => console.log('✅ Thumbnail loaded successfully')}
               onError={(e) => {
                 console.error('❌ Thumbnail load error:', e);
-                console.error('❌ Image src:', `data:image/png;base64,${currentImageData.substring(0, 100)}...`);
-                console.error('❌ Data length:', currentImageData.length);
-                console.error('❌ Data type:', typeof currentImageData);
+                console.error('❌ Image src:', `data:image/png;base64,${thumbnailData.substring(0, 100)}...`);
+                console.error('❌ Data length:', thumbnailData.length);
+                console.error('❌ Data type:', typeof thumbnailData);
               }}
             />
             <Typography variant="caption" color="text.secondary" sx={{ mt: 1, display: 'block' }}>
-              Debug: {currentImageData.length} chars
+              Debug: {thumbnailData.length} chars
             </Typography>
             <Typography variant="caption" color="text.secondary" sx={{ display: 'block' }}>
-              Data: {currentImageData.substring(0, 50)}...
+              Data: {thumbnailData.substring(0, 50)}...
             </Typography>
           </Box>
         ) : (
@@ -328,7 +339,7 @@ const ImagenProcesada: React.FC<ImagenProcesadaProps> = ({
             onClick={(e) => e.stopPropagation()}
           >
             <img
-              src={`data:image/png;base64,${currentImageData}`}
+              src={currentImageSrc}
               alt={`Análisis ${analisisId} procesado`}
               style={{
                 maxWidth: '100%',